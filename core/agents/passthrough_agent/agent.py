@@ -11,6 +11,7 @@ import json
 import time
 import asyncio
 import inspect
+from contextvars import ContextVar
 from typing import Any, Dict, List, Optional, Tuple, get_type_hints
 from pathlib import Path
 
@@ -32,6 +33,13 @@ from langchain_core.callbacks.base import BaseCallbackHandler
 
 from core.utils.extension_discovery import discover_extensions, build_all_light_schema
 from core.utils.llm_selector import get_chat_model
+from core.utils.token_budget import ContextBudget
+from core.utils.cancellation import check_cancelled, is_cancelled
+from core.utils.deadline import DEADLINE_FALLBACK_TEXT, remaining_time, timeout_for
+from core.utils.response_cache import record_tool_call
+from core.utils import fast_json
+from core.utils import tracing
+from core.utils import metrics
 
 
 # ---- Pydantic Models ----
@@ -90,12 +98,31 @@ class ToolResult(BaseModel):
 
 
 # ---- Runtime cache ----
-RUN_TRACES: List[ToolTrace] = []
 TOOL_RUNNERS: Dict[str, Any] = {}
 LIGHT_SCHEMA: str = ""
 DOMAIN_PROMPTS_TEXT: str = ""
 
 
+# Traces of the run in progress. A context variable rather than a module list, so
+# concurrent runs each collect their own; tool threads share their run's list.
+_RUN_TRACES: ContextVar[Optional[List[ToolTrace]]] = ContextVar("passthrough_run_traces", default=None)
+
+
+def _start_run_traces() -> List[ToolTrace]:
+    """Start a fresh trace list for the current run and return it."""
+    traces: List[ToolTrace] = []
+    _RUN_TRACES.set(traces)
+    return traces
+
+
+def _record_trace(trace: ToolTrace) -> None:
+    traces = _RUN_TRACES.get()
+    if traces is not None:
+        traces.append(trace)
+    # Lets the agent API invalidate cached answers after streamed runs too
+    record_tool_call(trace.tool)
+
+
 def _get_env(key: str, default: Optional[str] = None) -> Optional[str]:
     """Get environment variable with fallback."""
     val = os.getenv(key)
@@ -146,11 +173,13 @@ class LLMRunTracer(BaseCallbackHandler):
     def __init__(self, key: str):
         self.key = key
         self._starts: Dict[str, float] = {}
+        self._spans: Dict[str, Any] = {}
         self.total_duration_secs: float = 0.0
 
     def on_llm_start(self, serialized, prompts, run_id, parent_run_id=None, **kwargs):  # type: ignore[override]
         try:
             self._starts[str(run_id)] = time.perf_counter()
+            self._spans[str(run_id)] = tracing.start_span("llm.call", kind="CLIENT", **{"llm.role": self.key})
         except Exception:
             pass
 
@@ -159,6 +188,20 @@ class LLMRunTracer(BaseCallbackHandler):
             start = self._starts.pop(str(run_id), None)
             if isinstance(start, (int, float)):
                 self.total_duration_secs += max(0.0, time.perf_counter() - start)
+            usage = tracing.llm_token_usage(response)
+            metrics.record_llm_tokens(self.key, usage)
+            span = self._spans.pop(str(run_id), tracing.NOOP_SPAN)
+            tracing.record_llm_usage(span, response, usage)
+            span.end()
+        except Exception:
+            pass
+
+    def on_llm_error(self, error, run_id, parent_run_id=None, **kwargs):  # type: ignore[override]
+        try:
+            self._starts.pop(str(run_id), None)
+            span = self._spans.pop(str(run_id), tracing.NOOP_SPAN)
+            span.record_error(error)
+            span.end()
         except Exception:
             pass
 
@@ -167,7 +210,7 @@ def _normalize_result_to_string(result: Any) -> str:
     """Normalize a result to a string representation."""
     if isinstance(result, BaseModel):
         try:
-            return json.dumps(result.model_dump(), ensure_ascii=False)
+            return fast_json.dumps(result.model_dump())
         except Exception:
             try:
                 return result.model_dump_json()  # type: ignore[attr-defined]
@@ -178,7 +221,7 @@ def _normalize_result_to_string(result: Any) -> str:
                     return str(result)
     if isinstance(result, (dict, list)):
         try:
-            return json.dumps(result, ensure_ascii=False)
+            return fast_json.dumps(result)
         except Exception:
             return str(result)
     return str(result)
@@ -208,6 +251,8 @@ def _wrap_callable_as_runner(fn, ext_name: str):
     
     def _runner(**kwargs) -> ToolResult:
         t0 = time.perf_counter()
+        if is_cancelled():
+            return ToolResult(tool=fn.__name__, args=(kwargs or None), success=False, public_text="Cancelled", error="cancelled", duration_secs=0.0)
         try:
             # Pydantic validation before execution
             try:
@@ -219,7 +264,7 @@ def _wrap_callable_as_runner(fn, ext_name: str):
             result = fn(**validated_kwargs)
             sres = _normalize_result_to_string(result)
             dur = time.perf_counter() - t0
-            RUN_TRACES.append(ToolTrace(tool=fn.__name__, args=(kwargs or None), output=sres, duration_secs=dur))
+            _record_trace(ToolTrace(tool=fn.__name__, args=(kwargs or None), output=sres, duration_secs=dur))
             return ToolResult(tool=fn.__name__, args=(kwargs or None), success=True, public_text=sres, error=None, duration_secs=dur)
         except Exception as e:
             err = f"Error running tool {fn.__name__}: {str(e)}"
@@ -227,7 +272,7 @@ def _wrap_callable_as_runner(fn, ext_name: str):
                 dur = time.perf_counter() - t0
             except Exception:
                 dur = None
-            RUN_TRACES.append(ToolTrace(tool=fn.__name__, args=(kwargs or None), output=err, duration_secs=dur))
+            _record_trace(ToolTrace(tool=fn.__name__, args=(kwargs or None), output=err, duration_secs=dur))
             return ToolResult(tool=fn.__name__, args=(kwargs or None), success=False, public_text=err, error=str(e), duration_secs=dur)
     
     _runner.__doc__ = inspect.getdoc(fn) or ""
@@ -319,22 +364,39 @@ def _build_planner_messages(
     system_lines.append("- Prefer batching independent calls in the same step.")
     system_lines.append("")
     
-    if light_schema.strip():
+    # Fit schema, memory, history and review items into the prompt token budget
+    domain_text = ""
+    try:
+        if _env_bool("MONO_PT_INCLUDE_DOMAIN_PROMPTS", True) and DOMAIN_PROMPTS_TEXT.strip():
+            domain_text = DOMAIN_PROMPTS_TEXT.strip()
+    except Exception:
+        pass
+    review_list = review_items if isinstance(review_items, list) else []
+    budget = ContextBudget()
+    fitted = budget.fit(
+        schema=[light_schema.strip(), domain_text],
+        memory=memory,
+        history=chat_history,
+        review_texts=[budget.fit_tool_output(r.public_text or "", r.tool) for r in review_list],
+    )
+    schema_text, domain_text = fitted["schema"]
+    chat_history = fitted["history"]
+    memory = fitted["memory"]
+    _dbg_print(f"[passthrough] token allocation: {fitted['allocation']}")
+
+    if schema_text:
         system_lines.append("Available tools:")
-        system_lines.append(light_schema.strip())
+        system_lines.append(schema_text)
         system_lines.append("")
         system_lines.append("- DIRECT_RESPONSE(response_text: str): Answer the user directly without other tools")
     
     # Include domain prompts for better guidance
-    try:
-        if _env_bool("MONO_PT_INCLUDE_DOMAIN_PROMPTS", True) and DOMAIN_PROMPTS_TEXT.strip():
-            system_lines.append("")
-            system_lines.append("Domain system prompts:")
-            system_lines.append(DOMAIN_PROMPTS_TEXT.strip())
-    except Exception:
-        pass
+    if domain_text:
+        system_lines.append("")
+        system_lines.append("Domain system prompts:")
+        system_lines.append(domain_text)
     
-    if isinstance(review_items, list) and review_items:
+    if review_list:
         system_lines.append("")
         system_lines.append("Context: You are in a follow-up step. Some results require review.")
     
@@ -353,13 +415,13 @@ def _build_planner_messages(
     else:
         _dbg_print("[passthrough] WARNING: No chat_history or memory provided!")
     
-    if isinstance(review_items, list) and review_items:
+    if review_list:
         review_payload = []
-        for r in review_items:
+        for r, public_text in zip(review_list, fitted["review_texts"]):
             review_payload.append({
                 "tool": r.tool,
                 "success": bool(r.success),
-                "public_text": r.public_text,
+                "public_text": public_text,
                 "error": r.error,
             })
         msgs.append(SystemMessage(content=(
@@ -374,7 +436,7 @@ def _extract_json_object(text: str) -> Optional[Dict[str, Any]]:
     """Extract JSON object from text."""
     # Try direct JSON first
     try:
-        obj = json.loads(text)
+        obj = fast_json.loads(text)
         if isinstance(obj, dict):
             return obj
     except Exception:
@@ -386,7 +448,7 @@ def _extract_json_object(text: str) -> Optional[Dict[str, Any]]:
     if start >= 0 and end > start:
         snippet = text[start : end + 1]
         try:
-            obj = json.loads(snippet)
+            obj = fast_json.loads(snippet)
             if isinstance(obj, dict):
                 return obj
         except Exception:
@@ -406,12 +468,41 @@ async def _run_one_tool(name: str, args: Dict[str, Any]) -> ToolResult:
             error="unknown tool",
             duration_secs=None
         )
-    # Run potentially blocking tool in worker thread
-    return await asyncio.to_thread(runner, **(args or {}))
+    # Run potentially blocking tool in worker thread, bounded by the request deadline
+    timeout = timeout_for()
+    t0 = time.perf_counter()
+    try:
+        with tracing.span("tool.call", **{"tool.name": name}) as span:
+            result = await asyncio.wait_for(asyncio.to_thread(runner, **(args or {})), timeout=timeout)
+            span.set_attribute("tool.success", bool(getattr(result, "success", True)))
+        metrics.observe_tool(name, time.perf_counter() - t0, "ok" if getattr(result, "success", True) else "error")
+        return result
+    except asyncio.TimeoutError:
+        metrics.observe_tool(name, time.perf_counter() - t0, "timeout")
+        return ToolResult(
+            tool=name,
+            args=args or None,
+            success=False,
+            public_text=f"Error: tool '{name}' did not finish before the request deadline",
+            error="deadline exceeded",
+            duration_secs=timeout
+        )
+
+
+def _deadline_allows_step(step: int, last_plan_secs: float) -> bool:
+    """Whether the remaining request budget can fit another planning step."""
+    left = remaining_time()
+    if left is None:
+        return True
+    if left <= 0:
+        return False
+    # Follow-up steps need at least as long as the previous planner call took
+    return step <= 1 or left >= last_plan_secs
 
 
 async def _execute_planned_calls(calls: List[PlannedToolCall]) -> Tuple[List[ToolResult], List[Tuple[PlannedToolCall, ToolResult]]]:
     """Execute planned calls concurrently."""
+    check_cancelled()
     tasks = [asyncio.create_task(_run_one_tool(pc.tool, pc.args or {})) for pc in calls]
     results: List[ToolResult] = await asyncio.gather(*tasks)
     paired: List[Tuple[PlannedToolCall, ToolResult]] = list(zip(calls, results))
@@ -472,8 +563,8 @@ async def run_agent(
         model = base_model
         _dbg_print("[passthrough] Warning: structured output not supported, falling back to JSON parsing")
 
-    # Clear traces per run
-    del RUN_TRACES[:]
+    # Traces belong to this run only
+    run_traces = _start_run_traces()
 
     # Iterative plan-execute-review loop
     t0_total = time.perf_counter()
@@ -482,9 +573,15 @@ async def run_agent(
     recursion_limit = int(_get_env("MONO_PT_RECURSION_LIMIT", "8") or 8)
     followup_items: List[ToolResult] = []
     step = 0
+    last_plan_secs = 0.0
+    deadline_hit = False
 
     while step < recursion_limit:
         step += 1
+        if not _deadline_allows_step(step, last_plan_secs):
+            _dbg_print(f"[passthrough] step {step}: not enough time left before the deadline; finishing.")
+            deadline_hit = True
+            break
         
         # Build planning messages
         messages = _build_planner_messages(
@@ -496,10 +593,18 @@ async def run_agent(
         )
 
         # Invoke planner with structured output
+        check_cancelled()
         t0_plan = time.perf_counter()
         _dbg_print(f"[passthrough] step {step}: planning...")
-        plan_resp = await model.ainvoke(messages)
+        try:
+            with tracing.span("planner.step", **{"planner.step": step}):
+                plan_resp = await asyncio.wait_for(model.ainvoke(messages), timeout=timeout_for())
+        except asyncio.TimeoutError:
+            _dbg_print(f"[passthrough] step {step}: planner call hit the request deadline; finishing.")
+            deadline_hit = True
+            break
         plan_secs = time.perf_counter() - t0_plan
+        last_plan_secs = plan_secs
         timings.append(Timing(name=f"plan:{step}", seconds=float(plan_secs)))
         
         # Parse plan - should be PlannerStep if structured output worked
@@ -546,7 +651,8 @@ async def run_agent(
             _dbg_print(f"[passthrough] step {step} CALL {idx}/{len(planner_step.calls)}: tool={pc.tool} passthrough={(pc.options.passthrough if pc.options else True)} args={_truncate(args_str, 600)}")
 
         t0_exec = time.perf_counter()
-        _, paired = await _execute_planned_calls(planner_step.calls)
+        with tracing.span("tools.execute", **{"planner.step": step, "tools.count": len(planner_step.calls)}):
+            _, paired = await _execute_planned_calls(planner_step.calls)
         exec_secs = time.perf_counter() - t0_exec
         timings.append(Timing(name=f"exec:{step}", seconds=float(exec_secs)))
 
@@ -570,8 +676,13 @@ async def run_agent(
 
     total_secs = time.perf_counter() - t0_total
     timings.append(Timing(name="total", seconds=float(total_secs)))
+    if deadline_hit:
+        # Marks a run cut short by the request deadline (the answer may be partial)
+        timings.append(Timing(name="deadline", seconds=float(remaining_time() or 0.0)))
 
     final_text = "\n\n".join([seg for seg in accumulated_segments if isinstance(seg, str) and seg])
+    if deadline_hit and not final_text:
+        final_text = DEADLINE_FALLBACK_TEXT
     _dbg_print(f"[passthrough] done. steps={step} segments={len(accumulated_segments)} total={total_secs:.2f}s")
     
     return AgentResult(
@@ -580,7 +691,7 @@ async def run_agent(
         timings=timings,
         content=final_text,
         response_time_secs=float(total_secs),
-        traces=list(RUN_TRACES),
+        traces=list(run_traces),
     )
 
 
@@ -620,8 +731,8 @@ async def run_agent_stream(
         model = base_model
         _dbg_print("[passthrough-stream] Warning: structured output not supported, falling back to JSON parsing")
 
-    # Clear traces
-    del RUN_TRACES[:]
+    # Traces belong to this run only
+    _start_run_traces()
 
     # Iterative plan-execute-review loop with streaming
     accumulated_segments: List[str] = []
@@ -629,9 +740,15 @@ async def run_agent_stream(
     followup_items: List[ToolResult] = []
     step = 0
     yielded_any = False
+    last_plan_secs = 0.0
+    deadline_hit = False
 
     while step < recursion_limit:
         step += 1
+        if not _deadline_allows_step(step, last_plan_secs):
+            _dbg_print(f"[passthrough-stream] step {step}: not enough time left before the deadline; finishing.")
+            deadline_hit = True
+            break
         
         messages = _build_planner_messages(
             user_prompt=user_prompt,
@@ -641,8 +758,17 @@ async def run_agent_stream(
             review_items=(followup_items or None),
         )
 
+        check_cancelled()
         _dbg_print(f"[passthrough-stream] step {step}: planning...")
-        plan_resp = await model.ainvoke(messages)
+        t0_plan = time.perf_counter()
+        try:
+            with tracing.span("planner.step", **{"planner.step": step}):
+                plan_resp = await asyncio.wait_for(model.ainvoke(messages), timeout=timeout_for())
+        except asyncio.TimeoutError:
+            _dbg_print(f"[passthrough-stream] step {step}: planner call hit the request deadline; finishing.")
+            deadline_hit = True
+            break
+        last_plan_secs = time.perf_counter() - t0_plan
         
         # Parse plan - should be PlannerStep if structured output worked
         planner_step = PlannerStep()
@@ -678,7 +804,8 @@ async def run_agent_stream(
             break
 
         _dbg_print(f"[passthrough-stream] step {step}: executing {len(planner_step.calls)} call(s)...")
-        _, paired = await _execute_planned_calls(planner_step.calls)
+        with tracing.span("tools.execute", **{"planner.step": step, "tools.count": len(planner_step.calls)}):
+            _, paired = await _execute_planned_calls(planner_step.calls)
 
         # Route and stream
         followup_items = []
@@ -699,7 +826,9 @@ async def run_agent_stream(
             _dbg_print(f"[passthrough-stream] step {step}: no follow-up needed; finishing.")
             break
 
-    if not yielded_any:
+    if not yielded_any and deadline_hit:
+        yield DEADLINE_FALLBACK_TEXT
+    elif not yielded_any:
         _dbg_print("[passthrough-stream] no content streamed; falling back.")
         res = await run_agent(user_prompt, chat_history=chat_history, memory=memory, tool_root=tool_root, llm=llm)
         yield res.final
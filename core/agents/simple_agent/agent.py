@@ -8,7 +8,9 @@ import os
 import sys
 import json
 import time
+import asyncio
 import inspect
+from contextvars import ContextVar
 from typing import Any, Dict, List, Optional, Tuple, get_type_hints
 from pathlib import Path
 
@@ -28,6 +30,13 @@ from pydantic import BaseModel, Field
 from langchain_core.callbacks.base import BaseCallbackHandler
 from core.utils.extension_discovery import discover_extensions
 from core.utils.llm_selector import get_chat_model
+from core.utils.token_budget import ContextBudget
+from core.utils.cancellation import check_cancelled, RunCancelled
+from core.utils.deadline import DEADLINE_FALLBACK_TEXT, remaining_time, timeout_for
+from core.utils.response_cache import record_tool_call
+from core.utils import fast_json
+from core.utils import tracing
+from core.utils import metrics
 
 
 # ---- Pydantic Models (I/O Contract) ----
@@ -59,10 +68,29 @@ class AgentResult(BaseModel):
 
 # ---- Runtime cache ----
 PRELOADED_TOOLS: List[Any] = []
-RUN_TRACES: List[ToolTrace] = []
 DOMAIN_PROMPTS_TEXT: str = ""
 
 
+# Traces of the run in progress. A context variable rather than a module list, so
+# concurrent runs each collect their own; tool threads share their run's list.
+_RUN_TRACES: ContextVar[Optional[List[ToolTrace]]] = ContextVar("simple_run_traces", default=None)
+
+
+def _start_run_traces() -> List[ToolTrace]:
+    """Start a fresh trace list for the current run and return it."""
+    traces: List[ToolTrace] = []
+    _RUN_TRACES.set(traces)
+    return traces
+
+
+def _record_trace(trace: ToolTrace) -> None:
+    traces = _RUN_TRACES.get()
+    if traces is not None:
+        traces.append(trace)
+    # Lets the agent API invalidate cached answers after streamed runs too
+    record_tool_call(trace.tool)
+
+
 def _get_env(key: str, default: Optional[str] = None) -> Optional[str]:
     """Get environment variable with fallback."""
     val = os.getenv(key)
@@ -120,7 +148,7 @@ def _wrap_callable_as_tool(fn, ext_name: str):
                 # Normalize result to string
                 if isinstance(result, BaseModel):
                     try:
-                        sres = json.dumps(result.model_dump(), ensure_ascii=False)
+                        sres = fast_json.dumps(result.model_dump())
                     except Exception:
                         try:
                             sres = result.model_dump_json()
@@ -128,14 +156,14 @@ def _wrap_callable_as_tool(fn, ext_name: str):
                             sres = result.json() if hasattr(result, "json") else str(result)
                 elif isinstance(result, (dict, list)):
                     try:
-                        sres = json.dumps(result, ensure_ascii=False)
+                        sres = fast_json.dumps(result)
                     except Exception:
                         sres = str(result)
                 else:
                     sres = str(result)
                 
                 dur = time.perf_counter() - t0
-                RUN_TRACES.append(ToolTrace(tool=fn.__name__, args=(kwargs or None), output=sres, duration_secs=dur))
+                _record_trace(ToolTrace(tool=fn.__name__, args=(kwargs or None), output=sres, duration_secs=dur))
                 return sres
             
             except Exception as e:
@@ -147,7 +175,7 @@ def _wrap_callable_as_tool(fn, ext_name: str):
                     dur = time.perf_counter() - t0  # type: ignore[name-defined]
                 except Exception:
                     dur = None
-                RUN_TRACES.append(ToolTrace(tool=fn.__name__, args=(kwargs or None), output=last_err, duration_secs=dur))
+                _record_trace(ToolTrace(tool=fn.__name__, args=(kwargs or None), output=last_err, duration_secs=dur))
                 return last_err
         
         return last_err or "Unknown error"
@@ -201,16 +229,32 @@ class LLMRunTracer(BaseCallbackHandler):
     def __init__(self, key: str):
         self.key = key
         self._starts: Dict[str, float] = {}
+        self._spans: Dict[str, Any] = {}
 
     def on_llm_start(self, serialized, prompts, run_id, parent_run_id=None, **kwargs):  # type: ignore[override]
         try:
             self._starts[str(run_id)] = time.perf_counter()
+            self._spans[str(run_id)] = tracing.start_span("llm.call", kind="CLIENT", **{"llm.role": self.key})
         except Exception:
             pass
 
     def on_llm_end(self, response, run_id, parent_run_id=None, **kwargs):  # type: ignore[override]
         try:
             self._starts.pop(str(run_id), None)
+            usage = tracing.llm_token_usage(response)
+            metrics.record_llm_tokens(self.key, usage)
+            span = self._spans.pop(str(run_id), tracing.NOOP_SPAN)
+            tracing.record_llm_usage(span, response, usage)
+            span.end()
+        except Exception:
+            pass
+
+    def on_llm_error(self, error, run_id, parent_run_id=None, **kwargs):  # type: ignore[override]
+        try:
+            self._starts.pop(str(run_id), None)
+            span = self._spans.pop(str(run_id), tracing.NOOP_SPAN)
+            span.record_error(error)
+            span.end()
         except Exception:
             pass
 
@@ -270,6 +314,10 @@ async def run_agent(
     sys_parts.append("You are a helpful assistant with access to tools. Use tools when appropriate to help the user.")
     messages.append(SystemMessage(content="\n\n".join(sys_parts)))
     
+    # Keep history and memory inside the prompt token budget (tool schemas are bound separately)
+    budget = ContextBudget()
+    fitted = budget.fit(memory=memory, history=chat_history)
+    chat_history, memory = fitted["history"], fitted["memory"]
     if chat_history or memory:
         messages.append(SystemMessage(content=(
             "Conversation context to consider when responding.\n"
@@ -279,17 +327,27 @@ async def run_agent(
     
     messages.append(HumanMessage(content=user_prompt))
 
-    # Clear traces for this run
-    del RUN_TRACES[:]
+    # Traces belong to this run only
+    run_traces = _start_run_traces()
 
     # Agent loop with direct tool calling
     t0 = time.perf_counter()
     max_iterations = 16
+    deadline_hit = False
     
     try:
         for iteration in range(max_iterations):
-            # Invoke model
-            response = await model_with_tools.ainvoke(messages)
+            # Invoke model, bounded by the request deadline
+            check_cancelled()
+            left = remaining_time()
+            if left is not None and left <= 0:
+                deadline_hit = True
+                break
+            try:
+                response = await asyncio.wait_for(model_with_tools.ainvoke(messages), timeout=timeout_for())
+            except asyncio.TimeoutError:
+                deadline_hit = True
+                break
             messages.append(response)
             
             # Check if model wants to call tools
@@ -313,11 +371,19 @@ async def run_agent(
                         break
                 
                 if tool_found:
+                    check_cancelled()
+                    t0_tool = time.perf_counter()
                     try:
-                        result = await tool_found.ainvoke(tool_args)
-                        tool_result = str(result)
+                        with tracing.span("tool.call", **{"tool.name": tool_name}):
+                            result = await asyncio.wait_for(tool_found.ainvoke(tool_args), timeout=timeout_for())
+                        tool_result = budget.fit_tool_output(str(result), tool_name)
+                        metrics.observe_tool(tool_name, time.perf_counter() - t0_tool, "ok")
+                    except asyncio.TimeoutError:
+                        tool_result = f"Error executing tool {tool_name}: did not finish before the request deadline"
+                        metrics.observe_tool(tool_name, time.perf_counter() - t0_tool, "timeout")
                     except Exception as e:
                         tool_result = f"Error executing tool {tool_name}: {str(e)}"
+                        metrics.observe_tool(tool_name, time.perf_counter() - t0_tool, "error")
                 else:
                     tool_result = f"Tool {tool_name} not found"
                 
@@ -335,16 +401,23 @@ async def run_agent(
                     final_text = content
                     break
         
-        if not final_text:
+        if not final_text and deadline_hit:
+            final_text = DEADLINE_FALLBACK_TEXT
+        elif not final_text:
             final_text = "No response generated"
     
+    except RunCancelled:
+        raise
     except Exception as e:
         elapsed = time.perf_counter() - t0
         final_text = f"Error during agent execution: {str(e)}"
 
     # Assemble response
     timings = [Timing(name="total", seconds=float(elapsed))]
-    traces = list(RUN_TRACES)
+    if deadline_hit:
+        # Marks a run cut short by the request deadline (the answer may be partial)
+        timings.append(Timing(name="deadline", seconds=float(remaining_time() or 0.0)))
+    traces = list(run_traces)
 
     return AgentResult(
         final=final_text,
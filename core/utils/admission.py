@@ -0,0 +1,239 @@
+"""Admission control for the agent API.
+
+Each chat completion can fan out into many LLM and tool calls, so the agent API
+limits how many runs execute at once. Requests beyond the global cap wait in a
+bounded priority queue where interactive requests are served before scheduled
+ones, and each API key/preset pair can additionally be rate limited with a token
+bucket. Requests that cannot be admitted get a 429 with a Retry-After hint.
+
+Settings (environment):
+    LUNA_MAX_CONCURRENT_RUNS      global concurrency cap (default 8, 0 = unlimited)
+    LUNA_ADMISSION_QUEUE_SIZE     max queued requests (default 32)
+    LUNA_ADMISSION_QUEUE_TIMEOUT  seconds a request may wait in the queue (default 30)
+    LUNA_RATE_LIMIT_PER_MIN       per key/preset requests per minute (default 0 = off)
+    LUNA_RATE_LIMIT_BURST         bucket size (default: the per-minute rate)
+"""
+import os
+import math
+import time
+import heapq
+import asyncio
+import hashlib
+import itertools
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from core.utils import metrics
+
+PRIORITIES: Dict[str, int] = {"interactive": 0, "scheduled": 1, "batch": 2}
+DEFAULT_PRIORITY = "interactive"
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; carries a Retry-After hint."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+def parse_priority(value: Optional[str]) -> str:
+    """Map a priority header value to a known priority name."""
+    name = (value or "").strip().lower()
+    return name if name in PRIORITIES else DEFAULT_PRIORITY
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at rate tokens/second."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take one token. Returns 0 on success, else seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else 60.0
+
+
+class AdmissionTicket:
+    """A granted run slot. Release it exactly once (extra releases are ignored)."""
+
+    def __init__(self, controller: "AdmissionController", priority: str, waited: float):
+        self._controller = controller
+        self._released = False
+        self.priority = priority
+        self.waited_secs = waited
+        self._started = time.monotonic()
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller.record_run(time.monotonic() - self._started)
+            self._controller._release()
+
+    async def __aenter__(self) -> "AdmissionTicket":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.release()
+
+
+class AdmissionController:
+    """Global concurrency cap + bounded priority queue + per-key token buckets."""
+
+    def __init__(
+        self,
+        max_concurrent: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        queue_timeout: Optional[float] = None,
+        rate_per_min: Optional[float] = None,
+        burst: Optional[float] = None,
+    ):
+        if max_concurrent is None:
+            max_concurrent = int(os.getenv("LUNA_MAX_CONCURRENT_RUNS", "8") or 0)
+        if queue_size is None:
+            queue_size = int(os.getenv("LUNA_ADMISSION_QUEUE_SIZE", "32") or 0)
+        if queue_timeout is None:
+            queue_timeout = float(os.getenv("LUNA_ADMISSION_QUEUE_TIMEOUT", "30") or 0)
+        if rate_per_min is None:
+            rate_per_min = float(os.getenv("LUNA_RATE_LIMIT_PER_MIN", "0") or 0)
+        if burst is None:
+            burst = float(os.getenv("LUNA_RATE_LIMIT_BURST", "0") or 0) or rate_per_min
+        self.max_concurrent = max(0, max_concurrent)
+        self.queue_size = max(0, queue_size)
+        self.queue_timeout = max(0.0, queue_timeout)
+        self.rate_per_min = max(0.0, rate_per_min)
+        self.burst = max(1.0, burst) if self.rate_per_min else 0.0
+        self.active = 0
+        self.rejected = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+        self._avg_run_secs = 5.0
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, fut in self._waiters if not fut.done())
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "max_concurrent": self.max_concurrent,
+            "queue_size": self.queue_size,
+            "rejected": self.rejected,
+        }
+
+    def _bucket_key(self, api_key: str, model_id: str) -> str:
+        digest = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:12]
+        return f"{digest}:{model_id}"
+
+    def _check_rate(self, api_key: str, model_id: str) -> None:
+        if not self.rate_per_min:
+            return
+        key = self._bucket_key(api_key, model_id)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate_per_min / 60.0, self.burst)
+            wait = bucket.take()
+        if wait > 0:
+            self.rejected += 1
+            raise AdmissionRejected(f"rate limit exceeded for '{model_id}'", wait)
+
+    def _retry_hint(self) -> float:
+        """Rough time until a slot frees up, from the average run duration."""
+        if not self.max_concurrent:
+            return 1.0
+        return self._avg_run_secs * (1 + self.queued / self.max_concurrent)
+
+    async def acquire(
+        self,
+        api_key: str = "",
+        model_id: str = "",
+        priority: str = DEFAULT_PRIORITY,
+        timeout: Optional[float] = None,
+    ) -> AdmissionTicket:
+        """Wait for a run slot or raise AdmissionRejected.
+
+        timeout, when given, further bounds the queue wait (e.g. a request deadline).
+        """
+        self._check_rate(api_key, model_id)
+        t0 = time.monotonic()
+        if not self.max_concurrent or (self.active < self.max_concurrent and not self.queued):
+            self.active += 1
+            return AdmissionTicket(self, priority, 0.0)
+
+        if self.queued >= self.queue_size:
+            self.rejected += 1
+            raise AdmissionRejected("server busy: admission queue is full", self._retry_hint())
+
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (PRIORITIES.get(priority, 0), next(self._seq), fut))
+        try:
+            wait = self.queue_timeout or None
+            if timeout is not None:
+                wait = min(wait, timeout) if wait is not None else timeout
+            await asyncio.wait_for(asyncio.shield(fut), timeout=wait)
+        except asyncio.TimeoutError:
+            if fut.done() and not fut.cancelled():
+                # Granted just as the timeout fired; hand the slot back
+                self._release()
+            else:
+                fut.cancel()
+            self.rejected += 1
+            raise AdmissionRejected("server busy: timed out waiting for a run slot", self._retry_hint())
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self._release()
+            else:
+                fut.cancel()
+            raise
+        return AdmissionTicket(self, priority, time.monotonic() - t0)
+
+    def record_run(self, seconds: float) -> None:
+        """Feed run durations into the Retry-After estimate."""
+        self._avg_run_secs = 0.8 * self._avg_run_secs + 0.2 * max(0.0, seconds)
+
+    def _release(self) -> None:
+        # Hand the slot straight to the highest-priority live waiter
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.set_result(True)
+                return
+        self.active = max(0, self.active - 1)
+
+
+_CONTROLLER: Optional[AdmissionController] = None
+
+
+def get_admission_controller() -> AdmissionController:
+    """Process-wide admission controller used by the agent API."""
+    global _CONTROLLER
+    if _CONTROLLER is None:
+        _CONTROLLER = AdmissionController()
+    return _CONTROLLER
+
+
+def _metrics_collector():
+    """Scrape-time admission gauges for /metrics."""
+    if _CONTROLLER is None:
+        return
+    stats = _CONTROLLER.stats()
+    yield ("luna_admission_active", "gauge", "Chat runs holding an admission slot", [({}, stats["active"])])
+    yield ("luna_admission_queued", "gauge", "Chat runs waiting for an admission slot", [({}, stats["queued"])])
+    yield ("luna_admission_rejected_total", "counter", "Chat runs rejected by admission control", [({}, stats["rejected"])])
+
+
+metrics.REGISTRY.register_collector(_metrics_collector)
@@ -7,20 +7,23 @@ import os
 import sys
 import time
 import uuid
+import asyncio
 import json
 import glob
 import inspect
+import logging
 import secrets
+import threading
 import importlib.util
 from types import ModuleType
-from typing import List, Optional, Literal, Dict, Any, Tuple, AsyncGenerator
+from typing import List, Optional, Literal, Dict, Any, Set, Tuple, AsyncGenerator
 from pathlib import Path
 
 from fastapi import FastAPI, Response, HTTPException, Request, Header, Security
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel, Field
 
 # Ensure project root on sys.path
@@ -29,6 +32,23 @@ if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
 from core.utils.caddy_control import reload_caddy
+from core.utils.extension_discovery import shared_discovery_pass, track_extensions, reload_extensions, refresh_extensions
+from core.utils.history_summary import get_history_cache
+from core.utils.response_cache import get_response_cache, executed_tool_names, start_tool_calls
+from core.utils.admission import get_admission_controller, parse_priority, AdmissionRejected
+from core.utils.cancellation import CancellationToken, RunCancelled, use_token, run_until_disconnected
+from core.utils.deadline import DEADLINE_FALLBACK_TEXT, Deadline, use_deadline
+from core.utils import prefork
+from core.utils import fast_json
+from core.utils.fast_json import FastJSONResponse
+from core.utils import tracing
+from core.utils import metrics
+from core.utils import profiling
+from core.utils import extension_watcher
+from core.utils import structured_log
+from core.utils.config_store import get_config_store
+from core.utils.tracing import TracingMiddleware, bearer_auth
+from core.utils.sse import ChunkEncoder, DONE as SSE_DONE, coalesce as sse_coalesce
 
 # Optional .env
 try:
@@ -84,12 +104,27 @@ security = HTTPBearer()
 # ---- Config ----
 DEBUG = os.getenv("AGENT_API_DEBUG", "true").lower() in ("1", "true", "yes", "on")
 DEFAULT_AGENT = os.getenv("DEFAULT_AGENT", "simple_agent")
-_UNPROTECTED_PATHS = {"/", "/healthz"}
+_UNPROTECTED_PATHS = {"/", "/healthz", "/metrics"}
+
+# Request-path logging goes through a background writer (see structured_log)
+_REQUEST_LOG = structured_log.get_logger("agent_api.requests", label="Agent API")
 
 # Discovery: scan core/agents/*/ for agent.py files
 AGENTS_ROOT = PROJECT_ROOT / "core" / "agents"
 
-app = FastAPI(title="Luna Agent API", description="OpenAI-compatible API for Luna agents")
+app = FastAPI(
+    title="Luna Agent API",
+    description="OpenAI-compatible API for Luna agents",
+    default_response_class=FastJSONResponse,
+)
+
+# Root span per request (sampled; see core/utils/tracing.py)
+app.add_middleware(TracingMiddleware, service="agent-api", allow_force=bearer_auth(API_KEY))
+# Request counts/latency per route and per model (see core/utils/metrics.py)
+app.add_middleware(metrics.MetricsMiddleware, service="agent-api")
+# Opt-in per-request profiling via X-Luna-Profile (see core/utils/profiling.py)
+if profiling.REQUESTS_ENABLED:
+    app.add_middleware(profiling.ProfilingMiddleware)
 
 # Add CORS for localhost and network access - allow all origins
 app.add_middleware(
@@ -98,6 +133,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[tracing.TRACE_ID_HEADER, profiling.PROFILE_FILE_HEADER],
 )
 
 # API Key validation
@@ -127,6 +163,7 @@ class ChatCompletionRequest(BaseModel):
     top_p: Optional[float] = None
     max_tokens: Optional[int] = None
     n: Optional[int] = Field(default=1)
+    deadline_ms: Optional[int] = Field(default=None)  # Luna extension: time budget for this request
 
 
 # ---- Agent Registry ----
@@ -137,10 +174,17 @@ AGENT_PATHS: Dict[str, str] = {}
 _TOOL_CACHE: Dict[str, Any] = {}  # All tools cached at startup
 _PRESET_TOOL_CACHE: Dict[str, set] = {}  # Filtered tool names per preset
 _PRESET_METADATA: Dict[str, Dict[str, Any]] = {}  # Preset metadata for /v1/models
+_PRESET_SIGNATURES: Dict[str, str] = {}  # Serialized preset config, to detect changes
+_PRESETS_VERSION: Optional[Tuple[str, int]] = None  # (config path, ConfigStore version) at last preset load
 
+# ---- Negative cache for unknown model IDs ----
+_UNKNOWN_MODELS: Dict[str, float] = {}  # model_id -> expiry (monotonic)
+UNKNOWN_MODEL_TTL = float(os.getenv("LUNA_UNKNOWN_MODEL_TTL", "60"))
+MASTER_CONFIG_PATH = PROJECT_ROOT / "core" / "master_config.json"
 
-def _split_history_and_prompt(messages: List[ChatMessage]) -> Tuple[str, str]:
-    """Split messages into chat history and final user prompt."""
+
+def _history_lines_and_prompt(messages: List[ChatMessage]) -> Tuple[List[str], str]:
+    """Split messages into chat history lines and final user prompt."""
     user_indexes = [i for i, m in enumerate(messages) if m.role == "user" and (m.content or "").strip()]
     if not user_indexes:
         raise HTTPException(status_code=400, detail="no user message provided")
@@ -148,12 +192,8 @@ def _split_history_and_prompt(messages: List[ChatMessage]) -> Tuple[str, str]:
     last_user_idx = user_indexes[-1]
     last_user_text = (messages[last_user_idx].content or "").strip()
 
-    prior = messages[:last_user_idx]
-    if not prior:
-        return "", last_user_text
-
     lines: List[str] = []
-    for m in prior:
+    for m in messages[:last_user_idx]:
         c = (m.content or "").strip()
         if not c:
             continue
@@ -163,6 +203,12 @@ def _split_history_and_prompt(messages: List[ChatMessage]) -> Tuple[str, str]:
             lines.append(f"assistant: {c}")
         # Ignore system/tool/function in chat_history
     
+    return lines, last_user_text
+
+
+def _split_history_and_prompt(messages: List[ChatMessage]) -> Tuple[str, str]:
+    """Split messages into chat history and final user prompt."""
+    lines, last_user_text = _history_lines_and_prompt(messages)
     return "\n".join(lines), last_user_text
 
 
@@ -201,95 +247,64 @@ def _trigger_caddy_reload(reason: str) -> None:
 
 async def _sse_gen(final_text: str, model_id: str) -> AsyncGenerator[str, None]:
     """Generate SSE stream for a final text response."""
-    cid = f"chatcmpl-{uuid.uuid4().hex[:24]}"
-    created = int(time.time())
-    
-    chunk1 = {
-        "id": cid,
-        "object": "chat.completion.chunk",
-        "created": created,
-        "model": model_id,
-        "choices": [
-            {"index": 0, "delta": {"role": "assistant", "content": final_text}, "finish_reason": None}
-        ],
-    }
-    yield f"data: {json.dumps(chunk1)}\n\n"
-    
-    chunk2 = {
-        "id": cid,
-        "object": "chat.completion.chunk",
-        "created": created,
-        "model": model_id,
-        "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
-    }
-    yield f"data: {json.dumps(chunk2)}\n\n"
-    yield "data: [DONE]\n\n"
+    enc = ChunkEncoder(f"chatcmpl-{uuid.uuid4().hex[:24]}", int(time.time()), model_id)
+    yield enc.role(final_text)
+    yield enc.stop()
+    yield SSE_DONE
 
 
 async def _sse_token_stream(
     mod: ModuleType,
     user_prompt: str,
-    chat_history: Optional[str],
+    history_lines: List[str],
     memory: Optional[str],
-    model_id: str
+    model_id: str,
+    deadline: Optional[Deadline] = None
 ) -> AsyncGenerator[str, None]:
     """Stream token-by-token SSE compatible with OpenAI Chat Completions."""
-    cid = f"chatcmpl-{uuid.uuid4().hex[:24]}"
-    created = int(time.time())
+    enc = ChunkEncoder(f"chatcmpl-{uuid.uuid4().hex[:24]}", int(time.time()), model_id)
 
     # Send initial role chunk
-    first = {
-        "id": cid,
-        "object": "chat.completion.chunk",
-        "created": created,
-        "model": model_id,
-        "choices": [{"index": 0, "delta": {"role": "assistant"}, "finish_reason": None}],
-    }
-    yield f"data: {json.dumps(first)}\n\n"
+    yield enc.role()
 
     yielded_any = False
+    # Cancelled if the client drops the stream before the agent finishes
+    cancel_token = CancellationToken()
+    finished = False
+    # Streamed answers are not cached, but their UPDATE/ACTION tools still
+    # invalidate cached answers (the token tasks below share this list)
+    tool_calls = start_tool_calls()
     try:
         agen = getattr(mod, "run_agent_stream", None)
         if agen is None:
             raise RuntimeError("run_agent_stream not available")
         
-        async for token in agen(user_prompt, chat_history=chat_history or None, memory=memory):
-            if not isinstance(token, str) or token == "":
-                continue
-            yielded_any = True
-            chunk = {
-                "id": cid,
-                "object": "chat.completion.chunk",
-                "created": created,
-                "model": model_id,
-                "choices": [
-                    {"index": 0, "delta": {"content": token}, "finish_reason": None}
-                ],
-            }
-            yield f"data: {json.dumps(chunk)}\n\n"
+        async def text_tokens() -> AsyncGenerator[str, None]:
+            chat_history = await _compact_history(history_lines, deadline)
+            async for token in agen(user_prompt, chat_history=chat_history or None, memory=memory):
+                if isinstance(token, str) and token != "":
+                    yield token
+        
+        with use_token(cancel_token), use_deadline(deadline):
+            async for text in sse_coalesce(text_tokens()):
+                yielded_any = True
+                yield enc.content(text)
+        finished = True
     except Exception:
+        finished = True
         yielded_any = False if not yielded_any else yielded_any
+    finally:
+        if not finished:
+            cancel_token.cancel("client disconnected")
+            _REQUEST_LOG.info("client disconnected; cancelled stream", model=model_id)
+        get_response_cache().invalidate_mutations(tool_calls)
 
     # Close out the stream
     if not yielded_any:
-        empty = {
-            "id": cid,
-            "object": "chat.completion.chunk",
-            "created": created,
-            "model": model_id,
-            "choices": [{"index": 0, "delta": {"content": ""}, "finish_reason": None}],
-        }
-        yield f"data: {json.dumps(empty)}\n\n"
-
-    end = {
-        "id": cid,
-        "object": "chat.completion.chunk",
-        "created": created,
-        "model": model_id,
-        "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
-    }
-    yield f"data: {json.dumps(end)}\n\n"
-    yield "data: [DONE]\n\n"
+        yield enc.content("")
+
+    yield enc.stop()
+    yield SSE_DONE
 
 
 def _is_async_run_agent(mod: ModuleType) -> bool:
@@ -312,7 +327,33 @@ def _import_module_from_path(path: str) -> Optional[ModuleType]:
         return None
 
 
-def _discover_agents() -> Dict[str, ModuleType]:
+def _load_agent_dir(agent_dir: Path, paths: Optional[Dict[str, str]] = None) -> Optional[ModuleType]:
+    """Import core/agents/<name>/agent.py and check it exposes async run_agent."""
+    agent_file = agent_dir / "agent.py"
+    if not agent_file.exists():
+        print(f"[Agent API] Skipping {agent_dir.name}: no agent.py found", flush=True)
+        return None
+    
+    print(f"[Agent API] Found agent file: {agent_file}", flush=True)
+    
+    # Import the module
+    mod = _import_module_from_path(str(agent_file))
+    if not mod:
+        print(f"[Agent API] ERROR: Failed to import {agent_file}", flush=True)
+        return None
+    
+    print(f"[Agent API] Successfully imported {agent_dir.name}", flush=True)
+    
+    # Verify it has async run_agent
+    if not _is_async_run_agent(mod):
+        print(f"[Agent API] Skipping {agent_dir.name}: no async run_agent function", flush=True)
+        return None
+    
+    (AGENT_PATHS if paths is None else paths)[agent_dir.name] = str(agent_file.relative_to(PROJECT_ROOT))
+    return mod
+
+
+def _discover_agents(paths: Optional[Dict[str, str]] = None) -> Dict[str, ModuleType]:
     """Discover agents from core/agents/*/agent.py."""
     found: Dict[str, ModuleType] = {}
     
@@ -328,35 +369,204 @@ def _discover_agents() -> Dict[str, ModuleType]:
             print(f"[Agent API] Skipping non-directory: {agent_dir.name}", flush=True)
             continue
         
-        agent_file = agent_dir / "agent.py"
-        if not agent_file.exists():
-            print(f"[Agent API] Skipping {agent_dir.name}: no agent.py found", flush=True)
+        mod = _load_agent_dir(agent_dir, paths)
+        if mod is None:
             continue
         
-        print(f"[Agent API] Found agent file: {agent_file}", flush=True)
+        # Register with agent directory name as model ID
+        found[agent_dir.name] = mod
+        print(f"[Agent API] ✓ Registered agent: {agent_dir.name}", flush=True)
+    
+    return found
+
+
+def _warm_agent(model_id: str, mod: ModuleType) -> None:
+    """Run an agent's initialize_runtime() if it has one (best-effort)."""
+    _AGENT_STATE[model_id] = "warming"
+    t0 = time.perf_counter()
+    try:
+        init = getattr(mod, "initialize_runtime", None)
+        if callable(init):
+            print(f"[Agent API] Initializing runtime for {model_id}...", flush=True)
+            init()
+        _AGENT_STATE[model_id] = "ready"
+        print(f"[Agent API] {model_id} ready in {time.perf_counter() - t0:.2f}s", flush=True)
+    except Exception as e:
+        # Warming is best-effort; agents also initialize themselves on first run
+        _AGENT_STATE[model_id] = f"failed: {e}"
+        print(f"[Agent API] WARNING: Failed to initialize {model_id}: {e}", flush=True)
+
+
+def _live_registry() -> Dict[str, Any]:
+    """The registry tables requests read, keyed like _build_registry()'s result."""
+    return {
+        "agents": AGENTS,
+        "paths": AGENT_PATHS,
+        "preset_tools": _PRESET_TOOL_CACHE,
+        "preset_metadata": _PRESET_METADATA,
+        "preset_signatures": _PRESET_SIGNATURES,
+        "presets_version": _PRESETS_VERSION,
+    }
+
+
+def _unregister_preset(preset_name: str, registry: Optional[Dict[str, Any]] = None) -> None:
+    registry = _live_registry() if registry is None else registry
+    for table in ("agents", "paths", "preset_tools", "preset_metadata", "preset_signatures"):
+        registry[table].pop(preset_name, None)
+
+
+def _sync_presets(force: bool = False, registry: Optional[Dict[str, Any]] = None) -> List[str]:
+    """Register, update or remove agent presets from master_config.
+
+    Only presets whose config changed are touched. The config comes from the
+    shared ConfigStore, so nothing is re-read unless master_config.json changed;
+    force=True checks the file right away. Updates the live registry unless
+    registry (one being built by _build_registry) is given. Returns the names
+    of presets that were added, changed or removed.
+    """
+    global _PRESETS_VERSION
+    live = registry is None
+    registry = _live_registry() if live else registry
+    agents = registry["agents"]
+    signatures = registry["preset_signatures"]
+    store = get_config_store(MASTER_CONFIG_PATH)
+    snapshot = store.refresh() if force else store.snapshot()
+    version = (str(store.path), snapshot.version)
+    if not force and version == registry["presets_version"]:
+        return []
+    agent_presets = snapshot.get("agent_presets", {}) or {}
+    registry["presets_version"] = version
+    if live:
+        _PRESETS_VERSION = version
+    
+    changed: List[str] = []
+    wanted: Dict[str, Dict[str, Any]] = {}
+    for preset_name, preset_config in agent_presets.items():
+        if not preset_config.get("enabled", True):
+            print(f"[Agent API] Skipping disabled preset: {preset_name}", flush=True)
+            continue
         
-        # Import the module
-        mod = _import_module_from_path(str(agent_file))
-        if not mod:
-            print(f"[Agent API] ERROR: Failed to import {agent_file}", flush=True)
+        base_agent = preset_config.get("base_agent")
+        if base_agent not in agents:
+            print(f"[Agent API] Skipping preset {preset_name}: base agent {base_agent} not found", flush=True)
+            continue
+        wanted[preset_name] = preset_config
+    
+    # Drop presets that were removed, disabled or lost their base agent
+    for preset_name in list(signatures):
+        if preset_name not in wanted:
+            _unregister_preset(preset_name, registry)
+            changed.append(preset_name)
+            print(f"[Agent API] Removed preset: {preset_name}", flush=True)
+    
+    for preset_name, preset_config in wanted.items():
+        signature = json.dumps(preset_config, sort_keys=True, default=str)
+        if signatures.get(preset_name) == signature:
             continue
+        base_agent = preset_config.get("base_agent")
         
-        print(f"[Agent API] Successfully imported {agent_dir.name}", flush=True)
+        # Register preset as model (points to same module as base agent)
+        agents[preset_name] = agents[base_agent]
+        registry["paths"][preset_name] = f"preset:{base_agent}"
         
-        # Verify it has async run_agent
-        if not _is_async_run_agent(mod):
-            print(f"[Agent API] Skipping {agent_dir.name}: no async run_agent function", flush=True)
-            continue
+        # Cache enabled tools for this preset
+        enabled_tool_names = {
+            name for name, cfg in preset_config.get("tool_config", {}).items()
+            if cfg.get("enabled", False)
+        }
+        registry["preset_tools"][preset_name] = enabled_tool_names
         
-        # Register with agent directory name as model ID
-        model_id = agent_dir.name
-        found[model_id] = mod
-        AGENT_PATHS[model_id] = str(agent_file.relative_to(PROJECT_ROOT))
-        print(f"[Agent API] ✓ Registered agent: {model_id}", flush=True)
+        # Store metadata for /v1/models endpoint
+        registry["preset_metadata"][preset_name] = {
+            "base_agent": base_agent,
+            "tool_count": len(enabled_tool_names),
+            "is_preset": True
+        }
+        signatures[preset_name] = signature
+        changed.append(preset_name)
+        
+        print(f"[Agent API] ✓ Registered preset: {preset_name} (base: {base_agent}, {len(enabled_tool_names)} tools)", flush=True)
     
+    if agent_presets:
+        print(f"[Agent API] Loaded {len(agent_presets)} agent preset(s)", flush=True)
+    return changed
+
+
+def _load_new_agents(paths: Dict[str, str]) -> Dict[str, ModuleType]:
+    """Import and warm agent directories that are not registered yet (runs in a thread)."""
+    found: Dict[str, ModuleType] = {}
+    if AGENTS_ROOT.exists():
+        for agent_dir in AGENTS_ROOT.iterdir():
+            if not agent_dir.is_dir() or agent_dir.name in AGENTS or not (agent_dir / "agent.py").exists():
+                continue
+            mod = _load_agent_dir(agent_dir, paths)
+            if mod is None:
+                continue
+            _warm_agent(agent_dir.name, mod)
+            found[agent_dir.name] = mod
+    if found:
+        # Read master_config here so the forced preset sync below only stat()s it
+        get_config_store(MASTER_CONFIG_PATH).refresh()
     return found
 
 
+async def _scan_new_agents() -> List[str]:
+    paths: Dict[str, str] = {}
+    found = await asyncio.to_thread(_load_new_agents, paths)
+    changed: List[str] = []
+    for name, mod in found.items():
+        if name in AGENTS:
+            continue  # registered by a reload meanwhile
+        AGENTS[name] = mod
+        AGENT_PATHS[name] = paths[name]
+        print(f"[Agent API] ✓ Registered new agent: {name}", flush=True)
+        changed.append(name)
+    
+    # A new base agent may make previously skipped presets valid
+    changed.extend(_sync_presets(force=bool(changed)))
+    if changed:
+        _UNKNOWN_MODELS.clear()
+    return changed
+
+
+_REFRESHING: Optional["asyncio.Future[List[str]]"] = None
+
+
+async def _refresh_agents() -> List[str]:
+    """Incrementally pick up new agent directories and changed presets.
+
+    Unlike _init_agents() this never re-imports agents that are already loaded,
+    re-runs their initialize_runtime() or rebuilds the tool cache. New agents
+    are imported and warmed in a thread, and concurrent callers share one
+    scan, so in-flight streams keep running. Returns the model IDs that were
+    added, changed or removed.
+    """
+    global _REFRESHING
+    if _REFRESHING is None or _REFRESHING.done():
+        _REFRESHING = asyncio.ensure_future(_scan_new_agents())
+    return await asyncio.shield(_REFRESHING)
+
+
+def _is_known_unknown(model_id: str) -> bool:
+    """True if model_id was recently looked up and not found."""
+    expires = _UNKNOWN_MODELS.get(model_id)
+    if expires is None:
+        return False
+    if expires <= time.monotonic():
+        _UNKNOWN_MODELS.pop(model_id, None)
+        return False
+    return True
+
+
+def _remember_unknown(model_id: str) -> None:
+    if UNKNOWN_MODEL_TTL <= 0:
+        return
+    # Bound memory if a client cycles through many bogus names
+    if len(_UNKNOWN_MODELS) >= 1024:
+        _UNKNOWN_MODELS.clear()
+    _UNKNOWN_MODELS[model_id] = time.monotonic() + UNKNOWN_MODEL_TTL
+
+
 def _maybe_print_startup_models() -> None:
     """Print discovered agents at startup."""
     try:
@@ -373,94 +583,246 @@ def _maybe_print_startup_models() -> None:
         print(f"[Agent API] ERROR printing agents: {e}", flush=True)
 
 
-def _init_agents() -> None:
-    """Initialize agent registry."""
-    global AGENTS, _TOOL_CACHE, _PRESET_TOOL_CACHE, _PRESET_METADATA
-    
+def _build_registry() -> Dict[str, Any]:
+    """Import agents and resolve presets into new tables; the live registry is untouched."""
     print("[Agent API] Initializing agent registry...", flush=True)
+    paths: Dict[str, str] = {}
     
     # Discover built-in agents
-    AGENTS = _discover_agents()
-    print(f"[Agent API] Agent discovery complete. Found {len(AGENTS)} built-in agents.", flush=True)
+    agents = _discover_agents(paths)
+    print(f"[Agent API] Agent discovery complete. Found {len(agents)} built-in agents.", flush=True)
     
-    # Cache all tools for preset filtering
+    registry: Dict[str, Any] = {
+        "agents": agents,
+        "paths": paths,
+        "preset_tools": {},
+        "preset_metadata": {},
+        "preset_signatures": {},
+        "presets_version": None,
+    }
+    # Load agent presets from master_config
+    _sync_presets(force=True, registry=registry)
+    return registry
+
+
+def _install_registry(registry: Dict[str, Any]) -> None:
+    """Swap a registry from _build_registry() in, with its tool cache if it has one.
+
+    A single assignment replaces every table, so a request sees either the old
+    registry or the new one, never a half-built mix.
+    """
+    global AGENTS, AGENT_PATHS, _PRESET_TOOL_CACHE, _PRESET_METADATA, _PRESET_SIGNATURES, _PRESETS_VERSION, _TOOL_CACHE
+    AGENTS, AGENT_PATHS, _PRESET_TOOL_CACHE, _PRESET_METADATA, _PRESET_SIGNATURES, _PRESETS_VERSION, _TOOL_CACHE = (
+        registry["agents"],
+        registry["paths"],
+        registry["preset_tools"],
+        registry["preset_metadata"],
+        registry["preset_signatures"],
+        registry["presets_version"],
+        registry.get("tool_cache", _TOOL_CACHE),
+    )
+    _UNKNOWN_MODELS.clear()
+
+
+def _load_registry() -> None:
+    """Import agents and register presets (no tool cache, no warming)."""
+    _install_registry(_build_registry())
+
+
+def _load_tool_cache() -> Dict[str, Any]:
+    """All tools, for preset filtering."""
     try:
         from core.utils.tool_discovery import get_all_tools
-        _TOOL_CACHE = get_all_tools()
+        tools = get_all_tools()
         print("[Agent API] Tool cache initialized", flush=True)
+        return tools
     except Exception as e:
         print(f"[Agent API] WARNING: Failed to cache tools: {e}", flush=True)
-        _TOOL_CACHE = {}
-    
-    # Load agent presets from master_config
-    master_config_path = PROJECT_ROOT / "core" / "master_config.json"
-    if master_config_path.exists():
+        return {}
+
+
+def _build_tool_cache() -> None:
+    """Cache all tools for preset filtering."""
+    global _TOOL_CACHE
+    _TOOL_CACHE = _load_tool_cache()
+
+
+def _base_agents(registry: Optional[Dict[str, Any]] = None) -> List[Tuple[str, ModuleType]]:
+    """Registered agents excluding presets (they share the base agent's runtime)."""
+    registry = _live_registry() if registry is None else registry
+    paths = registry["paths"]
+    return [(k, mod) for k, mod in registry["agents"].items() if not paths.get(k, "").startswith("preset:")]
+
+
+def _prepare_agents() -> Dict[str, Any]:
+    """Build a registry with its tool cache and warm its agents, off to the side."""
+    if extension_watcher.WATCH_MODE != "off":
+        track_extensions()
+    # One extension scan shared by the tool cache and every agent runtime
+    with shared_discovery_pass():
+        registry = _build_registry()
+        registry["tool_cache"] = _load_tool_cache()
+        
+        # Warm agents if they expose initialize_runtime()
+        for k, mod in _base_agents(registry):
+            _warm_agent(k, mod)
+    return registry
+
+
+def _init_agents() -> None:
+    """Initialize agent registry."""
+    _install_registry(_prepare_agents())
+    _STARTUP["ready"] = True
+
+
+# ---- Startup readiness ----
+# Startup binds the port immediately and warms agents in the background. Requests
+# that arrive early wait for the registry and for their own agent's warm-up only.
+_STARTUP: Dict[str, Any] = {"ready": False, "registry_loaded": False, "tool_cache": False}
+_AGENT_STATE: Dict[str, str] = {}  # model_id -> warming | ready | failed: <error>
+_WARM_TASKS: Dict[str, "asyncio.Future[None]"] = {}
+_REGISTRY_LOADED: Optional["asyncio.Future[None]"] = None
+WARM_CONCURRENCY = int(os.getenv("LUNA_AGENT_WARM_CONCURRENCY", "4") or 4)
+
+
+def _ensure_warm(model_id: str) -> "asyncio.Future[None]":
+    """Start warming an agent now unless it is already warming or warm."""
+    fut = _WARM_TASKS.get(model_id)
+    if fut is None:
+        mod = AGENTS[model_id]
+        fut = asyncio.ensure_future(asyncio.to_thread(_warm_agent, model_id, mod))
+        _WARM_TASKS[model_id] = fut
+    return fut
+
+
+async def _wait_until_servable(model_id: str) -> None:
+    """Block an early request until the registry is loaded and its agent is warm."""
+    if _REGISTRY_LOADED is not None and not _REGISTRY_LOADED.done():
+        await asyncio.shield(_REGISTRY_LOADED)
+    if _STARTUP["ready"] or model_id not in AGENTS:
+        return
+    path = AGENT_PATHS.get(model_id, "")
+    base = path.split(":", 1)[1] if path.startswith("preset:") else model_id
+    if base in AGENTS:
+        # Lazily warm this agent now if the background warmer hasn't reached it yet
+        await asyncio.shield(_ensure_warm(base))
+
+
+async def _init_agents_background() -> None:
+    """Load the registry, then warm the tool cache and all agents concurrently."""
+    t0 = time.perf_counter()
+    if extension_watcher.WATCH_MODE != "off":
+        track_extensions()
+    with shared_discovery_pass():
         try:
-            master_config = json.loads(master_config_path.read_text())
-            agent_presets = master_config.get("agent_presets", {})
-            
-            for preset_name, preset_config in agent_presets.items():
-                if not preset_config.get("enabled", True):
-                    print(f"[Agent API] Skipping disabled preset: {preset_name}", flush=True)
-                    continue
-                
-                base_agent = preset_config.get("base_agent")
-                if base_agent not in AGENTS:
-                    print(f"[Agent API] Skipping preset {preset_name}: base agent {base_agent} not found", flush=True)
-                    continue
-                
-                # Register preset as model (points to same module as base agent)
-                AGENTS[preset_name] = AGENTS[base_agent]
-                AGENT_PATHS[preset_name] = f"preset:{base_agent}"
-                
-                # Cache enabled tools for this preset
-                enabled_tool_names = {
-                    name for name, cfg in preset_config.get("tool_config", {}).items()
-                    if cfg.get("enabled", False)
-                }
-                _PRESET_TOOL_CACHE[preset_name] = enabled_tool_names
-                
-                # Store metadata for /v1/models endpoint
-                _PRESET_METADATA[preset_name] = {
-                    "base_agent": base_agent,
-                    "tool_count": len(enabled_tool_names),
-                    "is_preset": True
-                }
-                
-                print(f"[Agent API] ✓ Registered preset: {preset_name} (base: {base_agent}, {len(enabled_tool_names)} tools)", flush=True)
-            
-            if agent_presets:
-                print(f"[Agent API] Loaded {len(agent_presets)} agent preset(s)", flush=True)
-        except Exception as e:
-            print(f"[Agent API] WARNING: Failed to load agent presets: {e}", flush=True)
-    
-    # Warm agents if they expose initialize_runtime()
-    for k, mod in AGENTS.items():
-        # Skip warming for presets (they use the same runtime as base agent)
-        if AGENT_PATHS.get(k, "").startswith("preset:"):
-            continue
+            await asyncio.to_thread(_load_registry)
+        finally:
+            _STARTUP["registry_loaded"] = True
+            if _REGISTRY_LOADED is not None and not _REGISTRY_LOADED.done():
+                _REGISTRY_LOADED.set_result(None)
+        _maybe_print_startup_models()
         
-        init = getattr(mod, "initialize_runtime", None)
-        if callable(init):
-            try:
-                print(f"[Agent API] Initializing runtime for {k}...", flush=True)
-                init()
-            except Exception as e:
-                # Warming is best-effort
-                print(f"[Agent API] WARNING: Failed to initialize {k}: {e}", flush=True)
+        sem = asyncio.Semaphore(max(1, WARM_CONCURRENCY))
+        
+        async def warm_one(model_id: str) -> None:
+            async with sem:
+                await _ensure_warm(model_id)
+        
+        async def tool_cache() -> None:
+            await asyncio.to_thread(_build_tool_cache)
+            _STARTUP["tool_cache"] = True
+        
+        await asyncio.gather(tool_cache(), *(warm_one(k) for k, _ in _base_agents()), return_exceptions=True)
+    _STARTUP["ready"] = True
+    print(f"[Agent API] All agents warmed in {time.perf_counter() - t0:.2f}s", flush=True)
+
+
+# Extensions changed since the pre-fork master last loaded them. The master
+# serves no requests, so it only collects change events and applies them
+# before it forks a replacement worker.
+_MASTER_CHANGES: Set[str] = set()
+_MASTER_CHANGES_LOCK = threading.Lock()
+
+
+def _note_master_changes(names: List[str]) -> None:
+    with _MASTER_CHANGES_LOCK:
+        _MASTER_CHANGES.update(names)
+
+
+def _preload_runtime() -> None:
+    """Load and warm everything in the pre-fork master so workers inherit it."""
+    if "master_watcher" not in _STARTUP:
+        _STARTUP["master_watcher"] = extension_watcher.start_for_service("agent_api-master", _note_master_changes)
+    with _MASTER_CHANGES_LOCK:
+        _MASTER_CHANGES.clear()
+    # Reloads so far happened in the workers only: reread extensions from disk
+    refresh_extensions()
+    _init_agents()
+    _maybe_print_startup_models()
+    _STARTUP.update({"registry_loaded": True, "tool_cache": True, "preloaded": True})
+
+
+def _refresh_preloaded_runtime() -> None:
+    """Apply extension changes to the pre-fork master before it forks a worker."""
+    with _MASTER_CHANGES_LOCK:
+        names = sorted(_MASTER_CHANGES)
+        _MASTER_CHANGES.clear()
+    if names:
+        _reload_changed_extensions(names)
+
+
+# ---- Extension hot reload ----
+def _reload_changed_extensions(names: List[str]) -> None:
+    """Reload changed extensions, then rebuild the tool cache and agent runtimes."""
+    t0 = time.perf_counter()
+    statuses = reload_extensions(names)
+    with shared_discovery_pass():
+        _build_tool_cache()
+        for k, mod in _base_agents():
+            _warm_agent(k, mod)
+    # Cached answers may come from tools that just changed
+    get_response_cache().clear()
+    summary = ", ".join(f"{name} {status}" for name, status in statuses.items())
+    print(f"[Agent API] Extensions hot reloaded in {time.perf_counter() - t0:.2f}s: {summary}", flush=True)
+
+
+def _on_config_change() -> None:
+    """Apply preset edits from master_config.json (runs on the event loop)."""
+    if not _STARTUP.get("registry_loaded"):
+        return  # the registry load syncs presets itself
+    if _sync_presets():
+        _UNKNOWN_MODELS.clear()
 
 
 # ---- Lifecycle ----
 @app.on_event("startup")
 async def _on_startup() -> None:
-    """Initialize agents on startup."""
+    """Start serving immediately; load and warm agents in the background."""
+    global _REGISTRY_LOADED
+    # Per process: sampler and log writer threads do not survive the pre-fork
+    structured_log.configure("agent-api")
+    profiling.start_process_sampler()
+    _STARTUP["watcher"] = extension_watcher.start_for_service("agent_api", _reload_changed_extensions)
+    loop = asyncio.get_running_loop()
+    unsubscribe = _STARTUP.pop("config_unsubscribe", None)
+    if unsubscribe:
+        unsubscribe()
+    _STARTUP["config_unsubscribe"] = get_config_store(MASTER_CONFIG_PATH).subscribe(
+        lambda snapshot, previous: loop.call_soon_threadsafe(_on_config_change)
+    )
+    if _STARTUP.get("preloaded"):
+        # Forked from a preloaded master: the warm runtime is already here
+        print(f"[Agent API] Worker {os.getpid()} serving the preloaded runtime", flush=True)
+        return
     print("[Agent API] Agent API starting up...", flush=True)
-    _init_agents()
-    _maybe_print_startup_models()
+    _STARTUP.update({"ready": False, "registry_loaded": False, "tool_cache": False})
+    _WARM_TASKS.clear()
+    _REGISTRY_LOADED = asyncio.get_running_loop().create_future()
+    _STARTUP["task"] = asyncio.create_task(_init_agents_background())
     # NOTE: Service manager is used for discovery/status only.
     # The Supervisor is responsible for actually starting extension services.
     # DO NOT call init_and_start() here - it would create duplicate services!
-    print("[Agent API] Agent API startup complete, ready for requests", flush=True)
+    print("[Agent API] Agent API accepting requests; agents are warming in the background", flush=True)
 
 
 # ---- Routes ----
@@ -481,9 +843,64 @@ async def root():
     }
 
 @app.get("/healthz")
-async def healthz() -> Dict[str, str]:
-    """Health check endpoint (no auth required)."""
-    return {"status": "ok"}
+async def healthz(ready: bool = False) -> Any:
+    """Health check endpoint (no auth required).
+
+    Always 200 while the process is up; pass ?ready=true to get 503 until all
+    agents have finished warming.
+    """
+    body = {
+        "status": "ok" if _STARTUP["ready"] else "starting",
+        "ready": bool(_STARTUP["ready"]),
+        "registry_loaded": bool(_STARTUP["registry_loaded"]),
+        "agents": dict(_AGENT_STATE),
+    }
+    if ready and not _STARTUP["ready"]:
+        return FastJSONResponse(status_code=503, content=body)
+    return body
+
+
+@app.get("/metrics")
+async def get_metrics() -> Response:
+    """Prometheus metrics for this process (no auth required)."""
+    return metrics.metrics_response()
+
+
+@app.post("/admin/reload")
+async def reload_agents(api_key: str = Security(verify_api_key)) -> Dict[str, Any]:
+    """Re-import agents and rediscover tools.
+
+    Under the pre-fork server this signals the master, which reloads once and
+    replaces every worker; a single process reloads in place.
+    """
+    if prefork.request_reload():
+        return {"ok": True, "mode": "prefork"}
+    # Build and warm the new registry in a thread while requests keep using the
+    # old one, then swap it in here on the event loop
+    _install_registry(await asyncio.to_thread(_prepare_agents))
+    _STARTUP["ready"] = True
+    return {"ok": True, "mode": "single", "agents": sorted(AGENTS)}
+
+
+@app.post("/admin/profile")
+async def profile_process(
+    seconds: float = 10.0,
+    mode: str = "sample",
+    api_key: str = Security(verify_api_key),
+) -> Dict[str, Any]:
+    """Profile this worker for a window and write the profile under logs/.
+
+    mode=sample records collapsed stacks of all threads (flamegraph input);
+    mode=cprofile records pstats for the event loop thread.
+    """
+    if mode not in profiling.MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {list(profiling.MODES)}")
+    seconds = min(max(seconds, 0.1), 300.0)
+    try:
+        result = await profiling.profile_for(seconds, mode)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"ok": True, "pid": os.getpid(), "seconds": seconds, **result}
 
 
 @app.get("/extensions")
@@ -568,6 +985,8 @@ async def restart_extension_service(name: str, service: str, api_key: str = Secu
 @app.get("/v1/models")
 async def list_models(api_key: str = Security(verify_api_key)):
     """List available models (agents and presets)."""
+    if _REGISTRY_LOADED is not None and not _REGISTRY_LOADED.done():
+        await asyncio.shield(_REGISTRY_LOADED)
     now = int(time.time())
     models = []
     
@@ -599,6 +1018,77 @@ async def get_model(model_id: str, api_key: str = Security(verify_api_key)):
     return {"id": model_id, "object": "model", "created": int(time.time()), "owned_by": "luna"}
 
 
+# Extra time allowed past a request deadline before the API gives up on the agent
+DEADLINE_GRACE_SECS = float(os.getenv("LUNA_DEADLINE_GRACE_SECS", "1.0"))
+
+
+async def _compact_history(history_lines: List[str], deadline: Optional[Deadline]) -> str:
+    """Fold older turns into the cached rolling summary, within the request deadline.
+
+    Called inside the admitted, cancellable part of a request, so summarizer
+    calls count against the concurrency limit and stop with the run.
+    """
+    return await get_history_cache().compact(history_lines, timeout=deadline.remaining() if deadline else None)
+
+
+async def _run_within_deadline(
+    mod: ModuleType,
+    user_prompt: str,
+    history_lines: List[str],
+    memory: Optional[str],
+    deadline: Optional[Deadline],
+) -> Any:
+    """Run an agent; if it overruns the request deadline, answer with a fallback text.
+
+    Agents bound their own planner and tool calls by the deadline, so this is only
+    a backstop for runs that do not.
+    """
+    chat_history = await _compact_history(history_lines, deadline)
+    run = mod.run_agent(  # type: ignore[attr-defined]
+        user_prompt,
+        chat_history=chat_history or None,
+        memory=memory
+    )
+    if deadline is None:
+        return await run
+    try:
+        return await asyncio.wait_for(run, timeout=deadline.remaining() + DEADLINE_GRACE_SECS)
+    except asyncio.TimeoutError:
+        print(f"[Agent API] Run exceeded its {deadline.budget:.1f}s deadline", flush=True)
+        return DEADLINE_FALLBACK_TEXT
+
+
+def _cut_by_deadline(result: Any, deadline: Optional[Deadline]) -> bool:
+    """Whether a run ended early because of its request deadline."""
+    if deadline is None:
+        return False
+    if deadline.expired or result is DEADLINE_FALLBACK_TEXT:
+        return True
+    return any(getattr(tm, "name", "") == "deadline" for tm in getattr(result, "timings", []) or [])
+
+
+def _cache_result(cache: Any, cache_key: Optional[str], final_text: str, result: Any, deadline: Optional[Deadline]) -> bool:
+    """Store a finished run's answer if it is cacheable; returns whether it was stored.
+
+    Partial answers from runs cut short by a deadline are never cached. Runs
+    that are not stored still invalidate what their UPDATE/ACTION tools touched.
+    """
+    tool_names = executed_tool_names(result)
+    if cache_key and not _cut_by_deadline(result, deadline):
+        return cache.store(cache_key, final_text, tool_names)
+    cache.invalidate_mutations(tool_names)
+    return False
+
+
+async def _admitted_stream(gen: AsyncGenerator[str, None], ticket: Any) -> AsyncGenerator[str, None]:
+    """Yield from an SSE generator and free its admission slot when it ends."""
+    try:
+        async for chunk in gen:
+            yield chunk
+    finally:
+        ticket.release()
+
+
 @app.post("/v1/chat/completions")
 async def chat_completions(
     body: ChatCompletionRequest,
@@ -606,19 +1096,31 @@ async def chat_completions(
     response: Response,
     api_key: str = Security(verify_api_key),
     memory_header: Optional[str] = Header(default=None, alias="X-Luna-Memory"),
+    priority_header: Optional[str] = Header(default=None, alias="X-Luna-Priority"),
+    deadline_header: Optional[str] = Header(default=None, alias="X-Luna-Deadline-Ms"),
 ):
     """Chat completion endpoint (OpenAI-compatible)."""
     if not body.messages:
         raise HTTPException(status_code=400, detail="messages cannot be empty")
 
+    # Optional end-to-end time budget; the header wins over the request field
+    deadline = Deadline.from_ms(deadline_header) or Deadline.from_ms(body.deadline_ms)
+
     model_id = (body.model or "").strip() or DEFAULT_AGENT
+    tracing.current_span().set_attributes({"luna.model": model_id, "luna.stream": bool(body.stream)})
+    request.state.luna_model = model_id
+    await _wait_until_servable(model_id)
     mod = AGENTS.get(model_id)
     
     if not mod:
-        # Refresh once in case of hot add
-        _init_agents()
+        # Unknown names are remembered for a while so typos don't rescan on every request
+        if _is_known_unknown(model_id):
+            raise HTTPException(status_code=404, detail=f"unknown model '{model_id}'")
+        # Refresh once in case of hot add (new agent directory or preset)
+        await _refresh_agents()
         mod = AGENTS.get(model_id)
         if not mod:
+            _remember_unknown(model_id)
             raise HTTPException(status_code=404, detail=f"unknown model '{model_id}'")
     
     # Check if this is a preset and get tool filter
@@ -626,7 +1128,7 @@ async def chat_completions(
     allowed_tool_names = _PRESET_TOOL_CACHE.get(model_id) if is_preset else None
     
     if is_preset:
-        print(f"[Agent API] Using preset '{model_id}' with {len(allowed_tool_names) if allowed_tool_names else 0} enabled tools", flush=True)
+        _REQUEST_LOG.debug("using preset", model=model_id, enabled_tools=len(allowed_tool_names) if allowed_tool_names else 0)
         # NOTE: Tool filtering for presets requires integration with the agent's tool discovery mechanism.
         # Currently, agents auto-discover all tools. To implement filtering, we would need to:
         # 1. Pass allowed_tool_names to agent's initialize_runtime() or run_agent()
@@ -634,7 +1136,9 @@ async def chat_completions(
         # 3. Or set a context variable that tool discovery checks
         # For now, presets are registered as models but use the same tools as base agents.
 
-    chat_history, user_prompt = _split_history_and_prompt(body.messages)
+    history_lines, user_prompt = _history_lines_and_prompt(body.messages)
+    # Older turns are folded into a rolling summary once the run is admitted
+    chat_history = "\n".join(history_lines)
     memory = _extract_memory(body.messages, memory_header)
 
     # Auto-fetch memories from database if not provided by client
@@ -646,94 +1150,160 @@ async def chat_completions(
             if rows:
                 memory_lines = [f"{i+1}. {row['content']}" for i, row in enumerate(rows)]
                 memory = "\n".join(memory_lines)
-                print(f"[Agent API] Auto-fetched {len(rows)} memories from database", flush=True)
+                _REQUEST_LOG.debug("auto-fetched memories from database", count=len(rows))
         except Exception as e:
-            print(f"[Agent API] Failed to auto-fetch memories: {e}", flush=True)
-
-    # Debug logging
-    print(f"[Agent API] Model: {model_id} | Is Preset: {is_preset}", flush=True)
-    print(f"[Agent API] Extracted chat_history: {bool(chat_history)} (len={len(chat_history) if chat_history else 0})", flush=True)
-    print(f"[Agent API] Extracted memory: {bool(memory)} (len={len(memory) if memory else 0})", flush=True)
-    print(f"[Agent API] Memory header: {bool(memory_header)}", flush=True)
-    if chat_history:
-        print(f"[Agent API] Chat history preview: {chat_history[:200]}", flush=True)
-    if memory:
-        print(f"[Agent API] Memory preview: {memory[:200]}", flush=True)
-
-    # Streaming path
-    if body.stream:
-        headers = {
-            "Cache-Control": "no-cache",
-            "X-Accel-Buffering": "no",
-        }
-        try:
-            # Prefer token streaming if available
-            if hasattr(mod, "run_agent_stream"):
+            _REQUEST_LOG.warning("failed to auto-fetch memories", error=str(e))
+
+    # One sampled record per request; previews only at LUNA_LOG_LEVEL=DEBUG
+    _REQUEST_LOG.info(
+        "chat request", sample=True, model=model_id, preset=is_preset, stream=bool(body.stream),
+        history_len=len(chat_history) if chat_history else 0, memory_len=len(memory) if memory else 0,
+        memory_header=bool(memory_header),
+    )
+    if _REQUEST_LOG.is_enabled(logging.DEBUG):
+        _REQUEST_LOG.debug("request previews", model=model_id, history=(chat_history or "")[:200], memory=(memory or "")[:200])
+
+    # Response cache (opt-in): only deterministic requests are eligible
+    cache = get_response_cache()
+    cache_key: Optional[str] = None
+    if cache.enabled and not body.temperature:
+        t0_cache = time.perf_counter()
+        cache_key = cache.make_key(model_id, user_prompt, memory, chat_history)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            _REQUEST_LOG.info("response cache hit", sample=True, model=model_id)
+            hit_header = fast_json.dumps({
+                "steps": [],
+                "server_elapsed_s": round(time.perf_counter() - t0_cache, 4),
+                "agent": model_id,
+                "cache": "hit",
+            })
+            if body.stream:
                 return StreamingResponse(
-                    _sse_token_stream(mod, user_prompt, chat_history or None, memory, model_id),
+                    _sse_gen(cached.content, model_id),
                     media_type="text/event-stream",
-                    headers=headers,
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Luna-Timings": hit_header},
                 )
-        except Exception:
-            pass
-
-        # Fallback: compute final text and stream in one chunk
-        try:
-            result_fallback = await mod.run_agent(  # type: ignore[attr-defined]
-                user_prompt,
-                chat_history=chat_history or None,
-                memory=memory
+            return FastJSONResponse(
+                content=_make_chat_completion_payload(model_id, cached.content),
+                headers={"X-Luna-Timings": hit_header},
             )
-        except Exception as exc:
-            raise HTTPException(status_code=500, detail=f"agent error: {exc}") from exc
-        
-        final_text_fallback: str = str(getattr(result_fallback, "final", result_fallback))
-        return StreamingResponse(
-            _sse_gen(final_text_fallback, model_id),
-            media_type="text/event-stream",
-            headers=headers
-        )
 
-    # Non-streaming path
+    # Admission control: cap concurrent runs and serve interactive before scheduled work
     try:
-        t0 = time.perf_counter()
-        result = await mod.run_agent(  # type: ignore[attr-defined]
-            user_prompt,
-            chat_history=chat_history or None,
-            memory=memory
+        ticket = await get_admission_controller().acquire(
+            api_key, model_id, parse_priority(priority_header),
+            timeout=deadline.remaining() if deadline else None,
         )
-        elapsed = round(time.perf_counter() - t0, 3)
-    except Exception as exc:
-        raise HTTPException(status_code=500, detail=f"agent error: {exc}") from exc
+    except AdmissionRejected as exc:
+        _REQUEST_LOG.warning("rejected request", model=model_id, reason=exc.reason)
+        raise HTTPException(status_code=429, detail=exc.reason, headers={"Retry-After": str(exc.retry_after)})
+    if ticket.waited_secs:
+        _REQUEST_LOG.info("admitted after queueing", model=model_id, priority=ticket.priority, waited_s=round(ticket.waited_secs, 2))
+
+    # The streaming path hands the slot to the response; everything else releases here
+    handed_off = False
+    try:
+        # Streaming path
+        if body.stream:
+            headers = {
+                "Cache-Control": "no-cache",
+                "X-Accel-Buffering": "no",
+            }
+            try:
+                # Prefer token streaming if available
+                if hasattr(mod, "run_agent_stream"):
+                    streaming = StreamingResponse(
+                        _admitted_stream(_sse_token_stream(mod, user_prompt, history_lines, memory, model_id, deadline), ticket),
+                        media_type="text/event-stream",
+                        headers=headers,
+                        background=BackgroundTask(ticket.release),
+                    )
+                    handed_off = True
+                    return streaming
+            except Exception:
+                pass
+
+            # Fallback: compute final text and stream in one chunk
+            try:
+                with use_deadline(deadline):
+                    result_fallback = await run_until_disconnected(
+                        _run_within_deadline(mod, user_prompt, history_lines, memory, deadline),
+                        request.is_disconnected,
+                        CancellationToken(),
+                    )
+            except RunCancelled:
+                _REQUEST_LOG.info("client disconnected; cancelled run", model=model_id)
+                raise HTTPException(status_code=499, detail="client disconnected")
+            except Exception as exc:
+                raise HTTPException(status_code=500, detail=f"agent error: {exc}") from exc
+        
+            final_text_fallback: str = str(getattr(result_fallback, "final", result_fallback))
+            _cache_result(cache, cache_key, final_text_fallback, result_fallback, deadline)
+            return StreamingResponse(
+                _sse_gen(final_text_fallback, model_id),
+                media_type="text/event-stream",
+                headers=headers
+            )
+
+        # Non-streaming path
+        try:
+            t0 = time.perf_counter()
+            # Stop the run (LLM calls and cooperative tools) if the client goes away
+            with use_deadline(deadline):
+                result = await run_until_disconnected(
+                    _run_within_deadline(mod, user_prompt, history_lines, memory, deadline),
+                    request.is_disconnected,
+                    CancellationToken(),
+                )
+            elapsed = round(time.perf_counter() - t0, 3)
+        except RunCancelled:
+            _REQUEST_LOG.info("client disconnected; cancelled run", model=model_id)
+            raise HTTPException(status_code=499, detail="client disconnected")
+        except Exception as exc:
+            raise HTTPException(status_code=500, detail=f"agent error: {exc}") from exc
 
-    final_text: str = str(getattr(result, "final", result))
+        final_text: str = str(getattr(result, "final", result))
 
-    # Add timings header
-    timings_list = []
-    try:
-        for tm in getattr(result, "timings", []) or []:
-            timings_list.append({
-                "name": getattr(tm, "name", "unknown"),
-                "seconds": getattr(tm, "seconds", None)
-            })
-    except Exception:
-        pass
+        # Add timings header
+        timings_list = []
+        try:
+            for tm in getattr(result, "timings", []) or []:
+                timings_list.append({
+                    "name": getattr(tm, "name", "unknown"),
+                    "seconds": getattr(tm, "seconds", None)
+                })
+        except Exception:
+            pass
     
-    timing_header = {
-        "steps": timings_list,
-        "server_elapsed_s": elapsed,
-        "agent": model_id
-    }
-    response.headers["X-Luna-Timings"] = json.dumps(timing_header)
+        timing_header = {
+            "steps": timings_list,
+            "server_elapsed_s": elapsed,
+            "agent": model_id
+        }
+        stored = _cache_result(cache, cache_key, final_text, result, deadline)
+        if cache_key:
+            timing_header["cache"] = "miss" if stored else "bypass"
+        response.headers["X-Luna-Timings"] = fast_json.dumps(timing_header)
 
-    payload = _make_chat_completion_payload(model_id, final_text)
-    return JSONResponse(content=payload)
+        payload = _make_chat_completion_payload(model_id, final_text)
+        return FastJSONResponse(content=payload, headers={"X-Luna-Timings": response.headers["X-Luna-Timings"]})
 
+    finally:
+        if not handed_off:
+            ticket.release()
 
 if __name__ == "__main__":
     import uvicorn
     host = os.environ.get("AGENT_API_HOST", "127.0.0.1")
     port = int(os.environ.get("AGENT_API_PORT", "8080"))
+    workers = int(os.environ.get("AGENT_API_WORKERS", "1") or 1)
+    if workers > 1 and get_response_cache().enabled:
+        print(
+            "[Agent API] WARNING: the response cache is per worker; a worker does not see "
+            "changes made through another worker or the MCP servers until its entries expire",
+            flush=True,
+        )
     
     print("="*60)
     print("🌙 Luna Agent API Starting...")
@@ -750,4 +1320,10 @@ if __name__ == "__main__":
     print("="*60)
     print(f"\nStarting server on {host}:{port}...\n")
     
-    uvicorn.run(app, host=host, port=port, reload=False)
+    if workers > 1 and prefork.supported():
+        # Import and warm once, then fork workers that share the runtime copy-on-write
+        prefork.PreforkServer(
+            app, host, port, workers, preload=_preload_runtime, refresh=_refresh_preloaded_runtime, name="Agent API"
+        ).serve()
+    else:
+        uvicorn.run(app, host=host, port=port, reload=False)
@@ -32,6 +32,8 @@ def generate_caddyfile(repo_path, output_path=None):
     Returns:
         str: Generated Caddyfile content
     """
+    from core.utils.config_store import get_config_store
+
     repo_path = Path(repo_path)
 
     master_config_path = repo_path / "core" / "master_config.json"
@@ -44,12 +46,11 @@ def generate_caddyfile(repo_path, output_path=None):
     # Ensure .luna directory exists
     output_path.parent.mkdir(parents=True, exist_ok=True)
     
-    # Load master config
-    if not master_config_path.exists():
+    # Load master config (cached until the file changes)
+    snapshot = get_config_store(master_config_path).snapshot()
+    if not snapshot.exists:
         raise FileNotFoundError(f"Master config not found at {master_config_path}")
-    
-    with open(master_config_path, 'r') as f:
-        master_config = json.load(f)
+    master_config = snapshot.data
     
     # Get deployment mode from master_config or environment
     deployment_mode = master_config.get("deployment_mode") or os.getenv("DEPLOYMENT_MODE", "ngrok")
@@ -458,6 +459,7 @@ def generate_caddyfile(repo_path, output_path=None):
 
 if __name__ == "__main__":
     import sys
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
     
     repo_path = sys.argv[1] if len(sys.argv) > 1 else "."
     output_path = sys.argv[2] if len(sys.argv) > 2 else None
@@ -0,0 +1,146 @@
+"""Cooperative cancellation for agent runs.
+
+The agent API creates a CancellationToken per request and makes it current via a
+context variable. When the client disconnects the token is cancelled: the
+plan-execute loops stop before the next planner step or tool batch, in-flight
+LLM calls are cancelled with their asyncio task, and tools running in worker
+threads can poll ``is_cancelled()`` (asyncio.to_thread copies the context, so
+the token is visible there too) or register a callback with ``on_cancel``.
+"""
+import asyncio
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Iterator, List, Optional
+
+
+class RunCancelled(Exception):
+    """Raised inside an agent run once its cancellation token is cancelled."""
+
+
+class CancellationToken:
+    """Thread-safe, one-shot cancellation flag with callbacks."""
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], Any]] = []
+        self.reason: Optional[str] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        """Cancel the token and run registered callbacks (once)."""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for cb in callbacks:
+            try:
+                cb()
+            except Exception:
+                pass
+
+    def on_cancel(self, callback: Callable[[], Any]) -> Callable[[], None]:
+        """Register a callback; returns a function that unregisters it."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                registered = True
+            else:
+                registered = False
+        if not registered:
+            try:
+                callback()
+            except Exception:
+                pass
+
+        def remove() -> None:
+            with self._lock:
+                try:
+                    self._callbacks.remove(callback)
+                except ValueError:
+                    pass
+        return remove
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise RunCancelled(self.reason or "cancelled")
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until cancelled or timeout; returns True if cancelled."""
+        return self._event.wait(timeout)
+
+
+_CURRENT: ContextVar[Optional[CancellationToken]] = ContextVar("luna_cancellation_token", default=None)
+
+
+def current_token() -> Optional[CancellationToken]:
+    """The token for the run executing in this context, if any."""
+    return _CURRENT.get()
+
+
+def is_cancelled() -> bool:
+    """True if the current run has been cancelled (for cooperative tools)."""
+    token = _CURRENT.get()
+    return bool(token and token.cancelled)
+
+
+def check_cancelled() -> None:
+    """Raise RunCancelled if the current run has been cancelled."""
+    token = _CURRENT.get()
+    if token is not None:
+        token.raise_if_cancelled()
+
+
+@contextmanager
+def use_token(token: CancellationToken) -> Iterator[CancellationToken]:
+    """Make token current for code run (or tasks created) inside the block."""
+    ctx = _CURRENT.set(token)
+    try:
+        yield token
+    finally:
+        try:
+            _CURRENT.reset(ctx)
+        except ValueError:
+            # Exited from another context (e.g. an async generator closed elsewhere)
+            pass
+
+
+async def run_until_disconnected(
+    awaitable: Awaitable[Any],
+    is_disconnected: Callable[[], Awaitable[bool]],
+    token: CancellationToken,
+    poll_interval: float = 0.5,
+) -> Any:
+    """Await a run, cancelling it (and its token) if the client goes away.
+
+    Raises RunCancelled when the client disconnected before the run finished.
+    """
+    with use_token(token):
+        task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            try:
+                gone = await is_disconnected()
+            except Exception:
+                gone = False
+            if gone:
+                token.cancel("client disconnected")
+                task.cancel()
+                try:
+                    await task
+                except BaseException:
+                    pass
+                raise RunCancelled("client disconnected")
+    except asyncio.CancelledError:
+        token.cancel("request cancelled")
+        task.cancel()
+        raise
@@ -0,0 +1,243 @@
+"""Cached, versioned access to master_config.json (or any JSON config file).
+
+Tool discovery, the agent API, the MCP servers, the Caddy generator, external
+services and the supervisor used to each re-open and re-parse
+master_config.json, some of them on every request. A ConfigStore parses the
+file once and hands out the same immutable snapshot until the file's
+(mtime, inode, size) changes. Even that stat is skipped if the file was
+checked within the last LUNA_CONFIG_RECHECK_MS.
+
+- Snapshots are frozen (dicts raise on mutation, lists become tuples) and
+  carry a version number that increases with every change seen by this
+  process. Use snapshot.thaw() for a mutable deep copy.
+- save() writes to a temporary file and renames it over the config, so
+  readers in other processes never see a partial file. It also updates this
+  process's cache directly.
+- subscribe(callback) calls callback(snapshot, previous) whenever a new
+  version is loaded or saved. While there are subscribers, a daemon thread
+  polls the file so that changes made by other processes are noticed too.
+
+Configuration:
+    LUNA_CONFIG_RECHECK_MS  minimum time between stat() checks (default 1000; 0 = every read)
+    LUNA_CONFIG_POLL_MS     poll interval while subscribers exist (default 1000)
+"""
+import os
+import time
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from core.utils import fast_json
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+MASTER_CONFIG_PATH = PROJECT_ROOT / "core" / "master_config.json"
+
+RECHECK_S = float(os.getenv("LUNA_CONFIG_RECHECK_MS", "1000") or 0) / 1000.0
+POLL_S = float(os.getenv("LUNA_CONFIG_POLL_MS", "1000") or 1000) / 1000.0
+
+
+class FrozenDict(dict):
+    """A dict that refuses mutation (still a dict for isinstance checks and JSON)."""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("config snapshots are read-only; use snapshot.thaw() for a mutable copy")
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = __ior__ = _readonly  # type: ignore[assignment]
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+
+def _freeze(obj: Any) -> Any:
+    if isinstance(obj, dict):
+        return FrozenDict((k, _freeze(v)) for k, v in obj.items())
+    if isinstance(obj, list):
+        return tuple(_freeze(v) for v in obj)
+    return obj
+
+
+def thaw(obj: Any) -> Any:
+    """Mutable deep copy of a frozen value (dicts and lists)."""
+    if isinstance(obj, dict):
+        return {k: thaw(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [thaw(v) for v in obj]
+    return obj
+
+
+class ConfigSnapshot:
+    """One immutable, versioned view of a config file."""
+
+    __slots__ = ("version", "data", "exists", "stamp")
+
+    def __init__(self, version: int, data: Dict[str, Any], exists: bool, stamp: Optional[Tuple[int, int, int]]):
+        self.version = version
+        self.data: Dict[str, Any] = _freeze(data) if not isinstance(data, FrozenDict) else data
+        self.exists = exists
+        self.stamp = stamp
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.data.get(key, default)
+
+    def __getitem__(self, key: str) -> Any:
+        return self.data[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.data
+
+    def thaw(self) -> Dict[str, Any]:
+        return thaw(self.data)
+
+    def __repr__(self) -> str:
+        return f"ConfigSnapshot(version={self.version}, keys={sorted(self.data)})"
+
+
+def _stamp(st: os.stat_result) -> Tuple[int, int, int]:
+    return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+
+class ConfigStore:
+    """Caches one JSON config file; see the module docstring."""
+
+    def __init__(self, path: Union[str, Path], recheck: Optional[float] = None):
+        self.path = Path(path)
+        self.recheck = RECHECK_S if recheck is None else recheck
+        self._lock = threading.RLock()
+        self._snapshot = ConfigSnapshot(0, {}, False, None)
+        self._loaded = False
+        self._checked_at = 0.0
+        self._subscribers: List[Callable[[ConfigSnapshot, ConfigSnapshot], None]] = []
+        self._poller: Optional[threading.Thread] = None
+
+    # ---- reading ----
+    def snapshot(self) -> ConfigSnapshot:
+        """Current snapshot; touches the filesystem at most once per recheck period."""
+        now = time.monotonic()
+        if self._loaded and now - self._checked_at < self.recheck:
+            return self._snapshot
+        return self.refresh()
+
+    def get(self) -> Dict[str, Any]:
+        """Frozen config data (shorthand for snapshot().data)."""
+        return self.snapshot().data
+
+    def refresh(self) -> ConfigSnapshot:
+        """stat() the file now and reload it if it changed."""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                stamp: Optional[Tuple[int, int, int]] = _stamp(os.stat(self.path))
+            except FileNotFoundError:
+                stamp = None
+            current = self._snapshot
+            if self._loaded and stamp == current.stamp:
+                return current
+            if stamp is None:
+                return self._replace({}, False, None)
+            try:
+                data = fast_json.read_file(self.path)
+            except (OSError, ValueError) as exc:
+                # A writer that does not rename atomically; keep the last good version
+                print(f"[ConfigStore] Warning: could not read {self.path}: {exc}", flush=True)
+                self._loaded = True
+                return current
+            return self._replace(data if isinstance(data, dict) else {}, True, stamp)
+
+    def _replace(self, data: Dict[str, Any], exists: bool, stamp: Optional[Tuple[int, int, int]]) -> ConfigSnapshot:
+        previous = self._snapshot
+        first = not self._loaded
+        self._snapshot = ConfigSnapshot(previous.version + 1, data, exists, stamp)
+        self._loaded = True
+        if not first:
+            self._notify(self._snapshot, previous)
+        return self._snapshot
+
+    # ---- writing ----
+    def save(self, data: Dict[str, Any]) -> ConfigSnapshot:
+        """Atomically replace the file with data and return the new snapshot."""
+        with self._lock:
+            fast_json.write_file_atomic(self.path, data)
+            self._checked_at = time.monotonic()
+            self._loaded = True
+            return self._replace(data, True, _stamp(os.stat(self.path)))
+
+    def update(self, mutate: Callable[[Dict[str, Any]], Any]) -> ConfigSnapshot:
+        """Read-modify-write: mutate(a mutable copy of the latest config), then save it."""
+        with self._lock:
+            data = self.refresh().thaw()
+            mutate(data)
+            return self.save(data)
+
+    # ---- change events ----
+    def subscribe(self, callback: Callable[[ConfigSnapshot, ConfigSnapshot], None]) -> Callable[[], None]:
+        """Call callback(new, previous) on every change; returns an unsubscribe function."""
+        with self._lock:
+            self._subscribers.append(callback)
+            self.snapshot()
+            if self._poller is None or not self._poller.is_alive():
+                self._poller = threading.Thread(target=self._poll, name=f"config-poll-{self.path.name}", daemon=True)
+                self._poller.start()
+
+        def unsubscribe() -> None:
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+
+        return unsubscribe
+
+    def _notify(self, snapshot: ConfigSnapshot, previous: ConfigSnapshot) -> None:
+        for callback in list(self._subscribers):
+            try:
+                callback(snapshot, previous)
+            except Exception as exc:  # noqa: BLE001
+                print(f"[ConfigStore] Subscriber failed for {self.path.name} v{snapshot.version}: {exc}", flush=True)
+
+    def _poll(self) -> None:
+        while True:
+            time.sleep(POLL_S)
+            with self._lock:
+                if not self._subscribers:
+                    self._poller = None
+                    return
+            try:
+                self.refresh()
+            except Exception as exc:  # noqa: BLE001
+                print(f"[ConfigStore] Poll failed for {self.path}: {exc}", flush=True)
+
+    def _after_fork(self) -> None:
+        self._lock = threading.RLock()
+        self._poller = None
+        if self._subscribers:
+            self._poller = threading.Thread(target=self._poll, name=f"config-poll-{self.path.name}", daemon=True)
+            self._poller.start()
+
+
+# ---- Registry ----
+_STORES: Dict[str, ConfigStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_config_store(path: Optional[Union[str, Path]] = None) -> ConfigStore:
+    """The process-wide store for path (default: core/master_config.json)."""
+    key = str(Path(path or MASTER_CONFIG_PATH).resolve())
+    store = _STORES.get(key)
+    if store is None:
+        with _STORES_LOCK:
+            store = _STORES.setdefault(key, ConfigStore(key))
+    return store
+
+
+def master_config(path: Optional[Union[str, Path]] = None) -> Dict[str, Any]:
+    """Frozen master_config data ({} when the file does not exist)."""
+    return get_config_store(path).get()
+
+
+def _after_fork_in_child() -> None:
+    global _STORES_LOCK
+    _STORES_LOCK = threading.Lock()
+    for store in _STORES.values():
+        store._after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
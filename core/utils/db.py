@@ -9,6 +9,9 @@ import psycopg
 from psycopg_pool import ConnectionPool
 from psycopg.rows import dict_row
 
+from core.utils import tracing
+from core.utils import metrics
+
 # Load environment variables
 try:
     from dotenv import load_dotenv
@@ -56,15 +59,17 @@ class Database:
         """Execute a query and optionally fetch results as list of dicts."""
         conn = None
         try:
-            conn = self.get_connection()
-            with conn.cursor(row_factory=dict_row) as cursor:
-                cursor.execute(query, params or ())
-                if fetch:
-                    results = cursor.fetchall()
-                    return [dict(row) for row in results]
-                else:
-                    conn.commit()
-                    return None
+            with tracing.span("db.query", kind="CLIENT", **{"db.statement": query[:200]}) as span:
+                conn = self.get_connection()
+                with conn.cursor(row_factory=dict_row) as cursor:
+                    cursor.execute(query, params or ())
+                    if fetch:
+                        results = cursor.fetchall()
+                        span.set_attribute("db.rows", len(results))
+                        return [dict(row) for row in results]
+                    else:
+                        conn.commit()
+                        return None
         finally:
             if conn:
                 self.put_connection(conn)
@@ -73,11 +78,12 @@ class Database:
         """Execute a query and fetch a single result as dict."""
         conn = None
         try:
-            conn = self.get_connection()
-            with conn.cursor(row_factory=dict_row) as cursor:
-                cursor.execute(query, params or ())
-                result = cursor.fetchone()
-                return dict(result) if result else None
+            with tracing.span("db.query", kind="CLIENT", **{"db.statement": query[:200]}):
+                conn = self.get_connection()
+                with conn.cursor(row_factory=dict_row) as cursor:
+                    cursor.execute(query, params or ())
+                    result = cursor.fetchone()
+                    return dict(result) if result else None
         finally:
             if conn:
                 self.put_connection(conn)
@@ -98,6 +104,22 @@ def get_db() -> Database:
     return db
 
 
+def _metrics_collector():
+    """Scrape-time connection pool gauges for /metrics."""
+    if not db._initialized or db._pool is None:
+        return
+    stats = db._pool.get_stats()
+    for key, name, help_text in (
+        ("pool_size", "luna_db_pool_size", "Connections currently open in the pool"),
+        ("pool_available", "luna_db_pool_available", "Idle connections in the pool"),
+        ("requests_waiting", "luna_db_pool_waiting", "Callers waiting for a pooled connection"),
+    ):
+        yield (name, "gauge", help_text, [({}, stats.get(key, 0))])
+
+
+metrics.REGISTRY.register_collector(_metrics_collector)
+
+
 def utc_now() -> datetime:
     """Get current UTC timestamp."""
     return datetime.utcnow()
@@ -0,0 +1,78 @@
+"""Per-request deadlines for agent runs.
+
+A client may give ``/v1/chat/completions`` a time budget (``X-Luna-Deadline-Ms``
+header or ``deadline_ms`` request field). The agent API turns it into a Deadline
+and makes it current via a context variable, so planner calls, local tool
+execution and remote MCP calls can bound their own timeouts with
+``timeout_for()`` and the plan-execute loops can decide whether another
+planning step still fits.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+# Answer given when a run is cut short by its deadline before producing any text
+DEADLINE_FALLBACK_TEXT = "Sorry, I ran out of time before I could finish that."
+
+
+class Deadline:
+    """An absolute point in (monotonic) time by which a run must answer."""
+
+    def __init__(self, seconds: float):
+        self.budget = max(0.0, float(seconds))
+        self.expires_at = time.monotonic() + self.budget
+
+    @classmethod
+    def from_ms(cls, value: Optional[object]) -> Optional["Deadline"]:
+        """Build a deadline from a millisecond budget; None/invalid/<=0 means no deadline."""
+        try:
+            ms = float(value)  # type: ignore[arg-type]
+        except (TypeError, ValueError):
+            return None
+        return cls(ms / 1000.0) if ms > 0 else None
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+_CURRENT: ContextVar[Optional[Deadline]] = ContextVar("luna_deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """The deadline for the run executing in this context, if any."""
+    return _CURRENT.get()
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the current deadline, or None when there is none."""
+    deadline = _CURRENT.get()
+    return deadline.remaining() if deadline is not None else None
+
+
+def timeout_for(default: Optional[float] = None) -> Optional[float]:
+    """Clamp a component's own timeout to the time left on the current deadline."""
+    left = remaining_time()
+    if left is None:
+        return default
+    if default is None:
+        return left
+    return min(default, left)
+
+
+@contextmanager
+def use_deadline(deadline: Optional[Deadline]) -> Iterator[Optional[Deadline]]:
+    """Make deadline current for code run (or tasks created) inside the block."""
+    ctx = _CURRENT.set(deadline)
+    try:
+        yield deadline
+    finally:
+        try:
+            _CURRENT.reset(ctx)
+        except ValueError:
+            # Exited from another context (e.g. an async generator closed elsewhere)
+            pass
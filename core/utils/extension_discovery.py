@@ -6,9 +6,12 @@ import os
 import sys
 import json
 import glob
-import importlib.util
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Callable
+from typing import List, Dict, Any, Optional, Callable, Tuple
 
 # Ensure project root is on path
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
@@ -16,6 +19,192 @@ if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
 
+DISCOVERY_WORKERS = int(os.getenv('LUNA_DISCOVERY_WORKERS', '') or min(8, os.cpu_count() or 4))
+
+def _isolation_mode(ext_config: Dict[str, Any]) -> str:
+    """Return the tool isolation mode for an extension ('inprocess' or 'process')."""
+    mode = str((ext_config or {}).get('tool_isolation', 'inprocess') or 'inprocess').strip().lower()
+    return 'process' if mode in ('process', 'out-of-process', 'subprocess') else 'inprocess'
+
+
+def _load_tool_module(tool_file: str, tools_dir: str):
+    """Import a *_tools.py file as luna_ext.<extension>.<module> (see extension_namespace)."""
+    from core.utils import extension_namespace
+    return extension_namespace.load_module(tool_file, tools_dir)
+
+
+def _collect_module_exports(module) -> Tuple[List[Callable], str]:
+    """Extract the TOOLS list and SYSTEM_PROMPT from an imported tools module."""
+    tools: List[Callable] = []
+    if hasattr(module, 'TOOLS'):
+        module_tools = getattr(module, 'TOOLS')
+        if isinstance(module_tools, list):
+            for tool in module_tools:
+                if callable(tool):
+                    tools.append(tool)
+
+    system_prompt = ""
+    if hasattr(module, 'SYSTEM_PROMPT'):
+        sp = getattr(module, 'SYSTEM_PROMPT')
+        if isinstance(sp, str) and sp.strip():
+            system_prompt = sp.strip()
+        elif callable(sp):
+            # Some legacy code has SYSTEM_PROMPT as a function
+            try:
+                result = sp()
+                if isinstance(result, str) and result.strip():
+                    system_prompt = result.strip()
+            except Exception:
+                pass
+
+    return tools, system_prompt
+
+
+# ---- Load report ----
+# Latest per-extension load timings per tool root. The default extensions/
+# root also writes them to .luna/extension_load/<process>-<pid>.json so the
+# supervisor can report on the agent API and MCP servers.
+_LOAD_REPORTS: Dict[str, Dict[str, Any]] = {}
+
+
+def _rss_bytes() -> int:
+    """Resident set size of this process (0 if unavailable)."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except Exception:
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except Exception:
+        return 0
+
+
+def load_report_dir(tool_root: Optional[str] = None) -> Optional[Path]:
+    """<repo>/.luna/extension_load for <repo>/extensions, else None."""
+    root = Path(tool_root).resolve() if tool_root else PROJECT_ROOT / 'extensions'
+    if root.name != 'extensions':
+        return None
+    return root.parent / '.luna' / 'extension_load'
+
+
+def _record_load_report(tool_root: str, timings: List[Dict[str, Any]], total_secs: float, workers: int) -> None:
+    report = {
+        'process': Path(sys.argv[0] or '').stem.lstrip('-') or 'python',
+        'pid': os.getpid(),
+        'tool_root': tool_root,
+        'finished_at': time.time(),
+        'total_secs': round(total_secs, 4),
+        'workers': workers,
+        # Memory deltas overlap while extensions load concurrently; use
+        # LUNA_DISCOVERY_WORKERS=1 for exact per-extension numbers
+        'rss_exact': workers == 1,
+        'extensions': sorted(timings, key=lambda t: t['secs'], reverse=True),
+    }
+    _LOAD_REPORTS[tool_root] = report
+
+    slowest = ', '.join(f"{t['name']} {t['secs']:.2f}s" for t in report['extensions'][:5])
+    print(
+        f"[ExtensionDiscovery] Loaded {len(timings)} extensions in {total_secs:.2f}s "
+        f"({workers} workers){'; slowest: ' + slowest if slowest else ''}",
+        flush=True,
+    )
+
+    out_dir = load_report_dir(tool_root)
+    if out_dir is None:
+        return
+    try:
+        out_dir.mkdir(parents=True, exist_ok=True)
+        path = out_dir / f"{report['process']}-{report['pid']}.json"
+        tmp = path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(report, indent=2), encoding='utf-8')
+        os.replace(tmp, path)
+    except OSError as exc:
+        print(f"[ExtensionDiscovery] Could not write load report: {exc}", flush=True)
+
+
+def get_load_report(tool_root: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """The latest load report for tool_root in this process, if any."""
+    root = str(Path(tool_root).resolve()) if tool_root else str(PROJECT_ROOT / 'extensions')
+    return _LOAD_REPORTS.get(root)
+
+
+def read_load_reports(tool_root: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Load reports written by every process that discovered tool_root.
+
+    Reports from processes that have exited are dropped (and their files
+    removed) unless they are the newest report for that process name.
+    """
+    out_dir = load_report_dir(tool_root)
+    if out_dir is None or not out_dir.is_dir():
+        return []
+    reports: List[Dict[str, Any]] = []
+    for path in out_dir.glob('*.json'):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                report = json.load(f)
+        except Exception:
+            continue
+        report['alive'] = _pid_alive(int(report.get('pid') or 0))
+        report['_path'] = path
+        reports.append(report)
+    reports.sort(key=lambda r: r.get('finished_at', 0), reverse=True)
+
+    kept: List[Dict[str, Any]] = []
+    newest_seen = set()
+    for report in reports:
+        path = report.pop('_path')
+        name = report.get('process')
+        if report['alive'] or name not in newest_seen:
+            kept.append(report)
+        else:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+        newest_seen.add(name)
+    return kept
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# ---- Shared discovery pass ----
+# While a shared pass is open, discover_extensions() runs once per tool root and
+# every caller (agents, tool cache, light schema) reuses that result, including
+# callers on other threads. Outside a pass every call scans from scratch.
+_SHARED_PASS_LOCK = threading.RLock()
+_SHARED_PASS: Optional[Dict[str, List[Dict[str, Any]]]] = None
+_SHARED_PASS_DEPTH = 0
+
+
+@contextmanager
+def shared_discovery_pass():
+    """Reuse a single extension discovery result for everything inside the block."""
+    global _SHARED_PASS, _SHARED_PASS_DEPTH
+    with _SHARED_PASS_LOCK:
+        if _SHARED_PASS_DEPTH == 0:
+            _SHARED_PASS = {}
+        _SHARED_PASS_DEPTH += 1
+    try:
+        yield
+    finally:
+        with _SHARED_PASS_LOCK:
+            _SHARED_PASS_DEPTH -= 1
+            if _SHARED_PASS_DEPTH == 0:
+                _SHARED_PASS = None
+
+
 def discover_extensions(tool_root: Optional[str] = None) -> List[Dict[str, Any]]:
     """Discover all extensions and their tools.
     
@@ -38,105 +227,258 @@ def discover_extensions(tool_root: Optional[str] = None) -> List[Dict[str, Any]]
     else:
         tool_root = str(Path(tool_root).resolve())
     
+    if tool_root in _LIVE:
+        return _live_extensions(tool_root)
+    if _SHARED_PASS is None:
+        return _scan_extensions(tool_root)
+    # Holding the lock while scanning makes concurrent callers wait for one scan
+    with _SHARED_PASS_LOCK:
+        if _SHARED_PASS is None:
+            return _scan_extensions(tool_root)
+        if tool_root not in _SHARED_PASS:
+            _SHARED_PASS[tool_root] = _scan_extensions(tool_root)
+        return _SHARED_PASS[tool_root]
+
+
+# ---- Live snapshot (hot reload) ----
+# A tracked tool root keeps one discovery result for the life of the process;
+# reload_extensions() replaces just the changed extensions in it. Roots that
+# are not tracked behave as before.
+_LIVE_LOCK = threading.RLock()
+_LIVE: Dict[str, Optional[Dict[str, Dict[str, Any]]]] = {}
+
+
+def _resolve_root(tool_root: Optional[str]) -> str:
+    return str(PROJECT_ROOT / 'extensions') if tool_root is None else str(Path(tool_root).resolve())
+
+
+def track_extensions(tool_root: Optional[str] = None) -> None:
+    """Keep a live discovery snapshot for tool_root, filled on the next discovery."""
+    with _LIVE_LOCK:
+        _LIVE.setdefault(_resolve_root(tool_root), None)
+
+
+def refresh_extensions(tool_root: Optional[str] = None) -> None:
+    """Forget everything loaded from tool_root so the next discovery rereads the disk.
+
+    Drops the live snapshot (tool_root stays tracked if it was), the
+    luna_ext packages and the tool pools of its extensions. For processes
+    that missed change events, e.g. the pre-fork master before a reload.
+    """
+    tool_root = _resolve_root(tool_root)
+    from core.utils import extension_namespace
+    from core.utils.tool_process_pool import drop_tool_pool
+    with _LIVE_LOCK:
+        if tool_root in _LIVE:
+            _LIVE[tool_root] = None
+    for name, info in extension_namespace.loaded_extensions().items():
+        if str(Path(info['tools_dir']).resolve().parents[1]) == tool_root:
+            extension_namespace.unload(name)
+            drop_tool_pool(info['tools_dir'])
+
+
+def _live_extensions(tool_root: str) -> List[Dict[str, Any]]:
+    with _LIVE_LOCK:
+        live = _LIVE.get(tool_root)
+        if live is None:
+            live = {ext['name']: ext for ext in _scan_extensions(tool_root)}
+            _LIVE[tool_root] = live
+        return [live[name] for name in sorted(live)]
+
+
+def reload_extensions(names: List[str], tool_root: Optional[str] = None) -> Dict[str, str]:
+    """Reload only the named extensions into the live snapshot.
+
+    Returns {name: 'loaded' | 'reloaded' | 'removed' | 'failed' | 'absent'}.
+    Tracks tool_root if it was not tracked yet.
+    """
+    tool_root = _resolve_root(tool_root)
+    track_extensions(tool_root)
+    _live_extensions(tool_root)
+
+    from core.utils import lazy_tools, extension_namespace
+    manifest: Dict[str, Dict[str, Any]] = {}
+    if lazy_tools.LAZY_ENABLED:
+        try:
+            from core.utils.tool_manifest import file_entries
+            manifest = file_entries(tool_root)
+        except Exception as exc:  # noqa: BLE001
+            print(f"[ExtensionDiscovery] Tool manifest unavailable, importing tools eagerly: {exc}", flush=True)
+
+    statuses: Dict[str, str] = {}
+    for name in names:
+        ext_dir = os.path.join(tool_root, name)
+        tools_dir = os.path.join(ext_dir, 'tools')
+        # Drop luna_ext.<name> so changed helper modules are re-read too
+        extension_namespace.unload(name)
+        try:
+            from core.utils.tool_process_pool import drop_tool_pool
+            drop_tool_pool(tools_dir)
+        except Exception:
+            pass
+
+        ext = None
+        if os.path.isdir(tools_dir):
+            ext, timing = _load_extension(ext_dir, manifest, lazy_tools)
+            print(
+                f"[ExtensionDiscovery] Reloaded {name}: {timing['tools']} tools "
+                f"({timing['lazy_tools']} lazy) in {timing['secs'] * 1000:.0f}ms",
+                flush=True,
+            )
+
+        with _LIVE_LOCK:
+            live = _LIVE[tool_root]
+            existed = name in live
+            if ext is not None:
+                live[name] = ext
+                statuses[name] = 'failed' if ext['load_errors'] and not ext['tools'] else ('reloaded' if existed else 'loaded')
+            else:
+                live.pop(name, None)
+                statuses[name] = 'removed' if existed else 'absent'
+    return statuses
+
+
+def _scan_extensions(tool_root: str) -> List[Dict[str, Any]]:
+    """Scan tool_root for extensions (see discover_extensions).
+
+    Extensions load concurrently on a thread pool (LUNA_DISCOVERY_WORKERS);
+    results keep directory order. Per-extension timings are kept for
+    get_load_report() and logged.
+    """
     if not os.path.isdir(tool_root):
         return []
-    
-    extensions = []
-    
-    # Find all extension directories (containing tools/ subdirectory)
-    for ext_dir in glob.glob(os.path.join(tool_root, '*')):
-        if not os.path.isdir(ext_dir):
-            continue
-        
-        tools_dir = os.path.join(ext_dir, 'tools')
-        if not os.path.isdir(tools_dir):
-            continue
-        
-        ext_name = os.path.basename(ext_dir)
-        
-        # Load extension config if present
-        config_path = os.path.join(ext_dir, 'config.json')
-        ext_config = {}
-        if os.path.isfile(config_path):
-            try:
-                with open(config_path, 'r', encoding='utf-8') as f:
-                    ext_config = json.load(f)
-            except Exception:
-                pass
-        
-        # Load tool_config.json
-        tool_config_path = os.path.join(tools_dir, 'tool_config.json')
-        tool_configs = {}
-        if os.path.isfile(tool_config_path):
-            try:
-                with open(tool_config_path, 'r', encoding='utf-8') as f:
-                    tool_configs = json.load(f)
-            except Exception:
-                pass
-        
-        # Find all *_tools.py files
-        tool_files = glob.glob(os.path.join(tools_dir, '*_tools.py'))
-        
-        tools: List[Callable] = []
-        system_prompt = ""
-        
-        ext_errors: List[str] = []
 
-        for tool_file in tool_files:
-            try:
-                # Import the module
-                # Add the tools directory to sys.path so relative imports work
-                if tools_dir not in sys.path:
-                    sys.path.insert(0, tools_dir)
-
-                module_name = os.path.splitext(os.path.basename(tool_file))[0]
-                spec = importlib.util.spec_from_file_location(module_name, tool_file)
-                if not spec or not spec.loader:
-                    continue
-
-                module = importlib.util.module_from_spec(spec)
-                spec.loader.exec_module(module)
-                
-                # Extract TOOLS list
-                if hasattr(module, 'TOOLS'):
-                    module_tools = getattr(module, 'TOOLS')
-                    if isinstance(module_tools, list):
-                        for tool in module_tools:
-                            if callable(tool):
-                                tools.append(tool)
-                
-                # Extract SYSTEM_PROMPT (use first one found)
-                if not system_prompt and hasattr(module, 'SYSTEM_PROMPT'):
-                    sp = getattr(module, 'SYSTEM_PROMPT')
-                    if isinstance(sp, str) and sp.strip():
-                        system_prompt = sp.strip()
-                    elif callable(sp):
-                        # Some legacy code has SYSTEM_PROMPT as a function
-                        try:
-                            result = sp()
-                            if isinstance(result, str) and result.strip():
-                                system_prompt = result.strip()
-                        except Exception:
-                            pass
-            
-            except Exception as exc:  # noqa: BLE001
-                msg = f"[ExtensionDiscovery] Failed to load tools from {tool_file}: {exc}"
+    # In-process tools become lazy proxies built from the static manifest
+    from core.utils import lazy_tools
+    manifest: Dict[str, Dict[str, Any]] = {}
+    if lazy_tools.LAZY_ENABLED:
+        try:
+            from core.utils.tool_manifest import file_entries
+            manifest = file_entries(tool_root)
+        except Exception as exc:  # noqa: BLE001
+            print(f"[ExtensionDiscovery] Tool manifest unavailable, importing tools eagerly: {exc}", flush=True)
+
+    # Find all extension directories (containing tools/ subdirectory)
+    ext_dirs = [
+        d for d in sorted(glob.glob(os.path.join(tool_root, '*')))
+        if os.path.isdir(os.path.join(d, 'tools'))
+    ]
+    workers = max(1, min(DISCOVERY_WORKERS, len(ext_dirs)))
+    t0 = time.perf_counter()
+    if workers == 1:
+        results = [_load_extension(d, manifest, lazy_tools) for d in ext_dirs]
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ext-discovery") as pool:
+            results = list(pool.map(lambda d: _load_extension(d, manifest, lazy_tools), ext_dirs))
+
+    _record_load_report(tool_root, [timing for _, timing in results], time.perf_counter() - t0, workers)
+    return [ext for ext, _ in results if ext is not None]
+
+
+def _load_extension(ext_dir: str, manifest: Dict[str, Dict[str, Any]], lazy_tools: Any) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+    """Load one extension's tools; returns (extension or None, timing)."""
+    t0 = time.perf_counter()
+    cpu0 = time.thread_time()
+    rss0 = _rss_bytes()
+    tools_dir = os.path.join(ext_dir, 'tools')
+    ext_name = os.path.basename(ext_dir)
+
+    # Load extension config if present
+    config_path = os.path.join(ext_dir, 'config.json')
+    ext_config = {}
+    if os.path.isfile(config_path):
+        try:
+            with open(config_path, 'r', encoding='utf-8') as f:
+                ext_config = json.load(f)
+        except Exception:
+            pass
+
+    # Load tool_config.json
+    tool_config_path = os.path.join(tools_dir, 'tool_config.json')
+    tool_configs = {}
+    if os.path.isfile(tool_config_path):
+        try:
+            with open(tool_config_path, 'r', encoding='utf-8') as f:
+                tool_configs = json.load(f)
+        except Exception:
+            pass
+
+    # Find all *_tools.py files
+    tool_files = glob.glob(os.path.join(tools_dir, '*_tools.py'))
+
+    tools: List[Callable] = []
+    system_prompt = ""
+
+    ext_errors: List[str] = []
+
+    if _isolation_mode(ext_config) == 'process':
+        # Out-of-process extension: tools run in a warm worker pool and the
+        # module is never imported into this process.
+        try:
+            from core.utils.tool_process_pool import get_tool_pool
+            pool = get_tool_pool(ext_name, tools_dir, tool_files, ext_config)
+            tools.extend(pool.tool_proxies())
+            system_prompt = pool.system_prompt
+            for err in pool.load_errors:
+                msg = f"[ExtensionDiscovery] Failed to load tools from {err}"
                 print(msg, flush=True)
                 ext_errors.append(msg)
+        except Exception as exc:  # noqa: BLE001
+            msg = f"[ExtensionDiscovery] Failed to start tool workers for {ext_name}: {exc}"
+            print(msg, flush=True)
+            ext_errors.append(msg)
+        tool_files = []
+
+    for tool_file in tool_files:
+        entry = manifest.get(str(Path(tool_file).resolve()))
+        proxies = lazy_tools.lazy_tools(ext_name, tool_file, tools_dir, entry)
+        if proxies is not None:
+            tools.extend(proxies)
+            if not system_prompt and entry.get('system_prompt'):
+                system_prompt = entry['system_prompt']
+            continue
+
+        try:
+            module = _load_tool_module(tool_file, tools_dir)
+            if module is None:
                 continue
 
-        if tools or ext_errors:
-            extensions.append({
-                'name': ext_name,
-                'path': ext_dir,
-                'tools': tools,
-                'system_prompt': system_prompt,
-                'tool_configs': tool_configs,
-                'config': ext_config,
-                'load_errors': ext_errors,
-            })
-    
-    return extensions
+            module_tools, module_prompt = _collect_module_exports(module)
+            tools.extend(module_tools)
+
+            # Use first SYSTEM_PROMPT found
+            if not system_prompt and module_prompt:
+                system_prompt = module_prompt
+
+        except Exception as exc:  # noqa: BLE001
+            msg = f"[ExtensionDiscovery] Failed to load tools from {tool_file}: {exc}"
+            print(msg, flush=True)
+            ext_errors.append(msg)
+            continue
+
+
+    lazy_count = sum(1 for t in tools if hasattr(t, '__luna_lazy__'))
+    timing = {
+        'name': ext_name,
+        'secs': round(time.perf_counter() - t0, 4),
+        'cpu_secs': round(time.thread_time() - cpu0, 4),
+        'rss_delta_mb': round((_rss_bytes() - rss0) / (1024 * 1024), 2),
+        'mode': _isolation_mode(ext_config),
+        'tools': len(tools),
+        'lazy_tools': lazy_count,
+        'errors': len(ext_errors),
+    }
+    if not (tools or ext_errors):
+        return None, timing
+    return {
+        'name': ext_name,
+        'path': ext_dir,
+        'tools': tools,
+        'system_prompt': system_prompt,
+        'tool_configs': tool_configs,
+        'config': ext_config,
+        'load_errors': ext_errors,
+    }, timing
 
 
 def discover_extension_uis(tool_root: Optional[str] = None) -> List[Dict[str, Any]]:
@@ -209,45 +551,25 @@ def discover_extension_services(tool_root: Optional[str] = None) -> List[Dict[st
     return results
 
 
-def build_all_light_schema() -> str:
+def build_all_light_schema(tool_root: Optional[str] = None) -> str:
     """Build a lightweight schema description of all available tools.
-    
+
+    Reads the static tool manifest (core/utils/tool_manifest.py), so no tools
+    module is imported just to describe it.
+
     Returns:
         String describing all tools in a format suitable for agent prompts
     """
-    extensions = discover_extensions()
-    
+    from core.utils.tool_manifest import list_extension_tools, tool_signature
+
     lines = []
-    for ext in extensions:
-        ext_name = ext.get('name', 'unknown')
-        tools = ext.get('tools', [])
-        
-        for tool in tools:
-            tool_name = getattr(tool, '__name__', 'unknown')
-            tool_doc = getattr(tool, '__doc__', '') or ''
-            
-            # Extract first line as summary
-            doc_lines = tool_doc.strip().split('\n')
-            summary = doc_lines[0].strip() if doc_lines else ''
-            
-            # Build tool signature from annotations
-            try:
-                import inspect
-                sig = inspect.signature(tool)
-                params = []
-                for param_name, param in sig.parameters.items():
-                    param_type = param.annotation if param.annotation != inspect.Parameter.empty else 'Any'
-                    param_type_str = getattr(param_type, '__name__', str(param_type))
-                    params.append(f"{param_name}: {param_type_str}")
-                signature = f"{tool_name}({', '.join(params)})"
-            except Exception:
-                signature = f"{tool_name}(...)"
-            
-            lines.append(f"- {signature}")
-            if summary:
-                lines.append(f"  {summary}")
+    for ext in list_extension_tools(tool_root):
+        for tool in ext.get('tools', []):
+            lines.append(f"- {tool_signature(tool)}")
+            if tool.get('summary'):
+                lines.append(f"  {tool['summary']}")
             lines.append("")
-    
+
     return '\n'.join(lines)
 
 
@@ -264,15 +586,13 @@ def get_all_extension_tools() -> List[Callable]:
     all_tools = []
 
     # Load master_config to check enabled state
-    master_config_path = PROJECT_ROOT / 'core' / 'master_config.json'
     enabled_extensions = set()
     try:
-        if master_config_path.exists():
-            with open(master_config_path, 'r') as f:
-                master_config = json.load(f)
-                for ext_name, ext_config in master_config.get('extensions', {}).items():
-                    if ext_config.get('enabled', True):  # Default to True if not specified
-                        enabled_extensions.add(ext_name)
+        from core.utils.config_store import get_config_store
+        master_config = get_config_store().get()
+        for ext_name, ext_config in master_config.get('extensions', {}).items():
+            if ext_config.get('enabled', True):  # Default to True if not specified
+                enabled_extensions.add(ext_name)
     except Exception as e:
         print(f"[ExtDiscovery] Warning: Failed to load master_config, exposing all extensions: {e}", flush=True)
         # If we can't load config, expose all extensions (safer default)
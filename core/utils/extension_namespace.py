@@ -0,0 +1,223 @@
+"""Per-extension module namespaces.
+
+Extension tool modules used to be imported under their bare file names with
+each extension's tools/ directory prepended to sys.path. Every import in the
+process then scanned one more directory per installed extension, and helper
+modules with the same name in two extensions (utils.py, models.py) collided
+in sys.modules.
+
+Now every extension gets a package, luna_ext.<name>, whose only search
+location is its tools/ directory, and a meta path finder resolves modules
+inside those packages. sys.path does not change. Modules run with an
+extension-scoped __import__, so existing bare sibling imports
+(``import helpers``, ``from models import X``) still resolve to
+luna_ext.<name>.helpers and never reach another extension's helpers. Because
+everything an extension loads sits under its own package, unload() can drop
+one extension without touching the others.
+"""
+import os
+import re
+import sys
+import hashlib
+import types
+import builtins
+import threading
+import importlib.abc
+import importlib.util
+import importlib.machinery
+from typing import Any, Dict, Optional, Set
+
+ROOT_PACKAGE = "luna_ext"
+
+_LOCK = threading.RLock()
+
+
+class _Extension:
+    """A registered extension package and what its bare imports may resolve to."""
+
+    def __init__(self, name: str, package: str, tools_dir: str):
+        self.name = name
+        self.package = package
+        self.tools_dir = tools_dir
+        self.siblings = _sibling_names(tools_dir)
+        self.builtins = dict(builtins.__dict__, __import__=self._import)
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        top = name.partition(".")[0]
+        if level or top not in self.siblings:
+            return _builtin_import(name, globals, locals, fromlist, level)
+        module = _builtin_import(f"{self.package}.{name}", globals, locals, fromlist, 0)
+        # ``import helpers.sub`` binds the top name, which here is the sibling
+        return module if fromlist else sys.modules[f"{self.package}.{top}"]
+
+
+_builtin_import = builtins.__import__
+_EXTENSIONS: Dict[str, _Extension] = {}  # package key -> extension
+
+
+def _sibling_names(tools_dir: str) -> Set[str]:
+    """Top-level modules and packages an extension can import by bare name."""
+    names: Set[str] = set()
+    try:
+        entries = os.listdir(tools_dir)
+    except OSError:
+        return names
+    for entry in entries:
+        stem, ext = os.path.splitext(entry)
+        if ext == ".py" and stem.isidentifier():
+            names.add(stem)
+        elif entry.isidentifier() and os.path.isfile(os.path.join(tools_dir, entry, "__init__.py")):
+            names.add(entry)
+    return names
+
+
+def package_key(ext_name: str) -> str:
+    """Identifier used for an extension under luna_ext.
+
+    Names that are identifiers are used as is. Anything else is sanitized and
+    suffixed with a hash of the name, so my-ext and my_ext get different
+    packages.
+    """
+    if ext_name.isidentifier():
+        return ext_name
+    key = re.sub(r"\W", "_", ext_name)
+    digest = hashlib.blake2b(ext_name.encode("utf-8", "surrogatepass"), digest_size=4).hexdigest()
+    return f"_{key}_{digest}" if not key or key[0].isdigit() else f"{key}_{digest}"
+
+
+class _ExtensionLoader(importlib.machinery.SourceFileLoader):
+    """Source loader that runs modules with their extension's scoped __import__."""
+
+    def __init__(self, fullname: str, path: str, extension: _Extension):
+        super().__init__(fullname, path)
+        self.extension = extension
+
+    def exec_module(self, module: types.ModuleType) -> None:
+        module.__dict__["__builtins__"] = self.extension.builtins
+        super().exec_module(module)
+
+
+class ExtensionFinder(importlib.abc.MetaPathFinder):
+    """Resolves luna_ext.<name>.<module> inside that extension's tools directory."""
+
+    def find_spec(self, fullname, path=None, target=None):
+        if not fullname.startswith(ROOT_PACKAGE + "."):
+            return None
+        parts = fullname.split(".")
+        extension = _EXTENSIONS.get(parts[1])
+        if extension is None or len(parts) < 3:
+            return None  # extension packages exist only once registered
+        base = os.path.join(extension.tools_dir, *parts[2:])
+        init = os.path.join(base, "__init__.py")
+        if os.path.isfile(init):
+            return importlib.util.spec_from_file_location(
+                fullname, init, loader=_ExtensionLoader(fullname, init, extension), submodule_search_locations=[base]
+            )
+        if os.path.isfile(base + ".py"):
+            return importlib.util.spec_from_file_location(
+                fullname, base + ".py", loader=_ExtensionLoader(fullname, base + ".py", extension)
+            )
+        return None
+
+
+_FINDER = ExtensionFinder()
+
+
+def _install() -> types.ModuleType:
+    root = sys.modules.get(ROOT_PACKAGE)
+    if root is None:
+        root = types.ModuleType(ROOT_PACKAGE, "Namespace for Luna extension modules.")
+        root.__path__ = []  # type: ignore[attr-defined]
+        sys.modules[ROOT_PACKAGE] = root
+    if _FINDER not in sys.meta_path:
+        sys.meta_path.insert(0, _FINDER)
+    return root
+
+
+def register(ext_name: str, tools_dir: str) -> str:
+    """Create (or re-point) the luna_ext.<name> package; returns its name.
+
+    Registering the same extension from a different directory unloads the
+    old package first. A different extension whose name maps to the same
+    package raises ValueError instead of unloading it.
+    """
+    tools_dir = os.path.abspath(tools_dir)
+    key = package_key(ext_name)
+    package = f"{ROOT_PACKAGE}.{key}"
+    with _LOCK:
+        root = _install()
+        current = _EXTENSIONS.get(key)
+        if current is not None and current.name != ext_name:
+            raise ValueError(f"Extension {ext_name!r} collides with {current.name!r} as package {package}")
+        if current is not None and current.tools_dir == tools_dir and package in sys.modules:
+            return package
+        if current is not None:
+            unload(ext_name)
+        extension = _Extension(ext_name, package, tools_dir)
+        module = types.ModuleType(package, f"Tools of the {ext_name} extension.")
+        module.__path__ = [tools_dir]  # type: ignore[attr-defined]
+        module.__package__ = package
+        module.__luna_extension__ = ext_name  # type: ignore[attr-defined]
+        _EXTENSIONS[key] = extension
+        sys.modules[package] = module
+        setattr(root, key, module)
+    return package
+
+
+def load_module(tool_file: str, tools_dir: str, ext_name: Optional[str] = None) -> Optional[types.ModuleType]:
+    """Execute a *_tools.py file as luna_ext.<ext>.<stem>.
+
+    The tools module itself runs fresh on every call, as discovery always
+    did. Helper modules it imports stay cached in the extension's package.
+    """
+    if ext_name is None:
+        ext_name = os.path.basename(os.path.dirname(os.path.abspath(tools_dir)))
+    package = register(ext_name, tools_dir)
+    fullname = f"{package}.{os.path.splitext(os.path.basename(tool_file))[0]}"
+    extension = _EXTENSIONS[package.rpartition(".")[2]]
+    spec = importlib.util.spec_from_file_location(
+        fullname, tool_file, loader=_ExtensionLoader(fullname, tool_file, extension)
+    )
+    if not spec or not spec.loader:
+        return None
+    module = importlib.util.module_from_spec(spec)
+    previous = sys.modules.get(fullname)
+    sys.modules[fullname] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        if previous is None:
+            sys.modules.pop(fullname, None)
+        else:
+            sys.modules[fullname] = previous
+        raise
+    return module
+
+
+def unload(ext_name: str) -> int:
+    """Drop an extension's package and every module under it; returns modules dropped."""
+    key = package_key(ext_name)
+    package = f"{ROOT_PACKAGE}.{key}"
+    with _LOCK:
+        _EXTENSIONS.pop(key, None)
+        names = [n for n in list(sys.modules) if n == package or n.startswith(package + ".")]
+        for name in names:
+            sys.modules.pop(name, None)
+        root = sys.modules.get(ROOT_PACKAGE)
+        if root is not None and hasattr(root, key):
+            delattr(root, key)
+    importlib.invalidate_caches()
+    return len(names)
+
+
+def loaded_extensions() -> Dict[str, Any]:
+    """Registered extensions: {name: {'package', 'tools_dir', 'modules'}}."""
+    with _LOCK:
+        return {
+            ext.name: {
+                "package": ext.package,
+                "tools_dir": ext.tools_dir,
+                "modules": sorted(n for n in sys.modules if n.startswith(ext.package + ".")),
+            }
+            for ext in _EXTENSIONS.values()
+        }
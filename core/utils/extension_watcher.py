@@ -0,0 +1,411 @@
+"""Extension hot reload: a filesystem watcher on extensions/ plus a local change channel.
+
+Installing or editing an extension used to need a restart of the agent API
+and every MCP server before its tools showed up. The watcher notices changes
+under extensions/ and reports the names of the changed extensions once the
+tree has been quiet for a short debounce period. Each service then reloads
+only those extensions (extension_discovery.reload_extensions).
+
+The watcher uses inotify through libc when it is available and falls back to
+polling file mtimes. Only files that affect tool loading count: an
+extension's config.json and anything under its tools/ directory, apart from
+bytecode, editor swap files and hidden files.
+
+Normally only the supervisor watches. It publishes each batch of changed
+names to the running services over Unix datagram sockets in
+.luna/ext_events/, one socket per subscribed process.
+
+Configuration:
+    LUNA_EXTENSION_WATCH              supervisor (default; "1" is the same) to
+                                      have the supervisor watch and publish,
+                                      local for every process to watch on its
+                                      own, 0 to disable hot reload
+    LUNA_EXTENSION_WATCH_DEBOUNCE_MS  quiet period before reporting (default 500)
+    LUNA_EXTENSION_WATCH_POLL_MS      polling interval without inotify (default 1000)
+    LUNA_EXTENSION_WATCH_POLLING      1 to force polling (e.g. network filesystems)
+"""
+import os
+import json
+import glob
+import time
+import errno
+import select
+import socket
+import struct
+import threading
+import weakref
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+_mode = os.getenv("LUNA_EXTENSION_WATCH", "supervisor").strip().lower()
+WATCH_MODE = "off" if _mode in ("0", "false", "no", "off") else ("local" if _mode == "local" else "supervisor")
+DEBOUNCE_S = float(os.getenv("LUNA_EXTENSION_WATCH_DEBOUNCE_MS", "500") or 500) / 1000.0
+POLL_S = float(os.getenv("LUNA_EXTENSION_WATCH_POLL_MS", "1000") or 1000) / 1000.0
+FORCE_POLLING = os.getenv("LUNA_EXTENSION_WATCH_POLLING", "0").strip().lower() in ("1", "true", "yes", "on")
+
+_IGNORED_DIRS = {"__pycache__", ".git", "node_modules", ".mypy_cache", ".pytest_cache"}
+_IGNORED_SUFFIXES = (".pyc", ".pyo", ".swp", ".swx", ".swo", ".tmp", "~")
+
+
+def default_root() -> str:
+    return str(PROJECT_ROOT / "extensions")
+
+
+def _relevant(parts: Tuple[str, ...]) -> bool:
+    """Whether a path (relative to the extensions root) can change tool loading."""
+    if not parts or any(p.startswith(".") or p in _IGNORED_DIRS for p in parts):
+        return False
+    if len(parts) == 1:
+        return True  # an extension directory itself was added, removed or renamed
+    if parts[1] == "config.json":
+        return len(parts) == 2
+    if parts[1] != "tools":
+        return False
+    name = parts[-1]
+    return not (name.endswith(_IGNORED_SUFFIXES) or name == "4913")  # vim's write probe
+
+
+def _watch_dir(parts: Tuple[str, ...]) -> bool:
+    """Directories that need an inotify watch: the root, extensions, tools trees."""
+    if any(p.startswith(".") or p in _IGNORED_DIRS for p in parts):
+        return False
+    return len(parts) <= 1 or parts[1] == "tools"
+
+
+class ExtensionWatcher:
+    """Watch an extensions root and report changed extension names, debounced.
+
+    callback(names) runs on the watcher's debounce thread with a sorted list.
+    """
+
+    def __init__(
+        self,
+        callback: Callable[[List[str]], None],
+        root: Optional[str] = None,
+        debounce: Optional[float] = None,
+        poll_interval: Optional[float] = None,
+        polling: Optional[bool] = None,
+    ):
+        self.root = str(Path(root or default_root()).resolve())
+        self.callback = callback
+        self.debounce = DEBOUNCE_S if debounce is None else debounce
+        self.poll_interval = POLL_S if poll_interval is None else poll_interval
+        self.backend = "polling" if (FORCE_POLLING if polling is None else polling) else "inotify"
+        self._pending: Set[str] = set()
+        self._last_event = 0.0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    # ---- lifecycle ----
+    def start(self) -> "ExtensionWatcher":
+        if self.backend == "inotify":
+            try:
+                self._inotify = _Inotify()
+                self._add_tree(self.root)
+                target = self._inotify_loop
+            except OSError as exc:
+                print(f"[ExtensionWatcher] inotify unavailable ({exc}); polling instead", flush=True)
+                self.backend = "polling"
+        if self.backend == "polling":
+            self._snapshot = self._poll_snapshot()
+            target = self._poll_loop
+        for fn, name in ((target, "ext-watch"), (self._debounce_loop, "ext-watch-debounce")):
+            thread = threading.Thread(target=fn, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"[ExtensionWatcher] Watching {self.root} ({self.backend})", flush=True)
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=2)
+        if self.backend == "inotify":
+            self._inotify.close()
+
+    # ---- change collection ----
+    def _changed(self, path: str) -> None:
+        parts = Path(os.path.relpath(path, self.root)).parts
+        if parts and parts[0] == os.pardir:
+            return
+        if _relevant(parts):
+            with self._cond:
+                self._pending.add(parts[0])
+                self._last_event = time.monotonic()
+                self._cond.notify_all()
+
+    def _changed_all(self) -> None:
+        for ext_dir in glob.glob(os.path.join(self.root, "*")):
+            if os.path.isdir(ext_dir):
+                self._changed(ext_dir)
+
+    def _debounce_loop(self) -> None:
+        while not self._stop.is_set():
+            with self._cond:
+                while not self._pending and not self._stop.is_set():
+                    self._cond.wait()
+                quiet = self._last_event + self.debounce - time.monotonic()
+                if quiet > 0:
+                    self._cond.wait(quiet)
+                    continue
+                names, self._pending = sorted(self._pending), set()
+            if names and not self._stop.is_set():
+                try:
+                    self.callback(names)
+                except Exception as exc:  # noqa: BLE001
+                    print(f"[ExtensionWatcher] Reload callback failed for {names}: {exc}", flush=True)
+
+    # ---- inotify backend ----
+    def _add_tree(self, path: str) -> None:
+        for dirpath, dirnames, _ in os.walk(path):
+            parts = Path(os.path.relpath(dirpath, self.root)).parts if dirpath != self.root else ()
+            if not _watch_dir(parts):
+                dirnames[:] = []
+                continue
+            try:
+                self._inotify.add_watch(dirpath)
+            except OSError:
+                pass  # vanished while walking
+            if len(parts) == 1:
+                dirnames[:] = [d for d in dirnames if d == "tools"]
+
+    def _inotify_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                events = self._inotify.read(timeout=0.5)
+            except OSError as exc:
+                print(f"[ExtensionWatcher] inotify read failed: {exc}", flush=True)
+                return
+            for path, mask in events:
+                if path is None:  # queue overflow: changes were lost
+                    self._changed_all()
+                    continue
+                if mask & _Inotify.IN_ISDIR and mask & (_Inotify.IN_CREATE | _Inotify.IN_MOVED_TO):
+                    self._add_tree(path)
+                self._changed(path)
+
+    # ---- polling backend ----
+    def _poll_snapshot(self) -> Dict[str, Tuple[int, int]]:
+        snapshot: Dict[str, Tuple[int, int]] = {}
+        for ext_dir in glob.glob(os.path.join(self.root, "*")):
+            if not os.path.isdir(ext_dir):
+                continue
+            snapshot[ext_dir] = (0, 0)
+            candidates = [os.path.join(ext_dir, "config.json")]
+            for dirpath, dirnames, filenames in os.walk(os.path.join(ext_dir, "tools")):
+                dirnames[:] = [d for d in dirnames if d not in _IGNORED_DIRS and not d.startswith(".")]
+                candidates.extend(os.path.join(dirpath, f) for f in filenames)
+            for path in candidates:
+                if not _relevant(Path(os.path.relpath(path, self.root)).parts):
+                    continue
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                snapshot[path] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    def _poll_loop(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            current = self._poll_snapshot()
+            previous, self._snapshot = self._snapshot, current
+            for path in set(previous) | set(current):
+                if previous.get(path) != current.get(path):
+                    self._changed(path)
+
+
+class _Inotify:
+    """Minimal inotify binding over libc (Linux only; raises OSError elsewhere)."""
+
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+    _HEADER = struct.Struct("iIII")
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            self._add = libc.inotify_add_watch
+            init = libc.inotify_init1
+        except (OSError, AttributeError) as exc:
+            raise OSError(errno.ENOSYS, f"inotify not supported: {exc}")
+        self._add.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._ctypes = ctypes
+        self.fd = init(os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._paths: Dict[int, str] = {}
+
+    def add_watch(self, path: str) -> None:
+        wd = self._add(self.fd, os.fsencode(path), self.MASK)
+        if wd < 0:
+            err = self._ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        self._paths[wd] = path
+
+    def read(self, timeout: float) -> List[Tuple[Optional[str], int]]:
+        """Pending events as (path, mask); path is None after a queue overflow."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        data = os.read(self.fd, 64 * 1024)
+        events: List[Tuple[Optional[str], int]] = []
+        offset = 0
+        while offset + self._HEADER.size <= len(data):
+            wd, mask, _cookie, length = self._HEADER.unpack_from(data, offset)
+            offset += self._HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & self.IN_Q_OVERFLOW:
+                events.append((None, mask))
+                continue
+            if mask & self.IN_IGNORED:
+                self._paths.pop(wd, None)
+                continue
+            base = self._paths.get(wd)
+            if base is not None:
+                events.append((os.path.join(base, os.fsdecode(name)) if name else base, mask))
+        return events
+
+    def close(self) -> None:
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+
+
+# ---- Local change channel ----
+def channel_dir() -> Path:
+    return PROJECT_ROOT / ".luna" / "ext_events"
+
+
+def publish(names: Iterable[str], root: Optional[str] = None, directory: Optional[Path] = None) -> int:
+    """Send changed extension names to every subscribed process; returns deliveries.
+
+    Sockets whose process is gone are removed.
+    """
+    payload = json.dumps({"extensions": sorted(names), "root": root or default_root(), "ts": time.time()}).encode()
+    delivered = 0
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    try:
+        for path in glob.glob(str((directory or channel_dir()) / "*.sock")):
+            try:
+                sock.sendto(payload, path)
+                delivered += 1
+            except (ConnectionRefusedError, FileNotFoundError):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            except OSError as exc:
+                print(f"[ExtensionWatcher] Could not notify {os.path.basename(path)}: {exc}", flush=True)
+    finally:
+        sock.close()
+    return delivered
+
+
+class Subscription:
+    """Receives published change batches on a per-process socket."""
+
+    def __init__(self, callback: Callable[[List[str]], None], label: str, directory: Optional[Path] = None):
+        self.callback = callback
+        directory = directory or channel_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        self._pid = os.getpid()
+        self.path = str(directory / f"{label}-{self._pid}.sock")
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(self.path)
+        self._sock.settimeout(0.5)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name=f"ext-events-{label}", daemon=True)
+        self._thread.start()
+        _SUBSCRIPTIONS.add(self)
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                data = self._sock.recv(64 * 1024)
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            try:
+                names = list(json.loads(data).get("extensions") or [])
+            except ValueError:
+                continue
+            if names:
+                try:
+                    self.callback(names)
+                except Exception as exc:  # noqa: BLE001
+                    print(f"[ExtensionWatcher] Reload callback failed for {names}: {exc}", flush=True)
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=2)
+        self._sock.close()
+        if os.getpid() != self._pid:
+            return  # inherited across a fork: the socket file belongs to the parent
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+# Subscriptions of this process. A forked child has no reader thread, so it
+# closes its copy of each socket: an unread copy would keep the socket alive
+# (and fill up) after the owning process exits.
+_SUBSCRIPTIONS: "weakref.WeakSet[Subscription]" = weakref.WeakSet()
+
+
+def _after_fork_in_child() -> None:
+    for sub in list(_SUBSCRIPTIONS):
+        sub._stop.set()
+        sub._sock.close()
+    _SUBSCRIPTIONS.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def subscribe(callback: Callable[[List[str]], None], label: str, directory: Optional[Path] = None) -> Subscription:
+    return Subscription(callback, label, directory)
+
+
+def start_for_service(label: str, on_change: Callable[[List[str]], None]):
+    """Hot reload for a service process per LUNA_EXTENSION_WATCH.
+
+    Returns the Subscription or ExtensionWatcher (both have stop()), or None
+    when hot reload is off.
+    """
+    if WATCH_MODE == "off":
+        return None
+    try:
+        if WATCH_MODE == "local":
+            return ExtensionWatcher(on_change).start()
+        return subscribe(on_change, label)
+    except OSError as exc:
+        print(f"[ExtensionWatcher] Hot reload unavailable for {label}: {exc}", flush=True)
+        return None
@@ -814,14 +814,13 @@ class ExternalServicesManager:
         master_config_path = self.repo_path / "core" / "master_config.json"
         public_domain = ""
         deployment_mode = ""
-        if master_config_path.exists():
-            try:
-                with open(master_config_path, 'r') as f:
-                    master_config = json.load(f)
-                    public_domain = master_config.get("public_domain", "")
-                    deployment_mode = master_config.get("deployment_mode", "")
-            except Exception as e:
-                print(f"[ExternalServicesManager] Warning: Could not load master_config for template vars: {e}")
+        try:
+            from core.utils.config_store import get_config_store
+            master_config = get_config_store(master_config_path).get()
+            public_domain = master_config.get("public_domain", "")
+            deployment_mode = master_config.get("deployment_mode", "")
+        except Exception as e:
+            print(f"[ExternalServicesManager] Warning: Could not load master_config for template vars: {e}")
 
         # Auto-assign common system variables (case variations for convenience)
         auto_vars = {
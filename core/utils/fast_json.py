@@ -0,0 +1,145 @@
+"""Shared JSON encoding/decoding with an optional fast backend.
+
+Hot paths (SSE chunks, tool result normalization, planner output parsing,
+supervisor config/state files) go through this module. When ``orjson`` is
+installed it is used; otherwise everything falls back to the stdlib ``json``
+module with equivalent settings. Set LUNA_FAST_JSON=0 to force the stdlib.
+
+Output is always UTF-8 (non-ASCII is not escaped) and compact unless an
+indent is requested; only an indent of 2 is supported by the fast backend,
+other indents use the stdlib.
+"""
+import os
+import json
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Optional, Union
+
+from starlette.responses import JSONResponse
+
+try:  # Optional fast backend
+    import orjson  # type: ignore
+except Exception:  # noqa: BLE001
+    orjson = None  # type: ignore
+
+if os.getenv("LUNA_FAST_JSON", "1").strip().lower() in ("0", "false", "no", "off"):
+    orjson = None  # type: ignore
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers can catch this
+JSONDecodeError = json.JSONDecodeError
+
+
+def dumpb(
+    obj: Any,
+    *,
+    indent: Optional[int] = None,
+    sort_keys: bool = False,
+    default: Optional[Callable[[Any], Any]] = None,
+) -> bytes:
+    """Serialize obj to UTF-8 JSON bytes."""
+    if orjson is not None and indent in (None, 2):
+        option = orjson.OPT_NON_STR_KEYS
+        if indent == 2:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(obj, default=default, option=option)
+        except TypeError:
+            pass  # e.g. ints beyond 64 bits; let the stdlib decide
+    separators = (",", ": ") if indent is not None else (",", ":")
+    text = json.dumps(obj, ensure_ascii=False, indent=indent, sort_keys=sort_keys, default=default, separators=separators)
+    try:
+        return text.encode("utf-8")
+    except UnicodeEncodeError:
+        # Lone surrogates can't be UTF-8; escape everything instead
+        return json.dumps(
+            obj, ensure_ascii=True, indent=indent, sort_keys=sort_keys, default=default, separators=separators,
+        ).encode("ascii")
+
+
+def dumps(
+    obj: Any,
+    *,
+    indent: Optional[int] = None,
+    sort_keys: bool = False,
+    default: Optional[Callable[[Any], Any]] = None,
+) -> str:
+    """Serialize obj to a JSON string."""
+    return dumpb(obj, indent=indent, sort_keys=sort_keys, default=default).decode("utf-8")
+
+
+def quote(text: str) -> str:
+    """Encode a single string as a JSON string literal (the SSE delta hot path)."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(text).decode("utf-8")
+        except TypeError:
+            pass  # lone surrogates; the stdlib escapes them
+    return json.encoder.encode_basestring_ascii(text)
+
+
+def loads(data: Union[str, bytes, bytearray]) -> Any:
+    """Parse JSON from str or bytes."""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass  # stdlib also accepts NaN/Infinity and big integers; it raises the final error
+    return json.loads(data)
+
+
+def read_file(path: Union[str, Path]) -> Any:
+    """Load a JSON file."""
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def write_file(path: Union[str, Path], obj: Any, *, indent: Optional[int] = 2) -> None:
+    """Write obj to a JSON file (pretty-printed by default)."""
+    data = dumpb(obj, indent=indent)
+    if indent is not None:
+        data += b"\n"
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def write_file_atomic(path: Union[str, Path], obj: Any, *, indent: Optional[int] = 2, fsync: bool = True) -> None:
+    """Like write_file, but readers never see a partial file (see write_bytes_atomic)."""
+    data = dumpb(obj, indent=indent)
+    if indent is not None:
+        data += b"\n"
+    write_bytes_atomic(path, data, fsync=fsync)
+
+
+def write_bytes_atomic(path: Union[str, Path], data: bytes, *, fsync: bool = True) -> None:
+    """Write data to a temp file and rename it over path, keeping its permissions."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=str(path.parent))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        try:
+            os.chmod(tmp, os.stat(path).st_mode & 0o777)
+        except FileNotFoundError:
+            os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered through the shared fast encoder."""
+
+    def render(self, content: Any) -> bytes:
+        return dumpb(content)
@@ -0,0 +1,170 @@
+"""Rolling conversation summaries for the agent API.
+
+OpenAI-style clients resend the whole message list every turn. Instead of passing
+an ever-growing history to the planner, older turns are folded into a compact
+summary that is cached under a hash of the history prefix it covers. On the next
+turn the longest cached prefix is found and only the lines after it (the delta)
+are summarized, so each turn costs roughly the same prompt size.
+
+The planner then sees: summary of earlier turns + the most recent turns verbatim.
+"""
+import os
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from core.utils.token_budget import count_tokens
+
+# (previous_summary, new_lines) -> updated summary
+Summarizer = Callable[[str, List[str]], Awaitable[str]]
+
+DEFAULT_RECENT_LINES = 8
+DEFAULT_MIN_TOKENS = 3000
+DEFAULT_BATCH_LINES = 6
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TIMEOUT_S = 10.0
+
+
+def prefix_hashes(lines: List[str]) -> List[str]:
+    """Chained hash of every prefix: result[i] identifies lines[:i + 1]."""
+    hashes: List[str] = []
+    h = hashlib.sha256()
+    for line in lines:
+        h.update(line.encode("utf-8", "replace"))
+        h.update(b"\x00")
+        hashes.append(h.copy().hexdigest())
+    return hashes
+
+
+async def llm_summarizer(previous: str, new_lines: List[str]) -> str:
+    """Default summarizer: ask the chat model to fold new lines into the summary."""
+    from langchain_core.messages import SystemMessage, HumanMessage
+    from core.utils.llm_selector import get_chat_model
+
+    model = get_chat_model(
+        role="summary",
+        model=os.getenv("LUNA_HISTORY_SUMMARY_MODEL") or os.getenv("LLM_DEFAULT_MODEL", "gpt-4.1"),
+        temperature=0.0,
+    )
+    prompt = (
+        f"Current summary:\n{previous or '(none)'}\n\n"
+        "New conversation lines:\n" + "\n".join(new_lines)
+    )
+    resp = await model.ainvoke([
+        SystemMessage(content=(
+            "You maintain a running summary of a conversation between a user and an assistant. "
+            "Update the summary with the new lines. Keep facts, names, decisions, open requests "
+            "and user preferences; drop pleasantries. Reply with the updated summary only."
+        )),
+        HumanMessage(content=prompt),
+    ])
+    return str(getattr(resp, "content", resp) or "").strip()
+
+
+class HistorySummaryCache:
+    """LRU cache of conversation summaries keyed by history prefix hash."""
+
+    def __init__(
+        self,
+        summarizer: Optional[Summarizer] = None,
+        recent_lines: Optional[int] = None,
+        min_tokens: Optional[int] = None,
+        batch_lines: Optional[int] = None,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        timeout: Optional[float] = None,
+    ):
+        self.summarizer = summarizer or llm_summarizer
+        self.recent_lines = max(0, recent_lines if recent_lines is not None
+                                else int(os.getenv("LUNA_HISTORY_RECENT_LINES", str(DEFAULT_RECENT_LINES))))
+        self.min_tokens = max(0, min_tokens if min_tokens is not None
+                              else int(os.getenv("LUNA_HISTORY_SUMMARY_MIN_TOKENS", str(DEFAULT_MIN_TOKENS)) or 0))
+        self.batch_lines = max(1, batch_lines if batch_lines is not None
+                               else int(os.getenv("LUNA_HISTORY_SUMMARY_BATCH_LINES", str(DEFAULT_BATCH_LINES))))
+        self.max_entries = max(1, max_entries)
+        self.timeout = max(0.0, timeout if timeout is not None
+                           else float(os.getenv("LUNA_HISTORY_SUMMARY_TIMEOUT_S", str(DEFAULT_TIMEOUT_S)) or 0))
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """A minimum of 0 tokens disables summarization."""
+        return self.min_tokens > 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            summary = self._entries.get(key)
+            if summary is not None:
+                self._entries.move_to_end(key)
+            return summary
+
+    def put(self, key: str, summary: str) -> None:
+        with self._lock:
+            self._entries[key] = summary
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _longest_cached(self, hashes: List[str]) -> Tuple[int, str]:
+        """Return (covered_lines, summary) for the longest cached prefix."""
+        for i in range(len(hashes), 0, -1):
+            summary = self.get(hashes[i - 1])
+            if summary is not None:
+                return i, summary
+        return 0, ""
+
+    async def compact(self, lines: List[str], timeout: Optional[float] = None) -> str:
+        """Return history text with older lines replaced by a cached rolling summary.
+
+        Short histories (under min_tokens) are returned unchanged. If the
+        summarizer fails, or does not answer within the smaller of timeout and
+        the cache's own limit (LUNA_HISTORY_SUMMARY_TIMEOUT_S), the full history
+        is returned.
+        """
+        full = "\n".join(lines)
+        if not self.enabled or len(lines) <= self.recent_lines or count_tokens(full) < self.min_tokens:
+            return full
+
+        split = len(lines) - self.recent_lines
+        older, recent = lines[:split], lines[split:]
+        hashes = prefix_hashes(older)
+        covered, summary = self._longest_cached(hashes)
+        delta = older[covered:]
+
+        # Small deltas stay verbatim until a full batch has accumulated, so most
+        # turns reuse the cached summary without a summarizer call.
+        if delta and (not summary or len(delta) >= self.batch_lines):
+            limits = [t for t in (timeout, self.timeout or None) if t is not None]
+            try:
+                summary = await asyncio.wait_for(self.summarizer(summary, delta), min(limits) if limits else None)
+            except asyncio.TimeoutError:
+                print("[HistorySummary] Summarizer timed out, using full history", flush=True)
+                return full
+            except Exception as exc:  # noqa: BLE001
+                print(f"[HistorySummary] Summarizer failed, using full history: {exc}", flush=True)
+                return full
+            self.put(hashes[-1], summary)
+            delta = []
+
+        parts = [f"Summary of earlier conversation:\n{summary}"]
+        parts.append("Recent turns:\n" + "\n".join(delta + recent))
+        return "\n\n".join(parts)
+
+
+_CACHE: Optional[HistorySummaryCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_history_cache() -> HistorySummaryCache:
+    """Process-wide summary cache used by the agent API."""
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = HistorySummaryCache()
+        return _CACHE
@@ -0,0 +1,162 @@
+"""Lazy in-process tools backed by the static tool manifest.
+
+Discovery used to import every extension's ``*_tools.py`` at startup, so the
+startup time and resident memory of the agent API and MCP server grew with
+every installed extension, even for tools a process never calls. With lazy
+loading, discovery builds each tool as a proxy from its manifest entry (name,
+docstring, signature, annotations, defaults) and imports the module on the
+proxy's first call. Schema building and argument validation work on the proxy
+without the import.
+
+A module is still imported up front when its manifest entry cannot reproduce
+the real signature faithfully (annotations outside builtins/typing, non-literal
+defaults, async tools, a failed manifest read) or when it is on the warm list.
+
+Configuration:
+    LUNA_LAZY_TOOLS  1 (default) to enable, 0 to import everything at startup
+    LUNA_TOOL_WARM   comma-separated extension or tool names to import at
+                     startup anyway ("*" for all)
+"""
+import os
+import time
+import inspect
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from core.utils.tool_process_pool import _ANNOTATION_NAMESPACE
+
+LAZY_ENABLED = os.getenv("LUNA_LAZY_TOOLS", "1").strip().lower() not in ("0", "false", "no", "off")
+WARM_LIST = {name.strip() for name in os.getenv("LUNA_TOOL_WARM", "").split(",") if name.strip()}
+
+
+class _Unresolvable(Exception):
+    pass
+
+
+def _resolve_annotation(expr: Optional[str]) -> Any:
+    """Evaluate an annotation string; unlike the process pool, never guess Any."""
+    if not expr:
+        return inspect.Parameter.empty
+    try:
+        return eval(expr, {"__builtins__": {}}, _ANNOTATION_NAMESPACE)  # noqa: S307
+    except Exception:
+        raise _Unresolvable(expr)
+
+
+def should_warm(ext_name: str, tool_names: Iterable[str], warm: Optional[Iterable[str]] = None) -> bool:
+    """Whether a module must be imported at startup per the warm list."""
+    warm = WARM_LIST if warm is None else set(warm)
+    return "*" in warm or ext_name in warm or any(name in warm for name in tool_names)
+
+
+class LazyToolModule:
+    """A tools module imported on first use (thread-safe, once)."""
+
+    def __init__(self, ext_name: str, tool_file: str, tools_dir: str):
+        self.ext_name = ext_name
+        self.tool_file = tool_file
+        self.tools_dir = tools_dir
+        self._module: Any = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def load(self) -> Any:
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    from core.utils.extension_discovery import _load_tool_module
+
+                    t0 = time.perf_counter()
+                    module = _load_tool_module(self.tool_file, self.tools_dir)
+                    if module is None:
+                        raise RuntimeError(f"cannot load {self.tool_file}")
+                    print(
+                        f"[LazyTools] Imported {self.ext_name}/{os.path.basename(self.tool_file)} "
+                        f"on first call ({(time.perf_counter() - t0) * 1000:.0f}ms)",
+                        flush=True,
+                    )
+                    self._module = module
+        return self._module
+
+    def resolve(self, tool_name: str, index: Optional[int] = None) -> Callable:
+        """The imported function for a manifest entry.
+
+        Matches by name. If the entry disagrees with the imported TOOLS (e.g.
+        a decorator renamed the function), falls back to the entry's position.
+        """
+        from core.utils.extension_discovery import _collect_module_exports
+
+        tools, _ = _collect_module_exports(self.load())
+        matches = [fn for fn in tools if getattr(fn, "__name__", None) == tool_name]
+        if len(matches) == 1:
+            return matches[0]
+        if index is not None and index < len(tools):
+            print(
+                f"[LazyTools] Manifest for {os.path.basename(self.tool_file)} does not match its TOOLS; "
+                f"using entry {index} ({getattr(tools[index], '__name__', '?')}) for '{tool_name}'",
+                flush=True,
+            )
+            return tools[index]
+        if matches:
+            return matches[0]
+        raise RuntimeError(f"tool '{tool_name}' is not exported by {self.tool_file}")
+
+
+def _signature(spec: Dict[str, Any]) -> inspect.Signature:
+    params: List[inspect.Parameter] = []
+    for p in spec.get("params", []):
+        kind = getattr(inspect.Parameter, p.get("kind") or "POSITIONAL_OR_KEYWORD")
+        if p.get("required") or kind in (inspect.Parameter.VAR_POSITIONAL, inspect.Parameter.VAR_KEYWORD):
+            default = inspect.Parameter.empty
+        elif "value" in p:
+            default = p["value"]
+        else:
+            raise _Unresolvable(f"default of {p['name']}")
+        params.append(inspect.Parameter(p["name"], kind, default=default, annotation=_resolve_annotation(p.get("annotation"))))
+    return inspect.Signature(params)
+
+
+def make_proxy(spec: Dict[str, Any], module: LazyToolModule, index: Optional[int] = None) -> Callable:
+    """Proxy with the tool's name, doc and signature that imports on first call.
+
+    index is the tool's position in the manifest entry (its place in TOOLS).
+
+    Raises _Unresolvable when the manifest cannot reproduce the signature.
+    """
+    if spec.get("async"):
+        raise _Unresolvable("async tool")
+    tool_name = spec["name"]
+    signature = _signature(spec)
+    target: List[Callable] = []
+
+    def tool_proxy(*args, **kwargs):
+        if not target:
+            target.append(module.resolve(tool_name, index))
+        return target[0](*args, **kwargs)
+
+    tool_proxy.__name__ = tool_name
+    tool_proxy.__qualname__ = tool_name
+    tool_proxy.__doc__ = spec.get("doc", "")
+    tool_proxy.__signature__ = signature  # type: ignore[attr-defined]
+    tool_proxy.__annotations__ = {
+        p.name: p.annotation for p in signature.parameters.values() if p.annotation is not inspect.Parameter.empty
+    }
+    tool_proxy.__luna_lazy__ = module  # type: ignore[attr-defined]
+    return tool_proxy
+
+
+def lazy_tools(ext_name: str, tool_file: str, tools_dir: str, entry: Optional[Dict[str, Any]]) -> Optional[List[Callable]]:
+    """Proxies for every tool in tool_file, or None if it must be imported now."""
+    if not LAZY_ENABLED or not entry or entry.get("source") == "error":
+        return None
+    specs = entry.get("tools") or []
+    if should_warm(ext_name, (spec["name"] for spec in specs)):
+        return None
+    module = LazyToolModule(ext_name, tool_file, tools_dir)
+    try:
+        return [make_proxy(spec, module, i) for i, spec in enumerate(specs)]
+    except _Unresolvable:
+        return None
@@ -0,0 +1,178 @@
+"""Multi-tenant MCP host: every configured MCP server in one process.
+
+The supervisor used to launch one mcp_server.py process per entry in
+master_config.mcp_servers. Each one discovered all extensions, imported every
+tool module and opened its own remote MCP sessions, so memory use and startup
+time grew with the number of servers exposed.
+
+This host builds all enabled servers in a single process:
+- extensions are discovered and imported once (one tracked registry), and
+  remote MCP sessions are opened once by a shared session manager
+- each server still gets its own FastMCP instance with its own tool view
+  (mcp_servers.<name>.tool_config), its own auth ('main' uses GitHub OAuth,
+  the rest bearer API keys) and its own port, so the Caddy routes do not change
+- extension hot reload re-imports a changed extension once and updates every
+  server's tools
+
+Metrics cover the whole process, so the servers do not serve /metrics (one
+tenant's key would show every server's tools). Set LUNA_MCP_HOST_METRICS_PORT
+to serve them on that port, bound to 127.0.0.1 only.
+
+Usage:
+    python core/utils/mcp_host.py --host 127.0.0.1 [--servers main,gym]
+"""
+import os
+import sys
+import signal
+import asyncio
+import argparse
+import contextlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Ensure project root importability
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import uvicorn
+
+from core.utils import extension_watcher, metrics, structured_log
+from core.utils.mcp_server import (
+    _build_app,
+    _create_server,
+    _init_remote_sessions,
+    _load_server_tools,
+    _print_banner,
+    _reload_extension_tools,
+)
+
+
+METRICS_PORT = int(os.getenv("LUNA_MCP_HOST_METRICS_PORT", "0") or 0)
+
+
+class _HostedServer(uvicorn.Server):
+    """A uvicorn server that leaves signal handling to the host.
+
+    uvicorn installs process-wide signal handlers per server, so with several
+    servers in one loop only the last one would see SIGTERM.
+    """
+
+    @contextlib.contextmanager
+    def capture_signals(self):
+        yield
+
+    def install_signal_handlers(self) -> None:  # uvicorn < 0.29
+        pass
+
+
+def select_servers(master_config: Dict[str, Any], only: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """Enabled entries of master_config.mcp_servers (optionally only the named ones)."""
+    servers = master_config.get("mcp_servers", {}) or {}
+    return {
+        name: cfg for name, cfg in servers.items()
+        if cfg.get("enabled", True) and (not only or name in only)
+    }
+
+
+def _metrics_app():
+    """The process's /metrics, for the loopback-only metrics port."""
+    from starlette.applications import Starlette
+    from starlette.routing import Route
+
+    return Starlette(routes=[Route("/metrics", lambda request: metrics.metrics_response())])
+
+
+async def _serve_all(servers: List[_HostedServer]) -> int:
+    """Serve until stopped; each server fails on its own. Returns how many failed."""
+    loop = asyncio.get_running_loop()
+
+    def stop() -> None:
+        for server in servers:
+            if server.should_exit:
+                server.force_exit = True
+            server.should_exit = True
+
+    async def serve_one(server: _HostedServer) -> bool:
+        # uvicorn calls sys.exit(1) when it cannot bind its port; that must
+        # only take down this server, not the loop and every other server
+        try:
+            await server.serve()
+        except (Exception, SystemExit) as exc:
+            print(f"[MCP Host] Server on port {server.config.port} failed: {exc!r}", flush=True)
+            return False
+        if not server.started:
+            print(f"[MCP Host] Server on port {server.config.port} did not start", flush=True)
+            return False
+        return True
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop)
+        except (NotImplementedError, RuntimeError):
+            signal.signal(sig, lambda *_: stop())
+    results = await asyncio.gather(*(serve_one(server) for server in servers))
+    return sum(1 for ok in results if not ok)
+
+
+def main(argv: List[str]) -> int:
+    """Serve all enabled MCP servers from master_config in this process."""
+    parser = argparse.ArgumentParser(description="Luna MCP host (all configured MCP servers in one process)")
+    parser.add_argument("--host", default="0.0.0.0", help="Host to bind every server to")
+    parser.add_argument("--servers", default=None, help="Comma-separated server names to serve (default: all enabled)")
+    args = parser.parse_args(argv)
+
+    structured_log.configure("mcp-host")
+    only = [name.strip() for name in args.servers.split(",") if name.strip()] if args.servers else None
+
+    # Shared by every server: master_config, remote sessions and the extension registry
+    master_config, session_manager = _init_remote_sessions()
+    configs = select_servers(master_config, only)
+    if not configs:
+        print("[MCP Host] No enabled MCP servers configured", flush=True)
+        return 1
+
+    from core.utils.extension_discovery import track_extensions
+    track_extensions()
+
+    hosted = []
+    uvicorn_servers: List[_HostedServer] = []
+    for name, cfg in configs.items():
+        print(f"[MCP Host] Setting up server '{name}'...", flush=True)
+        server = _create_server(name, None if name == "main" else cfg.get("api_key"))
+        if server is None:
+            print(f"[MCP Host] Skipping server '{name}'", flush=True)
+            continue
+        registered = _load_server_tools(server["mcp"], name, master_config, session_manager)
+        port = int(cfg.get("port", 8766))
+        try:
+            app = _build_app(server, metrics_route=False)
+        except Exception as e:
+            print(f"[MCP Host] Failed to create ASGI app for '{name}': {e}", flush=True)
+            continue
+        _print_banner(server, registered, f"http://{args.host}:{port}", "Streamable HTTP")
+        hosted.append((server["mcp"], name))
+        uvicorn_servers.append(_HostedServer(uvicorn.Config(app, host=args.host, port=port, log_level="info")))
+
+    if not uvicorn_servers:
+        print("[MCP Host] No MCP server could be started", flush=True)
+        return 1
+    if METRICS_PORT:
+        uvicorn_servers.append(_HostedServer(uvicorn.Config(
+            _metrics_app(), host="127.0.0.1", port=METRICS_PORT, log_level="warning"
+        )))
+        print(f"[MCP Host] Metrics on http://127.0.0.1:{METRICS_PORT}/metrics", flush=True)
+
+    # One reload of a changed extension updates every server
+    extension_watcher.start_for_service(
+        "mcp-host",
+        lambda names: _reload_extension_tools(hosted, names, session_manager),
+    )
+
+    print(f"[MCP Host] Serving {len(hosted)} MCP server(s): {', '.join(name for _, name in hosted)}", flush=True)
+    failed = asyncio.run(_serve_all(uvicorn_servers))
+    return 1 if failed == len(uvicorn_servers) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -8,7 +8,7 @@ import os
 import sys
 import argparse
 import secrets
-from typing import Any, Callable, List
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from pathlib import Path
 
 # Ensure project root importability
@@ -28,7 +28,7 @@ try:
     from fastmcp.server.auth.providers.github import GitHubProvider, GitHubTokenVerifier
     from fastmcp.server.auth import AccessToken
     from starlette.applications import Starlette
-    from starlette.routing import Mount
+    from starlette.routing import Mount, Route
     from starlette.middleware.base import BaseHTTPMiddleware
     from starlette.responses import JSONResponse
     import uvicorn
@@ -39,6 +39,12 @@ except Exception as e:
     ) from e
 
 from core.utils.tool_discovery import get_mcp_enabled_tools, get_mcp_enabled_tools_for_server
+from core.utils import metrics
+from core.utils import extension_watcher
+from core.utils import structured_log
+from core.utils import tool_executor
+
+_CALL_LOG = structured_log.get_logger("mcp.calls", label="MCP CALL")
 
 
 class RestrictedGitHubTokenVerifier(GitHubTokenVerifier):
@@ -160,39 +166,69 @@ class RestrictedGitHubProvider(GitHubProvider):
 
 
 def _create_logging_wrapper(fn: Callable[..., Any], tool_name: str) -> Callable[..., Any]:
-    """Wrap a tool function to log calls and errors."""
+    """Wrap a tool function (sync or async) to log calls and errors."""
     import functools
-    import json
-    import datetime
+    import inspect
+    import time
+    from core.utils import tracing
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                # One trace per tool call (subject to LUNA_TRACE_SAMPLE_RATE)
+                with tracing.start_trace("mcp.tool_call", service="mcp-server", **{"tool.name": tool_name}):
+                    result = await fn(*args, **kwargs)
+            except Exception as e:
+                _log_call(tool_name, kwargs, time.perf_counter() - t0, error=e)
+                raise
+            _log_call(tool_name, kwargs, time.perf_counter() - t0, result=result)
+            return result
+
+        return async_wrapper
 
     @functools.wraps(fn)
     def wrapper(*args, **kwargs):
-        timestamp = datetime.datetime.now().isoformat()
-
-        # Sanitize arguments for logging (avoid logging sensitive data)
-        log_args = {k: str(v)[:200] for k, v in kwargs.items()}  # Truncate long values
-
-        print(f"[MCP CALL] {timestamp} - {tool_name}", flush=True)
-        print(f"[MCP CALL]   Args: {json.dumps(log_args, ensure_ascii=False)}", flush=True)
-
+        t0 = time.perf_counter()
         try:
-            result = fn(*args, **kwargs)
-            # Log result length/type but not full content (could be huge)
-            result_info = f"type={type(result).__name__}"
-            if isinstance(result, str):
-                result_info += f", len={len(result)}"
-            print(f"[MCP CALL]   Result: {result_info}", flush=True)
-            return result
+            # One trace per tool call (subject to LUNA_TRACE_SAMPLE_RATE)
+            with tracing.start_trace("mcp.tool_call", service="mcp-server", **{"tool.name": tool_name}):
+                result = fn(*args, **kwargs)
         except Exception as e:
-            error_msg = str(e)
-            print(f"[MCP CALL]   ERROR: {error_msg}", flush=True)
-            import traceback
-            print(f"[MCP CALL]   Traceback: {traceback.format_exc()}", flush=True)
+            _log_call(tool_name, kwargs, time.perf_counter() - t0, error=e)
             raise
+        _log_call(tool_name, kwargs, time.perf_counter() - t0, result=result)
+        return result
 
     return wrapper
 
 
+def _log_call(tool_name: str, kwargs: Dict[str, Any], elapsed: float, result: Any = None, error: Optional[BaseException] = None) -> None:
+    import logging
+
+    if error is not None:
+        metrics.observe_tool(tool_name, elapsed, "error")
+        _CALL_LOG.log(
+            logging.ERROR, "tool call failed", exc_info=error, tool=tool_name, args=_log_args(kwargs),
+            duration_ms=round(elapsed * 1000, 1), error=str(error),
+        )
+        return
+    metrics.observe_tool(tool_name, elapsed, "ok")
+    if _CALL_LOG.is_enabled(logging.INFO):
+        # Log result length/type but not full content (could be huge)
+        _CALL_LOG.info(
+            "tool call", sample=True, tool=tool_name, args=_log_args(kwargs),
+            duration_ms=round(elapsed * 1000, 1), result_type=type(result).__name__,
+            result_len=len(result) if isinstance(result, str) else None,
+        )
+
+
+def _log_args(kwargs: Dict[str, Any]) -> Dict[str, str]:
+    # Sanitize arguments for logging (avoid logging sensitive data)
+    return {k: str(v)[:200] for k, v in kwargs.items()}  # Truncate long values
+
+
 def _register_tools(mcp: "FastMCP", tools: List[Callable[..., Any]]) -> int:
     """Register tools with the MCP server."""
     from core.utils.tool_discovery import MCPRemoteTool
@@ -245,15 +281,15 @@ def _register_tools(mcp: "FastMCP", tools: List[Callable[..., Any]]) -> int:
                         else:
                             params.append(inspect.Parameter(param_name, inspect.Parameter.POSITIONAL_OR_KEYWORD, default=None, annotation=py_type))
 
-                    # Create function with proper signature
+                    # Create function with proper signature (async: the call is awaited, not blocked on)
                     def create_remote_tool_func(remote_tool_instance, param_list):
-                        def tool_func(*args, **kwargs):
+                        async def tool_func(*args, **kwargs):
                             # Convert args/kwargs to dict for remote call
                             call_kwargs = dict(zip(param_list, args))
                             call_kwargs.update(kwargs)
                             # Remove None values
                             call_kwargs = {k: v for k, v in call_kwargs.items() if v is not None}
-                            return remote_tool_instance(**call_kwargs)
+                            return await remote_tool_instance.acall(**call_kwargs)
 
                         tool_func.__name__ = remote_tool_instance.__name__
                         tool_func.__doc__ = remote_tool_instance.__doc__
@@ -264,21 +300,21 @@ def _register_tools(mcp: "FastMCP", tools: List[Callable[..., Any]]) -> int:
                     wrapper_fn = create_remote_tool_func(fn, param_names)
                 else:
                     # No schema, create simple wrapper
-                    def tool_func():
-                        return fn()
+                    async def tool_func():
+                        return await fn.acall()
                     tool_func.__name__ = tool_name
                     tool_func.__doc__ = tool_doc
                     wrapper_fn = tool_func
 
-                # Wrap with logging
+                # Wrap with logging; calls share the tool's concurrency limit and timeout
                 logged_wrapper = _create_logging_wrapper(wrapper_fn, tool_name)
-                mcp.tool(logged_wrapper)
+                mcp.tool(tool_executor.offload(logged_wrapper, tool_name))
                 print(f"[MCP]     ✓ Registered remote tool: {tool_name}", flush=True)
                 count += 1
             else:
-                # Regular local tool - wrap with logging
+                # Regular local tool - wrap with logging and run it off the event loop
                 logged_fn = _create_logging_wrapper(fn, tool_name)
-                mcp.tool(logged_fn)
+                mcp.tool(tool_executor.offload(logged_fn, tool_name))
                 print(f"[MCP]     ✓ Registered local tool: {tool_name}", flush=True)
                 count += 1
         except Exception as e:
@@ -290,6 +326,47 @@ def _register_tools(mcp: "FastMCP", tools: List[Callable[..., Any]]) -> int:
     return count
 
 
+def _reload_extension_tools(servers: List[Tuple["FastMCP", str | None]], names: List[str], session_manager=None) -> int:
+    """Swap the registered tools of changed extensions for their reloaded versions.
+
+    servers is a list of (mcp, server_name) sharing one extension registry, so
+    the extensions are reloaded once and every server's tool view is updated.
+    """
+    from core.utils.extension_discovery import discover_extensions, reload_extensions
+    from core.utils.tool_discovery import MCPRemoteTool
+
+    def ext_tool_names() -> set:
+        return {
+            getattr(tool, '__name__', '')
+            for ext in discover_extensions() if ext.get('name') in names
+            for tool in ext.get('tools', []) or []
+        }
+
+    old_names = ext_tool_names()
+    statuses = reload_extensions(names)
+    new_names = ext_tool_names()
+    summary = ", ".join(f"{name} {status}" for name, status in statuses.items())
+
+    total = 0
+    for mcp, server_name in servers:
+        # master_config=None re-reads it, picking up tool enablement saved alongside the change
+        if server_name:
+            tools = get_mcp_enabled_tools_for_server(server_name=server_name, session_manager=session_manager)
+        else:
+            tools = get_mcp_enabled_tools(session_manager=session_manager)
+        tools = [t for t in tools if not isinstance(t, MCPRemoteTool) and getattr(t, '__name__', '') in new_names]
+
+        for tool_name in old_names:
+            try:
+                mcp.remove_tool(tool_name)
+            except Exception:
+                pass  # was not enabled on this server
+        registered = _register_tools(mcp, tools)
+        total += registered
+        print(f"[MCP] Hot reload of {server_name or 'default'} ({summary}): {len(old_names)} tools removed, {registered} registered", flush=True)
+    return total
+
+
 class APIKeyMiddleware(BaseHTTPMiddleware):
     """Simple bearer-token middleware for API key protected MCP servers."""
 
@@ -298,6 +375,7 @@ class APIKeyMiddleware(BaseHTTPMiddleware):
         self._api_key = api_key
 
     async def dispatch(self, request, call_next):  # type: ignore[override]
+        # Preflight is unauthenticated; /metrics needs the key like everything else
         if request.method == "OPTIONS":
             return await call_next(request)
 
@@ -317,27 +395,22 @@ class APIKeyMiddleware(BaseHTTPMiddleware):
         )
 
 
-def main(argv: List[str]) -> int:
-    """Main entry point for Anthropic-compatible MCP server."""
-    parser = argparse.ArgumentParser(description="Luna MCP server for Anthropic Claude")
-    parser.add_argument("--name", default="Luna MCP", help="MCP server name")
-    parser.add_argument("--server-name", dest="server_name", default=None, help="Server key from master_config.mcp_servers (e.g., 'main')")
-    parser.add_argument("--transport", choices=["sse", "stdio", "http", "streamable-http"], default="streamable-http", help="Transport protocol")
-    parser.add_argument("--host", default="0.0.0.0", help="Host for SSE (0.0.0.0 for network access)")
-    parser.add_argument("--port", type=int, default=8765, help="Port for SSE")
-    parser.add_argument("--api-key", dest="api_key", default=None, help="API key for bearer auth (non-main servers)")
-    args = parser.parse_args(argv)
+def _create_server(server_name: str, api_key: Optional[str] = None, name: str = "Luna MCP") -> Optional[Dict[str, Any]]:
+    """Create the FastMCP instance and auth for one configured MCP server.
 
-    server_name = args.server_name or "main"
+    The 'main' server uses GitHub OAuth, every other server a bearer API key.
+    Returns a dict describing the server, or None (after printing why) when
+    it cannot start.
+    """
     is_main_server = server_name == "main"
-    use_oauth = args.api_key is None
+    use_oauth = api_key is None
 
     if use_oauth and not is_main_server:
         print("[ERROR] Only the 'main' MCP server may use GitHub OAuth. Provide --api-key for other servers.")
-        return 1
+        return None
     if not use_oauth and is_main_server:
         print("[ERROR] The 'main' MCP server must use GitHub OAuth (do not supply --api-key).")
-        return 1
+        return None
 
     public_url_root = os.getenv("PUBLIC_URL", "https://lunahub.dev/api").rstrip('/')
     server_suffix = "" if is_main_server else f"/mcp-{server_name}"
@@ -351,7 +424,7 @@ def main(argv: List[str]) -> int:
     print(f"[MCP] Issuer URL: {issuer_url}")
     print(f"[MCP] OAuth endpoints will be at: {base_url}/authorize, {base_url}/token")
 
-    display_name = args.name if args.name else "Luna MCP"
+    display_name = name if name else "Luna MCP"
     if server_name and display_name == "Luna MCP":
         display_name = f"Luna MCP - {server_name}"
 
@@ -376,7 +449,7 @@ def main(argv: List[str]) -> int:
             print("     MCP_GITHUB_CLIENT_ID=your_mcp_client_id")
             print("     MCP_GITHUB_CLIENT_SECRET=your_mcp_client_secret")
             print("\nNote: This is separate from GITHUB_CLIENT_ID used by Hub UI")
-            return 1
+            return None
 
         if allowed_usernames:
             users_list = ", ".join(sorted(allowed_usernames))
@@ -407,23 +480,37 @@ def main(argv: List[str]) -> int:
             import traceback
             traceback.print_exc()
             print("[ERROR] MCP server cannot start without authentication")
-            return 1
+            return None
     else:
         print("[MCP] API Key authentication enabled")
         print("[MCP] Clients must send: Authorization: Bearer <api_key>")
-        print(f"[MCP] API Key: {args.api_key}")
+        print(f"[MCP] API Key: {api_key}")
         mcp = FastMCP(name=display_name)
 
-    # Initialize remote MCP session manager if configured
+    return {
+        "mcp": mcp,
+        "server_name": server_name,
+        "display_name": display_name,
+        "base_url": base_url,
+        "issuer_url": issuer_url,
+        "use_oauth": use_oauth,
+        "api_key": api_key,
+    }
+
+
+def _init_remote_sessions() -> Tuple[Dict[str, Any], Any]:
+    """Load master_config and connect configured remote MCP servers.
+
+    Returns (master_config, session_manager); session_manager is None when no
+    remote servers are configured or they failed to initialize.
+    """
     session_manager = None
-    master_config = {}
+    master_config: Dict[str, Any] = {}
     try:
-        import json
-        from pathlib import Path
-        master_config_path = Path(PROJECT_ROOT) / 'core' / 'master_config.json'
-        if master_config_path.exists():
-            with open(master_config_path, 'r') as f:
-                master_config = json.load(f)
+        from core.utils.config_store import get_config_store
+        snapshot = get_config_store().snapshot()
+        if snapshot.exists:
+            master_config = snapshot.data
             
             # Check if remote MCP servers are configured
             remote_servers = master_config.get('remote_mcp_servers', {})
@@ -438,13 +525,15 @@ def main(argv: List[str]) -> int:
         print(f"[MCP] Warning: Failed to initialize remote MCP servers: {e}")
         import traceback
         traceback.print_exc()
-    
-    # Load and register MCP-enabled tools (local + remote)
-    print("[MCP] Discovering tools from all sources...", flush=True)
+    return master_config, session_manager
+
+
+def _load_server_tools(mcp: "FastMCP", server_name: Optional[str], master_config: Dict[str, Any], session_manager=None) -> int:
+    """Discover the tools enabled for server_name and register them on mcp."""
     try:
-        if args.server_name:
+        if server_name:
             tools = get_mcp_enabled_tools_for_server(
-                server_name=args.server_name,
+                server_name=server_name,
                 master_config=master_config,
                 session_manager=session_manager,
             )
@@ -456,11 +545,106 @@ def main(argv: List[str]) -> int:
         
         if registered == 0:
             print("[WARNING] No tools registered. Check extension tool_config.json files.", flush=True)
+        return registered
     except Exception as e:
         print(f"[MCP] ERROR during tool discovery/registration: {e}", flush=True)
         import traceback
         traceback.print_exc()
-        registered = 0
+        return 0
+
+
+def _build_app(server: Dict[str, Any], metrics_route: bool = True) -> "Starlette":
+    """ASGI app for one server: the MCP endpoint, its auth and (optionally) /metrics.
+
+    /metrics is behind the same API key as the MCP endpoint. It reports the
+    whole process, so a process hosting several servers leaves it out.
+    """
+    mcp_app = server["mcp"].http_app(path="/mcp")
+    use_oauth = server["use_oauth"]
+
+    well_known_routes = []
+    if use_oauth:
+        print("[MCP] ⚠ OAuth discovery handled by MCP app (no separate well-known routes)")
+
+    mount_path = "/api" if use_oauth else "/"
+    routes = [Route("/metrics", lambda request: metrics.metrics_response())] if metrics_route else []
+    app = Starlette(
+        routes=[
+            *routes,
+            Mount(mount_path, mcp_app),
+            *well_known_routes
+        ],
+        lifespan=getattr(mcp_app, 'lifespan', None)
+    )
+
+    if not use_oauth and server["api_key"]:
+        app.add_middleware(APIKeyMiddleware, api_key=server["api_key"])
+    app.add_middleware(metrics.MetricsMiddleware, service=server["server_name"] or "mcp-server")
+    return app
+
+
+def _print_banner(server: Dict[str, Any], registered: int, url: str, transport_name: str) -> None:
+    base_url = server["base_url"]
+    print(f"\n{'='*60}")
+    print(f"[MCP] {server['display_name']}")
+    print(f"[MCP] {registered} tools registered")
+    print(f"[MCP] Serving via {transport_name} at {url}")
+    print(f"[MCP] MCP Endpoint: {base_url}/mcp")
+    if server["use_oauth"]:
+        print(f"[MCP] OAuth Authorize: {base_url}/authorize")
+        print(f"[MCP] OAuth Discovery: {server['issuer_url']}/.well-known/oauth-authorization-server")
+        print(f"\n[ANTHROPIC] Add to Claude:")
+        print(f"  MCP Server URL: {base_url}/mcp")
+        print(f"  OAuth Provider: GITHUB")
+    else:
+        print(f"[MCP] Authentication: API Key (Bearer)")
+        print(f"[MCP] Required header: Authorization: Bearer {server['api_key']}")
+        print(f"\n[CLIENT SETUP]")
+        print(f"  MCP Server URL: {base_url}/mcp")
+        print("  Header     : Authorization: Bearer <your_api_key>")
+    print(f"{'='*60}\n")
+
+
+def main(argv: List[str]) -> int:
+    """Main entry point for Anthropic-compatible MCP server.
+
+    Serves a single MCP server; the supervisor normally runs all of them in
+    one process with core/utils/mcp_host.py instead.
+    """
+    parser = argparse.ArgumentParser(description="Luna MCP server for Anthropic Claude")
+    parser.add_argument("--name", default="Luna MCP", help="MCP server name")
+    parser.add_argument("--server-name", dest="server_name", default=None, help="Server key from master_config.mcp_servers (e.g., 'main')")
+    parser.add_argument("--transport", choices=["sse", "stdio", "http", "streamable-http"], default="streamable-http", help="Transport protocol")
+    parser.add_argument("--host", default="0.0.0.0", help="Host for SSE (0.0.0.0 for network access)")
+    parser.add_argument("--port", type=int, default=8765, help="Port for SSE")
+    parser.add_argument("--api-key", dest="api_key", default=None, help="API key for bearer auth (non-main servers)")
+    args = parser.parse_args(argv)
+
+    server_name = args.server_name or "main"
+    structured_log.configure(f"mcp-{server_name}")
+    server = _create_server(server_name, args.api_key, args.name)
+    if server is None:
+        return 1
+    mcp = server["mcp"]
+    display_name = server["display_name"]
+    base_url = server["base_url"]
+    use_oauth = server["use_oauth"]
+
+    # Initialize remote MCP session manager if configured
+    master_config, session_manager = _init_remote_sessions()
+    
+    # Load and register MCP-enabled tools (local + remote)
+    print("[MCP] Discovering tools from all sources...", flush=True)
+    if extension_watcher.WATCH_MODE != "off":
+        from core.utils.extension_discovery import track_extensions
+        track_extensions()
+    registered = _load_server_tools(mcp, args.server_name, master_config, session_manager)
+
+    # Re-register only the tools of extensions that change while serving
+    extension_watcher.start_for_service(
+        f"mcp-{server_name}",
+        lambda names: _reload_extension_tools([(mcp, args.server_name)], names, session_manager),
+    )
 
     if args.transport in ["sse", "http", "streamable-http"]:
         url = f"http://{args.host}:{args.port}"
@@ -470,43 +654,8 @@ def main(argv: List[str]) -> int:
         print("[MCP] Using ASGI mounting for subpath support...")
         
         try:
-            mcp_app = mcp.http_app(path="/mcp")
-
-            well_known_routes = []
-            if use_oauth:
-                print("[MCP] ⚠ OAuth discovery handled by MCP app (no separate well-known routes)")
-
-            mount_path = "/api" if use_oauth else "/"
-            app = Starlette(
-                routes=[
-                    Mount(mount_path, mcp_app),
-                    *well_known_routes
-                ],
-                lifespan=getattr(mcp_app, 'lifespan', None)
-            )
-
-            if not use_oauth and args.api_key:
-                app.add_middleware(APIKeyMiddleware, api_key=args.api_key)
-
-            print(f"\n{'='*60}")
-            print(f"[MCP] {display_name}")
-            print(f"[MCP] {registered} tools registered")
-            print(f"[MCP] Serving via {transport_name} at {url}")
-            print(f"[MCP] MCP Endpoint: {base_url}/mcp")
-            if use_oauth:
-                print(f"[MCP] OAuth Authorize: {base_url}/authorize")
-                print(f"[MCP] OAuth Discovery: {issuer_url}/.well-known/oauth-authorization-server")
-                print(f"\n[ANTHROPIC] Add to Claude:")
-                print(f"  MCP Server URL: {base_url}/mcp")
-                print(f"  OAuth Provider: GITHUB")
-            else:
-                print(f"[MCP] Authentication: API Key (Bearer)")
-                print(f"[MCP] Required header: Authorization: Bearer {args.api_key}")
-                print(f"\n[CLIENT SETUP]")
-                print(f"  MCP Server URL: {base_url}/mcp")
-                print("  Header     : Authorization: Bearer <your_api_key>")
-            print(f"{'='*60}\n")
-
+            app = _build_app(server)
+            _print_banner(server, registered, url, transport_name)
             uvicorn.run(app, host=args.host, port=args.port, log_level="info")
 
         except Exception as e:
@@ -0,0 +1,290 @@
+"""In-process metrics with Prometheus text exposition.
+
+A small registry of counters, gauges and histograms (no client library
+needed) rendered by ``render()`` in the text format Prometheus scrapes.
+Services expose it as ``/metrics``; MetricsMiddleware counts HTTP requests and
+latencies, and the shared metrics below are fed by the agents, the MCP server,
+admission control and the DB pool.
+
+Metrics are per process: under the pre-fork agent API each worker reports its
+own series (labelled with ``pid`` via the process collector).
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# A collector returns (name, type, help, [(labels, value), ...]) families at scrape time
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...]) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing value per label set."""
+
+    type_name = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self._labels(k))} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+
+    type_name = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram with _bucket/_sum/_count series."""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def count(self, **labels: Any) -> int:
+        return sum(self._counts.get(self._key(labels), []))
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(c), self._sums.get(k, 0.0)) for k, c in self._counts.items()]
+        lines: List[str] = []
+        for key, counts, total in items:
+            labels = self._labels(key)
+            running = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                running += n
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {running}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {running}")
+        return lines
+
+
+class Registry:
+    """Named metrics plus scrape-time collectors."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, help_text: str, labelnames: Sequence[str], **kwargs) -> Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, labelnames, **kwargs)
+            elif type(metric) is not cls or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"metric {name} already registered with a different type or labels")
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, labelnames)
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def register_collector(self, collector: Callable[[], Iterable[Family]]) -> None:
+        with self._lock:
+            if collector not in self._collectors:
+                self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Everything in Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        lines: List[str] = []
+        for metric in metrics:
+            samples = metric.render()
+            if not samples:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(samples)
+        for collector in collectors:
+            try:
+                families = list(collector())
+            except Exception as exc:  # noqa: BLE001
+                print(f"[Metrics] Collector {getattr(collector, '__name__', collector)} failed: {exc}", flush=True)
+                continue
+            for name, type_name, help_text, samples in families:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {type_name}")
+                lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}" for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+# ---- Shared metrics ----
+HTTP_REQUESTS = REGISTRY.counter("luna_http_requests_total", "HTTP requests served", ("service", "method", "route", "status"))
+HTTP_LATENCY = REGISTRY.histogram("luna_http_request_duration_seconds", "HTTP request latency (until the body is sent)", ("service", "route"))
+AGENT_REQUESTS = REGISTRY.counter("luna_agent_requests_total", "Chat completion requests per model/preset", ("model", "status"))
+AGENT_LATENCY = REGISTRY.histogram("luna_agent_request_duration_seconds", "Chat completion latency per model/preset", ("model",))
+TOOL_CALLS = REGISTRY.counter("luna_tool_calls_total", "Tool calls by outcome (ok, error, timeout)", ("tool", "status"))
+TOOL_LATENCY = REGISTRY.histogram("luna_tool_call_duration_seconds", "Tool call latency", ("tool",))
+LLM_TOKENS = REGISTRY.counter("luna_llm_tokens_total", "LLM tokens by role and type (prompt, completion)", ("role", "type"))
+
+
+def observe_tool(tool: str, seconds: float, status: str = "ok") -> None:
+    """Record one tool call."""
+    TOOL_CALLS.inc(tool=tool, status=status)
+    TOOL_LATENCY.observe(seconds, tool=tool)
+
+
+def record_llm_tokens(role: str, usage: Dict[str, Any]) -> None:
+    """Add token counts from an llm_token_usage() dict."""
+    for key, kind in (("prompt_tokens", "prompt"), ("completion_tokens", "completion")):
+        value = usage.get(key)
+        if isinstance(value, int) and value > 0:
+            LLM_TOKENS.inc(value, role=role, type=kind)
+
+
+def _process_collector() -> Iterable[Family]:
+    yield ("luna_process_start_time_seconds", "gauge", "Process start time (unix seconds)",
+           [({"pid": str(os.getpid())}, _START_TIME)])
+
+
+_START_TIME = time.time()
+REGISTRY.register_collector(_process_collector)
+
+
+# ---- HTTP ----
+def metrics_response() -> Any:
+    """A /metrics response for Starlette/FastAPI routes."""
+    from starlette.responses import Response
+    return Response(render(), media_type=CONTENT_TYPE)
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting requests and latency per route template.
+
+    Chat completion routes can set ``request.state.luna_model`` to also
+    record per-model/preset request counts and latency.
+    """
+
+    def __init__(self, app: Any, service: str):
+        self.app = app
+        self.service = service
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope.get("type") != "http":
+            await self.app(scope, receive, send)
+            return
+        t0 = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_with_status(message: Dict[str, Any]) -> None:
+            if message.get("type") == "http.response.start":
+                status["code"] = int(message.get("status") or 0)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - t0
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            HTTP_REQUESTS.inc(service=self.service, method=scope.get("method", ""), route=route, status=str(status["code"]))
+            HTTP_LATENCY.observe(elapsed, service=self.service, route=route)
+            model = (scope.get("state") or {}).get("luna_model")
+            if model:
+                AGENT_REQUESTS.inc(model=model, status=str(status["code"]))
+                AGENT_LATENCY.observe(elapsed, model=model)
@@ -0,0 +1,235 @@
+"""Pre-fork serving for ASGI apps.
+
+The master process binds the listening socket, runs a preload hook (agent
+imports, tool discovery, warm-up) and then forks workers that inherit the warm
+runtime copy-on-write. Each worker runs its own uvicorn server and event loop
+on the shared socket, so per-worker state (admission queues, caches, sessions)
+is shared-nothing and the kernel spreads connections across workers.
+
+Signals to the master:
+    SIGHUP          re-run the preload hook, then replace workers one at a time
+    SIGTERM/SIGINT  stop workers gracefully and exit
+Workers that die unexpectedly are respawned, after the optional refresh hook
+has brought the master's runtime up to date (e.g. with hot-reloaded
+extensions), so a new worker never starts from stale code.
+"""
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Any, Callable, Dict, Optional
+
+MASTER_PID_ENV = "LUNA_PREFORK_MASTER_PID"
+
+
+def supported() -> bool:
+    """True when this platform can fork workers."""
+    return hasattr(os, "fork")
+
+
+def master_pid() -> Optional[int]:
+    """PID of the pre-fork master when running inside a worker, else None."""
+    try:
+        pid = int(os.environ.get(MASTER_PID_ENV, "") or 0)
+    except ValueError:
+        return None
+    return pid if pid > 0 and pid != os.getpid() else None
+
+
+def request_reload() -> bool:
+    """Ask the master to reload all workers; False when not running pre-forked."""
+    pid = master_pid()
+    if pid is None:
+        return False
+    os.kill(pid, signal.SIGHUP)
+    return True
+
+
+class PreforkServer:
+    """Fork N uvicorn workers from a preloaded master process."""
+
+    def __init__(
+        self,
+        app: Any,
+        host: str,
+        port: int,
+        workers: int,
+        preload: Optional[Callable[[], None]] = None,
+        refresh: Optional[Callable[[], None]] = None,
+        graceful_timeout: float = 30.0,
+        log_level: str = "info",
+        name: str = "Prefork",
+    ):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = max(1, int(workers))
+        self.preload = preload
+        self.refresh = refresh
+        self.graceful_timeout = graceful_timeout
+        self.log_level = log_level
+        self.name = name
+        self._sock: Optional[socket.socket] = None
+        self._workers: Dict[int, float] = {}  # pid -> start time
+        self._retiring: Dict[int, float] = {}  # pid -> kill deadline
+        self._stopping = False
+        self._reload_requested = False
+
+    def _log(self, msg: str) -> None:
+        print(f"[{self.name}] {msg}", flush=True)
+
+    def _bind(self) -> socket.socket:
+        family = socket.AF_INET6 if ":" in self.host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+
+    def _run_preload(self) -> None:
+        if self.preload is None:
+            return
+        t0 = time.perf_counter()
+        self.preload()
+        # Move everything loaded so far out of the collector's reach so that
+        # gc passes in the workers don't touch (and un-share) those pages.
+        gc.collect()
+        gc.freeze()
+        self._log(f"Runtime preloaded in {time.perf_counter() - t0:.2f}s")
+
+    def _run_refresh(self) -> None:
+        if self.refresh is None:
+            return
+        try:
+            self.refresh()
+        except Exception as exc:  # noqa: BLE001
+            self._log(f"Refresh before respawn failed; forking the current runtime: {exc}")
+            return
+        gc.collect()
+        gc.freeze()
+
+    # ---- Workers ----
+    def _spawn(self) -> int:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self._run_worker()
+            except BaseException as exc:  # noqa: BLE001
+                print(f"[{self.name}] Worker {os.getpid()} crashed: {exc}", flush=True)
+                code = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        self._workers[pid] = time.monotonic()
+        return pid
+
+    def _run_worker(self) -> None:
+        import uvicorn
+
+        for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(sig, signal.SIG_DFL)
+        config = uvicorn.Config(self.app, log_level=self.log_level, lifespan="on")
+        server = uvicorn.Server(config)
+        self._log(f"Worker {os.getpid()} serving on {self.host}:{self.port}")
+        server.run(sockets=[self._sock])
+
+    def _retire(self, pid: int) -> None:
+        """Ask a worker to finish in-flight requests and exit."""
+        self._workers.pop(pid, None)
+        self._retiring[pid] = time.monotonic() + self.graceful_timeout
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            self._retiring.pop(pid, None)
+
+    def _reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self._retiring.clear()
+                return
+            if pid == 0:
+                return
+            if self._retiring.pop(pid, None) is not None:
+                continue
+            started = self._workers.pop(pid, None)
+            if started is None or self._stopping:
+                continue
+            self._log(f"Worker {pid} exited unexpectedly (status {status}); respawning")
+            if time.monotonic() - started < 1.0:
+                time.sleep(1.0)  # avoid a tight crash loop
+            self._run_refresh()
+            self._spawn()
+
+    def _kill_stragglers(self) -> None:
+        now = time.monotonic()
+        for pid, deadline in list(self._retiring.items()):
+            if now >= deadline:
+                self._log(f"Worker {pid} did not stop in {self.graceful_timeout:.0f}s; killing")
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    self._retiring.pop(pid, None)
+
+    def _reload(self) -> None:
+        self._log("Reload requested; re-running preload")
+        try:
+            gc.unfreeze()
+            self._run_preload()
+        except Exception as exc:  # noqa: BLE001
+            self._log(f"Preload failed during reload; keeping current workers: {exc}")
+            return
+        # Replace workers one at a time; the shared socket keeps accepting throughout.
+        for pid in list(self._workers):
+            self._spawn()
+            self._retire(pid)
+        self._log(f"Reload complete ({len(self._workers)} worker(s))")
+
+    # ---- Master loop ----
+    def _on_signal(self, signum: int, frame: Any) -> None:
+        if signum == signal.SIGHUP:
+            self._reload_requested = True
+        else:
+            self._stopping = True
+
+    def serve(self) -> None:
+        """Bind, preload, fork the workers and supervise them until stopped."""
+        self._sock = self._bind()
+        os.environ[MASTER_PID_ENV] = str(os.getpid())
+        self._run_preload()
+        for _ in range(self.workers):
+            self._spawn()
+        self._log(f"Master {os.getpid()} running {self.workers} worker(s) on {self.host}:{self.port}")
+
+        signal.signal(signal.SIGHUP, self._on_signal)
+        signal.signal(signal.SIGTERM, self._on_signal)
+        signal.signal(signal.SIGINT, self._on_signal)
+        try:
+            while not self._stopping:
+                if self._reload_requested:
+                    self._reload_requested = False
+                    self._reload()
+                self._reap()
+                self._kill_stragglers()
+                time.sleep(0.2)
+        finally:
+            self._shutdown()
+
+    def _shutdown(self) -> None:
+        self._stopping = True
+        self._log("Stopping workers...")
+        for pid in list(self._workers):
+            self._retire(pid)
+        while self._retiring:
+            self._reap()
+            self._kill_stragglers()
+            time.sleep(0.1)
+        if self._sock is not None:
+            self._sock.close()
+        self._log("Master stopped")
@@ -0,0 +1,293 @@
+"""On-demand CPU profiling for live services.
+
+Three entry points, all off unless configured:
+
+* Per request: with LUNA_PROFILE_REQUESTS=1, ProfilingMiddleware profiles any
+  request carrying ``X-Luna-Profile: sample`` (or ``1``) or
+  ``X-Luna-Profile: cprofile`` and names the output file in the
+  X-Luna-Profile-File response header. When the setting is off the middleware
+  is not installed at all.
+* On demand: ``profile_for(seconds, mode)`` profiles the whole process for a
+  window (the agent API exposes it as ``POST /admin/profile``).
+* Continuous: LUNA_PROFILE_SAMPLER_MS > 0 starts a background stack sampler
+  that writes one profile every LUNA_PROFILE_SAMPLER_FLUSH_S seconds.
+
+Profiles are written to LUNA_PROFILE_DIR (default logs/):
+    *.folded  collapsed stacks, one "frame;frame;frame count" line per stack
+              (flamegraph.pl, inferno, speedscope)
+    *.prof    cProfile/pstats data (snakeviz, ``python -m pstats``)
+
+The sampler sees every thread (event loop and ``asyncio.to_thread`` tool
+workers) but cannot tell concurrent requests apart; cProfile only sees the
+event loop thread. Only one profile runs at a time; overlapping requests are
+served unprofiled.
+"""
+import os
+import re
+import sys
+import time
+import asyncio
+import cProfile
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+REQUESTS_ENABLED = os.getenv("LUNA_PROFILE_REQUESTS", "").strip().lower() in ("1", "true", "yes")
+PROFILE_DIR = Path(os.getenv("LUNA_PROFILE_DIR", "") or PROJECT_ROOT / "logs")
+SAMPLE_INTERVAL_MS = float(os.getenv("LUNA_PROFILE_INTERVAL_MS", "5") or 5)
+SAMPLER_MS = float(os.getenv("LUNA_PROFILE_SAMPLER_MS", "0") or 0)
+SAMPLER_FLUSH_S = float(os.getenv("LUNA_PROFILE_SAMPLER_FLUSH_S", "60") or 60)
+
+PROFILE_HEADER = "X-Luna-Profile"
+PROFILE_FILE_HEADER = "X-Luna-Profile-File"
+MODES = ("sample", "cprofile")
+
+# Leaf frames of threads parked on a lock, queue or selector
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+}
+
+# One profile at a time: cProfile hooks and sampler output would otherwise mix
+_ACTIVE = threading.Lock()
+
+
+def _frame_label(code: Any, cache: Dict[Any, str]) -> str:
+    label = cache.get(code)
+    if label is None:
+        label = cache[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    return label
+
+
+class StackSampler:
+    """Background thread counting collapsed Python stacks of all threads."""
+
+    def __init__(self, interval: Optional[float] = None, include_idle: bool = False):
+        self.interval = (SAMPLE_INTERVAL_MS / 1000.0) if interval is None else interval
+        self.include_idle = include_idle
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self._labels: Dict[Any, str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "StackSampler":
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="luna-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> "StackSampler":
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return self
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.sample(skip=own)
+
+    def sample(self, skip: Optional[int] = None) -> None:
+        """Take one sample of every thread except ``skip``."""
+        names = {t.ident: t.name for t in threading.enumerate()}
+        stacks = []
+        for tid, frame in sys._current_frames().items():
+            if tid == skip:
+                continue
+            code = frame.f_code
+            if not self.include_idle and (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES:
+                continue
+            parts = []
+            while frame is not None:
+                parts.append(_frame_label(frame.f_code, self._labels))
+                frame = frame.f_back
+            parts.append(names.get(tid, f"thread-{tid}"))
+            stacks.append(";".join(reversed(parts)))
+        with self._lock:
+            self.counts.update(stacks)
+            self.samples += 1
+
+    def drain(self) -> Tuple[Counter, int]:
+        """Return and reset the collected counts."""
+        with self._lock:
+            counts, samples = self.counts, self.samples
+            self.counts, self.samples = Counter(), 0
+        return counts, samples
+
+
+def write_folded(counts: Counter, path: Path) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, n in counts.most_common():
+            f.write(f"{stack} {n}\n")
+    return path
+
+
+def profile_path(label: str, mode: str) -> Path:
+    """logs/profile-<time>-<label>-<pid>.<ext>"""
+    slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", label).strip("_")[:60] or "process"
+    now = time.time()
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now)) + f"{int(now * 1000) % 1000:03d}"
+    ext = "prof" if mode == "cprofile" else "folded"
+    return PROFILE_DIR / f"profile-{stamp}-{slug}-{os.getpid()}.{ext}"
+
+
+class _Session:
+    """One sampler or cProfile run writing a single file."""
+
+    def __init__(self, mode: str, label: str):
+        self.mode = mode
+        self.path = profile_path(label, mode)
+        self._sampler: Optional[StackSampler] = None
+        self._profile: Optional[cProfile.Profile] = None
+
+    def start(self) -> None:
+        if self.mode == "cprofile":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler = StackSampler().start()
+
+    def stop(self) -> Dict[str, Any]:
+        if self._profile is not None:
+            self._profile.disable()
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._profile.dump_stats(str(self.path))
+            return {"mode": self.mode, "file": str(self.path)}
+        assert self._sampler is not None
+        counts, samples = self._sampler.stop().drain()
+        write_folded(counts, self.path)
+        return {"mode": self.mode, "file": str(self.path), "samples": samples}
+
+
+def _try_start(mode: str, label: str) -> Optional[_Session]:
+    if not _ACTIVE.acquire(blocking=False):
+        return None
+    try:
+        session = _Session(mode, label)
+        session.start()
+    except Exception:
+        _ACTIVE.release()
+        raise
+    return session
+
+
+def _finish(session: _Session) -> Dict[str, Any]:
+    try:
+        result = session.stop()
+    finally:
+        _ACTIVE.release()
+    print(f"[Profile] Wrote {result['file']}", flush=True)
+    return result
+
+
+async def profile_for(seconds: float, mode: str = "sample", label: str = "window") -> Dict[str, Any]:
+    """Profile the whole process for ``seconds`` and write one profile file.
+
+    Must be awaited on the event loop (cProfile then covers the loop thread).
+    Raises RuntimeError if another profile is already running.
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}")
+    session = _try_start(mode, label)
+    if session is None:
+        raise RuntimeError("a profile is already running")
+    try:
+        await asyncio.sleep(max(0.0, seconds))
+    finally:
+        result = _finish(session)
+    return result
+
+
+def _header_mode(scope: Dict[str, Any]) -> Optional[str]:
+    for key, value in scope.get("headers") or []:
+        if key == b"x-luna-profile":
+            v = value.decode("latin-1").strip().lower()
+            if v in ("1", "true", "yes", "sample"):
+                return "sample"
+            if v == "cprofile":
+                return "cprofile"
+    return None
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling requests that send X-Luna-Profile.
+
+    Install it only when REQUESTS_ENABLED; the profile covers the request until
+    its body (including SSE streams) has been sent.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        mode = _header_mode(scope) if scope.get("type") == "http" else None
+        session = None
+        if mode:
+            try:
+                session = _try_start(mode, f"{scope.get('method', '')}{scope.get('path', '')}")
+            except Exception as exc:  # noqa: BLE001 - e.g. another profiler owns the hooks
+                print(f"[Profile] Could not start {mode} profile: {exc}", flush=True)
+        if session is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_file(message: Dict[str, Any]) -> None:
+            if message.get("type") == "http.response.start":
+                message = dict(message)
+                message["headers"] = list(message.get("headers") or []) + [
+                    (PROFILE_FILE_HEADER.lower().encode("latin-1"), session.path.name.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_file)
+        finally:
+            _finish(session)
+
+
+# ---- Continuous process sampler ----
+_PROCESS_SAMPLER: Optional[StackSampler] = None
+
+
+def start_process_sampler(interval_ms: Optional[float] = None, flush_s: Optional[float] = None) -> bool:
+    """Start the periodic whole-process sampler (LUNA_PROFILE_SAMPLER_MS).
+
+    Returns False when disabled or already running. Call it after forking:
+    the sampler thread does not survive into pre-fork workers.
+    """
+    global _PROCESS_SAMPLER
+    interval_ms = SAMPLER_MS if interval_ms is None else interval_ms
+    flush_s = SAMPLER_FLUSH_S if flush_s is None else flush_s
+    if interval_ms <= 0 or _PROCESS_SAMPLER is not None:
+        return False
+    sampler = _PROCESS_SAMPLER = StackSampler(interval=interval_ms / 1000.0).start()
+
+    def flush_loop() -> None:
+        while sampler._thread is not None:
+            time.sleep(flush_s)
+            counts, samples = sampler.drain()
+            if samples:
+                write_folded(counts, profile_path("sampler", "sample"))
+
+    threading.Thread(target=flush_loop, name="luna-profiler-flush", daemon=True).start()
+    print(f"[Profile] Process sampler every {interval_ms:g}ms, flushing to {PROFILE_DIR} every {flush_s:g}s", flush=True)
+    return True
+
+
+def stop_process_sampler() -> None:
+    global _PROCESS_SAMPLER
+    sampler, _PROCESS_SAMPLER = _PROCESS_SAMPLER, None
+    if sampler is not None:
+        sampler.stop()
+        counts, samples = sampler.drain()
+        if samples:
+            write_folded(counts, profile_path("sampler", "sample"))
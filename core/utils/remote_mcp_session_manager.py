@@ -3,6 +3,7 @@
 Remote MCP Session Manager - Manage persistent connections to remote MCP servers
 """
 import asyncio
+import concurrent.futures
 import json
 import threading
 import time
@@ -18,6 +19,11 @@ except ImportError as e:
         "mcp library required for remote MCP servers. Install with: pip install mcp"
     ) from e
 
+from core.utils.cancellation import current_token
+from core.utils.deadline import timeout_for
+from core.utils import tracing
+from core.utils import structured_log
+
 
 # Global singleton instance for reuse across the application
 _global_session_manager: Optional['RemoteMCPSessionManager'] = None
@@ -92,6 +98,54 @@ class PersistentMCPSession:
             error_msg = getattr(self, '_init_error', 'Timeout waiting for session initialization')
             raise RuntimeError(f"Failed to initialize MCP session for {self._server_id}: {error_msg}")
     
+    async def _call(self, tool_name: str, arguments: dict) -> str:
+        """Run the call on the session's own loop and flatten the result to a string."""
+        try:
+            result = await self._session.call_tool(tool_name, arguments=arguments)
+            
+            # Extract content from result
+            if result.structuredContent:
+                return json.dumps(result.structuredContent, indent=2)
+            elif result.content:
+                parts = []
+                for content in result.content:
+                    if isinstance(content, types.TextContent):
+                        parts.append(content.text)
+                    else:
+                        parts.append(str(content))
+                return "\n".join(parts) if parts else "<no content>"
+            return "<no content>"
+        except Exception as e:
+            raise RuntimeError(f"Failed to call tool {tool_name} on {self._server_id}: {e}") from e
+    
+    async def call_tool_async(self, tool_name: str, arguments: dict) -> str:
+        """Call a tool from another event loop without blocking it.
+        
+        The session lives on its own background loop; the caller awaits the
+        result instead of parking a thread on future.result().
+        """
+        if not self._loop or not self._session:
+            raise RuntimeError(f"Session not initialized for {self._server_id}")
+        
+        with tracing.span("mcp.remote_call", kind="CLIENT", **{"mcp.server": self._server_id, "tool.name": tool_name}):
+            future = asyncio.run_coroutine_threadsafe(self._call(tool_name, arguments), self._loop)
+            token = current_token()
+            unregister = token.on_cancel(future.cancel) if token is not None else None
+            try:
+                # Cancelling the awaited wrapper (timeout or client gone) cancels the remote call too
+                return await asyncio.wait_for(asyncio.wrap_future(future), timeout_for(30))
+            except asyncio.CancelledError:
+                task = asyncio.current_task()
+                if future.cancelled() and task is not None and not task.cancelling():
+                    # Cancelled through the run's token rather than by our caller
+                    raise RuntimeError(f"Tool call {tool_name} on {self._server_id} cancelled") from None
+                raise
+            except asyncio.TimeoutError as e:
+                raise RuntimeError(f"Tool call timeout for {tool_name} on {self._server_id}") from e
+            finally:
+                if unregister is not None:
+                    unregister()
+    
     def call_tool_sync(self, tool_name: str, arguments: dict) -> str:
         """Call a tool synchronously using the persistent session.
         
@@ -105,30 +159,24 @@ class PersistentMCPSession:
         if not self._loop or not self._session:
             raise RuntimeError(f"Session not initialized for {self._server_id}")
         
-        async def call_async():
+        with tracing.span("mcp.remote_call", kind="CLIENT", **{"mcp.server": self._server_id, "tool.name": tool_name}):
+            future = asyncio.run_coroutine_threadsafe(self._call(tool_name, arguments), self._loop)
+            # Abort the remote call if the agent run that issued it is cancelled
+            token = current_token()
+            unregister = token.on_cancel(future.cancel) if token is not None else None
             try:
-                result = await self._session.call_tool(tool_name, arguments=arguments)
-                
-                # Extract content from result
-                if result.structuredContent:
-                    return json.dumps(result.structuredContent, indent=2)
-                elif result.content:
-                    parts = []
-                    for content in result.content:
-                        if isinstance(content, types.TextContent):
-                            parts.append(content.text)
-                        else:
-                            parts.append(str(content))
-                    return "\n".join(parts) if parts else "<no content>"
-                return "<no content>"
+                # Never wait past the request deadline of the run that issued the call
+                return future.result(timeout=timeout_for(30))
+            except concurrent.futures.CancelledError as e:
+                raise RuntimeError(f"Tool call {tool_name} on {self._server_id} cancelled") from e
+            except concurrent.futures.TimeoutError as e:
+                future.cancel()
+                raise RuntimeError(f"Tool call timeout for {tool_name} on {self._server_id}") from e
             except Exception as e:
-                raise RuntimeError(f"Failed to call tool {tool_name} on {self._server_id}: {e}") from e
-        
-        future = asyncio.run_coroutine_threadsafe(call_async(), self._loop)
-        try:
-            return future.result(timeout=30)
-        except Exception as e:
-            raise RuntimeError(f"Tool call timeout or error for {tool_name} on {self._server_id}: {e}") from e
+                raise RuntimeError(f"Tool call timeout or error for {tool_name} on {self._server_id}: {e}") from e
+            finally:
+                if unregister is not None:
+                    unregister()
     
     async def close(self):
         """Close the persistent session."""
@@ -185,16 +233,12 @@ class RemoteMCPSessionManager:
         self._log_dir = Path(log_dir)
         self._log_dir.mkdir(parents=True, exist_ok=True)
         self._log_file = self._log_dir / 'remote_mcp_sessions.log'
+        # Queued and written (with rotation) by the structured_log writer thread
+        self._logger = structured_log.get_logger("remote_mcp", file=self._log_file)
     
     def _log(self, message: str):
         """Write a log message to the log file."""
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        log_line = f"[{timestamp}] {message}\n"
-        try:
-            with open(self._log_file, 'a') as f:
-                f.write(log_line)
-        except Exception as e:
-            print(f"[RemoteMCP] Failed to write log: {e}", flush=True)
+        self._logger.info(message)
     
     def _write_tools_manifest(self):
         """Write comprehensive tools manifest to log."""
@@ -344,6 +388,13 @@ class RemoteMCPSessionManager:
         session = self._sessions[server_id]
         return session.call_tool_sync(tool_name, arguments)
     
+    async def call_tool_async(self, server_id: str, tool_name: str, arguments: dict) -> str:
+        """Async variant of call_tool for callers running on an event loop."""
+        if server_id not in self._sessions:
+            raise ValueError(f"No active session for server: {server_id}")
+        
+        return await self._sessions[server_id].call_tool_async(tool_name, arguments)
+    
     def get_active_servers(self) -> list:
         """Get list of active server IDs.
         
@@ -398,16 +449,12 @@ def get_global_session_manager() -> Optional['RemoteMCPSessionManager']:
         if _global_session_manager is None:
             # Try to initialize from master_config
             try:
-                # Calculate project root from this file's location
-                project_root = Path(__file__).resolve().parents[2]
-                master_config_path = project_root / 'core' / 'master_config.json'
-                
-                if not master_config_path.exists():
+                from core.utils.config_store import get_config_store
+                snapshot = get_config_store().snapshot()
+                if not snapshot.exists:
                     print(f"[RemoteMCP] No master_config.json found, skipping global session manager", flush=True)
                     return None
-                
-                with open(master_config_path, 'r') as f:
-                    master_config = json.load(f)
+                master_config = snapshot.data
                 
                 remote_servers = master_config.get('remote_mcp_servers', {})
                 if not remote_servers:
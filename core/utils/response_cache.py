@@ -0,0 +1,246 @@
+"""Opt-in response cache for the chat completions endpoint.
+
+Automation and voice requests are often exact or near-exact repeats at
+temperature 0. When enabled (LUNA_RESPONSE_CACHE=1) the agent API stores final
+answers keyed by model/preset, normalized prompt, chat history and memory
+version, and serves repeats without running the agent.
+
+Runs that executed UPDATE or ACTION tools are never stored, and they invalidate
+cached answers that read from the same tool domain (the tool name prefix, e.g.
+MEMORY in MEMORY_GET_all). Agents report the tools they run through
+record_tool_call(), so token-streamed runs invalidate too.
+
+The cache is per process. It only sees mutations made by agent runs in the
+same process: not those run by another pre-fork worker (AGENT_API_WORKERS > 1),
+through the MCP servers or by anything else that changes the same data. Enable
+it only where such answers may be up to one TTL (LUNA_RESPONSE_CACHE_TTL,
+LUNA_RESPONSE_CACHE_DOMAIN_TTLS) out of date.
+"""
+import os
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set
+
+DEFAULT_TTL_SECS = 300.0
+DEFAULT_MAX_ENTRIES = 1024
+
+MUTATING_TOOL_TYPES = ("UPDATE", "ACTION")
+
+_WS_RE = re.compile(r"\s+")
+_TRAILING_PUNCT_RE = re.compile(r"[\s?!.,;:]+$")
+
+
+def normalize_prompt(text: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    text = _WS_RE.sub(" ", (text or "").strip().lower())
+    return _TRAILING_PUNCT_RE.sub("", text)
+
+
+def memory_version(memory: Optional[str]) -> str:
+    """Short digest identifying the memory snapshot a response was built from."""
+    return hashlib.sha256((memory or "").encode("utf-8", "replace")).hexdigest()[:16]
+
+
+def tool_domain(tool_name: str) -> str:
+    """Domain prefix of a tool name (MEMORY_GET_all -> MEMORY)."""
+    return (tool_name or "").split("_", 1)[0].upper()
+
+
+def tool_type(tool_name: str) -> str:
+    """Operation type of a tool name (MEMORY_GET_all -> GET)."""
+    parts = (tool_name or "").split("_")
+    return parts[1].upper() if len(parts) > 2 else ""
+
+
+def is_mutating(tool_name: str) -> bool:
+    return tool_type(tool_name) in MUTATING_TOOL_TYPES
+
+
+def _parse_domain_ttls(raw: str) -> Dict[str, float]:
+    """Parse 'WEATHER=600,NOTES=60' into {'WEATHER': 600.0, 'NOTES': 60.0}."""
+    ttls: Dict[str, float] = {}
+    for item in (raw or "").split(","):
+        if "=" not in item:
+            continue
+        name, _, value = item.partition("=")
+        try:
+            ttls[name.strip().upper()] = float(value)
+        except ValueError:
+            continue
+    return ttls
+
+
+@dataclass
+class CachedResponse:
+    """A stored final answer and the tool domains it depended on."""
+    content: str
+    domains: Set[str] = field(default_factory=set)
+    created: float = 0.0
+    expires: float = 0.0
+
+
+class ResponseCache:
+    """TTL + LRU cache of final agent answers."""
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        ttl_secs: Optional[float] = None,
+        domain_ttls: Optional[Dict[str, float]] = None,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        if enabled is None:
+            enabled = os.getenv("LUNA_RESPONSE_CACHE", "").strip().lower() in {"1", "true", "yes", "on"}
+        if ttl_secs is None:
+            ttl_secs = float(os.getenv("LUNA_RESPONSE_CACHE_TTL", str(DEFAULT_TTL_SECS)))
+        if domain_ttls is None:
+            domain_ttls = _parse_domain_ttls(os.getenv("LUNA_RESPONSE_CACHE_DOMAIN_TTLS", ""))
+        self.enabled = bool(enabled)
+        self.ttl_secs = max(0.0, ttl_secs)
+        self.domain_ttls = {k.upper(): v for k, v in domain_ttls.items()}
+        self.max_entries = max(1, max_entries)
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def make_key(
+        self,
+        model_id: str,
+        prompt: str,
+        memory: Optional[str] = None,
+        chat_history: Optional[str] = None,
+    ) -> str:
+        parts = [
+            model_id or "",
+            normalize_prompt(prompt),
+            memory_version(memory),
+            hashlib.sha256((chat_history or "").encode("utf-8", "replace")).hexdigest()[:16],
+        ]
+        return hashlib.sha256("\x00".join(parts).encode("utf-8", "replace")).hexdigest()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def _ttl_for(self, domains: Iterable[str]) -> float:
+        ttl = self.ttl_secs
+        for d in domains:
+            if d in self.domain_ttls:
+                ttl = min(ttl, self.domain_ttls[d])
+        return ttl
+
+    def store(self, key: str, content: str, tool_names: Iterable[str]) -> bool:
+        """Store a final answer unless the run mutated state. Returns True if stored.
+
+        A run that executed UPDATE/ACTION tools invalidates cached answers for the
+        domains it touched instead of being stored.
+        """
+        if not self.enabled:
+            return False
+        names = [n for n in tool_names if n]
+        if self.invalidate_mutations(names):
+            return False
+        domains = {tool_domain(n) for n in names if n != "DIRECT_RESPONSE"}
+        ttl = self._ttl_for(domains)
+        if ttl <= 0:
+            return False
+        now = time.time()
+        with self._lock:
+            self._entries[key] = CachedResponse(content=content, domains=domains, created=now, expires=now + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return True
+
+    def invalidate_mutations(self, tool_names: Iterable[str]) -> bool:
+        """Drop answers for the domains that UPDATE/ACTION tools in tool_names touched.
+
+        For runs whose answer is not stored (streamed, cut short, not
+        cacheable). Returns whether any of the tools mutated.
+        """
+        mutated = {tool_domain(n) for n in tool_names if n and is_mutating(n)}
+        if mutated and self.enabled:
+            self.invalidate_domains(mutated)
+        return bool(mutated)
+
+    def invalidate_domains(self, domains: Iterable[str]) -> int:
+        """Drop cached answers that depended on any of the given tool domains."""
+        wanted = {d.upper() for d in domains}
+        with self._lock:
+            stale = [k for k, e in self._entries.items() if e.domains & wanted]
+            for k in stale:
+                del self._entries[k]
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            size = len(self._entries)
+        return {"enabled": self.enabled, "entries": size, "hits": self.hits, "misses": self.misses}
+
+
+def executed_tool_names(result: object) -> List[str]:
+    """Names of the tools an agent result says it ran (traces, then results)."""
+    names: List[str] = []
+    for item in list(getattr(result, "traces", None) or []) + list(getattr(result, "results", None) or []):
+        name = getattr(item, "tool", None)
+        if name is None and isinstance(item, dict):
+            name = item.get("tool")
+        if isinstance(name, str) and name:
+            names.append(name)
+    return names
+
+
+# Tools run by the request in progress (see start_tool_calls)
+_TOOL_CALLS: ContextVar[Optional[List[str]]] = ContextVar("response_cache_tool_calls", default=None)
+
+
+def start_tool_calls() -> List[str]:
+    """Start collecting the tools agents report in the current context; returns the list.
+
+    Tasks and threads started from this context afterwards report into the
+    same list.
+    """
+    calls: List[str] = []
+    _TOOL_CALLS.set(calls)
+    return calls
+
+
+def record_tool_call(tool_name: str) -> None:
+    """Report a tool an agent ran (a no-op unless start_tool_calls() was called)."""
+    calls = _TOOL_CALLS.get()
+    if calls is not None:
+        calls.append(tool_name)
+
+
+_CACHE: Optional[ResponseCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Process-wide response cache used by the agent API."""
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = ResponseCache()
+        return _CACHE
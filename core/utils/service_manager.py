@@ -87,14 +87,9 @@ class ServiceManager:
         
     def _load_master_config(self) -> Dict[str, Any]:
         """Load master_config.json to check enabled state."""
-        master_config_path = PROJECT_ROOT / 'core' / 'master_config.json'
-        try:
-            if master_config_path.exists():
-                with open(master_config_path, 'r') as f:
-                    return json.load(f)
-        except Exception as e:
-            print(f"[ServiceManager] Warning: Failed to load master_config: {e}", flush=True)
-        return {"extensions": {}}
+        from core.utils.config_store import get_config_store
+        snapshot = get_config_store().snapshot()
+        return snapshot.data if snapshot.exists else {"extensions": {}}
     
     def _is_extension_enabled(self, ext_name: str) -> bool:
         """Check if extension is enabled in master_config."""
@@ -0,0 +1,236 @@
+"""Write-behind persistence for the supervisor's in-memory state.
+
+The supervisor used to rewrite the whole indented state.json on every service
+status change, and master_config.json for every port it assigned, so starting
+N services meant O(N) full-file rewrites. It also raced with the API thread,
+which could read state.json halfway through a write.
+
+Reads are now served from memory. A mutation only marks the store dirty. A
+flusher thread coalesces everything that changed within the debounce window
+into one atomic write (temp file and rename), and checkpoint() flushes right
+away, e.g. before another process needs the file or at shutdown.
+
+Backends:
+    json    (default) the JSON file at the given path, replaced atomically
+    sqlite  a SQLite database next to it (<name>.sqlite3, WAL mode) with one
+            row per top-level key; a flush writes only the keys whose
+            contents changed
+
+Configuration:
+    LUNA_STATE_BACKEND      json | sqlite
+    LUNA_STATE_DEBOUNCE_MS  write-behind delay (default 250)
+"""
+import os
+import time
+import atexit
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Union
+
+from core.utils import fast_json
+
+BACKEND = (os.getenv("LUNA_STATE_BACKEND", "json") or "json").strip().lower()
+DEBOUNCE_S = float(os.getenv("LUNA_STATE_DEBOUNCE_MS", "250") or 250) / 1000.0
+
+
+def _encode(value: Any, indent: Optional[int] = None) -> bytes:
+    """Serialize a value that other threads may be mutating."""
+    for attempt in range(5):
+        try:
+            return fast_json.dumpb(value, indent=indent)
+        except RuntimeError:
+            # "dictionary changed size during iteration" with the stdlib encoder
+            if attempt == 4:
+                raise
+    raise AssertionError("unreachable")
+
+
+class WriteBehind:
+    """Coalesces dirty marks into one persist() call per debounce window."""
+
+    def __init__(self, persist: Callable[[], None], debounce: Optional[float] = None, name: str = "state"):
+        self.persist = persist
+        self.debounce = DEBOUNCE_S if debounce is None else debounce
+        self.name = name
+        self.flushes = 0
+        self._dirty = False
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f"write-behind-{name}", daemon=True)
+        self._thread.start()
+        _OPEN.add(self)
+
+    def mark_dirty(self) -> None:
+        with self._cond:
+            self._dirty = True
+            self._cond.notify_all()
+
+    @property
+    def dirty(self) -> bool:
+        return self._dirty
+
+    def flush(self) -> bool:
+        """Persist now if anything changed; returns whether a write happened."""
+        with self._flush_lock:
+            with self._cond:
+                if not self._dirty:
+                    return False
+                self._dirty = False
+            try:
+                self.persist()
+            except Exception:
+                with self._cond:
+                    self._dirty = True  # retry on the next flush
+                raise
+            self.flushes += 1
+            return True
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._dirty and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+            # One write per window, counted from the first change in it
+            deadline = time.monotonic() + self.debounce
+            with self._cond:
+                while not self._closed and (remaining := deadline - time.monotonic()) > 0:
+                    self._cond.wait(remaining)
+            try:
+                self.flush()
+            except Exception as exc:  # noqa: BLE001
+                print(f"[StateStore] Flush of {self.name} failed: {exc}", flush=True)
+
+    def close(self) -> None:
+        """Flush outstanding changes and stop the flusher thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout=2)
+        try:
+            self.flush()
+        finally:
+            _OPEN.discard(self)
+
+
+_OPEN: "weakref.WeakSet[WriteBehind]" = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_all() -> None:
+    for writer in list(_OPEN):
+        try:
+            writer.flush()
+        except Exception as exc:  # noqa: BLE001
+            print(f"[StateStore] Final flush of {writer.name} failed: {exc}", flush=True)
+
+
+class _JsonBackend:
+    def __init__(self, path: Path):
+        self.path = path
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        try:
+            data = fast_json.read_file(self.path)
+        except (OSError, ValueError):
+            return None
+        return data if isinstance(data, dict) else None
+
+    def save(self, data: Dict[str, Any]) -> None:
+        # Runtime state is rebuilt at startup, so skip the fsync
+        fast_json.write_bytes_atomic(self.path, _encode(data, indent=2) + b"\n", fsync=False)
+
+
+class _SqliteBackend:
+    def __init__(self, path: Path):
+        self.path = path.with_suffix(".sqlite3")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value BLOB NOT NULL)")
+        self._written: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        rows = self._conn.execute("SELECT key, value FROM state").fetchall()
+        if not rows:
+            return None
+        self._written = {key: value.encode() if isinstance(value, str) else bytes(value) for key, value in rows}
+        return {key: fast_json.loads(value) for key, value in self._written.items()}
+
+    def save(self, data: Dict[str, Any]) -> None:
+        encoded = {key: _encode(value) for key, value in list(data.items())}
+        with self._lock:
+            changed = {k: v for k, v in encoded.items() if self._written.get(k) != v}
+            removed = [k for k in self._written if k not in encoded]
+            if not changed and not removed:
+                return
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", list(changed.items()))
+                self._conn.executemany("DELETE FROM state WHERE key = ?", [(k,) for k in removed])
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._written.update(changed)
+            for k in removed:
+                self._written.pop(k, None)
+
+
+class StateStore:
+    """An in-memory dict persisted write-behind to a JSON file or SQLite.
+
+    Callers read and mutate ``store.data`` directly (or inside ``mutate()``)
+    and call mark_dirty() afterwards.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        default: Optional[Dict[str, Any]] = None,
+        backend: Optional[str] = None,
+        debounce: Optional[float] = None,
+        load: bool = True,
+    ):
+        self.path = Path(path)
+        self.backend_name = (backend or BACKEND).lower()
+        self._backend = _SqliteBackend(self.path) if self.backend_name == "sqlite" else _JsonBackend(self.path)
+        loaded = self._backend.load() if load else None
+        self.data: Dict[str, Any] = loaded if loaded is not None else dict(default or {})
+        self._lock = threading.RLock()
+        self._writer = WriteBehind(lambda: self._backend.save(self.data), debounce, name=self.path.name)
+
+    def replace(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Swap in a new state dict (e.g. a fresh state at startup)."""
+        with self._lock:
+            self.data = data
+        self.mark_dirty()
+        return data
+
+    def mark_dirty(self) -> None:
+        self._writer.mark_dirty()
+
+    @contextmanager
+    def mutate(self) -> Iterator[Dict[str, Any]]:
+        """Mutate the state under the store lock; marks it dirty afterwards."""
+        with self._lock:
+            yield self.data
+        self.mark_dirty()
+
+    def checkpoint(self) -> bool:
+        """Flush pending changes now; returns whether anything was written."""
+        return self._writer.flush()
+
+    @property
+    def flushes(self) -> int:
+        return self._writer.flushes
+
+    def close(self) -> None:
+        self._writer.close()
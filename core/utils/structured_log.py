@@ -0,0 +1,320 @@
+"""Non-blocking structured logging for request hot paths.
+
+The MCP tool wrapper, the agent API request handler and the remote MCP session
+manager used to print(..., flush=True) several lines per call, or open and
+append to a file per message. Each synchronous flush is a write() syscall on
+the request path, and concurrent requests serialize on the stdout lock.
+
+Here a call only builds a LogRecord and puts it on a bounded in-memory queue.
+One background thread (a logging.handlers.QueueListener) formats the records
+and writes them:
+- a human-readable line to stdout, which the supervisor already captures in
+  logs/<service>.log (LUNA_LOG_STDOUT=0 turns this off)
+- one JSON object per record to logs/<service>.jsonl, rotated by size. A
+  forked worker writes <service>.<pid>.jsonl so processes never rotate each
+  other's file.
+- loggers created with get_logger(name, file=...) go to their own rotating
+  text file instead (e.g. logs/remote_mcp_sessions.log)
+
+If the queue is full, records are dropped and counted rather than blocking the
+caller. Records logged with sample=True below WARNING are kept with
+probability LUNA_LOG_SAMPLE_RATE. Warnings and errors are always kept.
+
+Services call configure() at startup. A process that logs without doing so
+(a script, a test, or anything logging after shutdown()) gets stdout only: it
+writes a JSONL file only when LUNA_LOG_DIR is set explicitly.
+
+    log = get_logger("mcp.calls", label="MCP CALL")
+    log.info("tool call", sample=True, tool=name, duration_ms=12.5)
+
+Configuration:
+    LUNA_LOG_LEVEL        DEBUG | INFO | WARNING | ERROR (default INFO)
+    LUNA_LOG_SAMPLE_RATE  fraction of sampled records to keep (default 1)
+    LUNA_LOG_STDOUT       1 = also write text lines to stdout (default 1)
+    LUNA_LOG_DIR          directory for JSONL files (default logs/ after configure(); "" = off)
+    LUNA_LOG_MAX_BYTES    rotate files at this size (default 10 MB)
+    LUNA_LOG_BACKUPS      rotated files to keep (default 5)
+    LUNA_LOG_QUEUE_SIZE   records buffered before dropping (default 10000)
+"""
+import os
+import sys
+import time
+import queue
+import atexit
+import random
+import logging
+import threading
+import logging.handlers
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from core.utils import fast_json
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+LEVEL = logging.getLevelName((os.getenv("LUNA_LOG_LEVEL", "INFO") or "INFO").strip().upper())
+if not isinstance(LEVEL, int):
+    LEVEL = logging.INFO
+SAMPLE_RATE = float(os.getenv("LUNA_LOG_SAMPLE_RATE", "1") or 1)
+STDOUT = (os.getenv("LUNA_LOG_STDOUT", "1") or "1").strip().lower() not in ("0", "false", "no", "off")
+_LOG_DIR_ENV = os.getenv("LUNA_LOG_DIR")
+LOG_DIR: Optional[Path] = PROJECT_ROOT / "logs" if _LOG_DIR_ENV is None else (Path(_LOG_DIR_ENV) if _LOG_DIR_ENV.strip() else None)
+MAX_BYTES = int(os.getenv("LUNA_LOG_MAX_BYTES", str(10 * 1024 * 1024)) or 10 * 1024 * 1024)
+BACKUPS = int(os.getenv("LUNA_LOG_BACKUPS", "5") or 5)
+QUEUE_SIZE = int(os.getenv("LUNA_LOG_QUEUE_SIZE", "10000") or 10000)
+
+ROOT_LOGGER = "luna"
+
+
+# ---- Formatters ----
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: ts, level, logger, msg, service, pid and fields."""
+
+    def __init__(self, service: str):
+        super().__init__()
+        self.service = service
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "service": self.service,
+            "pid": record.process,
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return fast_json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """``[label] message key=value ...`` (optionally prefixed with a timestamp)."""
+
+    def __init__(self, timestamps: bool = False, labels: bool = True):
+        super().__init__()
+        self.timestamps = timestamps
+        self.labels = labels
+
+    def format(self, record: logging.LogRecord) -> str:
+        parts = []
+        if self.timestamps:
+            parts.append(time.strftime("[%Y-%m-%d %H:%M:%S]", time.localtime(record.created)))
+        if self.labels:
+            parts.append(f"[{_LABELS.get(record.name) or record.name.partition('.')[2] or record.name}]")
+        if record.levelno >= logging.WARNING:
+            parts.append(f"{record.levelname}:")
+        parts.append(record.getMessage())
+        for key, value in (getattr(record, "fields", None) or {}).items():
+            text = value if isinstance(value, str) else fast_json.dumps(value, default=str)
+            parts.append(f"{key}={text}")
+        line = " ".join(parts)
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+# ---- Queue plumbing ----
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Enqueues without blocking; keeps fields and tracebacks structured."""
+
+    def __init__(self, q: "queue.Queue[logging.LogRecord]"):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message and traceback now; the objects may change before the writer runs
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Fanout(logging.Handler):
+    """Writer-side handler: dedicated file loggers to their file, the rest to the shared sinks."""
+
+    def __init__(self, sinks: List[logging.Handler], dedicated: Dict[str, logging.Handler]):
+        super().__init__()
+        self.sinks = sinks
+        self.dedicated = dedicated
+
+    def emit(self, record: logging.LogRecord) -> None:
+        target = self.dedicated.get(record.name)
+        for handler in [target] if target is not None else self.sinks:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def flush(self) -> None:
+        for handler in [*self.sinks, *self.dedicated.values()]:
+            handler.flush()
+
+    def close(self) -> None:
+        for handler in [*self.sinks, *self.dedicated.values()]:
+            handler.close()
+        super().close()
+
+
+def _rotating(path: Path, formatter: logging.Formatter) -> logging.Handler:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    handler = logging.handlers.RotatingFileHandler(path, maxBytes=MAX_BYTES, backupCount=BACKUPS, encoding="utf-8", delay=True)
+    handler.setFormatter(formatter)
+    return handler
+
+
+# ---- Process-wide setup ----
+_LOCK = threading.RLock()
+_LABELS: Dict[str, str] = {}
+_FILES: Dict[str, Path] = {}
+_STATE: Dict[str, Any] = {"service": None, "options": {}, "handler": None, "listener": None, "fanout": None, "forked": False}
+
+
+def configure(service: str, *, level: Optional[int] = None, stdout: Optional[bool] = None,
+              log_dir: Union[str, Path, None, bool] = True) -> None:
+    """Set up (or redo) this process's logging for service.
+
+    log_dir=True uses LUNA_LOG_DIR / logs/; None or False disables the JSONL
+    file. Safe to call more than once; the last call wins.
+    """
+    with _LOCK:
+        shutdown()
+        stdout = STDOUT if stdout is None else stdout
+        directory = LOG_DIR if log_dir is True else (Path(log_dir) if log_dir else None)
+
+        sinks: List[logging.Handler] = []
+        if stdout:
+            console = logging.StreamHandler(sys.stdout)
+            console.setFormatter(TextFormatter())
+            sinks.append(console)
+        if directory is not None:
+            name = f"{service}.{os.getpid()}.jsonl" if _STATE["forked"] else f"{service}.jsonl"
+            sinks.append(_rotating(directory / name, JsonFormatter(service)))
+        dedicated = {name: _rotating(path, TextFormatter(timestamps=True, labels=False)) for name, path in _FILES.items()}
+
+        q: "queue.Queue[logging.LogRecord]" = queue.Queue(QUEUE_SIZE)
+        fanout = _Fanout(sinks, dedicated)
+        listener = logging.handlers.QueueListener(q, fanout)
+        handler = _QueueHandler(q)
+
+        root = logging.getLogger(ROOT_LOGGER)
+        root.handlers = [handler]
+        root.setLevel(LEVEL if level is None else level)
+        root.propagate = False
+        listener.start()
+        options = {"level": level, "stdout": stdout, "log_dir": log_dir}
+        _STATE.update(service=service, options=options, handler=handler, listener=listener, fanout=fanout)
+
+
+def _ensure_configured() -> None:
+    if _STATE["listener"] is None:
+        with _LOCK:
+            if _STATE["listener"] is None:
+                # Not set up by this process's service (or already shut down):
+                # never create the repo's logs/ behind its back
+                configure(_STATE["service"] or "luna", log_dir=_LOG_DIR_ENV is not None)
+
+
+def shutdown() -> None:
+    """Drain the queue and stop the writer thread (also runs at exit)."""
+    with _LOCK:
+        listener = _STATE.get("listener")
+        if listener is not None:
+            listener.stop()  # processes everything queued before returning
+            _STATE["fanout"].close()
+        _STATE.update(handler=None, listener=None, fanout=None)
+
+
+def flush() -> None:
+    """Wait until everything logged so far has been written."""
+    listener = _STATE.get("listener")
+    if listener is None:
+        return
+    listener.queue.join()
+    _STATE["fanout"].flush()
+
+
+def dropped() -> int:
+    """Records dropped because the queue was full."""
+    handler = _STATE.get("handler")
+    return handler.dropped if handler is not None else 0
+
+
+atexit.register(shutdown)
+
+
+# ---- Loggers ----
+class StructuredLogger:
+    """A logging.Logger front end taking structured fields as keyword arguments."""
+
+    __slots__ = ("logger",)
+
+    def __init__(self, logger: logging.Logger):
+        self.logger = logger
+
+    def is_enabled(self, level: int) -> bool:
+        return self.logger.isEnabledFor(level)
+
+    def log(self, level: int, msg: str, *, sample: bool = False, exc_info: Any = None, **fields: Any) -> None:
+        if not self.logger.isEnabledFor(level):
+            return
+        if sample and level < logging.WARNING and SAMPLE_RATE < 1 and random.random() >= SAMPLE_RATE:
+            return
+        _ensure_configured()
+        self.logger.log(level, msg, exc_info=exc_info, extra={"fields": fields})
+
+    def debug(self, msg: str, **fields: Any) -> None:
+        self.log(logging.DEBUG, msg, **fields)
+
+    def info(self, msg: str, **fields: Any) -> None:
+        self.log(logging.INFO, msg, **fields)
+
+    def warning(self, msg: str, **fields: Any) -> None:
+        self.log(logging.WARNING, msg, **fields)
+
+    def error(self, msg: str, **fields: Any) -> None:
+        self.log(logging.ERROR, msg, **fields)
+
+    def exception(self, msg: str, **fields: Any) -> None:
+        """Error record with the current exception's traceback."""
+        self.log(logging.ERROR, msg, exc_info=True, **fields)
+
+
+def get_logger(name: str, *, label: Optional[str] = None, file: Union[str, Path, None] = None) -> StructuredLogger:
+    """Logger luna.<name>.
+
+    label is the stdout prefix (default: name). With file, this logger's
+    records go only to that rotating text file.
+    """
+    full = f"{ROOT_LOGGER}.{name}"
+    if label:
+        _LABELS[full] = label
+    if file is not None:
+        path = Path(file)
+        with _LOCK:
+            if _FILES.get(full) != path:
+                _FILES[full] = path
+                if _STATE["listener"] is not None:
+                    configure(_STATE["service"], **_STATE["options"])
+    return StructuredLogger(logging.getLogger(full))
+
+
+def _after_fork_in_child() -> None:
+    global _LOCK
+    _LOCK = threading.RLock()
+    _STATE["forked"] = True
+    if _STATE["listener"] is not None:
+        # The writer thread did not survive the fork; start this process's own
+        _STATE.update(handler=None, listener=None, fanout=None)
+        configure(_STATE["service"], **_STATE["options"])
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
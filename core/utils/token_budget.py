@@ -0,0 +1,311 @@
+"""Token budgeting for agent prompts.
+
+Counts tokens locally and splits a fixed prompt budget between the tool schema,
+memory, chat history and review items so long conversations cannot grow the
+planner prompt without bound. History is trimmed oldest-first and oversized
+tool outputs are cut with a pointer back to the full run trace. The tool list
+itself is never cut: only tool descriptions give way, so the planner always
+sees every tool it may call.
+"""
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
+
+# Sections in the order leftover budget is handed out. History comes last, so it
+# is the first section to give up tokens when the prompt is over budget.
+SECTION_PRIORITY = ("schema", "review", "memory", "history")
+
+DEFAULT_SHARES: Dict[str, float] = {
+    "schema": 0.35,
+    "review": 0.20,
+    "memory": 0.15,
+    "history": 0.30,
+}
+
+DEFAULT_TOTAL_TOKENS = 16000
+DEFAULT_TOOL_OUTPUT_TOKENS = 1500
+
+_ENCODER = None
+_ENCODER_LOADED = False
+
+# Counts keyed by a digest of the text, so the cache never keeps large histories alive
+_COUNT_CACHE: "OrderedDict[bytes, int]" = OrderedDict()
+_COUNT_CACHE_SIZE = 512
+_COUNT_LOCK = threading.Lock()
+
+
+def _get_encoder():
+    """Load a tiktoken encoder once; None when unavailable (offline, not installed)."""
+    global _ENCODER, _ENCODER_LOADED
+    if _ENCODER_LOADED:
+        return _ENCODER
+    _ENCODER_LOADED = True
+    if os.getenv("LUNA_TOKENIZER", "").strip().lower() == "heuristic":
+        return None
+    try:
+        import tiktoken
+        _ENCODER = tiktoken.get_encoding("o200k_base")
+    except Exception:
+        _ENCODER = None
+    return _ENCODER
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens in text (tiktoken when available, ~4 chars/token otherwise)."""
+    if not text:
+        return 0
+    key = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+    with _COUNT_LOCK:
+        cached = _COUNT_CACHE.get(key)
+        if cached is not None:
+            _COUNT_CACHE.move_to_end(key)
+            return cached
+    count = _count_tokens(text)
+    with _COUNT_LOCK:
+        _COUNT_CACHE[key] = count
+        if len(_COUNT_CACHE) > _COUNT_CACHE_SIZE:
+            _COUNT_CACHE.popitem(last=False)
+    return count
+
+
+def _count_tokens(text: str) -> int:
+    enc = _get_encoder()
+    if enc is not None:
+        try:
+            return len(enc.encode(text, disallowed_special=()))
+        except Exception:
+            pass
+    return (len(text) + 3) // 4
+
+
+def truncate_text(text: str, max_tokens: int, pointer: Optional[str] = None, tail: bool = False) -> str:
+    """Cut text to roughly max_tokens, adding a marker that says what was dropped.
+
+    Keeps the head and appends the marker; tail=True keeps the end instead,
+    after the marker.
+    """
+    if not text:
+        return text
+    if max_tokens <= 0:
+        return ""
+    total = count_tokens(text)
+    if total <= max_tokens:
+        return text
+    # Scale by characters, then tighten until the kept part fits
+    keep_chars = max(1, int(len(text) * max_tokens / total))
+    kept = text[-keep_chars:] if tail else text[:keep_chars]
+    while keep_chars > 1 and count_tokens(kept) > max_tokens:
+        keep_chars = int(keep_chars * 0.9)
+        kept = text[-keep_chars:] if tail else text[:keep_chars]
+    omitted = total - count_tokens(kept)
+    if tail:
+        marker = f"[truncated {omitted} tokens" + (f"; {pointer}]..." if pointer else "]...")
+        return marker + "\n" + kept.lstrip()
+    marker = f"...[truncated {omitted} tokens"
+    marker += f"; {pointer}]" if pointer else "]"
+    return kept.rstrip() + "\n" + marker
+
+
+def fit_parts(parts: List[str], max_tokens: int, pointer: Optional[str] = None) -> List[str]:
+    """Fit several texts into one allocation, filling them in order."""
+    fitted: List[str] = []
+    remaining = max_tokens
+    for part in parts:
+        cut = truncate_text(part or "", remaining, pointer=pointer)
+        fitted.append(cut)
+        remaining = max(0, remaining - count_tokens(cut))
+    return fitted
+
+
+def _tool_entries(schema: str) -> List[Tuple[str, List[str]]]:
+    """Split a tool list into (signature line, description lines) per tool.
+
+    Lines starting with "- " begin a tool; the lines after it, up to the next
+    tool, are its description.
+    """
+    entries: List[Tuple[str, List[str]]] = []
+    preamble: List[str] = []
+    for line in schema.split("\n"):
+        if line.startswith("- "):
+            entries.append((line, []))
+        elif entries:
+            entries[-1][1].append(line)
+        elif line.strip():
+            preamble.append(line)
+    if preamble:
+        entries.insert(0, ("\n".join(preamble), []))
+    return entries
+
+
+def tool_list_floor(schema: str) -> int:
+    """Tokens the tool list needs with every description dropped."""
+    if not schema:
+        return 0
+    return count_tokens("\n".join(sig for sig, _ in _tool_entries(schema)))
+
+
+def fit_tool_schema(schema: str, max_tokens: int) -> str:
+    """Fit a tool list into max_tokens by dropping tool descriptions, never tools.
+
+    Descriptions are kept in list order while they fit. If the signatures alone
+    exceed max_tokens they are all returned anyway.
+    """
+    if not schema or count_tokens(schema) <= max_tokens:
+        return schema
+    entries = _tool_entries(schema)
+    used = tool_list_floor(schema)
+    lines: List[str] = []
+    omitted = 0
+    for signature, description in entries:
+        lines.append(signature)
+        text = "\n".join(line for line in description if line.strip())
+        if not text:
+            continue
+        cost = count_tokens(text) + 1
+        if used + cost <= max_tokens:
+            lines.append(text)
+            used += cost
+        else:
+            omitted += 1
+    if omitted:
+        lines.append(f"[descriptions of {omitted} tools omitted]")
+    return "\n".join(lines)
+
+
+def trim_history(history: Optional[str], max_tokens: int) -> str:
+    """Drop the oldest history lines until the rest fits in max_tokens."""
+    if not history:
+        return ""
+    if count_tokens(history) <= max_tokens:
+        return history
+    lines = history.split("\n")
+    kept: List[str] = []
+    used = 0
+    for line in reversed(lines):
+        cost = count_tokens(line) + 1
+        if used + cost > max_tokens:
+            break
+        kept.append(line)
+        used += cost
+    dropped = len(lines) - len(kept)
+    if not kept and lines:
+        # Even the newest line is too long; keep its tail, where the latest turn ends
+        newest = lines[-1]
+        return f"[{dropped - 1} earlier lines omitted]\n" + truncate_text(newest, max_tokens, tail=True)
+    kept.reverse()
+    return f"[{dropped} earlier lines omitted]\n" + "\n".join(kept)
+
+
+class ContextBudget:
+    """Allocates a prompt token budget among schema, memory, history and review items."""
+
+    def __init__(
+        self,
+        total_tokens: Optional[int] = None,
+        shares: Optional[Dict[str, float]] = None,
+        tool_output_tokens: Optional[int] = None,
+    ):
+        if total_tokens is None:
+            total_tokens = int(os.getenv("LUNA_CONTEXT_TOKEN_BUDGET", str(DEFAULT_TOTAL_TOKENS)) or 0)
+        if tool_output_tokens is None:
+            tool_output_tokens = int(os.getenv("LUNA_TOOL_OUTPUT_MAX_TOKENS", str(DEFAULT_TOOL_OUTPUT_TOKENS)) or 0)
+        self.total_tokens = max(0, total_tokens)
+        self.shares = dict(shares or DEFAULT_SHARES)
+        self.tool_output_tokens = max(0, tool_output_tokens)
+
+    @property
+    def enabled(self) -> bool:
+        """A budget of 0 disables trimming entirely."""
+        return self.total_tokens > 0
+
+    def allocate(self, demands: Dict[str, int]) -> Dict[str, int]:
+        """Split the budget given each section's token demand.
+
+        Every section first gets min(demand, share of total). Tokens left unused by
+        small sections are then handed out in SECTION_PRIORITY order.
+        """
+        if not self.enabled:
+            return dict(demands)
+        alloc: Dict[str, int] = {}
+        for name in SECTION_PRIORITY:
+            cap = int(self.total_tokens * self.shares.get(name, 0.0))
+            alloc[name] = min(demands.get(name, 0), cap)
+        leftover = self.total_tokens - sum(alloc.values())
+        for name in SECTION_PRIORITY:
+            if leftover <= 0:
+                break
+            extra = min(demands.get(name, 0) - alloc[name], leftover)
+            if extra > 0:
+                alloc[name] += extra
+                leftover -= extra
+        return alloc
+
+    def fit_tool_output(self, text: str, tool: str) -> str:
+        """Truncate a single tool output to the per-item cap."""
+        if not self.tool_output_tokens:
+            return text
+        return truncate_text(text, self.tool_output_tokens, pointer=f"full {tool} output is in the run trace")
+
+    def fit(
+        self,
+        schema: Union[str, List[str]] = "",
+        memory: Optional[str] = None,
+        history: Optional[str] = None,
+        review_texts: Optional[List[str]] = None,
+    ) -> Dict[str, object]:
+        """Return the sections trimmed to their allocations.
+
+        ``schema`` may be a list of parts: the tool list, then e.g. domain
+        prompts. They share one allocation. The tool list always keeps every
+        tool (only descriptions are dropped), taking tokens from the other
+        sections if it must; later parts are cut to what is left. Returns a dict
+        with 'schema' (same shape as the input), 'memory', 'history',
+        'review_texts' (same order as the input) and 'allocation'.
+        """
+        schema_parts = [schema or ""] if isinstance(schema, str) else [p or "" for p in schema]
+        review_texts = list(review_texts or [])
+        demands = {
+            "schema": sum(count_tokens(p) for p in schema_parts),
+            "memory": count_tokens(memory or ""),
+            "history": count_tokens(history or ""),
+            "review": sum(count_tokens(t or "") for t in review_texts),
+        }
+        alloc = self.allocate(demands)
+        floor = tool_list_floor(schema_parts[0])
+        if self.enabled and alloc["schema"] < floor:
+            # Every tool stays listed; the other sections give way, history first
+            deficit = floor - alloc["schema"]
+            alloc["schema"] = floor
+            for name in reversed(SECTION_PRIORITY):
+                if name == "schema" or deficit <= 0:
+                    continue
+                taken = min(alloc[name], deficit)
+                alloc[name] -= taken
+                deficit -= taken
+        if not self.enabled:
+            return {
+                "schema": schema if isinstance(schema, list) else (schema or ""),
+                "memory": memory or "",
+                "history": history or "",
+                "review_texts": review_texts,
+                "allocation": alloc,
+            }
+
+        fitted_review: List[str] = []
+        if review_texts:
+            per_item = max(1, alloc["review"] // len(review_texts))
+            for text in review_texts:
+                fitted_review.append(truncate_text(text or "", per_item, pointer="full output is in the run trace"))
+
+        tool_schema = fit_tool_schema(schema_parts[0], alloc["schema"])
+        rest = fit_parts(schema_parts[1:], max(0, alloc["schema"] - count_tokens(tool_schema)), pointer="remaining descriptions omitted")
+        fitted_schema = [tool_schema, *rest]
+        return {
+            "schema": fitted_schema if isinstance(schema, list) else fitted_schema[0],
+            "memory": truncate_text(memory or "", alloc["memory"], pointer="remaining memories omitted"),
+            "history": trim_history(history, alloc["history"]),
+            "review_texts": fitted_review,
+            "allocation": alloc,
+        }
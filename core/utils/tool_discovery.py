@@ -3,7 +3,6 @@
 Tool Discovery - Centralized tool loading from all sources
 Loads tools from local extensions, remote MCP servers, and future sources
 """
-import json
 import sys
 from pathlib import Path
 from typing import Dict, List, Any, Callable, Union, Optional
@@ -14,6 +13,8 @@ if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
 from core.utils.extension_discovery import discover_extensions, get_mcp_tools
+from core.utils.tool_manifest import list_extension_tools
+from core.utils.config_store import get_config_store
 
 
 class MCPRemoteTool:
@@ -55,6 +56,13 @@ class MCPRemoteTool:
         
         return self._session_manager.call_tool(self._server_id, self._tool_name, kwargs)
     
+    async def acall(self, **kwargs) -> str:
+        """Call the remote tool without blocking the caller's event loop."""
+        if not self._session_manager:
+            raise RuntimeError(f"No session manager available for remote tool {self._tool_name}")
+        
+        return await self._session_manager.call_tool_async(self._server_id, self._tool_name, kwargs)
+    
     def __repr__(self):
         return f"<MCPRemoteTool {self._server_id}.{self._tool_name}>"
 
@@ -93,19 +101,12 @@ def get_all_tools() -> Dict[str, Any]:
             ]
         }
     """
-    # Load master_config
-    master_config_path = PROJECT_ROOT / 'core' / 'master_config.json'
-    master_config = {}
-    try:
-        if master_config_path.exists():
-            with open(master_config_path, 'r') as f:
-                master_config = json.load(f)
-    except Exception as e:
-        print(f"[ToolDiscovery] Warning: Failed to load master_config: {e}", flush=True)
+    # Load master_config (cached snapshot; re-read only when the file changes)
+    master_config = get_config_store().get()
     
-    # Get local extension tools
+    # Get local extension tools (from the static manifest; nothing is imported)
     extensions_data = []
-    discovered_exts = discover_extensions()
+    discovered_exts = list_extension_tools()
     
     for ext in discovered_exts:
         ext_name = ext.get('name', '')
@@ -119,7 +120,7 @@ def get_all_tools() -> Dict[str, Any]:
         # Build tool list with configs
         tools_list = []
         for tool in tools:
-            tool_name = getattr(tool, '__name__', 'unknown')
+            tool_name = tool['name']
             tool_config = tool_configs.get(tool_name, {})
             
             # Also check master_config.tool_configs
@@ -132,7 +133,7 @@ def get_all_tools() -> Dict[str, Any]:
                 'name': tool_name,
                 'enabled_in_mcp': merged_config.get('enabled_in_mcp', False),
                 'passthrough': merged_config.get('passthrough', False),
-                'docstring': getattr(tool, '__doc__', '')
+                'docstring': tool.get('doc', '')
             })
         
         if tools_list:  # Only include extensions with tools
@@ -188,13 +189,9 @@ def get_mcp_enabled_tools(session_manager=None) -> List[Union[Callable, MCPRemot
     
     # Get remote MCP tools if session manager provided
     if session_manager:
-        # Load master_config
-        master_config_path = PROJECT_ROOT / 'core' / 'master_config.json'
         try:
-            if master_config_path.exists():
-                with open(master_config_path, 'r') as f:
-                    master_config = json.load(f)
-                    
+            master_config = get_config_store().snapshot()
+            if master_config.exists:
                 remote_servers = master_config.get('remote_mcp_servers', {})
                 
                 for server_id, server_config in remote_servers.items():
@@ -254,14 +251,7 @@ def get_mcp_enabled_tools_for_server(
     
     # Resolve master_config
     if master_config is None:
-        master_config_path = PROJECT_ROOT / 'core' / 'master_config.json'
-        try:
-            if master_config_path.exists():
-                with open(master_config_path, 'r') as f:
-                    master_config = json.load(f)
-        except Exception as e:  # noqa: BLE001
-            print(f"[ToolDiscovery] Warning: Failed to load master_config: {e}", flush=True)
-            master_config = {}
+        master_config = get_config_store().get()
 
     server_cfg = (master_config or {}).get('mcp_servers', {}).get(server_name, {})
     per_server_tool_cfg: Dict[str, Dict[str, Any]] = server_cfg.get('tool_config', {}) or {}
@@ -0,0 +1,135 @@
+"""Off-loop, concurrency-limited tool execution for the MCP server.
+
+FastMCP calls a plain sync tool function directly on its event loop, so one
+slow local tool, or a remote MCP tool blocking on its future, held up every
+other request to that server (and with the MCP host, to every server). Tools
+are registered through ``offload()`` instead, which returns an async function
+with the same name, docstring and signature. That function:
+
+- waits for a slot in the tool's own limit (LUNA_MCP_TOOL_CONCURRENCY, with
+  per-tool overrides in LUNA_MCP_TOOL_LIMITS="slow_tool=1,search=8")
+- runs a sync tool on a shared bounded thread pool (LUNA_MCP_TOOL_WORKERS)
+  with the caller's context variables, so traces and deadlines carry over,
+  or awaits an async tool (e.g. the async path of remote MCP tools) directly
+- fails with ToolTimeout after LUNA_MCP_TOOL_TIMEOUT_S (0 = no limit),
+  counting the wait for a slot
+
+A thread cannot be killed. A timed-out sync call therefore keeps its
+concurrency slot until it actually returns, so a wedged tool cannot pile
+up threads in the pool.
+"""
+import os
+import asyncio
+import functools
+import inspect
+import threading
+import weakref
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+DEFAULT_CONCURRENCY = int(os.getenv("LUNA_MCP_TOOL_CONCURRENCY", "4") or 4)
+TIMEOUT_S = float(os.getenv("LUNA_MCP_TOOL_TIMEOUT_S", "120") or 0)
+WORKERS = int(os.getenv("LUNA_MCP_TOOL_WORKERS", "32") or 32)
+
+
+def _parse_limits(spec: str) -> Dict[str, int]:
+    limits: Dict[str, int] = {}
+    for item in (spec or "").split(","):
+        name, _, value = item.partition("=")
+        if name.strip() and value.strip().isdigit():
+            limits[name.strip()] = max(1, int(value))
+    return limits
+
+
+TOOL_LIMITS = _parse_limits(os.getenv("LUNA_MCP_TOOL_LIMITS", ""))
+
+
+class ToolTimeout(RuntimeError):
+    """A tool call did not finish within its timeout."""
+
+
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_EXECUTOR_LOCK = threading.Lock()
+# Semaphores belong to one event loop: {loop: {tool_name: semaphore}}
+_LIMITERS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """The shared thread pool that sync tools run on."""
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        with _EXECUTOR_LOCK:
+            if _EXECUTOR is None:
+                _EXECUTOR = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="mcp-tool")
+    return _EXECUTOR
+
+
+def limit_for(tool_name: str) -> int:
+    return TOOL_LIMITS.get(tool_name, DEFAULT_CONCURRENCY)
+
+
+def _limiter(tool_name: str) -> asyncio.Semaphore:
+    per_loop = _LIMITERS.setdefault(asyncio.get_running_loop(), {})
+    sem = per_loop.get(tool_name)
+    if sem is None:
+        sem = per_loop[tool_name] = asyncio.Semaphore(limit_for(tool_name))
+    return sem
+
+
+async def run_tool(
+    fn: Callable[..., Any],
+    args: Tuple[Any, ...],
+    kwargs: Dict[str, Any],
+    tool_name: str,
+    timeout: Optional[float] = None,
+) -> Any:
+    """Call fn(*args, **kwargs) under tool_name's concurrency limit and timeout."""
+    timeout = TIMEOUT_S if timeout is None else timeout
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout if timeout > 0 else None
+
+    def remaining() -> Optional[float]:
+        return None if deadline is None else max(0.0, deadline - loop.time())
+
+    sem = _limiter(tool_name)
+    try:
+        await asyncio.wait_for(sem.acquire(), remaining())
+    except asyncio.TimeoutError:
+        raise ToolTimeout(f"Tool {tool_name} timed out after {timeout:g}s waiting for a free slot") from None
+
+    if inspect.iscoroutinefunction(fn):
+        try:
+            return await asyncio.wait_for(fn(*args, **kwargs), remaining())
+        except asyncio.TimeoutError:
+            raise ToolTimeout(f"Tool {tool_name} timed out after {timeout:g}s") from None
+        finally:
+            sem.release()
+
+    ctx = contextvars.copy_context()
+    try:
+        future = loop.run_in_executor(get_executor(), functools.partial(ctx.run, fn, *args, **kwargs))
+    except BaseException:
+        sem.release()
+        raise
+    # The slot frees when the thread is done, not when the caller gives up
+    future.add_done_callback(lambda _: sem.release())
+    try:
+        return await asyncio.wait_for(asyncio.shield(future), remaining())
+    except asyncio.TimeoutError:
+        raise ToolTimeout(f"Tool {tool_name} timed out after {timeout:g}s") from None
+
+
+def offload(fn: Callable[..., Any], tool_name: Optional[str] = None, timeout: Optional[float] = None) -> Callable[..., Awaitable[Any]]:
+    """Async wrapper for fn that FastMCP can register in its place.
+
+    Name, docstring and signature (via __wrapped__) are those of fn, so the
+    tool's schema does not change.
+    """
+    name = tool_name or getattr(fn, "__name__", "tool")
+
+    @functools.wraps(fn)
+    async def tool(*args: Any, **kwargs: Any) -> Any:
+        return await run_tool(fn, args, kwargs, name, timeout)
+
+    return tool
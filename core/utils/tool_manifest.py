@@ -0,0 +1,426 @@
+"""Static tool manifest for extensions.
+
+Listing tools used to import every ``*_tools.py`` (and with it pandas-sized
+extension dependencies) just to read names and docstrings. The manifest
+instead reads each tools module with ``ast``: the ``TOOLS`` list, every tool's
+signature and docstring, and ``SYSTEM_PROMPT``. Only modules that cannot be
+read statically (a computed TOOLS list, a callable SYSTEM_PROMPT, tools
+defined in another module) are imported, and then in a short-lived
+subprocess so the caller never loads their dependencies.
+
+Entries are persisted to ``.luna/tool_manifest.json`` keyed by the SHA-256 of
+each tools file; a file whose size and mtime are unchanged is not even
+re-hashed, so listing tools costs a few ``stat`` calls.
+
+Each tool entry looks like::
+
+    {"name": "MEMORY_GET_all", "doc": "...", "summary": "first doc line",
+     "params": [{"name": "x", "annotation": "str", "default": None,
+                 "required": True, "kind": "POSITIONAL_OR_KEYWORD"}]}
+"""
+import os
+import sys
+import ast
+import glob
+import hashlib
+import inspect
+import subprocess
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Ensure project root is on path
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from core.utils import fast_json
+
+MANIFEST_VERSION = 4
+IMPORT_TIMEOUT_S = float(os.getenv("LUNA_TOOL_MANIFEST_IMPORT_TIMEOUT", "60") or 60)
+
+_LOCK = threading.Lock()
+# manifest path -> loaded manifest dict
+_CACHE: Dict[str, Dict[str, Any]] = {}
+
+
+class _NotStatic(Exception):
+    """The module needs to be imported to be described."""
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _summary(doc: str) -> str:
+    return doc.strip().split("\n")[0].strip() if doc else ""
+
+
+_NO_VALUE = object()
+
+
+def _json_literal(value: Any) -> Any:
+    """value if it survives a JSON round trip unchanged, else _NO_VALUE."""
+    try:
+        return value if fast_json.loads(fast_json.dumps(value)) == value else _NO_VALUE
+    except Exception:
+        return _NO_VALUE
+
+
+def _default_fields(node: Optional[ast.AST]) -> Dict[str, Any]:
+    """"default" as str() of the value (like str(inspect.Parameter.default)),
+    plus "value" when the default is a JSON literal a proxy can reuse."""
+    if node is None:
+        return {"default": None}
+    try:
+        value = ast.literal_eval(node)
+    except Exception:
+        return {"default": ast.unparse(node)}
+    fields: Dict[str, Any] = {"default": str(value)}
+    if _json_literal(value) is not _NO_VALUE:
+        fields["value"] = value
+    return fields
+
+
+def _static_params(fn: ast.AST) -> List[Dict[str, Any]]:
+    args = fn.args  # type: ignore[attr-defined]
+    params: List[Dict[str, Any]] = []
+
+    def add(arg: ast.arg, kind: str, default: Optional[ast.AST]) -> None:
+        params.append({
+            "name": arg.arg,
+            "annotation": ast.unparse(arg.annotation) if arg.annotation is not None else None,
+            **_default_fields(default),
+            "required": default is None and kind in ("POSITIONAL_ONLY", "POSITIONAL_OR_KEYWORD", "KEYWORD_ONLY"),
+            "kind": kind,
+        })
+
+    positional = list(args.posonlyargs) + list(args.args)
+    defaults: List[Optional[ast.AST]] = [None] * (len(positional) - len(args.defaults)) + list(args.defaults)
+    for i, (arg, default) in enumerate(zip(positional, defaults)):
+        add(arg, "POSITIONAL_ONLY" if i < len(args.posonlyargs) else "POSITIONAL_OR_KEYWORD", default)
+    if args.vararg:
+        add(args.vararg, "VAR_POSITIONAL", None)
+    for arg, default in zip(args.kwonlyargs, args.kw_defaults):
+        add(arg, "KEYWORD_ONLY", default)
+    if args.kwarg:
+        add(args.kwarg, "VAR_KEYWORD", None)
+    return params
+
+
+def _tools_mentions(tree: ast.AST) -> Tuple[int, bool]:
+    """(assignments to TOOLS anywhere, whether anything else might define it)."""
+    stores = 0
+    dynamic = False
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id == "TOOLS" and isinstance(node.ctx, (ast.Store, ast.Del)):
+            stores += 1
+        elif isinstance(node, ast.Global) and "TOOLS" in node.names:
+            dynamic = True
+        elif isinstance(node, ast.ImportFrom) and any(a.name == "*" or (a.asname or a.name) == "TOOLS" for a in node.names):
+            dynamic = True
+        elif isinstance(node, ast.Constant) and node.value == "TOOLS":
+            dynamic = True  # globals()["TOOLS"] = ..., setattr(module, "TOOLS", ...)
+        elif isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) and node.value.id == "TOOLS":
+            dynamic = dynamic or isinstance(node.ctx, (ast.Store, ast.Del))
+        elif (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+              and isinstance(node.func.value, ast.Name) and node.func.value.id == "TOOLS"):
+            dynamic = True  # TOOLS.append(...) anywhere, e.g. under an if
+    return stores, dynamic
+
+
+def _read_static(path: str) -> Tuple[List[Dict[str, Any]], str]:
+    """Describe a tools module from its source; raise _NotStatic if it can't."""
+    with open(path, "r", encoding="utf-8") as f:
+        source = f.read()
+    try:
+        tree = ast.parse(source, filename=path)
+    except SyntaxError as exc:
+        raise _NotStatic(f"syntax error: {exc}")
+
+    functions: Dict[str, ast.AST] = {}
+    tools_node: Optional[ast.AST] = None
+    prompt = ""
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            functions[node.name] = node
+            if node.name in ("TOOLS", "SYSTEM_PROMPT"):
+                raise _NotStatic(f"{node.name} is a function")
+            continue
+        targets: List[ast.AST] = []
+        value: Optional[ast.AST] = None
+        if isinstance(node, ast.Assign):
+            targets, value = node.targets, node.value
+        elif isinstance(node, ast.AnnAssign):
+            targets, value = [node.target], node.value
+        elif isinstance(node, ast.AugAssign):
+            targets = [node.target]
+        names = {t.id for t in targets if isinstance(t, ast.Name)}
+        if "TOOLS" in names:
+            if not isinstance(node, (ast.Assign, ast.AnnAssign)) or tools_node is not None:
+                raise _NotStatic("TOOLS is built incrementally")
+            tools_node = value
+        if "SYSTEM_PROMPT" in names:
+            try:
+                prompt = ast.literal_eval(value) if value is not None else ""
+            except Exception:
+                raise _NotStatic("SYSTEM_PROMPT is not a literal")
+            if not isinstance(prompt, str):
+                raise _NotStatic("SYSTEM_PROMPT is not a string")
+        # TOOLS.append(...) / TOOLS.extend(...) at module level
+        if isinstance(node, ast.Expr) and isinstance(node.value, ast.Call):
+            func = node.value.func
+            if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id == "TOOLS":
+                raise _NotStatic("TOOLS is mutated")
+
+    # TOOLS set inside if/try/functions, imported or built dynamically: only an
+    # import can tell what it ends up as (reading no tools would hide them all)
+    stores, dynamic = _tools_mentions(tree)
+    if dynamic or stores > (1 if tools_node is not None else 0):
+        raise _NotStatic("TOOLS is not a single module-level assignment")
+
+    tools: List[Dict[str, Any]] = []
+    if tools_node is not None:
+        if not isinstance(tools_node, ast.List):
+            raise _NotStatic("TOOLS is not a list literal")
+        for elt in tools_node.elts:
+            if not isinstance(elt, ast.Name) or elt.id not in functions:
+                raise _NotStatic("TOOLS references something not defined in the module")
+            fn = functions[elt.id]
+            if fn.decorator_list:  # type: ignore[attr-defined]
+                # A decorator can rename the tool or change its signature and doc
+                raise _NotStatic(f"{elt.id} is decorated")
+            doc = ast.get_docstring(fn, clean=True) or ""  # type: ignore[arg-type]
+            tools.append({
+                "name": elt.id,
+                "doc": doc,
+                "summary": _summary(doc),
+                "params": _static_params(fn),
+                "async": isinstance(fn, ast.AsyncFunctionDef),
+            })
+    return tools, prompt.strip()
+
+
+def _describe_imported(path: str) -> Dict[str, Any]:
+    """Describe a tools module by importing it (runs in the helper subprocess)."""
+    from core.utils.extension_discovery import _load_tool_module, _collect_module_exports
+
+    module = _load_tool_module(path, os.path.dirname(path))
+    if module is None:
+        raise RuntimeError(f"cannot load {path}")
+    tools, prompt = _collect_module_exports(module)
+    entries = []
+    for tool in tools:
+        doc = inspect.cleandoc(getattr(tool, "__doc__", "") or "")
+        params: List[Dict[str, Any]] = []
+        try:
+            for p in inspect.signature(tool).parameters.values():
+                annotation = p.annotation
+                if annotation is inspect.Parameter.empty:
+                    annotation_str = None
+                elif isinstance(annotation, str):
+                    annotation_str = annotation
+                else:
+                    annotation_str = getattr(annotation, "__name__", None) if isinstance(annotation, type) else None
+                    annotation_str = annotation_str or str(annotation).replace("typing.", "")
+                param: Dict[str, Any] = {
+                    "name": p.name,
+                    "annotation": annotation_str,
+                    "default": None if p.default is inspect.Parameter.empty else str(p.default),
+                    "required": p.default is inspect.Parameter.empty and p.kind not in (p.VAR_POSITIONAL, p.VAR_KEYWORD),
+                    "kind": p.kind.name,
+                }
+                if p.default is not inspect.Parameter.empty and _json_literal(p.default) is not _NO_VALUE:
+                    param["value"] = p.default
+                params.append(param)
+        except (TypeError, ValueError):
+            pass
+        entries.append({
+            "name": getattr(tool, "__name__", "unknown"),
+            "doc": doc,
+            "summary": _summary(doc),
+            "params": params,
+            "async": inspect.iscoroutinefunction(tool),
+        })
+    return {"tools": entries, "system_prompt": prompt}
+
+
+def _read_imported(path: str) -> Tuple[List[Dict[str, Any]], str]:
+    """Import the module in a subprocess and return its description."""
+    proc = subprocess.run(
+        [sys.executable, "-m", "core.utils.tool_manifest", "--describe", path],
+        cwd=str(PROJECT_ROOT),
+        capture_output=True,
+        text=True,
+        timeout=IMPORT_TIMEOUT_S,
+    )
+    # The module may print while importing; the description is the last line
+    lines = [line for line in proc.stdout.splitlines() if line.strip()]
+    if proc.returncode != 0 or not lines:
+        detail = (proc.stderr or proc.stdout).strip().splitlines()[-1:] or [f"exit code {proc.returncode}"]
+        raise RuntimeError(detail[0])
+    data = fast_json.loads(lines[-1])
+    return data["tools"], data["system_prompt"]
+
+
+def _describe_file(path: str, digest: str, st: os.stat_result) -> Dict[str, Any]:
+    entry: Dict[str, Any] = {"sha256": digest, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    try:
+        tools, prompt = _read_static(path)
+        entry.update(source="ast", tools=tools, system_prompt=prompt)
+    except _NotStatic as reason:
+        try:
+            tools, prompt = _read_imported(path)
+            entry.update(source="import", tools=tools, system_prompt=prompt, reason=str(reason))
+        except Exception as exc:  # noqa: BLE001
+            print(f"[ToolManifest] Failed to describe {path} ({reason}): {exc}", flush=True)
+            entry.update(source="error", tools=[], system_prompt="", error=str(exc))
+    return entry
+
+
+def manifest_path(tool_root: str) -> Optional[Path]:
+    """<repo>/.luna/tool_manifest.json for <repo>/extensions.
+
+    Other tool roots (tests, ad-hoc directories) keep their manifest in memory.
+    """
+    root = Path(tool_root).resolve()
+    if root.name != "extensions":
+        return None
+    return root.parent / ".luna" / "tool_manifest.json"
+
+
+def _load(root: Path, path: Optional[Path]) -> Dict[str, Any]:
+    cached = _CACHE.get(str(root))
+    if cached is not None:
+        return cached
+    data: Dict[str, Any] = {}
+    if path is not None:
+        try:
+            data = fast_json.read_file(path)
+            if data.get("version") != MANIFEST_VERSION or not isinstance(data.get("files"), dict):
+                data = {}
+        except Exception:
+            data = {}
+    data = data or {"version": MANIFEST_VERSION, "files": {}}
+    _CACHE[str(root)] = data
+    return data
+
+
+def _save(path: Path, data: Dict[str, Any]) -> None:
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(fast_json.dumps(data, indent=2) + "\n", encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError as exc:
+        print(f"[ToolManifest] Could not write {path}: {exc}", flush=True)
+
+
+def _file_entries(tool_root: str) -> Dict[str, Dict[str, Any]]:
+    """Up-to-date manifest entries for every tools file under tool_root."""
+    path = manifest_path(tool_root)
+    root = Path(tool_root).resolve()
+    with _LOCK:
+        data = _load(root, path)
+        files: Dict[str, Dict[str, Any]] = data["files"]
+        seen = set()
+        changed = False
+        for tool_file in sorted(glob.glob(os.path.join(str(root), "*", "tools", "*_tools.py"))):
+            rel = os.path.relpath(tool_file, str(root))
+            seen.add(rel)
+            try:
+                st = os.stat(tool_file)
+            except OSError:
+                continue
+            entry = files.get(rel)
+            if entry and entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns:
+                continue
+            digest = _sha256(tool_file)
+            if entry and entry.get("sha256") == digest and entry.get("source") != "error":
+                entry.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+            else:
+                files[rel] = _describe_file(tool_file, digest, st)
+            changed = True
+        for rel in [r for r in files if r not in seen]:
+            del files[rel]
+            changed = True
+        if changed and path is not None:
+            _save(path, data)
+        return dict(files)
+
+
+def file_entries(tool_root: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """Manifest entries keyed by absolute tools file path."""
+    root = Path(tool_root).resolve() if tool_root else PROJECT_ROOT / "extensions"
+    if not root.is_dir():
+        return {}
+    return {str(root / rel): entry for rel, entry in _file_entries(str(root)).items()}
+
+
+def _read_json(path: str) -> Dict[str, Any]:
+    if not os.path.isfile(path):
+        return {}
+    try:
+        return fast_json.read_file(path)
+    except Exception:
+        return {}
+
+
+def list_extension_tools(tool_root: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Describe every extension's tools without importing them.
+
+    Returns the same shape as discover_extensions() except that ``tools`` is a
+    list of manifest tool entries (dicts) rather than callables.
+    """
+    if tool_root is None:
+        tool_root = str(PROJECT_ROOT / "extensions")
+    root = str(Path(tool_root).resolve())
+    if not os.path.isdir(root):
+        return []
+
+    by_ext: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {}
+    for rel, entry in _file_entries(root).items():
+        by_ext.setdefault(rel.split(os.sep, 1)[0], []).append((rel, entry))
+
+    extensions = []
+    for ext_name in sorted(by_ext):
+        ext_dir = os.path.join(root, ext_name)
+        tools: List[Dict[str, Any]] = []
+        system_prompt = ""
+        errors: List[str] = []
+        for rel, entry in sorted(by_ext[ext_name]):
+            tools.extend(entry.get("tools") or [])
+            if not system_prompt and entry.get("system_prompt"):
+                system_prompt = entry["system_prompt"]
+            if entry.get("error"):
+                errors.append(f"[ToolManifest] Failed to describe {os.path.join(root, rel)}: {entry['error']}")
+        if tools or errors:
+            extensions.append({
+                "name": ext_name,
+                "path": ext_dir,
+                "tools": tools,
+                "system_prompt": system_prompt,
+                "tool_configs": _read_json(os.path.join(ext_dir, "tools", "tool_config.json")),
+                "config": _read_json(os.path.join(ext_dir, "config.json")),
+                "load_errors": errors,
+            })
+    return extensions
+
+
+def tool_signature(tool: Dict[str, Any]) -> str:
+    """``name(a: str, b: int)`` for a manifest tool entry."""
+    params = [f"{p['name']}: {p.get('annotation') or 'Any'}" for p in tool.get("params", [])]
+    return f"{tool['name']}({', '.join(params)})"
+
+
+if __name__ == "__main__":
+    # Helper mode for modules that must be imported: print one JSON line
+    if len(sys.argv) == 3 and sys.argv[1] == "--describe":
+        print(fast_json.dumps(_describe_imported(sys.argv[2])), flush=True)
+    else:
+        for ext in list_extension_tools(sys.argv[1] if len(sys.argv) > 1 else None):
+            print(f"{ext['name']}: {len(ext['tools'])} tools")
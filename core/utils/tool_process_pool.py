@@ -0,0 +1,399 @@
+"""Out-of-process tool execution for Luna extensions.
+
+Extensions that set ``"tool_isolation": "process"`` in their config.json are never
+imported into the agent API, MCP server or supervisor. Instead their *_tools.py
+modules are loaded by a warm pool of worker processes and each tool is exposed
+as a proxy function with the original name, docstring and signature.
+
+Calls cross the process boundary as a compact ``(tool_name, kwargs)`` tuple and
+come back as ``(ok, payload)``. A worker that dies (segfault, os._exit, OOM) only
+fails the call that was running; the pool is rebuilt for the next call. A call
+that runs longer than the extension's ``tool_timeout_s`` (or
+LUNA_TOOL_POOL_TIMEOUT_S, default 120s; 0 = no limit) fails, and the pool is
+rebuilt so the hung worker does not keep a slot.
+"""
+import os
+import sys
+import ast
+import atexit
+import inspect
+import threading
+import typing
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Ensure project root is on path (spawned workers inherit sys.path from the parent)
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+
+DEFAULT_WORKERS = 2
+DEFAULT_CALL_TIMEOUT_S = float(os.getenv("LUNA_TOOL_POOL_TIMEOUT_S", "120") or 0)
+
+# Names available when resolving annotation strings reported by workers
+_ANNOTATION_NAMESPACE: Dict[str, Any] = {
+    "typing": typing,
+    "str": str, "int": int, "float": float, "bool": bool,
+    "list": list, "dict": dict, "tuple": tuple, "set": set, "bytes": bytes,
+    "Any": Any, "Optional": Optional, "List": List, "Dict": Dict, "Tuple": Tuple,
+    "Union": typing.Union, "Literal": typing.Literal, "NoneType": type(None),
+}
+
+
+# ---- Worker side ----
+_WORKER_TOOLS: Dict[str, Callable] = {}
+_WORKER_SYSTEM_PROMPT: str = ""
+_WORKER_ERRORS: List[str] = []
+
+
+def _worker_init(tools_dir: str, tool_files: List[str]) -> None:
+    """Import the extension's tool modules once per worker process."""
+    global _WORKER_SYSTEM_PROMPT
+    from core.utils.extension_discovery import _load_tool_module, _collect_module_exports
+
+    for tool_file in tool_files:
+        try:
+            module = _load_tool_module(tool_file, tools_dir)
+            if module is None:
+                continue
+            module_tools, module_prompt = _collect_module_exports(module)
+            for fn in module_tools:
+                _WORKER_TOOLS[getattr(fn, "__name__", "unknown")] = fn
+            if not _WORKER_SYSTEM_PROMPT and module_prompt:
+                _WORKER_SYSTEM_PROMPT = module_prompt
+        except Exception as exc:  # noqa: BLE001
+            _WORKER_ERRORS.append(f"{tool_file}: {exc}")
+
+
+def _annotation_to_str(annotation: Any) -> Optional[str]:
+    """Render an annotation as an expression the parent can evaluate, or None."""
+    if annotation is inspect.Parameter.empty:
+        return None
+    if isinstance(annotation, str):
+        return annotation
+    if isinstance(annotation, type) and annotation.__module__ == "builtins":
+        return annotation.__name__
+    # typing constructs and builtin generics repr as evaluable expressions; anything
+    # else (e.g. a Pydantic model from the tool module) resolves to Any in the parent
+    return repr(annotation)
+
+
+def _portable_default(value: Any) -> Tuple[bool, Any]:
+    """Return (has_default, value); only literal defaults survive the trip to the parent."""
+    if value is inspect.Parameter.empty:
+        return False, None
+    try:
+        if ast.literal_eval(repr(value)) == value:
+            return True, value
+    except Exception:
+        pass
+    raise ValueError(f"default {value!r} is not a literal and cannot be exposed across processes")
+
+
+def _worker_describe() -> Dict[str, Any]:
+    """Report tool specs (name, doc, parameters) for the modules loaded in this worker."""
+    specs: List[Dict[str, Any]] = []
+    errors = list(_WORKER_ERRORS)
+    for name, fn in _WORKER_TOOLS.items():
+        params: List[Dict[str, Any]] = []
+        try:
+            signature = inspect.signature(fn)
+        except (TypeError, ValueError):
+            signature = None
+        try:
+            for pname, param in (signature.parameters.items() if signature else ()):
+                if param.kind in (inspect.Parameter.VAR_POSITIONAL, inspect.Parameter.VAR_KEYWORD):
+                    continue
+                try:
+                    has_default, default = _portable_default(param.default)
+                except ValueError as exc:
+                    raise ValueError(f"parameter '{pname}': {exc}") from None
+                params.append({
+                    "name": pname,
+                    "annotation": _annotation_to_str(param.annotation),
+                    "has_default": has_default,
+                    "default": default,
+                })
+        except ValueError as exc:
+            # Exposing it with a made-up default would change what the tool does
+            errors.append(f"{name}: {exc}")
+            continue
+        specs.append({"name": name, "doc": inspect.getdoc(fn) or "", "params": params})
+    return {
+        "tools": specs,
+        "system_prompt": _WORKER_SYSTEM_PROMPT,
+        "errors": errors,
+        "pid": os.getpid(),
+    }
+
+
+def _to_portable(result: Any) -> Any:
+    """Convert a tool result into something the parent can unpickle without the tool module."""
+    try:
+        from pydantic import BaseModel
+        if isinstance(result, BaseModel):
+            return result.model_dump()
+    except Exception:
+        pass
+    if isinstance(result, (str, int, float, bool, type(None))):
+        return result
+    if isinstance(result, (list, tuple)):
+        converted = [_to_portable(item) for item in result]
+        return tuple(converted) if isinstance(result, tuple) else converted
+    if isinstance(result, dict):
+        return {str(k): _to_portable(v) for k, v in result.items()}
+    return str(result)
+
+
+def _worker_call(tool_name: str, kwargs: Dict[str, Any]) -> Tuple[bool, Any]:
+    """Execute one tool call inside a worker process."""
+    fn = _WORKER_TOOLS.get(tool_name)
+    if fn is None:
+        return False, f"unknown tool '{tool_name}'"
+    try:
+        return True, _to_portable(fn(**(kwargs or {})))
+    except Exception as exc:  # noqa: BLE001
+        return False, str(exc) or type(exc).__name__
+
+
+# ---- Parent side ----
+def _resolve_annotation(expr: Optional[str]) -> Any:
+    """Evaluate an annotation string from a worker, falling back to Any."""
+    if not expr:
+        return Any
+    try:
+        return eval(expr, {"__builtins__": {}}, _ANNOTATION_NAMESPACE)  # noqa: S307
+    except Exception:
+        return Any
+
+
+class ToolProcessPool:
+    """Warm pool of worker processes serving the tools of a single extension."""
+
+    def __init__(self, ext_name: str, tools_dir: str, tool_files: List[str], workers: int = DEFAULT_WORKERS,
+                 call_timeout: float = DEFAULT_CALL_TIMEOUT_S):
+        self.ext_name = ext_name
+        self.tools_dir = tools_dir
+        self.tool_files = sorted(tool_files)
+        self.workers = max(1, int(workers))
+        self.call_timeout = float(call_timeout)
+        self.system_prompt: str = ""
+        self.load_errors: List[str] = []
+        self.restarts = 0
+        self._specs: List[Dict[str, Any]] = []
+        self._proxies: List[Callable] = []
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.fingerprint = _files_fingerprint(self.tools_dir, self.tool_files)
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_worker_init,
+            initargs=(self.tools_dir, self.tool_files),
+        )
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._new_executor()
+            return self._executor
+
+    def _restart(self, broken: ProcessPoolExecutor, reason: str = "Worker crashed", kill: bool = False) -> None:
+        """Replace a broken executor (only once, even if several calls saw it break)."""
+        with self._lock:
+            if self._executor is not broken:
+                return
+            self.restarts += 1
+            print(f"[ToolProcessPool] {reason} for {self.ext_name}; restarting pool (restart #{self.restarts})", flush=True)
+            # A hung worker never picks up the shutdown request, so stop it outright
+            processes = list((getattr(broken, "_processes", None) or {}).values()) if kill else []
+            try:
+                broken.shutdown(wait=False, cancel_futures=True)
+            except Exception:
+                pass
+            for process in processes:
+                try:
+                    process.terminate()
+                except Exception:
+                    pass
+            self._executor = self._new_executor()
+
+    def start(self, timeout: float = 60.0) -> None:
+        """Spawn the workers, load the tool modules and build the proxy functions."""
+        executor = self._get_executor()
+        # Warm every worker so the first real calls don't pay the import cost
+        futures = [executor.submit(_worker_describe) for _ in range(self.workers)]
+        info = futures[0].result(timeout=timeout)
+        for fut in futures[1:]:
+            try:
+                fut.result(timeout=timeout)
+            except Exception:
+                pass
+        self._specs = info.get("tools", [])
+        self.system_prompt = info.get("system_prompt", "") or ""
+        self.load_errors = info.get("errors", []) or []
+        self._proxies = [self._make_proxy(spec) for spec in self._specs]
+        print(f"[ToolProcessPool] {self.ext_name}: {len(self._proxies)} tool(s) in {self.workers} worker process(es)", flush=True)
+
+    def tool_proxies(self) -> List[Callable]:
+        """Return proxy callables for every tool exposed by the extension."""
+        return list(self._proxies)
+
+    def call(self, tool_name: str, kwargs: Dict[str, Any], timeout: Optional[float] = None) -> Any:
+        """Run a tool in a worker process and return its (portable) result."""
+        timeout = self.call_timeout if timeout is None else timeout
+        executor = self._get_executor()
+        try:
+            ok, payload = executor.submit(_worker_call, tool_name, kwargs).result(timeout=timeout if timeout > 0 else None)
+        except BrokenProcessPool as exc:
+            self._restart(executor)
+            raise RuntimeError(f"tool worker for {self.ext_name} crashed while running {tool_name}") from exc
+        except FutureTimeout as exc:
+            self._restart(executor, reason=f"{tool_name} timed out after {timeout:g}s", kill=True)
+            raise RuntimeError(f"tool {tool_name} in {self.ext_name} timed out after {timeout:g}s") from exc
+        if not ok:
+            raise RuntimeError(payload)
+        return payload
+
+    def _make_proxy(self, spec: Dict[str, Any]) -> Callable:
+        tool_name = spec["name"]
+        params: List[inspect.Parameter] = []
+        annotations: Dict[str, Any] = {}
+        for p in spec.get("params", []):
+            ann = _resolve_annotation(p.get("annotation"))
+            annotations[p["name"]] = ann
+            default = p.get("default") if p.get("has_default") else inspect.Parameter.empty
+            params.append(inspect.Parameter(p["name"], inspect.Parameter.POSITIONAL_OR_KEYWORD, default=default, annotation=ann))
+
+        # Parameters with defaults must follow those without; fall back to keyword-only if a
+        # worker reported an order Python would reject.
+        try:
+            signature = inspect.Signature(params)
+        except ValueError:
+            signature = inspect.Signature([p.replace(kind=inspect.Parameter.KEYWORD_ONLY) for p in params])
+
+        def tool_proxy(*args, **kwargs):
+            # Unknown or surplus arguments raise TypeError, as calling the tool would.
+            # Only arguments actually passed are sent; the worker applies its defaults.
+            call_kwargs = dict(signature.bind(*args, **kwargs).arguments)
+            return self.call(tool_name, call_kwargs)
+
+        tool_proxy.__name__ = tool_name
+        tool_proxy.__qualname__ = tool_name
+        tool_proxy.__doc__ = spec.get("doc", "")
+        tool_proxy.__signature__ = signature  # type: ignore[attr-defined]
+        tool_proxy.__annotations__ = annotations
+        tool_proxy.__luna_isolation__ = "process"  # type: ignore[attr-defined]
+        return tool_proxy
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                try:
+                    self._executor.shutdown(wait=False, cancel_futures=True)
+                except Exception:
+                    pass
+                self._executor = None
+
+
+def _files_fingerprint(tools_dir: str, tool_files: List[str]) -> Tuple[Tuple[str, float], ...]:
+    """mtimes of the tool modules and every other .py file under tools_dir (the helpers they import)."""
+    files = set(tool_files)
+    for dirpath, dirnames, filenames in os.walk(tools_dir):
+        dirnames[:] = [d for d in dirnames if not d.startswith(".") and d != "__pycache__"]
+        files.update(os.path.join(dirpath, name) for name in filenames if name.endswith(".py"))
+    fp = []
+    for f in sorted(files):
+        try:
+            fp.append((f, os.path.getmtime(f)))
+        except OSError:
+            fp.append((f, 0.0))
+    return tuple(fp)
+
+
+# ---- Pool registry ----
+_POOLS: Dict[str, ToolProcessPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_tool_pool(
+    ext_name: str,
+    tools_dir: str,
+    tool_files: List[str],
+    ext_config: Optional[Dict[str, Any]] = None,
+) -> ToolProcessPool:
+    """Get (or start) the worker pool for an extension.
+
+    Pools are reused across discovery passes and only restarted when the set of
+    tool files or the modification time of any .py file under tools_dir changes.
+    """
+    cfg = ext_config or {}
+    workers = int(cfg.get("tool_workers") or os.getenv("LUNA_TOOL_POOL_WORKERS") or DEFAULT_WORKERS)
+    timeout = cfg.get("tool_timeout_s")
+    timeout = DEFAULT_CALL_TIMEOUT_S if timeout is None else float(timeout)
+    key = str(Path(tools_dir).resolve())
+    fingerprint = _files_fingerprint(tools_dir, tool_files)
+
+    def reusable(pool: Optional[ToolProcessPool]) -> bool:
+        return pool is not None and pool.fingerprint == fingerprint and pool.workers == workers and pool.call_timeout == timeout
+
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if reusable(pool):
+            return pool
+
+    # Start outside the registry lock so extensions loading in parallel start their pools in parallel
+    pool = ToolProcessPool(ext_name, tools_dir, tool_files, workers=workers, call_timeout=timeout)
+    try:
+        pool.start()
+    except Exception:
+        pool.shutdown()
+        raise
+
+    with _POOLS_LOCK:
+        current = _POOLS.get(key)
+        if reusable(current):
+            # Another discovery pass started the same pool meanwhile; keep theirs
+            winner, loser = current, pool
+        else:
+            _POOLS[key] = winner = pool
+            loser = current
+    if loser is not None:
+        loser.shutdown()
+    return winner
+
+
+def drop_tool_pool(tools_dir: str) -> None:
+    """Stop an extension's pool so the next get_tool_pool() starts fresh code."""
+    with _POOLS_LOCK:
+        pool = _POOLS.pop(str(Path(tools_dir).resolve()), None)
+    if pool is not None:
+        pool.shutdown()
+
+
+def shutdown_all_pools() -> None:
+    """Stop every worker pool (registered to run at interpreter exit)."""
+    with _POOLS_LOCK:
+        for pool in _POOLS.values():
+            pool.shutdown()
+        _POOLS.clear()
+
+
+def _after_fork_in_child() -> None:
+    """Drop executors inherited from a pre-fork master; each worker spawns its own."""
+    global _POOLS_LOCK
+    _POOLS_LOCK = threading.Lock()
+    for pool in _POOLS.values():
+        pool._lock = threading.Lock()
+        pool._executor = None
+
+
+atexit.register(shutdown_all_pools)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,485 @@
+"""Lightweight per-request span tracing.
+
+A sampled request gets a root span (from TracingMiddleware or start_trace);
+code underneath opens child spans with ``span(...)``. The current span lives in
+a context variable, so asyncio tasks and ``asyncio.to_thread`` tool calls nest
+correctly: request -> planner step -> LLM call -> tool call -> DB/remote MCP.
+
+When a trace's root span ends, the whole trace is written to a JSONL file as
+one OTLP/JSON ``ExportTraceServiceRequest`` per line (the format the
+OpenTelemetry collector's file exporter writes and its ``otlpjsonfile``
+receiver reads). The line is handed to a background writer through a bounded
+queue (the structured_log machinery), so the request never waits on disk; the
+file is rotated by size (LUNA_LOG_MAX_BYTES / LUNA_LOG_BACKUPS) and a forked
+worker writes traces.<pid>.jsonl.
+
+Configuration:
+    LUNA_TRACE_SAMPLE_RATE  fraction of requests to trace (default 0 = off)
+    LUNA_TRACE_FILE         output file (default logs/traces.jsonl)
+    LUNA_TRACE_ALLOW_FORCE  1 = any client may force tracing (default 0)
+Authenticated requests (see TracingMiddleware's allow_force) can force tracing
+with ``X-Luna-Trace: 1`` or a sampled W3C ``traceparent`` header; anonymous
+ones are sampled at the configured rate only. Unsampled requests only pay for
+a context-variable lookup per ``span()``.
+"""
+import os
+import queue
+import atexit
+import random
+import secrets
+import logging
+import logging.handlers
+import threading
+import time
+import functools
+import inspect
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from core.utils import fast_json, structured_log
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+SAMPLE_RATE = float(os.getenv("LUNA_TRACE_SAMPLE_RATE", "0") or 0)
+TRACE_FILE = Path(os.getenv("LUNA_TRACE_FILE", "") or PROJECT_ROOT / "logs" / "traces.jsonl")
+ALLOW_FORCE = (os.getenv("LUNA_TRACE_ALLOW_FORCE", "0") or "0").strip().lower() in ("1", "true", "yes", "on")
+TRACE_ID_HEADER = "X-Luna-Trace-Id"
+
+
+class _NoopSpan:
+    """Stand-in returned when the current request is not being traced."""
+
+    recording = False
+    trace_id = ""
+    span_id = ""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        pass
+
+    def record_error(self, exc: BaseException) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _Trace:
+    """Spans of one sampled request, exported together when the root ends."""
+
+    def __init__(self, trace_id: str, service: str):
+        self.trace_id = trace_id
+        self.service = service
+        self.spans: List["Span"] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: "Span") -> None:
+        with self._lock:
+            self.spans.append(span)
+
+
+class Span:
+    """A timed, attributed unit of work within a trace."""
+
+    recording = True
+    __slots__ = ("name", "trace", "span_id", "parent_id", "kind", "start_ns", "end_ns",
+                 "attributes", "status", "status_message", "is_root")
+
+    def __init__(self, name: str, trace: _Trace, parent_id: Optional[str], kind: str = "INTERNAL",
+                 attributes: Optional[Dict[str, Any]] = None, is_root: bool = False):
+        self.name = name
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = "UNSET"
+        self.status_message = ""
+        self.is_root = is_root
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def record_error(self, exc: BaseException) -> None:
+        self.status = "ERROR"
+        self.status_message = f"{type(exc).__name__}: {exc}"[:500]
+
+    def end(self) -> None:
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        self.trace.add(self)
+        if self.is_root:
+            get_exporter().export(self.trace)
+
+
+_CURRENT: ContextVar[Optional[Span]] = ContextVar("luna_current_span", default=None)
+
+
+def current_span() -> Any:
+    """The span active in this context, or NOOP_SPAN when not tracing."""
+    return _CURRENT.get() or NOOP_SPAN
+
+
+def should_sample(force: Optional[bool] = None, rate: Optional[float] = None) -> bool:
+    """Sampling decision for a new trace; force overrides the configured rate."""
+    if force is not None:
+        return force
+    rate = SAMPLE_RATE if rate is None else rate
+    return rate > 0 and (rate >= 1 or random.random() < rate)
+
+
+def parse_traceparent(value: Optional[str]) -> Tuple[Optional[str], Optional[str], Optional[bool]]:
+    """Parse a W3C traceparent header into (trace_id, parent_span_id, sampled)."""
+    try:
+        version, trace_id, span_id, flags = (value or "").strip().split("-")
+        if len(trace_id) != 32 or len(span_id) != 16 or int(trace_id, 16) == 0:
+            return None, None, None
+        return trace_id, span_id, bool(int(flags, 16) & 1)
+    except (ValueError, AttributeError):
+        return None, None, None
+
+
+def start_root_span(
+    name: str,
+    service: str,
+    sampled: Optional[bool] = None,
+    attributes: Optional[Dict[str, Any]] = None,
+    trace_id: Optional[str] = None,
+    parent_id: Optional[str] = None,
+    kind: str = "SERVER",
+) -> Any:
+    """Start a new trace (or continue a remote one); returns NOOP_SPAN if unsampled."""
+    if not should_sample(sampled):
+        return NOOP_SPAN
+    trace = _Trace(trace_id or os.urandom(16).hex(), service)
+    return Span(name, trace, parent_id, kind=kind, attributes=attributes, is_root=True)
+
+
+def start_span(name: str, parent: Any = None, kind: str = "INTERNAL", **attributes: Any) -> Any:
+    """Start a child span without making it current (for callback-style APIs)."""
+    parent = parent if parent is not None else _CURRENT.get()
+    if parent is None or not parent.recording:
+        return NOOP_SPAN
+    return Span(name, parent.trace, parent.span_id, kind=kind, attributes=attributes)
+
+
+@contextmanager
+def use_span(span: Any) -> Iterator[Any]:
+    """Make span current for the block and end it (recording errors) on exit."""
+    if not span.recording:
+        yield span
+        return
+    ctx = _CURRENT.set(span)
+    try:
+        yield span
+    except BaseException as exc:
+        span.record_error(exc)
+        raise
+    finally:
+        try:
+            _CURRENT.reset(ctx)
+        except ValueError:
+            # Exited from another context (e.g. an async generator closed elsewhere)
+            pass
+        span.end()
+
+
+@contextmanager
+def start_trace(name: str, service: str, sampled: Optional[bool] = None, **attributes: Any) -> Iterator[Any]:
+    """Run the block as the root span of a new trace (subject to sampling)."""
+    if _CURRENT.get() is not None:
+        # Already inside a trace (e.g. an in-process call): nest instead
+        with span(name, **attributes) as sp:
+            yield sp
+        return
+    with use_span(start_root_span(name, service, sampled=sampled, attributes=attributes)) as sp:
+        yield sp
+
+
+@contextmanager
+def span(name: str, kind: str = "INTERNAL", **attributes: Any) -> Iterator[Any]:
+    """Run the block as a child of the current span (no-op when not tracing)."""
+    parent = _CURRENT.get()
+    if parent is None:
+        yield NOOP_SPAN
+        return
+    with use_span(Span(name, parent.trace, parent.span_id, kind=kind, attributes=attributes)) as sp:
+        yield sp
+
+
+def traced(name: Optional[str] = None, kind: str = "INTERNAL") -> Callable[[Callable], Callable]:
+    """Decorator wrapping a sync or async function in a child span."""
+    def decorator(fn: Callable) -> Callable:
+        span_name = name or fn.__qualname__
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name, kind=kind):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name, kind=kind):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def llm_token_usage(response: Any) -> Dict[str, Any]:
+    """Token counts (prompt/completion/total) from a LangChain LLMResult."""
+    usage: Dict[str, Any] = {}
+    try:
+        usage = dict((getattr(response, "llm_output", None) or {}).get("token_usage") or {})
+    except Exception:
+        usage = {}
+    if not usage:
+        try:
+            message = response.generations[0][0].message
+            meta = getattr(message, "usage_metadata", None) or {}
+            usage = {
+                "prompt_tokens": meta.get("input_tokens"),
+                "completion_tokens": meta.get("output_tokens"),
+                "total_tokens": meta.get("total_tokens"),
+            }
+        except Exception:
+            usage = {}
+    return usage
+
+
+def record_llm_usage(span: Any, response: Any, usage: Optional[Dict[str, Any]] = None) -> None:
+    """Copy token counts from a LangChain LLMResult onto a span."""
+    if not span.recording:
+        return
+    usage = llm_token_usage(response) if usage is None else usage
+    for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        value = usage.get(key)
+        if isinstance(value, int):
+            span.set_attribute(f"llm.usage.{key}", value)
+    try:
+        model = (getattr(response, "llm_output", None) or {}).get("model_name")
+        span.set_attribute("llm.model", model)
+    except Exception:
+        pass
+
+
+# ---- Export ----
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items()]
+
+
+def _otlp_span(span: Span) -> Dict[str, Any]:
+    out: Dict[str, Any] = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": f"SPAN_KIND_{span.kind}",
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns or span.start_ns),
+        "attributes": _otlp_attributes(span.attributes),
+        "status": {"code": f"STATUS_CODE_{span.status}"},
+    }
+    if span.parent_id:
+        out["parentSpanId"] = span.parent_id
+    if span.status_message:
+        out["status"]["message"] = span.status_message
+    return out
+
+
+def to_otlp(trace: _Trace) -> Dict[str, Any]:
+    """Render a finished trace as an OTLP/JSON ExportTraceServiceRequest."""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": trace.service, "process.pid": os.getpid()})},
+            "scopeSpans": [{
+                "scope": {"name": "luna.tracing"},
+                "spans": [_otlp_span(s) for s in sorted(trace.spans, key=lambda s: s.start_ns)],
+            }],
+        }]
+    }
+
+
+class JsonlExporter:
+    """Write one OTLP/JSON trace per line to a size-rotated file.
+
+    export() serializes the trace on the caller's thread and enqueues the line;
+    a background thread writes it. When the queue is full the trace is dropped
+    and counted instead of blocking the request.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._handler: Optional[logging.Handler] = None
+        self._listener: Optional[logging.handlers.QueueListener] = None
+        self._file: Optional[logging.Handler] = None
+
+    def _start(self) -> logging.Handler:
+        with self._lock:
+            if self._pid != os.getpid():
+                # First export, or the writer thread did not survive a fork
+                path = self.path
+                if structured_log._STATE["forked"]:
+                    path = path.with_name(f"{path.stem}.{os.getpid()}{path.suffix}")
+                q: "queue.Queue[logging.LogRecord]" = queue.Queue(structured_log.QUEUE_SIZE)
+                self._file = structured_log._rotating(path, logging.Formatter("%(message)s"))
+                self._listener = logging.handlers.QueueListener(q, self._file)
+                self._handler = structured_log._QueueHandler(q)
+                self._listener.start()
+                self._pid = os.getpid()
+            return self._handler
+
+    def export(self, trace: _Trace) -> None:
+        try:
+            line = fast_json.dumpb(to_otlp(trace)).decode("utf-8")
+            self._start().handle(logging.makeLogRecord({"msg": line}))
+        except Exception as exc:  # noqa: BLE001
+            print(f"[Tracing] Failed to export trace {trace.trace_id}: {exc}", flush=True)
+
+    @property
+    def dropped(self) -> int:
+        """Traces dropped because the queue was full."""
+        return self._handler.dropped if self._handler is not None else 0
+
+    def flush(self) -> None:
+        """Wait until every trace exported so far has been written."""
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.queue.join()
+            self._file.flush()
+
+    def close(self) -> None:
+        """Drain the queue and stop the writer thread."""
+        with self._lock:
+            if self._listener is not None and self._pid == os.getpid():
+                self._listener.stop()  # processes everything queued before returning
+                self._file.close()
+            self._pid = self._handler = self._listener = self._file = None
+
+
+_EXPORTER: Optional[JsonlExporter] = None
+
+
+def get_exporter() -> JsonlExporter:
+    global _EXPORTER
+    if _EXPORTER is None:
+        _EXPORTER = JsonlExporter(TRACE_FILE)
+    return _EXPORTER
+
+
+def set_exporter(exporter: Optional[JsonlExporter]) -> None:
+    """Replace the exporter (None restores the default file exporter).
+
+    The replaced exporter is closed, so everything it was given is on disk.
+    """
+    global _EXPORTER
+    previous, _EXPORTER = _EXPORTER, exporter
+    if previous is not None and previous is not exporter:
+        previous.close()
+
+
+def _close_exporter() -> None:
+    if _EXPORTER is not None:
+        _EXPORTER.close()
+
+
+atexit.register(_close_exporter)
+
+
+def bearer_auth(token: Optional[str]) -> Callable[[Dict[bytes, bytes]], bool]:
+    """allow_force check accepting requests that carry ``Authorization: Bearer <token>``."""
+    expected = (token or "").encode("latin-1")
+
+    def check(headers: Dict[bytes, bytes]) -> bool:
+        auth = headers.get(b"authorization", b"")
+        if not expected or not auth.startswith(b"Bearer "):
+            return False
+        return secrets.compare_digest(auth[7:].strip(), expected)
+    return check
+
+
+class TracingMiddleware:
+    """ASGI middleware opening a root span per HTTP request.
+
+    The span stays open until the response body (including SSE streams) has
+    been sent, and sampled responses carry the trace id in X-Luna-Trace-Id.
+
+    The middleware runs before the app's API-key check, so the forcing headers
+    are honoured only when allow_force(headers) accepts the request (e.g.
+    bearer_auth(API_KEY)) or LUNA_TRACE_ALLOW_FORCE is set. Anyone else's
+    request is sampled at the configured rate, still joining the caller's
+    trace id when it is.
+    """
+
+    def __init__(self, app: Any, service: str, allow_force: Optional[Callable[[Dict[bytes, bytes]], bool]] = None):
+        self.app = app
+        self.service = service
+        self.allow_force = allow_force
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope.get("type") != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        force_hdr = headers.get(b"x-luna-trace", b"").decode("latin-1").strip().lower()
+        trace_id, parent_id, remote_sampled = parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        force: Optional[bool] = None
+        if (force_hdr or remote_sampled is not None) and (
+            ALLOW_FORCE or (self.allow_force is not None and self.allow_force(headers))
+        ):
+            force = True if force_hdr in ("1", "true", "yes") else remote_sampled
+        root = start_root_span(
+            f"{scope.get('method', 'GET')} {scope.get('path', '')}",
+            self.service,
+            sampled=force,
+            attributes={"http.method": scope.get("method"), "http.target": scope.get("path")},
+            trace_id=trace_id,
+            parent_id=parent_id,
+        )
+        if not root.recording:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_trace(message: Dict[str, Any]) -> None:
+            if message.get("type") == "http.response.start":
+                root.set_attribute("http.status_code", message.get("status"))
+                if int(message.get("status") or 0) >= 500:
+                    root.status = "ERROR"
+                message = dict(message)
+                message["headers"] = list(message.get("headers") or []) + [
+                    (TRACE_ID_HEADER.lower().encode("latin-1"), root.trace_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        with use_span(root):
+            await self.app(scope, receive, send_with_trace)
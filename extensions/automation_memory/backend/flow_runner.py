@@ -49,26 +49,39 @@ async def execute_prompt_with_agent(prompt: str, agent: str, memories: list) ->
         "temperature": 0.7,
     }
     
+    # Flow prompts are scheduled work: queue behind interactive requests
+    headers = {"X-Luna-Priority": "scheduled"}
+    api_key = os.getenv('AGENT_API_KEY')
+    if api_key:
+        headers["Authorization"] = f"Bearer {api_key}"
+    
     try:
         async with aiohttp.ClientSession() as session:
-            async with session.post(agent_api_url, json=payload, timeout=300) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    response = data.get('choices', [{}])[0].get('message', {}).get('content', '')
-                    return {
-                        "success": True,
-                        "prompt": prompt,
-                        "response": response,
-                        "error": None
-                    }
-                else:
-                    error_text = await resp.text()
-                    return {
-                        "success": False,
-                        "prompt": prompt,
-                        "response": None,
-                        "error": f"HTTP {resp.status}: {error_text}"
-                    }
+            for attempt in range(4):
+                async with session.post(agent_api_url, json=payload, headers=headers, timeout=300) as resp:
+                    if resp.status == 429 and attempt < 3:
+                        # Agent API is saturated; wait as long as it asks before retrying
+                        retry_after = float(resp.headers.get('Retry-After', '5') or 5)
+                        print(f"[flow_runner] Agent API busy, retrying in {retry_after:.0f}s")
+                        await asyncio.sleep(retry_after)
+                        continue
+                    if resp.status == 200:
+                        data = await resp.json()
+                        response = data.get('choices', [{}])[0].get('message', {}).get('content', '')
+                        return {
+                            "success": True,
+                            "prompt": prompt,
+                            "response": response,
+                            "error": None
+                        }
+                    else:
+                        error_text = await resp.text()
+                        return {
+                            "success": False,
+                            "prompt": prompt,
+                            "response": None,
+                            "error": f"HTTP {resp.status}: {error_text}"
+                        }
     except Exception as e:
         return {
             "success": False,
@@ -6,6 +6,9 @@ import uvicorn
 from fastapi import FastAPI, HTTPException, UploadFile, File, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from core.utils.fast_json import FastJSONResponse
+from core.utils.tracing import TracingMiddleware, bearer_auth
+from core.utils import metrics
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
 import os
@@ -13,9 +16,12 @@ from pathlib import Path
 from dotenv import load_dotenv, dotenv_values
 
 SUPERVISOR_API_TOKEN = os.getenv("SUPERVISOR_API_TOKEN", "").strip()
-_SUPERVISOR_UNPROTECTED_PATHS = {"/health"}
+_SUPERVISOR_UNPROTECTED_PATHS = {"/health", "/metrics"}
 
-app = FastAPI(title="Luna Supervisor API")
+app = FastAPI(title="Luna Supervisor API", default_response_class=FastJSONResponse)
+
+app.add_middleware(TracingMiddleware, service="supervisor-api", allow_force=bearer_auth(SUPERVISOR_API_TOKEN))
+app.add_middleware(metrics.MetricsMiddleware, service="supervisor-api")
 
 # Add CORS middleware for network access
 app.add_middleware(
@@ -107,6 +113,12 @@ def health():
     return {"status": "healthy"}
 
 
+@app.get('/metrics')
+def get_metrics():
+    """Prometheus metrics for the supervisor process"""
+    return metrics.metrics_response()
+
+
 @app.get('/services/status')
 def services_status():
     """Get current state.json contents"""
@@ -133,16 +145,9 @@ def get_extensions():
     state = supervisor_instance.get_state()
     services_dict = state.get('services', {})
     
-    # Get master config for tool counts and enabled status
-    from pathlib import Path
-    import json
-    master_config_path = Path(supervisor_instance.repo_path) / 'core' / 'master_config.json'
-    master_config = {}
-    try:
-        with open(master_config_path, 'r') as f:
-            master_config = json.load(f)
-    except:
-        pass
+    # Get master config for tool counts and enabled status (cached until the file changes)
+    from core.utils.config_store import get_config_store
+    master_config = get_config_store(supervisor_instance.master_config_path).get()
     
     # Group by extension
     extensions_data = {}
@@ -196,11 +201,11 @@ def get_extensions():
             extensions_data[ext_name] = {'name': ext_name, 'ui': None, 'services': [], 'tool_count': 0, 'enabled': False}
         extensions_data[ext_name]['enabled'] = ext_configs[ext_name].get('enabled', True)
     
-    # Discover tools and version for each extension
+    # Tool counts from the static manifest (tools modules are not imported)
     try:
-        from core.utils.extension_discovery import discover_extensions
+        from core.utils.tool_manifest import list_extension_tools
         extensions_root = Path(supervisor_instance.repo_path) / 'extensions'
-        discovered_exts = discover_extensions(str(extensions_root))
+        discovered_exts = list_extension_tools(str(extensions_root))
         for disc_ext in discovered_exts:
             ext_name = disc_ext.get('name', '')
             if ext_name in extensions_data:
@@ -215,9 +220,8 @@ def get_extensions():
         config_path = ext_path / 'config.json'
         if config_path.exists():
             try:
-                with open(config_path, 'r') as f:
-                    ext_config = json.load(f)
-                    extensions_data[ext_name]['version'] = ext_config.get('version', 'unknown')
+                ext_config = fast_json.read_file(config_path)
+                extensions_data[ext_name]['version'] = ext_config.get('version', 'unknown')
             except:
                 extensions_data[ext_name]['version'] = 'unknown'
         else:
@@ -229,6 +233,20 @@ def get_extensions():
     return {"extensions": list(extensions_data.values())}
 
 
+@app.get('/extensions/load-report')
+def get_extension_load_report():
+    """Per-extension import time and memory from each process's last discovery.
+
+    Reports come from the agent API, MCP servers and any other process that
+    loaded extensions/, slowest extension first.
+    """
+    if not supervisor_instance:
+        return {"reports": []}
+    from core.utils.extension_discovery import read_load_reports
+    extensions_root = Path(supervisor_instance.repo_path) / 'extensions'
+    return {"reports": read_load_reports(str(extensions_root))}
+
+
 @app.post('/ports/assign')
 def assign_port(request: PortAssignRequest):
     """Assign port to extension or service"""
@@ -297,9 +315,8 @@ def get_extension_config(name: str):
     if not config_path.exists():
         raise HTTPException(status_code=404, detail=f"Extension {name} not found")
     
-    import json
-    with open(config_path, 'r') as f:
-        config = json.load(f)
+    from core.utils import fast_json
+    config = fast_json.read_file(config_path)
     
     return config
 
@@ -1473,12 +1490,11 @@ def discover_tools(extension: Optional[str] = None):
         raise HTTPException(status_code=500, detail="Supervisor not initialized")
     
     try:
-        from core.utils.extension_discovery import discover_extensions
+        from core.utils.tool_manifest import list_extension_tools
         from pathlib import Path
-        import inspect
         
         extensions_root = Path(supervisor_instance.repo_path) / 'extensions'
-        discovered_exts = discover_extensions(str(extensions_root))
+        discovered_exts = list_extension_tools(str(extensions_root))
         
         tools_list = []
         
@@ -1493,28 +1509,18 @@ def discover_tools(extension: Optional[str] = None):
             tool_configs = ext.get('tool_configs', {})
             
             for tool in tools:
-                if not callable(tool):
-                    continue
-                
-                tool_name = tool.__name__
-                tool_doc = tool.__doc__ or "No description available"
+                tool_name = tool['name']
                 
-                # Extract first line of docstring as description
-                description = tool_doc.strip().split('\n')[0] if tool_doc else "No description available"
+                # First line of docstring as description
+                description = tool.get('summary') or "No description available"
                 
-                # Try to get function signature for parameters
-                parameters = {}
-                try:
-                    sig = inspect.signature(tool)
-                    parameters = {
-                        param_name: {
-                            "annotation": str(param.annotation) if param.annotation != inspect.Parameter.empty else "Any",
-                            "default": str(param.default) if param.default != inspect.Parameter.empty else None
-                        }
-                        for param_name, param in sig.parameters.items()
+                parameters = {
+                    param['name']: {
+                        "annotation": param.get('annotation') or "Any",
+                        "default": param.get('default')
                     }
-                except Exception:
-                    pass
+                    for param in tool.get('params', [])
+                }
                 
                 tools_list.append({
                     "name": tool_name,
@@ -1556,11 +1562,11 @@ def list_tools(extension: Optional[str] = None, enabled_only: bool = False):
         raise HTTPException(status_code=500, detail="Supervisor not initialized")
     
     try:
-        from core.utils.extension_discovery import discover_extensions
+        from core.utils.tool_manifest import list_extension_tools
         from pathlib import Path
         
         extensions_root = Path(supervisor_instance.repo_path) / 'extensions'
-        discovered_exts = discover_extensions(str(extensions_root))
+        discovered_exts = list_extension_tools(str(extensions_root))
         
         # Get tool configs from master_config
         tool_configs = supervisor_instance.master_config.get('tool_configs', {})
@@ -1577,10 +1583,7 @@ def list_tools(extension: Optional[str] = None, enabled_only: bool = False):
             tools = ext.get('tools', [])
             
             for tool in tools:
-                if not callable(tool):
-                    continue
-                
-                tool_name = tool.__name__
+                tool_name = tool['name']
                 tool_config = tool_configs.get(tool_name, {})
                 
                 # Default values if not in master_config
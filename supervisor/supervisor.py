@@ -2,6 +2,7 @@
 Luna Supervisor
 Main process manager that orchestrates all Luna services
 """
+import copy
 import json
 import os
 import sys
@@ -45,7 +46,6 @@ class Supervisor:
         self.external_services_registry_path = self.luna_path / "external_services.json"
         
         self.master_config = {}
-        self.state = {"services": {}, "external_services": {}}
         self.processes = {}  # Track spawned processes
         
         # Ensure directories exist
@@ -61,6 +61,18 @@ class Supervisor:
         
         from core.utils.external_services_manager import ExternalServicesManager
         self.external_services_manager = ExternalServicesManager(self.repo_path)
+
+        # State and port assignments are written behind: mutations are batched
+        # in memory and flushed atomically after a short debounce or checkpoint()
+        from core.utils.state_store import StateStore, WriteBehind
+        self._state_store = StateStore(
+            self.state_path, default={"services": {}, "external_services": {}}, load=False
+        )
+        # The flusher writes a copy taken when the save was requested, never
+        # the dict that API threads are editing in place
+        self._config_lock = threading.RLock()
+        self._config_snapshot = None
+        self._config_writer = WriteBehind(self._write_master_config, name="master_config.json")
     
     def log(self, level, message):
         """Write structured log message"""
@@ -170,8 +182,9 @@ class Supervisor:
         """Load existing master_config.json or create default"""
         if self.master_config_path.exists():
             self.log("INFO", f"Loading existing master_config from {self.master_config_path}")
-            with open(self.master_config_path, 'r') as f:
-                self.master_config = json.load(f)
+            from core.utils.config_store import get_config_store
+            # A mutable copy: the API edits it in place, then saves
+            self.master_config = get_config_store(self.master_config_path).refresh().thaw()
         else:
             self.log("INFO", f"Creating default master_config at {self.master_config_path}")
             # Load deployment mode from environment (set by install.sh)
@@ -196,7 +209,7 @@ class Supervisor:
                     "services": {}
                 }
             }
-            self.save_master_config()
+            self._defer_master_config_save()
         
         # Always update deployment_mode and public_domain from environment if present
         # This allows runtime changes without editing master_config
@@ -233,7 +246,7 @@ class Supervisor:
                     "enabled": True,
                     "tool_config": tool_filter,
                 }
-                self.save_master_config()
+                self._defer_master_config_save()
 
             updated = False
             for name, cfg in self.master_config["mcp_servers"].items():
@@ -252,7 +265,7 @@ class Supervisor:
                 self._set_env_var(self._env_key_for_server(name), api_key)
 
             if updated:
-                self.save_master_config()
+                self._defer_master_config_save()
         except Exception as exc:
             self.log("WARNING", f"MCP server migration skipped: {exc}")
         
@@ -260,13 +273,36 @@ class Supervisor:
         if "agent_presets" not in self.master_config:
             self.log("INFO", "Initializing agent_presets section in master_config")
             self.master_config["agent_presets"] = {}
-            self.save_master_config()
+            self._defer_master_config_save()
+        
+        # One write for all of the migrations above
+        self._config_writer.flush()
     
     def save_master_config(self):
-        """Save master_config to disk"""
-        with open(self.master_config_path, 'w') as f:
-            json.dump(self.master_config, f, indent=2)
+        """Save master_config to disk now (also covers any deferred port assignments)"""
+        self._defer_master_config_save()
+        self._config_writer.flush()
+    
+    def _defer_master_config_save(self):
+        """Snapshot master_config; write it on the next write-behind flush or checkpoint"""
+        with self._config_lock:
+            self._config_snapshot = copy.deepcopy(self.master_config)
+        self._config_writer.mark_dirty()
+    
+    def _write_master_config(self):
+        with self._config_lock:
+            snapshot = self._config_snapshot
+        if snapshot is None:
+            return
+        # Atomic rename; this process's ConfigStore readers see the new version at once
+        from core.utils.config_store import get_config_store
+        get_config_store(self.master_config_path).save(snapshot)
         self.log("INFO", f"Saved master_config to {self.master_config_path}")
+    
+    def checkpoint(self):
+        """Flush pending state.json and master_config.json writes now"""
+        self._config_writer.flush()
+        self._state_store.checkpoint()
 
     def _env_key_for_server(self, server_name: str) -> str:
         import re
@@ -346,15 +382,23 @@ class Supervisor:
         """Clear and create fresh state.json on every startup"""
         self.log("INFO", f"Clearing state and creating fresh state at {self.state_path}")
         self.state = {"services": {}}
-        self.save_state()
+        self._state_store.checkpoint()
+    
+    @property
+    def state(self):
+        """In-memory state (persisted write-behind to state.json)"""
+        return self._state_store.data
+    
+    @state.setter
+    def state(self, value):
+        self._state_store.replace(value)
     
     def save_state(self):
-        """Save state to disk"""
-        with open(self.state_path, 'w') as f:
-            json.dump(self.state, f, indent=2)
+        """Schedule a write of state.json (batched with other changes)"""
+        self._state_store.mark_dirty()
     
     def get_state(self):
-        """Get current state"""
+        """Get current state (served from memory)"""
         return self.state
     
     def update_service_status(self, service_name, pid=None, port=None, status=None):
@@ -384,53 +428,55 @@ class Supervisor:
         Returns:
             Port number or None
         """
-        if port_type == "extension":
-            # Extension UI ports: 5200-5299
-            assignments = self.master_config["port_assignments"]["extensions"]
-            
-            if name in assignments:
-                print(f"Reusing existing port {assignments[name]} for extension {name}")
-                return assignments[name]
-            
-            # Find next available port
-            used_ports = set(assignments.values())
-            for port in range(5200, 5300):
-                if port not in used_ports:
-                    assignments[name] = port
-                    self.save_master_config()
-                    print(f"Assigned port {port} to extension {name}")
-                    return port
-            
-            raise RuntimeError("No available ports in extension range (5200-5299)")
+        # Other threads snapshot master_config for saving; don't let them see half an update
+        with self._config_lock:
+            if port_type == "extension":
+                # Extension UI ports: 5200-5299
+                assignments = self.master_config["port_assignments"]["extensions"]
+            
+                if name in assignments:
+                    print(f"Reusing existing port {assignments[name]} for extension {name}")
+                    return assignments[name]
+            
+                # Find next available port
+                used_ports = set(assignments.values())
+                for port in range(5200, 5300):
+                    if port not in used_ports:
+                        assignments[name] = port
+                        self._defer_master_config_save()
+                        print(f"Assigned port {port} to extension {name}")
+                        return port
+            
+                raise RuntimeError("No available ports in extension range (5200-5299)")
         
-        elif port_type == "service":
-            # Service ports: 5300-5399 (or None if doesn't require port)
-            assignments = self.master_config["port_assignments"]["services"]
-            
-            if not requires_port:
-                # Service doesn't need a port
-                assignments[name] = None
-                self.save_master_config()
-                print(f"Service {name} does not require port (set to null)")
-                return None
-            
-            if name in assignments:
-                print(f"Reusing existing port {assignments[name]} for service {name}")
-                return assignments[name]
-            
-            # Find next available port
-            used_ports = set(p for p in assignments.values() if p is not None)
-            for port in range(5300, 5400):
-                if port not in used_ports:
-                    assignments[name] = port
-                    self.save_master_config()
-                    print(f"Assigned port {port} to service {name}")
-                    return port
-            
-            raise RuntimeError("No available ports in service range (5300-5399)")
+            elif port_type == "service":
+                # Service ports: 5300-5399 (or None if doesn't require port)
+                assignments = self.master_config["port_assignments"]["services"]
+            
+                if not requires_port:
+                    # Service doesn't need a port
+                    assignments[name] = None
+                    self._defer_master_config_save()
+                    print(f"Service {name} does not require port (set to null)")
+                    return None
+            
+                if name in assignments:
+                    print(f"Reusing existing port {assignments[name]} for service {name}")
+                    return assignments[name]
+            
+                # Find next available port
+                used_ports = set(p for p in assignments.values() if p is not None)
+                for port in range(5300, 5400):
+                    if port not in used_ports:
+                        assignments[name] = port
+                        self._defer_master_config_save()
+                        print(f"Assigned port {port} to service {name}")
+                        return port
+            
+                raise RuntimeError("No available ports in service range (5300-5399)")
         
-        else:
-            raise ValueError(f"Invalid port_type: {port_type}")
+            else:
+                raise ValueError(f"Invalid port_type: {port_type}")
     
     def get_port_mappings(self):
         """Get all port mappings"""
@@ -598,6 +644,8 @@ class Supervisor:
     def _generate_caddyfile(self):
         """Generate Caddyfile using caddy_config_generator"""
         try:
+            # The generator reads port assignments from master_config.json
+            self.checkpoint()
             from core.utils.caddy_config_generator import generate_caddyfile
             
             self.log("INFO", "Generating Caddyfile...")
@@ -613,6 +661,7 @@ class Supervisor:
         """Reload Caddy configuration using shared helper."""
         context = f" ({reason})" if reason else ""
         self.log("INFO", f"Reloading Caddy configuration{context}...")
+        self.checkpoint()
         try:
             from core.utils.caddy_control import reload_caddy as _reload_caddy
         except ImportError as exc:
@@ -815,14 +864,28 @@ class Supervisor:
                     else:
                         return
 
+            enabled = {name: cfg for name, cfg in servers.items() if cfg.get("enabled", True)}
+            for name, cfg in enabled.items():
+                if name != "main" and not cfg.get("api_key"):
+                    api_key = self._generate_api_key()
+                    cfg["api_key"] = api_key
+                    self._set_env_var(self._env_key_for_server(name), api_key)
+                    self.save_master_config()
+            # MCP processes read their api keys and tool views from master_config.json
+            self.checkpoint()
+
+            # One host process serves every server (shared extension registry and
+            # remote sessions); LUNA_MCP_HOST=per-server restores one process each
+            if os.getenv("LUNA_MCP_HOST", "shared").strip().lower() != "per-server":
+                self._start_mcp_host(enabled, ensure_port_free)
+                return
+
             mcp_server_script = self.core_path / "utils" / "mcp_server.py"
             if not mcp_server_script.exists():
                 self.log("ERROR", f"MCP Server script not found at {mcp_server_script}")
                 return
 
-            for name, cfg in servers.items():
-                if not cfg.get("enabled", True):
-                    continue
+            for name, cfg in enabled.items():
                 port = int(cfg.get("port", 8766))
 
                 self.log("INFO", f"Starting MCP server '{name}' on port {port}...")
@@ -840,13 +903,7 @@ class Supervisor:
                 ]
 
                 if name != "main":
-                    api_key = cfg.get("api_key")
-                    if not api_key:
-                        api_key = self._generate_api_key()
-                        cfg["api_key"] = api_key
-                        self._set_env_var(self._env_key_for_server(name), api_key)
-                        self.save_master_config()
-                    args.extend(["--api-key", api_key])
+                    args.extend(["--api-key", cfg["api_key"]])
 
                 proc = subprocess.Popen(
                     args,
@@ -874,6 +931,46 @@ class Supervisor:
             self.log("ERROR", f"Failed to start MCP servers: {e}")
             self.log("ERROR", traceback.format_exc())
 
+    def _start_mcp_host(self, servers, ensure_port_free):
+        """Serve all enabled MCP servers from a single mcp_host.py process."""
+        import time
+
+        mcp_host_script = self.core_path / "utils" / "mcp_host.py"
+        if not mcp_host_script.exists():
+            self.log("ERROR", f"MCP host script not found at {mcp_host_script}")
+            return
+
+        for name, cfg in servers.items():
+            ensure_port_free(int(cfg.get("port", 8766)))
+
+        self.log("INFO", f"Starting MCP host for {len(servers)} server(s): {', '.join(servers)}")
+        log_fp = open(self.logs_path / "mcp_host.log", 'w')
+        proc = subprocess.Popen(
+            [self.python_bin, str(mcp_host_script), "--host", "127.0.0.1", "--servers", ",".join(servers)],
+            stdout=log_fp,
+            stderr=subprocess.STDOUT,
+            cwd=str(self.repo_path),
+            start_new_session=True,
+        )
+        self.processes["mcp_host"] = proc
+
+        # Per-server status entries keep the /mcp-servers API unchanged
+        keys = [f"mcp_server_{name}" for name in servers]
+        for name, key in zip(servers, keys):
+            self.update_service_status(key, pid=proc.pid, port=int(servers[name].get("port", 8766)), status="starting")
+
+        # Mark running shortly after spawn
+        time.sleep(0.5)
+        status = "running" if proc.poll() is None else "failed"
+        for key in keys:
+            if key in self.state.get('services', {}):
+                self.state['services'][key]['status'] = status
+        self.save_state()
+        if status == "running":
+            self.log("INFO", f"MCP host is running (PID: {proc.pid})")
+        else:
+            self.log("ERROR", "MCP host exited immediately")
+
     def _start_hub_ui(self):
         """Start Hub UI on port 5173"""
         try:
@@ -1021,6 +1118,7 @@ class Supervisor:
                 if "service_api_keys" not in self.master_config:
                     self.master_config["service_api_keys"] = {}
                 self.master_config["service_api_keys"][service_key] = api_key
+                # Caddy and the service's clients depend on this key: write it now
                 self.save_master_config()
 
                 # Also store in .env for easy access
@@ -1135,7 +1233,8 @@ class Supervisor:
             
             import config_sync
             
-            # Run sync
+            # Run sync (it reads and rewrites master_config.json itself)
+            self.checkpoint()
             synced, skipped = config_sync.sync_all(self.repo_path)
             
             self.log("INFO", f"Config sync complete: {len(synced)} synced, {len(skipped)} skipped")
@@ -1193,8 +1292,10 @@ class Supervisor:
         
         # Phase 8: Start health monitoring thread
         self._start_health_monitoring()
+        self._start_extension_watcher()
         
         # Phase 9: Startup complete, ready for API
+        self.checkpoint()
         self.log("INFO", "=" * 60)
         self.log("INFO", "Supervisor startup complete")
         self.log("INFO", f"Master config: {self.master_config_path}")
@@ -1270,6 +1371,34 @@ class Supervisor:
             self.log("ERROR", f"Failed to start health monitoring: {e}")
             self.log("ERROR", traceback.format_exc())
     
+    def _start_extension_watcher(self):
+        """Watch extensions/ and hot reload changed extensions in running services"""
+        try:
+            from core.utils import extension_watcher
+            if extension_watcher.WATCH_MODE == "off":
+                self.log("INFO", "Extension hot reload disabled (LUNA_EXTENSION_WATCH=0)")
+                return
+            extensions_root = str(self.repo_path / "extensions")
+
+            def on_change(names):
+                self.log("INFO", f"Extensions changed: {', '.join(names)}")
+                try:
+                    # Re-describe the changed tool files so /tools/* stay current
+                    from core.utils.tool_manifest import list_extension_tools
+                    list_extension_tools(extensions_root)
+                except Exception as e:
+                    self.log("ERROR", f"Failed to refresh tool manifest: {e}")
+                if extension_watcher.WATCH_MODE == "supervisor":
+                    delivered = extension_watcher.publish(names, root=extensions_root)
+                    self.log("INFO", f"Notified {delivered} service(s) to reload {', '.join(names)}")
+
+            self.extension_watcher = extension_watcher.ExtensionWatcher(on_change, root=extensions_root).start()
+            self.log("INFO", f"Extension watcher started ({self.extension_watcher.backend})")
+
+        except Exception as e:
+            self.log("ERROR", f"Failed to start extension watcher: {e}")
+            self.log("ERROR", traceback.format_exc())
+    
     def _health_check_external_services(self):
         """Run health checks for all installed external services"""
         try:
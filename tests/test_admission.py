@@ -0,0 +1,118 @@
+"""Tests for agent API admission control."""
+import sys
+import asyncio
+from pathlib import Path
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from core.utils.admission import AdmissionController, AdmissionRejected, parse_priority
+
+
+def test_parse_priority():
+    """Unknown or missing priorities default to interactive."""
+    try:
+        assert parse_priority("Scheduled") == "scheduled"
+        assert parse_priority(None) == "interactive"
+        assert parse_priority("urgent") == "interactive"
+        print("[PASS] Priorities parse")
+    except Exception as e:
+        print(f"[FAIL] Error testing priority parsing: {e}")
+        raise
+
+
+def test_interactive_requests_jump_the_queue():
+    """Queued interactive requests are admitted before earlier scheduled ones."""
+    async def scenario():
+        ctrl = AdmissionController(max_concurrent=1, queue_size=4, queue_timeout=5, rate_per_min=0)
+        first = await ctrl.acquire("k", "agent", "interactive")
+        order = []
+
+        async def wait_for_slot(name, priority):
+            ticket = await ctrl.acquire("k", "agent", priority)
+            order.append(name)
+            ticket.release()
+
+        tasks = [asyncio.create_task(wait_for_slot("scheduled", "scheduled"))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(wait_for_slot("interactive", "interactive")))
+        await asyncio.sleep(0)
+        assert ctrl.stats()["queued"] == 2
+
+        first.release()
+        await asyncio.gather(*tasks)
+        assert order == ["interactive", "scheduled"]
+        assert ctrl.stats()["active"] == 0
+
+    try:
+        asyncio.run(scenario())
+        print("[PASS] Interactive requests are served first")
+    except Exception as e:
+        print(f"[FAIL] Error testing priority queue: {e}")
+        raise
+
+
+def test_full_queue_and_timeout_reject_with_retry_after():
+    """Saturation produces AdmissionRejected with a positive Retry-After."""
+    async def scenario():
+        ctrl = AdmissionController(max_concurrent=1, queue_size=1, queue_timeout=0.05, rate_per_min=0)
+        held = await ctrl.acquire()
+        waiter = asyncio.create_task(ctrl.acquire())
+        await asyncio.sleep(0)
+
+        try:
+            await ctrl.acquire()
+            assert False, "expected AdmissionRejected"
+        except AdmissionRejected as exc:
+            assert "queue is full" in exc.reason
+            assert exc.retry_after >= 1
+
+        try:
+            await waiter
+            assert False, "expected AdmissionRejected"
+        except AdmissionRejected as exc:
+            assert "timed out" in exc.reason
+
+        held.release()
+        assert ctrl.stats()["active"] == 0
+        assert ctrl.stats()["rejected"] == 2
+
+    try:
+        asyncio.run(scenario())
+        print("[PASS] Saturation is rejected with Retry-After")
+    except Exception as e:
+        print(f"[FAIL] Error testing rejection: {e}")
+        raise
+
+
+def test_token_bucket_per_key_and_preset():
+    """Each API key/preset pair has its own rate limit bucket."""
+    async def scenario():
+        ctrl = AdmissionController(max_concurrent=0, queue_size=0, rate_per_min=60, burst=2)
+        for _ in range(2):
+            (await ctrl.acquire("key-a", "preset-1")).release()
+        try:
+            await ctrl.acquire("key-a", "preset-1")
+            assert False, "expected AdmissionRejected"
+        except AdmissionRejected as exc:
+            assert "rate limit" in exc.reason
+            assert exc.retry_after == 1
+        (await ctrl.acquire("key-a", "preset-2")).release()
+        (await ctrl.acquire("key-b", "preset-1")).release()
+
+    try:
+        asyncio.run(scenario())
+        print("[PASS] Token buckets are per key and preset")
+    except Exception as e:
+        print(f"[FAIL] Error testing token buckets: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    print("Running admission control tests...")
+    test_parse_priority()
+    test_interactive_requests_jump_the_queue()
+    test_full_queue_and_timeout_reject_with_retry_after()
+    test_token_bucket_per_key_and_preset()
+    print("\nAll tests passed!")
@@ -1,136 +1,339 @@
-"""Tests for Agent API server."""
-import os
-import sys
-from pathlib import Path
-
-# Add project root to path
-PROJECT_ROOT = Path(__file__).resolve().parents[1]
-sys.path.insert(0, str(PROJECT_ROOT))
-
-
-def test_agent_api_imports():
-    """Test that agent API module can be imported."""
-    try:
-        from core.utils import agent_api
-        assert hasattr(agent_api, 'app')
-        assert hasattr(agent_api, '_discover_agents')
-        assert hasattr(agent_api, '_init_agents')
-        print("[PASS] Agent API module imports correctly")
-    except Exception as e:
-        print(f"[FAIL] Error importing agent API: {e}")
-        raise
-
-
-def test_discover_agents():
-    """Test agent discovery."""
-    try:
-        from core.utils.agent_api import _discover_agents, AGENTS_ROOT
-        
-        # Should find simple_agent and passthrough_agent
-        agents = _discover_agents()
-        
-        assert isinstance(agents, dict)
-        # If agents exist, they should have run_agent method
-        for agent_name, agent_mod in agents.items():
-            assert hasattr(agent_mod, 'run_agent')
-        
-        print(f"[PASS] Agent discovery found {len(agents)} agent(s)")
-    except Exception as e:
-        print(f"[FAIL] Error discovering agents: {e}")
-        raise
-
-
-def test_split_history_and_prompt():
-    """Test message splitting."""
-    try:
-        from core.utils.agent_api import _split_history_and_prompt, ChatMessage
-        
-        messages = [
-            ChatMessage(role="system", content="You are helpful"),
-            ChatMessage(role="user", content="Hello"),
-            ChatMessage(role="assistant", content="Hi there!"),
-            ChatMessage(role="user", content="How are you?"),
-        ]
-        
-        history, prompt = _split_history_and_prompt(messages)
-        
-        assert prompt == "How are you?"
-        assert "Hello" in history
-        assert "Hi there!" in history
-        
-        print("[PASS] Message splitting works correctly")
-    except Exception as e:
-        print(f"[FAIL] Error testing message splitting: {e}")
-        raise
-
-
-def test_extract_memory():
-    """Test memory extraction from header."""
-    try:
-        from core.utils.agent_api import _extract_memory, ChatMessage
-        
-        messages = [ChatMessage(role="user", content="test")]
-        
-        # Test with header
-        memory = _extract_memory(messages, "memory item 1\nmemory item 2")
-        assert memory == "memory item 1\nmemory item 2"
-        
-        # Test without header
-        memory = _extract_memory(messages, None)
-        assert memory is None
-        
-        print("[PASS] Memory extraction works correctly")
-    except Exception as e:
-        print(f"[FAIL] Error testing memory extraction: {e}")
-        raise
-
-
-def test_chat_completion_payload():
-    """Test OpenAI response payload generation."""
-    try:
-        from core.utils.agent_api import _make_chat_completion_payload
-        
-        payload = _make_chat_completion_payload("test_model", "test response")
-        
-        assert payload["object"] == "chat.completion"
-        assert payload["model"] == "test_model"
-        assert payload["choices"][0]["message"]["content"] == "test response"
-        assert payload["choices"][0]["message"]["role"] == "assistant"
-        assert "id" in payload
-        assert "created" in payload
-        
-        print("[PASS] Chat completion payload generation works")
-    except Exception as e:
-        print(f"[FAIL] Error testing payload generation: {e}")
-        raise
-
-
-def test_fastapi_app_exists():
-    """Test that FastAPI app is properly configured."""
-    try:
-        from core.utils.agent_api import app
-        
-        # Check routes exist
-        routes = [route.path for route in app.routes]
-        assert "/healthz" in routes
-        assert "/v1/models" in routes
-        assert "/v1/chat/completions" in routes
-        
-        print("[PASS] FastAPI app is properly configured")
-    except Exception as e:
-        print(f"[FAIL] Error checking FastAPI app: {e}")
-        raise
-
-
-if __name__ == "__main__":
-    print("Running Agent API tests...")
-    
-    test_agent_api_imports()
-    test_discover_agents()
-    test_split_history_and_prompt()
-    test_extract_memory()
-    test_chat_completion_payload()
-    test_fastapi_app_exists()
-    
-    print("\nAll tests passed!")
-
+"""Tests for Agent API server."""
+import os
+import sys
+from pathlib import Path
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+
+def test_agent_api_imports():
+    """Test that agent API module can be imported."""
+    try:
+        from core.utils import agent_api
+        assert hasattr(agent_api, 'app')
+        assert hasattr(agent_api, '_discover_agents')
+        assert hasattr(agent_api, '_init_agents')
+        print("[PASS] Agent API module imports correctly")
+    except Exception as e:
+        print(f"[FAIL] Error importing agent API: {e}")
+        raise
+
+
+def test_discover_agents():
+    """Test agent discovery."""
+    try:
+        from core.utils.agent_api import _discover_agents, AGENTS_ROOT
+        
+        # Should find simple_agent and passthrough_agent
+        agents = _discover_agents()
+        
+        assert isinstance(agents, dict)
+        # If agents exist, they should have run_agent method
+        for agent_name, agent_mod in agents.items():
+            assert hasattr(agent_mod, 'run_agent')
+        
+        print(f"[PASS] Agent discovery found {len(agents)} agent(s)")
+    except Exception as e:
+        print(f"[FAIL] Error discovering agents: {e}")
+        raise
+
+
+def test_split_history_and_prompt():
+    """Test message splitting."""
+    try:
+        from core.utils.agent_api import _split_history_and_prompt, ChatMessage
+        
+        messages = [
+            ChatMessage(role="system", content="You are helpful"),
+            ChatMessage(role="user", content="Hello"),
+            ChatMessage(role="assistant", content="Hi there!"),
+            ChatMessage(role="user", content="How are you?"),
+        ]
+        
+        history, prompt = _split_history_and_prompt(messages)
+        
+        assert prompt == "How are you?"
+        assert "Hello" in history
+        assert "Hi there!" in history
+        
+        print("[PASS] Message splitting works correctly")
+    except Exception as e:
+        print(f"[FAIL] Error testing message splitting: {e}")
+        raise
+
+
+def test_extract_memory():
+    """Test memory extraction from header."""
+    try:
+        from core.utils.agent_api import _extract_memory, ChatMessage
+        
+        messages = [ChatMessage(role="user", content="test")]
+        
+        # Test with header
+        memory = _extract_memory(messages, "memory item 1\nmemory item 2")
+        assert memory == "memory item 1\nmemory item 2"
+        
+        # Test without header
+        memory = _extract_memory(messages, None)
+        assert memory is None
+        
+        print("[PASS] Memory extraction works correctly")
+    except Exception as e:
+        print(f"[FAIL] Error testing memory extraction: {e}")
+        raise
+
+
+def test_chat_completion_payload():
+    """Test OpenAI response payload generation."""
+    try:
+        from core.utils.agent_api import _make_chat_completion_payload
+        
+        payload = _make_chat_completion_payload("test_model", "test response")
+        
+        assert payload["object"] == "chat.completion"
+        assert payload["model"] == "test_model"
+        assert payload["choices"][0]["message"]["content"] == "test response"
+        assert payload["choices"][0]["message"]["role"] == "assistant"
+        assert "id" in payload
+        assert "created" in payload
+        
+        print("[PASS] Chat completion payload generation works")
+    except Exception as e:
+        print(f"[FAIL] Error testing payload generation: {e}")
+        raise
+
+
+def test_fastapi_app_exists():
+    """Test that FastAPI app is properly configured."""
+    try:
+        from core.utils.agent_api import app
+        
+        # Check routes exist
+        routes = [route.path for route in app.routes]
+        assert "/healthz" in routes
+        assert "/v1/models" in routes
+        assert "/v1/chat/completions" in routes
+        
+        print("[PASS] FastAPI app is properly configured")
+    except Exception as e:
+        print(f"[FAIL] Error checking FastAPI app: {e}")
+        raise
+
+
+def test_unknown_model_negative_cache():
+    """Unknown model IDs trigger one incremental refresh, then hit the negative cache."""
+    try:
+        from fastapi.testclient import TestClient
+        from core.utils import agent_api
+        
+        calls = []
+        original_refresh = agent_api._refresh_agents
+        
+        async def fake_refresh():
+            calls.append(1)
+            return []
+        agent_api._refresh_agents = fake_refresh
+        agent_api._UNKNOWN_MODELS.clear()
+        try:
+            client = TestClient(agent_api.app)
+            headers = {"Authorization": f"Bearer {agent_api.API_KEY}"}
+            body = {"model": "no-such-model", "messages": [{"role": "user", "content": "hi"}]}
+            for _ in range(3):
+                resp = client.post("/v1/chat/completions", json=body, headers=headers)
+                assert resp.status_code == 404
+            assert len(calls) == 1
+        finally:
+            agent_api._refresh_agents = original_refresh
+            agent_api._UNKNOWN_MODELS.clear()
+        
+        print("[PASS] Unknown models are negatively cached")
+    except Exception as e:
+        print(f"[FAIL] Error testing negative cache: {e}")
+        raise
+
+
+def test_refresh_agents_runs_off_the_event_loop():
+    """Hot-added agents are imported and warmed in a thread, once for concurrent misses."""
+    import asyncio
+    import threading
+    try:
+        from core.utils import agent_api
+        
+        base = object()
+        loop_ran = threading.Event()
+        scans = []
+        saved = (agent_api._load_new_agents, agent_api._sync_presets)
+        
+        def load_new_agents(paths):
+            scans.append(threading.current_thread())
+            # Only returns if the event loop keeps running meanwhile
+            assert loop_ran.wait(5), "event loop blocked during refresh"
+            paths["hot_agent_x"] = "core/agents/hot_agent_x/agent.py"
+            return {"hot_agent_x": base}
+        
+        async def scenario():
+            async def tick():
+                await asyncio.sleep(0)
+                loop_ran.set()
+            results = await asyncio.gather(agent_api._refresh_agents(), agent_api._refresh_agents(), tick())
+            return results[:2]
+        
+        agent_api._load_new_agents = load_new_agents
+        agent_api._sync_presets = lambda force=False, registry=None: []
+        try:
+            first, second = asyncio.run(scenario())
+            assert first == second == ["hot_agent_x"]
+            assert len(scans) == 1 and scans[0] is not threading.main_thread()
+            assert agent_api.AGENTS["hot_agent_x"] is base
+            assert agent_api.AGENT_PATHS["hot_agent_x"] == "core/agents/hot_agent_x/agent.py"
+        finally:
+            agent_api._load_new_agents, agent_api._sync_presets = saved
+            agent_api.AGENTS.pop("hot_agent_x", None)
+            agent_api.AGENT_PATHS.pop("hot_agent_x", None)
+            agent_api._REFRESHING = None
+        
+        print("[PASS] Agent refresh runs off the event loop")
+    except Exception as e:
+        print(f"[FAIL] Error testing agent refresh: {e}")
+        raise
+
+
+def test_sync_presets_incremental():
+    """Presets are only re-registered when master_config changes them."""
+    import json
+    import tempfile
+    try:
+        from core.utils import agent_api
+        
+        base = object()
+        saved = (dict(agent_api.AGENTS), agent_api.MASTER_CONFIG_PATH, agent_api._PRESETS_VERSION)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cfg_path = Path(tmpdir) / "master_config.json"
+            agent_api.MASTER_CONFIG_PATH = cfg_path
+            agent_api.AGENTS["base_agent_x"] = base
+            try:
+                presets = {"p1": {"base_agent": "base_agent_x", "tool_config": {"A_GET_x": {"enabled": True}}}}
+                cfg_path.write_text(json.dumps({"agent_presets": presets}))
+                assert agent_api._sync_presets(force=True) == ["p1"]
+                assert agent_api.AGENTS["p1"] is base
+                assert agent_api._PRESET_TOOL_CACHE["p1"] == {"A_GET_x"}
+                
+                # Unchanged file: nothing re-read
+                assert agent_api._sync_presets() == []
+                # Same content, forced: nothing re-registered
+                assert agent_api._sync_presets(force=True) == []
+                
+                presets["p2"] = {"base_agent": "base_agent_x"}
+                presets["p1"]["enabled"] = False
+                cfg_path.write_text(json.dumps({"agent_presets": presets}))
+                assert sorted(agent_api._sync_presets(force=True)) == ["p1", "p2"]
+                assert "p1" not in agent_api.AGENTS and "p1" not in agent_api._PRESET_TOOL_CACHE
+                assert agent_api.AGENTS["p2"] is base
+            finally:
+                for name in ("p1", "p2"):
+                    agent_api._unregister_preset(name)
+                agent_api.AGENTS.clear()
+                agent_api.AGENTS.update(saved[0])
+                agent_api.MASTER_CONFIG_PATH, agent_api._PRESETS_VERSION = saved[1], saved[2]
+        
+        print("[PASS] Presets sync incrementally")
+    except Exception as e:
+        print(f"[FAIL] Error testing preset sync: {e}")
+        raise
+
+
+def test_reload_keeps_serving_presets():
+    """A single-process reload builds the new registry aside; presets never disappear mid-reload."""
+    import json
+    import tempfile
+    try:
+        from fastapi.testclient import TestClient
+        from core.utils import agent_api, extension_watcher
+        
+        base = object()
+        seen_during_build = []
+        saved = (agent_api._live_registry(), agent_api._TOOL_CACHE, agent_api.MASTER_CONFIG_PATH,
+                 agent_api._discover_agents, agent_api._load_tool_cache, extension_watcher.WATCH_MODE)
+        
+        def discover(paths=None):
+            seen_during_build.append(agent_api.AGENTS.get("p1"))
+            paths["base_agent_x"] = "core/agents/base_agent_x/agent.py"
+            return {"base_agent_x": base}
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cfg_path = Path(tmpdir) / "master_config.json"
+            cfg_path.write_text(json.dumps({"agent_presets": {"p1": {"base_agent": "base_agent_x"}}}))
+            agent_api.MASTER_CONFIG_PATH = cfg_path
+            agent_api._install_registry(dict(saved[0], agents={"base_agent_x": base}, paths={},
+                                             preset_tools={}, preset_metadata={}, preset_signatures={}))
+            agent_api._discover_agents = discover
+            agent_api._load_tool_cache = lambda: {"T_x": object()}
+            extension_watcher.WATCH_MODE = "off"
+            try:
+                agent_api._sync_presets(force=True)
+                client = TestClient(agent_api.app)
+                headers = {"Authorization": f"Bearer {agent_api.API_KEY}"}
+                resp = client.post("/admin/reload", headers=headers)
+                assert resp.status_code == 200 and resp.json()["mode"] == "single"
+                assert seen_during_build == [base]
+                assert agent_api.AGENTS["p1"] is base and "p1" in agent_api._PRESET_TOOL_CACHE
+                assert agent_api.AGENT_PATHS["p1"] == "preset:base_agent_x"
+                assert "T_x" in agent_api._TOOL_CACHE
+            finally:
+                agent_api._discover_agents, agent_api._load_tool_cache, extension_watcher.WATCH_MODE = saved[3:]
+                agent_api.MASTER_CONFIG_PATH = saved[2]
+                agent_api._install_registry(dict(saved[0], tool_cache=saved[1]))
+                agent_api._AGENT_STATE.pop("base_agent_x", None)
+        
+        print("[PASS] Reload keeps serving presets")
+    except Exception as e:
+        print(f"[FAIL] Error testing registry reload: {e}")
+        raise
+
+
+def test_healthz_reports_readiness():
+    """The port answers immediately; /healthz?ready=true is 503 until agents are warm."""
+    try:
+        from fastapi.testclient import TestClient
+        from core.utils import agent_api
+        
+        saved = dict(agent_api._STARTUP)
+        try:
+            client = TestClient(agent_api.app)
+            agent_api._STARTUP.update({"ready": False, "registry_loaded": False})
+            resp = client.get("/healthz")
+            assert resp.status_code == 200 and resp.json()["status"] == "starting"
+            assert client.get("/healthz?ready=true").status_code == 503
+            
+            agent_api._STARTUP.update({"ready": True, "registry_loaded": True})
+            resp = client.get("/healthz?ready=true")
+            assert resp.status_code == 200 and resp.json()["status"] == "ok"
+        finally:
+            agent_api._STARTUP.clear()
+            agent_api._STARTUP.update(saved)
+        
+        print("[PASS] /healthz reports readiness")
+    except Exception as e:
+        print(f"[FAIL] Error testing readiness: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    print("Running Agent API tests...")
+    
+    test_agent_api_imports()
+    test_discover_agents()
+    test_split_history_and_prompt()
+    test_extract_memory()
+    test_chat_completion_payload()
+    test_fastapi_app_exists()
+    test_unknown_model_negative_cache()
+    test_refresh_agents_runs_off_the_event_loop()
+    test_sync_presets_incremental()
+    test_reload_keeps_serving_presets()
+    test_healthz_reports_readiness()
+    
+    print("\nAll tests passed!")
+
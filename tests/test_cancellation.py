@@ -0,0 +1,113 @@
+"""Tests for cooperative run cancellation."""
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from core.utils.cancellation import (
+    CancellationToken, RunCancelled, check_cancelled, is_cancelled, run_until_disconnected, use_token,
+)
+
+
+def test_token_callbacks_and_context():
+    """Tokens run callbacks once and are visible through the context variable."""
+    try:
+        token = CancellationToken()
+        calls = []
+        remove = token.on_cancel(lambda: calls.append("a"))
+        token.on_cancel(lambda: calls.append("b"))
+        remove()
+
+        with use_token(token):
+            assert not is_cancelled()
+            token.cancel("stop")
+            token.cancel("again")
+            assert is_cancelled()
+            try:
+                check_cancelled()
+                assert False, "expected RunCancelled"
+            except RunCancelled as exc:
+                assert "stop" in str(exc)
+        assert calls == ["b"]
+        assert not is_cancelled()
+
+        late = []
+        token.on_cancel(lambda: late.append(1))
+        assert late == [1]
+        print("[PASS] Tokens cancel once and propagate via context")
+    except Exception as e:
+        print(f"[FAIL] Error testing cancellation token: {e}")
+        raise
+
+
+def test_disconnect_cancels_run_and_threaded_tool():
+    """A client disconnect cancels the run task and signals tools in threads."""
+    state = {"tool_saw_cancel": False, "llm_cancelled": False}
+
+    def cooperative_tool():
+        for _ in range(100):
+            if is_cancelled():
+                state["tool_saw_cancel"] = True
+                return
+            time.sleep(0.01)
+
+    async def fake_run():
+        tool = asyncio.create_task(asyncio.to_thread(cooperative_tool))
+        try:
+            await asyncio.sleep(10)  # stands in for an in-flight LLM call
+        except asyncio.CancelledError:
+            state["llm_cancelled"] = True
+            await tool
+            raise
+
+    async def scenario():
+        polls = {"n": 0}
+
+        async def is_disconnected():
+            polls["n"] += 1
+            return polls["n"] >= 2
+
+        token = CancellationToken()
+        try:
+            await run_until_disconnected(fake_run(), is_disconnected, token, poll_interval=0.02)
+            assert False, "expected RunCancelled"
+        except RunCancelled:
+            pass
+        assert token.cancelled
+
+    try:
+        asyncio.run(scenario())
+        assert state["llm_cancelled"] and state["tool_saw_cancel"]
+        print("[PASS] Disconnect cancels the run and its tools")
+    except Exception as e:
+        print(f"[FAIL] Error testing disconnect cancellation: {e}")
+        raise
+
+
+def test_connected_run_returns_result():
+    """Runs that finish while the client is connected return normally."""
+    async def run():
+        await asyncio.sleep(0.01)
+        return "done"
+
+    async def connected():
+        return False
+
+    try:
+        assert asyncio.run(run_until_disconnected(run(), connected, CancellationToken(), poll_interval=0.005)) == "done"
+        print("[PASS] Connected runs complete")
+    except Exception as e:
+        print(f"[FAIL] Error testing connected run: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    print("Running cancellation tests...")
+    test_token_callbacks_and_context()
+    test_disconnect_cancels_run_and_threaded_tool()
+    test_connected_run_returns_result()
+    print("\nAll tests passed!")
@@ -0,0 +1,108 @@
+"""Tests for the cached master_config store."""
+import os
+import sys
+import json
+import tempfile
+import threading
+from pathlib import Path
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from core.utils import config_store
+from core.utils.config_store import ConfigStore
+
+
+def test_snapshots_are_cached_frozen_and_versioned():
+    """The file is parsed once per change; snapshots refuse mutation."""
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "master_config.json"
+            store = ConfigStore(path, recheck=60)
+            missing = store.snapshot()
+            assert not missing.exists and missing.data == {}
+
+            path.write_text(json.dumps({"extensions": {"a": {"enabled": True}}, "ports": [1, 2]}))
+            first = store.refresh()
+            assert first.exists and first.version == missing.version + 1
+            assert first["extensions"]["a"]["enabled"] is True and first["ports"] == (1, 2)
+            assert isinstance(first.data, dict)
+            for mutate in (lambda d: d.__setitem__("x", 1), lambda d: d["extensions"].pop("a")):
+                try:
+                    mutate(first.data)
+                    assert False, "snapshot was mutable"
+                except TypeError:
+                    pass
+
+            # Within the recheck period nothing is touched, even if the file changes
+            path.write_text(json.dumps({"extensions": {}}))
+            assert store.snapshot() is first
+            # An unchanged file is not re-parsed
+            unchanged = store.refresh()
+            assert unchanged.version == first.version + 1 and unchanged.data == {"extensions": {}}
+            assert store.refresh() is unchanged
+
+            copy = unchanged.thaw()
+            copy["extensions"]["b"] = {}
+            assert unchanged["extensions"] == {}
+
+            # A broken write keeps the last good version
+            path.write_text("{not json")
+            assert store.refresh() is unchanged
+        print("[PASS] Snapshots are cached, frozen and versioned")
+    except Exception as e:
+        print(f"[FAIL] Error testing snapshots: {e}")
+        raise
+
+
+def test_atomic_save_and_change_events():
+    """save() renames a complete file into place and notifies subscribers."""
+    try:
+        saved_poll = config_store.POLL_S
+        config_store.POLL_S = 0.05
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "master_config.json"
+            path.write_text(json.dumps({"v": 1}))
+            os.chmod(path, 0o600)
+            store = ConfigStore(path, recheck=60)
+            events = []
+            external = threading.Event()
+
+            def on_change(snapshot, previous):
+                events.append((previous.get("v"), snapshot.get("v")))
+                if snapshot.get("v") == 3:
+                    external.set()
+
+            unsubscribe = store.subscribe(on_change)
+            try:
+                inode = path.stat().st_ino
+                new = store.save({"v": 2})
+                assert new.get("v") == 2 and store.snapshot() is new
+                assert path.stat().st_ino != inode  # replaced, not rewritten in place
+                assert path.stat().st_mode & 0o777 == 0o600
+                assert json.loads(path.read_text()) == {"v": 2}
+                assert [p.name for p in Path(tmpdir).iterdir()] == ["master_config.json"]
+
+                # Another process writing the file is picked up by the poller
+                path.write_text(json.dumps({"v": 3}))
+                assert external.wait(2)
+                assert events == [(1, 2), (2, 3)]
+
+                store.update(lambda data: data.update(v=4))
+                assert store.get() == {"v": 4}
+            finally:
+                unsubscribe()
+        config_store.POLL_S = saved_poll
+        assert config_store.get_config_store() is config_store.get_config_store(config_store.MASTER_CONFIG_PATH)
+        print("[PASS] Atomic save and change events")
+    except Exception as e:
+        print(f"[FAIL] Error testing save/events: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    print("Running config store tests...")
+    test_snapshots_are_cached_frozen_and_versioned()
+    test_atomic_save_and_change_events()
+    print("\nAll tests passed!")
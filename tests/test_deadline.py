@@ -0,0 +1,99 @@
+"""Tests for per-request deadlines."""
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from core.utils.deadline import Deadline, remaining_time, timeout_for, use_deadline
+
+
+def test_deadline_parsing_and_clamping():
+    """Deadlines parse from milliseconds and clamp component timeouts."""
+    try:
+        assert Deadline.from_ms(None) is None
+        assert Deadline.from_ms("abc") is None
+        assert Deadline.from_ms(0) is None
+        deadline = Deadline.from_ms("2000")
+        assert 1.9 < deadline.remaining() <= 2.0
+
+        assert remaining_time() is None
+        assert timeout_for(30) == 30
+        with use_deadline(deadline):
+            assert timeout_for(30) <= 2.0
+            assert timeout_for(0.5) == 0.5
+            assert timeout_for() <= 2.0
+        assert remaining_time() is None
+
+        expired = Deadline(0)
+        assert expired.expired and expired.remaining() == 0
+        print("[PASS] Deadlines parse and clamp timeouts")
+    except Exception as e:
+        print(f"[FAIL] Error testing deadlines: {e}")
+        raise
+
+
+def test_passthrough_tool_respects_deadline():
+    """Tools that overrun the request deadline fail instead of blocking the run."""
+    try:
+        from core.agents.passthrough_agent import agent
+
+        def slow_tool(**kwargs):
+            time.sleep(0.5)
+            return agent.ToolResult(tool="SLOW_GET_thing", public_text="late")
+
+        agent.TOOL_RUNNERS["SLOW_GET_thing"] = slow_tool
+
+        async def scenario():
+            with use_deadline(Deadline(0.05)):
+                t0 = time.perf_counter()
+                res = await agent._run_one_tool("SLOW_GET_thing", {})
+                return res, time.perf_counter() - t0
+
+        try:
+            res, elapsed = asyncio.run(scenario())
+        finally:
+            agent.TOOL_RUNNERS.pop("SLOW_GET_thing", None)
+
+        assert res.success is False
+        assert res.error == "deadline exceeded"
+        assert elapsed < 0.4
+
+        with use_deadline(Deadline(10)):
+            assert agent._deadline_allows_step(2, last_plan_secs=1.0)
+            assert not agent._deadline_allows_step(2, last_plan_secs=30.0)
+        with use_deadline(Deadline(0)):
+            assert not agent._deadline_allows_step(1, last_plan_secs=0.0)
+        assert agent._deadline_allows_step(5, last_plan_secs=100.0)
+        print("[PASS] Passthrough tools and steps respect the deadline")
+    except Exception as e:
+        print(f"[FAIL] Error testing passthrough deadlines: {e}")
+        raise
+
+
+def test_only_deadline_fallbacks_count_as_cut():
+    """Plain string answers are not mistaken for runs cut by the deadline."""
+    try:
+        from core.utils.agent_api import _cut_by_deadline
+        from core.utils.deadline import DEADLINE_FALLBACK_TEXT
+
+        deadline = Deadline(10)
+        assert _cut_by_deadline(DEADLINE_FALLBACK_TEXT, deadline)
+        assert not _cut_by_deadline("A complete answer.", deadline)
+        assert not _cut_by_deadline(DEADLINE_FALLBACK_TEXT, None)
+        assert _cut_by_deadline("A complete answer.", Deadline(0))
+        print("[PASS] Only deadline fallbacks count as cut")
+    except Exception as e:
+        print(f"[FAIL] Error testing deadline cut detection: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    print("Running deadline tests...")
+    test_deadline_parsing_and_clamping()
+    test_passthrough_tool_respects_deadline()
+    test_only_deadline_fallbacks_count_as_cut()
+    print("\nAll tests passed!")
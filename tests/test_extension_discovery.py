@@ -116,7 +116,8 @@ TOOLS = [ENABLED_tool, DISABLED_tool]
 def test_build_all_light_schema():
     """Test schema building."""
     with tempfile.TemporaryDirectory() as tmpdir:
-        ext_dir = Path(tmpdir) / "schema_test"
+        ext_root = Path(tmpdir) / "extensions"
+        ext_dir = ext_root / "schema_test"
         tools_dir = ext_dir / "tools"
         tools_dir.mkdir(parents=True)
         
@@ -129,18 +130,80 @@ def SCHEMA_test_function(name: str, count: int) -> str:
 TOOLS = [SCHEMA_test_function]
 ''')
         
-        # Mock discover
-        import core.utils.extension_discovery as discovery_module
-        original_discover = discovery_module.discover_extensions
-        discovery_module.discover_extensions = lambda root=None: discover_extensions(tmpdir)
-        
-        try:
-            schema = build_all_light_schema()
-            assert 'SCHEMA_test_function' in schema
-            assert 'name' in schema
-            assert 'count' in schema
-        finally:
-            discovery_module.discover_extensions = original_discover
+        schema = build_all_light_schema(str(ext_root))
+        assert 'SCHEMA_test_function' in schema
+        assert 'name' in schema
+        assert 'count' in schema
+
+
+def test_shared_discovery_pass_scans_once():
+    """Discovery inside a shared pass scans the tree once and reuses the result."""
+    from core.utils import extension_discovery as discovery_module
+
+    calls = []
+    original_scan = discovery_module._scan_extensions
+
+    def counting_scan(tool_root):
+        calls.append(tool_root)
+        return original_scan(tool_root)
+
+    discovery_module._scan_extensions = counting_scan
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with discovery_module.shared_discovery_pass():
+                first = discover_extensions(tmpdir)
+                with discovery_module.shared_discovery_pass():
+                    second = discover_extensions(tmpdir)
+            assert first == second == []
+            assert len(calls) == 1
+
+            # Outside the pass every call scans again
+            discover_extensions(tmpdir)
+            assert len(calls) == 2
+    finally:
+        discovery_module._scan_extensions = original_scan
+
+
+
+def test_parallel_load_report():
+    """Extensions import concurrently and each gets a timing entry."""
+    from core.utils import extension_discovery as discovery_module
+    from core.utils import lazy_tools
+
+    saved = (discovery_module.DISCOVERY_WORKERS, lazy_tools.LAZY_ENABLED)
+    discovery_module.DISCOVERY_WORKERS = 4
+    lazy_tools.LAZY_ENABLED = False
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir) / "extensions"
+            for name, delay in (("slow_ext", 0.4), ("also_slow_ext", 0.4), ("fast_ext", 0.0)):
+                tools_dir = root / name / "tools"
+                tools_dir.mkdir(parents=True)
+                (tools_dir / f"{name}_tools.py").write_text(f'''
+import time
+time.sleep({delay})
+
+def {name.upper()}_ping() -> str:
+    """Ping."""
+    return "pong"
+
+TOOLS = [{name.upper()}_ping]
+''')
+
+            extensions = discover_extensions(str(root))
+            assert [e["name"] for e in extensions] == ["also_slow_ext", "fast_ext", "slow_ext"]
+
+            report = discovery_module.get_load_report(str(root))
+            assert report["workers"] == 3
+            assert report["total_secs"] < 0.75  # the two slow imports overlapped
+            timings = {t["name"]: t for t in report["extensions"]}
+            assert timings["slow_ext"]["secs"] >= 0.4 and timings["slow_ext"]["tools"] == 1
+            assert report["extensions"][-1]["name"] == "fast_ext"
+
+            written = discovery_module.read_load_reports(str(root))
+            assert len(written) == 1 and written[0]["alive"] and written[0]["pid"] == os.getpid()
+    finally:
+        discovery_module.DISCOVERY_WORKERS, lazy_tools.LAZY_ENABLED = saved
 
 
 if __name__ == "__main__":
@@ -157,5 +220,11 @@ if __name__ == "__main__":
     test_build_all_light_schema()
     print("[PASS] Schema building test passed")
     
+    test_shared_discovery_pass_scans_once()
+    print("[PASS] Shared discovery pass test passed")
+    
+    test_parallel_load_report()
+    print("[PASS] Parallel load report test passed")
+    
     print("\nAll tests passed!")
 
@@ -0,0 +1,126 @@
+"""Tests for per-extension module namespaces."""
+import sys
+import tempfile
+from pathlib import Path
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from core.utils import extension_namespace
+from core.utils.extension_discovery import _load_tool_module
+
+TOOLS = '''
+import helpers
+from helpers import VALUE
+from . import helpers as relative_helpers
+import json
+
+def get_value() -> str:
+    return f"{helpers.VALUE}:{VALUE}:{relative_helpers is helpers}:{json.dumps(1)}"
+
+TOOLS = [get_value]
+'''
+
+
+def _make_ext(root: Path, name: str, value: str) -> Path:
+    tools_dir = root / name / "tools"
+    tools_dir.mkdir(parents=True)
+    (tools_dir / "helpers.py").write_text(f"VALUE = {value!r}\n")
+    (tools_dir / f"{name}_tools.py").write_text(TOOLS)
+    return tools_dir
+
+
+def test_same_named_helpers_stay_separate():
+    """Bare sibling imports resolve inside the extension's own package."""
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path_before = list(sys.path)
+            mods = {}
+            for name, value in (("ns_alpha", "a"), ("ns_beta", "b")):
+                tools_dir = _make_ext(Path(tmpdir), name, value)
+                mods[name] = _load_tool_module(str(tools_dir / f"{name}_tools.py"), str(tools_dir))
+            try:
+                assert sys.path == path_before
+                assert "helpers" not in sys.modules
+                assert mods["ns_alpha"].__name__ == "luna_ext.ns_alpha.ns_alpha_tools"
+                assert mods["ns_alpha"].get_value() == "a:a:True:1"
+                assert mods["ns_beta"].get_value() == "b:b:True:1"
+                assert sys.modules["luna_ext.ns_beta.helpers"].VALUE == "b"
+            finally:
+                for name in mods:
+                    extension_namespace.unload(name)
+        print("[PASS] Same-named helpers stay separate")
+    except Exception as e:
+        print(f"[FAIL] Error testing namespaces: {e}")
+        raise
+
+
+def test_unload_is_per_extension():
+    """Unloading one extension re-reads its helpers and leaves others cached."""
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            alpha = _make_ext(Path(tmpdir), "ns_alpha", "a")
+            beta = _make_ext(Path(tmpdir), "ns_beta", "b")
+            try:
+                _load_tool_module(str(alpha / "ns_alpha_tools.py"), str(alpha))
+                _load_tool_module(str(beta / "ns_beta_tools.py"), str(beta))
+                beta_helpers = sys.modules["luna_ext.ns_beta.helpers"]
+
+                (alpha / "helpers.py").write_text("VALUE = 'a2'\n")
+                assert extension_namespace.unload("ns_alpha") == 3
+                assert not any(n.startswith("luna_ext.ns_alpha") for n in sys.modules)
+                module = _load_tool_module(str(alpha / "ns_alpha_tools.py"), str(alpha))
+                assert module.get_value().startswith("a2:a2")
+                assert sys.modules["luna_ext.ns_beta.helpers"] is beta_helpers
+                assert set(extension_namespace.loaded_extensions()) >= {"ns_alpha", "ns_beta"}
+            finally:
+                extension_namespace.unload("ns_alpha")
+                extension_namespace.unload("ns_beta")
+        print("[PASS] Unload is per extension")
+    except Exception as e:
+        print(f"[FAIL] Error testing unload: {e}")
+        raise
+
+
+def test_similar_names_get_separate_packages():
+    """my-ext and my_ext never share (and so never unload) each other's package."""
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dashed = _make_ext(Path(tmpdir), "ns-gamma", "dash")
+            under = _make_ext(Path(tmpdir), "ns_gamma", "under")
+            try:
+                first = _load_tool_module(str(dashed / "ns-gamma_tools.py"), str(dashed))
+                second = _load_tool_module(str(under / "ns_gamma_tools.py"), str(under))
+                assert extension_namespace.package_key("ns-gamma") != "ns_gamma"
+                assert first.__name__ != second.__name__
+                assert first.get_value().startswith("dash:dash")
+                assert second.get_value().startswith("under:under")
+                assert set(extension_namespace.loaded_extensions()) >= {"ns-gamma", "ns_gamma"}
+
+                # Should two names still map to one package, register refuses
+                original = extension_namespace.package_key
+                extension_namespace.package_key = lambda name: "ns_gamma"
+                try:
+                    extension_namespace.register("ns-gamma", str(dashed))
+                    raise AssertionError("colliding extension was registered")
+                except ValueError:
+                    pass
+                finally:
+                    extension_namespace.package_key = original
+                assert sys.modules[second.__name__] is second
+            finally:
+                extension_namespace.unload("ns-gamma")
+                extension_namespace.unload("ns_gamma")
+        print("[PASS] Similar extension names get separate packages")
+    except Exception as e:
+        print(f"[FAIL] Error testing package keys: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    print("Running extension namespace tests...")
+    test_same_named_helpers_stay_separate()
+    test_unload_is_per_extension()
+    test_similar_names_get_separate_packages()
+    print("\nAll tests passed!")
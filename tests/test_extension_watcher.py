@@ -0,0 +1,146 @@
+"""Tests for extension hot reload (watcher, change channel, incremental reload)."""
+import sys
+import time
+import tempfile
+import threading
+from pathlib import Path
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from core.utils import extension_watcher
+from core.utils.extension_discovery import discover_extensions, reload_extensions, refresh_extensions, _LIVE
+
+
+def _tools_source(tool: str, result: str) -> str:
+    return f'def {tool}() -> str:\n    """{tool} tool."""\n    return "{result}"\n\nTOOLS = [{tool}]\n'
+
+
+def _make_ext(root: Path, name: str, tool: str, result: str = "v1") -> Path:
+    tools_dir = root / name / "tools"
+    tools_dir.mkdir(parents=True, exist_ok=True)
+    path = tools_dir / f"{name}_tools.py"
+    path.write_text(_tools_source(tool, result))
+    return path
+
+
+def _collect(backend_polling: bool, root: Path):
+    batches = []
+    got = threading.Event()
+
+    def on_change(names):
+        batches.append(names)
+        got.set()
+
+    watcher = extension_watcher.ExtensionWatcher(
+        on_change, root=str(root), debounce=0.2, poll_interval=0.05, polling=backend_polling
+    ).start()
+    return watcher, batches, got
+
+
+def test_watcher_debounces_changed_extensions():
+    """Bursts of edits become one batch naming only the changed extensions."""
+    try:
+        for polling in (True, False):
+            with tempfile.TemporaryDirectory() as tmpdir:
+                root = Path(tmpdir)
+                a = _make_ext(root, "alpha", "ALPHA_GET_x")
+                _make_ext(root, "beta", "BETA_GET_x")
+                watcher, batches, got = _collect(polling, root)
+                try:
+                    time.sleep(0.1)
+                    for i in range(3):
+                        a.write_text(_tools_source("ALPHA_GET_x", f"v{i + 2}"))
+                        time.sleep(0.06)
+                    (root / "alpha" / "tools" / "__pycache__").mkdir(exist_ok=True)
+                    (root / "beta" / "ui").mkdir()  # not tool related
+                    _make_ext(root, "gamma", "GAMMA_GET_x")
+                    assert got.wait(5), f"no change reported ({watcher.backend})"
+                    time.sleep(0.4)
+                finally:
+                    watcher.stop()
+                assert sorted(n for batch in batches for n in batch) == ["alpha", "gamma"], batches
+                assert len(batches) <= 2
+        print("[PASS] Watcher debounces changed extensions")
+    except Exception as e:
+        print(f"[FAIL] Error testing watcher: {e}")
+        raise
+
+
+def test_channel_and_incremental_reload():
+    """Published names reach subscribers; only those extensions are reloaded."""
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            channel = Path(tmpdir) / "events"
+            received = []
+            got = threading.Event()
+            sub = extension_watcher.subscribe(lambda names: (received.append(names), got.set()), "test", channel)
+            (channel / "gone-1.sock").touch()  # stale socket from a dead process
+            try:
+                assert extension_watcher.publish(["alpha"], directory=channel) == 1
+                assert got.wait(2) and received == [["alpha"]]
+                assert not (channel / "gone-1.sock").exists()
+            finally:
+                sub.stop()
+            assert not Path(sub.path).exists()
+
+            root = Path(tmpdir) / "exts"
+            a = _make_ext(root, "alpha", "ALPHA_GET_x")
+            _make_ext(root, "beta", "BETA_GET_x")
+            try:
+                statuses = reload_extensions([], str(root))  # start tracking
+                before = {e["name"]: e for e in discover_extensions(str(root))}
+                assert statuses == {} and before["alpha"]["tools"][0]() == "v1"
+
+                a.write_text(_tools_source("ALPHA_GET_x", "v2"))
+                _make_ext(root, "gamma", "GAMMA_GET_x")
+                statuses = reload_extensions(["alpha", "gamma", "missing"], str(root))
+                assert statuses == {"alpha": "reloaded", "gamma": "loaded", "missing": "absent"}
+
+                after = {e["name"]: e for e in discover_extensions(str(root))}
+                assert after["alpha"]["tools"][0]() == "v2"
+                assert after["beta"] is before["beta"]  # untouched
+                assert list(after) == ["alpha", "beta", "gamma"]
+            finally:
+                _LIVE.pop(str(root.resolve()), None)
+        print("[PASS] Channel delivers changes and reload is incremental")
+    except Exception as e:
+        print(f"[FAIL] Error testing reload: {e}")
+        raise
+
+
+def test_refresh_rereads_changes_missed_by_this_process():
+    """A process that missed change events (the pre-fork master) catches up on refresh."""
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir) / "exts"
+            a = _make_ext(root, "alpha", "ALPHA_GET_x")
+            try:
+                reload_extensions([], str(root))  # tracked like a watching service
+                assert discover_extensions(str(root))[0]["tools"][0]() == "v1"
+
+                a.write_text(_tools_source("ALPHA_GET_x", "v2"))
+                _make_ext(root, "beta", "BETA_GET_x")
+                # No event reached this process, so the snapshot is still the old code
+                assert [e["name"] for e in discover_extensions(str(root))] == ["alpha"]
+
+                refresh_extensions(str(root))
+                after = {e["name"]: e for e in discover_extensions(str(root))}
+                assert list(after) == ["alpha", "beta"]
+                assert after["alpha"]["tools"][0]() == "v2"
+                assert str(root.resolve()) in _LIVE  # still tracked
+            finally:
+                _LIVE.pop(str(root.resolve()), None)
+        print("[PASS] Refresh rereads extensions changed behind this process")
+    except Exception as e:
+        print(f"[FAIL] Error testing refresh: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    print("Running extension watcher tests...")
+    test_watcher_debounces_changed_extensions()
+    test_channel_and_incremental_reload()
+    test_refresh_rereads_changes_missed_by_this_process()
+    print("\nAll tests passed!")
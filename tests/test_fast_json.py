@@ -0,0 +1,73 @@
+"""Tests for the shared fast JSON layer."""
+import sys
+import json
+import tempfile
+from pathlib import Path
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from core.utils import fast_json
+
+
+def _backends():
+    """Yield the module once per available backend (fast first, then stdlib)."""
+    yield fast_json
+    saved = fast_json.orjson
+    fast_json.orjson = None
+    try:
+        yield fast_json
+    finally:
+        fast_json.orjson = saved
+
+
+def test_round_trip_both_backends():
+    """Both backends agree with the stdlib on what they encode and decode."""
+    try:
+        data = {"a": [1, 2.5, None, True], "ü": "🌙 \"quoted\"", 3: "int key", "nested": {"x": {}}}
+        expected = json.loads(json.dumps(data))
+        for mod in _backends():
+            encoded = mod.dumps(data)
+            assert json.loads(encoded) == expected
+            assert "🌙" in encoded  # UTF-8, not \\u escapes
+            assert mod.loads(encoded) == expected
+            assert mod.loads(encoded.encode("utf-8")) == expected
+            assert mod.loads("NaN") != mod.loads("NaN")  # stdlib-compatible leniency
+            assert mod.loads(str(2 ** 70)) == 2 ** 70
+            assert json.loads(mod.dumps({"s": "\ud800"})) == {"s": "\ud800"}
+            assert json.loads(mod.quote("a\n\"b\" \ud800")) == "a\n\"b\" \ud800"
+            try:
+                mod.loads("{not json")
+                assert False, "expected JSONDecodeError"
+            except mod.JSONDecodeError:
+                pass
+        print("[PASS] Backends round-trip like the stdlib")
+    except Exception as e:
+        print(f"[FAIL] Error testing round trip: {e}")
+        raise
+
+
+def test_files_and_response_class():
+    """Files are written pretty-printed and responses render compact UTF-8."""
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "state.json"
+            for mod in _backends():
+                mod.write_file(path, {"services": {"agent_api": {"port": 8080}}})
+                text = path.read_text()
+                assert text.startswith('{\n  "services": {')
+                assert mod.read_file(path) == {"services": {"agent_api": {"port": 8080}}}
+                body = mod.FastJSONResponse({"ok": "✓"}).body
+                assert body == '{"ok":"✓"}'.encode("utf-8")
+        print("[PASS] Files and responses use the shared encoder")
+    except Exception as e:
+        print(f"[FAIL] Error testing files/responses: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    print("Running fast JSON tests...")
+    test_round_trip_both_backends()
+    test_files_and_response_class()
+    print("\nAll tests passed!")
@@ -0,0 +1,105 @@
+"""Tests for rolling conversation summaries."""
+import sys
+import asyncio
+from pathlib import Path
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from core.utils.history_summary import HistorySummaryCache, prefix_hashes
+
+
+def _conversation(turns: int):
+    lines = []
+    for i in range(turns):
+        lines.append(f"user: question {i} " + "detail " * 20)
+        lines.append(f"assistant: answer {i} " + "detail " * 20)
+    return lines
+
+
+def _make_cache():
+    calls = []
+
+    async def fake_summarizer(previous, new_lines):
+        calls.append(list(new_lines))
+        return (previous + " | " if previous else "") + f"{len(new_lines)} lines"
+
+    cache = HistorySummaryCache(summarizer=fake_summarizer, recent_lines=4, min_tokens=50, batch_lines=4)
+    return cache, calls
+
+
+def test_prefix_hashes_are_stable():
+    """Prefix hashes depend only on the lines they cover."""
+    try:
+        a = prefix_hashes(["user: hi", "assistant: hello", "user: more"])
+        b = prefix_hashes(["user: hi", "assistant: hello"])
+        assert a[:2] == b
+        assert len(set(a)) == 3
+        print("[PASS] Prefix hashes are stable")
+    except Exception as e:
+        print(f"[FAIL] Error testing prefix hashes: {e}")
+        raise
+
+
+def test_compact_summarizes_only_the_delta():
+    """Each turn reuses the cached summary and summarizes only new lines."""
+    try:
+        cache, calls = _make_cache()
+
+        first = asyncio.run(cache.compact(_conversation(6)))
+        assert calls == [_conversation(6)[:8]]
+        assert first.startswith("Summary of earlier conversation:\n8 lines")
+        assert "answer 5" in first and "question 0 " not in first
+
+        # One more turn: 2 new older lines stay verbatim (below batch size)
+        second = asyncio.run(cache.compact(_conversation(7)))
+        assert len(calls) == 1
+        assert "question 4 " in second and "answer 6" in second
+
+        # Two more turns: the 4-line delta is folded into the summary
+        asyncio.run(cache.compact(_conversation(8)))
+        assert len(calls) == 2
+        assert calls[1] == _conversation(8)[8:12]
+
+        # Repeating the same request is a pure cache hit
+        asyncio.run(cache.compact(_conversation(8)))
+        assert len(calls) == 2
+        print("[PASS] Only history deltas are summarized")
+    except Exception as e:
+        print(f"[FAIL] Error testing rolling summary: {e}")
+        raise
+
+
+def test_compact_short_history_and_failures():
+    """Short histories pass through; summarizer errors and timeouts fall back to full history."""
+    try:
+        cache, calls = _make_cache()
+        short = ["user: hi", "assistant: hello"]
+        assert asyncio.run(cache.compact(short)) == "user: hi\nassistant: hello"
+        assert calls == []
+
+        async def broken(previous, new_lines):
+            raise RuntimeError("no model")
+
+        failing = HistorySummaryCache(summarizer=broken, recent_lines=4, min_tokens=50)
+        lines = _conversation(6)
+        assert asyncio.run(failing.compact(lines)) == "\n".join(lines)
+
+        async def hung(previous, new_lines):
+            await asyncio.sleep(30)
+
+        slow = HistorySummaryCache(summarizer=hung, recent_lines=4, min_tokens=50, timeout=5)
+        assert asyncio.run(slow.compact(lines, timeout=0.05)) == "\n".join(lines)
+        print("[PASS] Short histories and failures keep full history")
+    except Exception as e:
+        print(f"[FAIL] Error testing summary fallback: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    print("Running history summary tests...")
+    test_prefix_hashes_are_stable()
+    test_compact_summarizes_only_the_delta()
+    test_compact_short_history_and_failures()
+    print("\nAll tests passed!")
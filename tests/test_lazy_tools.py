@@ -0,0 +1,139 @@
+"""Tests for lazily imported extension tools."""
+import sys
+import inspect
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from core.utils import lazy_tools
+from core.utils.extension_discovery import discover_extensions
+
+
+LAZY_TOOLS = '''
+from typing import Optional
+open(__file__ + ".imported", "w").close()
+
+SYSTEM_PROMPT = "Lazy prompt"
+
+def LAZY_GET_item(name: str, limit: Optional[int] = 5, *, tags: list = []) -> str:
+    """Get an item lazily."""
+    return f"{name}:{limit}:{tags}"
+
+def LAZY_GET_other() -> str:
+    """Other tool."""
+    return "other"
+
+TOOLS = [LAZY_GET_item, LAZY_GET_other]
+'''
+
+EAGER_TOOLS = '''
+from pydantic import BaseModel
+open(__file__ + ".imported", "w").close()
+
+class Query(BaseModel):
+    text: str
+
+def EAGER_search(query: Query) -> str:
+    """Needs a model from this module to describe its signature."""
+    return query.text
+
+TOOLS = [EAGER_search]
+'''
+
+
+def _make_tree(tmpdir: str) -> str:
+    for ext, source in (("lazy_ext", LAZY_TOOLS), ("eager_ext", EAGER_TOOLS)):
+        tools_dir = Path(tmpdir) / ext / "tools"
+        tools_dir.mkdir(parents=True)
+        (tools_dir / f"{ext}_tools.py").write_text(source)
+    return tmpdir
+
+
+def _imports(tmpdir: str):
+    """Extensions whose tools module has been executed."""
+    return sorted(p.parts[-3] for p in Path(tmpdir).glob("*/tools/*.imported"))
+
+
+def test_tools_import_on_first_call():
+    """Faithful signatures become proxies that import their module once."""
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            exts = {e["name"]: e for e in discover_extensions(_make_tree(tmpdir))}
+            # Only the module whose signature needs its own classes was imported
+            assert _imports(tmpdir) == ["eager_ext"]
+
+            lazy = exts["lazy_ext"]
+            assert lazy["system_prompt"] == "Lazy prompt"
+            item, other = lazy["tools"]
+            assert item.__name__ == "LAZY_GET_item" and item.__doc__ == "Get an item lazily."
+            sig = inspect.signature(item)
+            assert sig.parameters["limit"].annotation == Optional[int]
+            assert sig.parameters["limit"].default == 5
+            assert sig.parameters["tags"].kind is inspect.Parameter.KEYWORD_ONLY
+            assert not hasattr(exts["eager_ext"]["tools"][0], "__luna_lazy__")
+
+            assert item("a", tags=["x"]) == "a:5:['x']"
+            assert other() == "other"
+            assert _imports(tmpdir) == ["eager_ext", "lazy_ext"]
+        print("[PASS] Tools import on first call")
+    except Exception as e:
+        print(f"[FAIL] Error testing lazy tools: {e}")
+        raise
+
+
+def test_warm_list_imports_up_front():
+    """Extensions or tools on the warm list are imported during discovery."""
+    try:
+        saved = lazy_tools.WARM_LIST
+        lazy_tools.WARM_LIST = {"LAZY_GET_other"}
+        try:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                exts = {e["name"]: e for e in discover_extensions(_make_tree(tmpdir))}
+                assert _imports(tmpdir) == ["eager_ext", "lazy_ext"]
+                assert not any(hasattr(t, "__luna_lazy__") for t in exts["lazy_ext"]["tools"])
+        finally:
+            lazy_tools.WARM_LIST = saved
+        assert lazy_tools.should_warm("x", [], warm={"*"})
+        assert not lazy_tools.should_warm("x", ["T"], warm={"y"})
+        print("[PASS] Warm list imports up front")
+    except Exception as e:
+        print(f"[FAIL] Error testing warm list: {e}")
+        raise
+
+
+def test_manifest_mismatch_falls_back_to_position():
+    """A proxy whose name no longer matches the imported TOOLS still calls the tool."""
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tools_dir = Path(tmpdir) / "renamed_ext" / "tools"
+            tools_dir.mkdir(parents=True)
+            tool_file = tools_dir / "renamed_tools.py"
+            tool_file.write_text(
+                "def wrap(fn):\n    def wrapper(*args):\n        return fn(*args)\n    return wrapper\n\n"
+                "@wrap\ndef RENAMED_GET_x(name: str) -> str:\n    return 'x:' + name\n\n"
+                "@wrap\ndef RENAMED_GET_y(name: str) -> str:\n    return 'y:' + name\n\n"
+                "TOOLS = [RENAMED_GET_x, RENAMED_GET_y]\n"
+            )
+            module = lazy_tools.LazyToolModule("renamed_ext", str(tool_file), str(tools_dir))
+            specs = [
+                {"name": name, "params": [{"name": "name", "annotation": "str", "required": True}]}
+                for name in ("RENAMED_GET_x", "RENAMED_GET_y")
+            ]
+            proxies = [lazy_tools.make_proxy(spec, module, i) for i, spec in enumerate(specs)]
+            assert [p("a") for p in proxies] == ["x:a", "y:a"]
+        print("[PASS] Manifest mismatch falls back to position")
+    except Exception as e:
+        print(f"[FAIL] Error testing manifest mismatch: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    print("Running lazy tool tests...")
+    test_tools_import_on_first_call()
+    test_warm_list_imports_up_front()
+    test_manifest_mismatch_falls_back_to_position()
+    print("\nAll tests passed!")
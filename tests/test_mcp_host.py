@@ -0,0 +1,117 @@
+"""Tests for the multi-tenant MCP host."""
+import sys
+from pathlib import Path
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+
+def test_select_servers():
+    """Only enabled servers (and the requested subset) are hosted."""
+    try:
+        from core.utils.mcp_host import select_servers
+
+        config = {"mcp_servers": {
+            "main": {"port": 8766},
+            "gym": {"port": 8767, "enabled": True, "api_key": "k1"},
+            "off": {"port": 8768, "enabled": False, "api_key": "k2"},
+        }}
+        assert list(select_servers(config)) == ["main", "gym"]
+        assert list(select_servers(config, ["gym", "off"])) == ["gym"]
+        assert select_servers({}) == {}
+        print("[PASS] Server selection")
+    except Exception as e:
+        print(f"[FAIL] Error testing server selection: {e}")
+        raise
+
+
+def test_servers_keep_separate_tools_and_auth():
+    """Servers built in one process have their own tool views and API keys."""
+    try:
+        import asyncio
+        from starlette.testclient import TestClient
+        from core.utils.mcp_server import _build_app, _create_server, _register_tools
+
+        def shared_tool() -> str:
+            """Available on both servers."""
+            return "shared"
+
+        def gym_tool() -> str:
+            """Only on gym."""
+            return "gym"
+
+        gym = _create_server("gym", "key-gym")
+        other = _create_server("other", "key-other")
+        assert _create_server("gym", None) is None  # only 'main' may use OAuth
+        _register_tools(gym["mcp"], [shared_tool, gym_tool])
+        _register_tools(other["mcp"], [shared_tool])
+
+        gym_tools = asyncio.run(gym["mcp"].get_tools())
+        other_tools = asyncio.run(other["mcp"].get_tools())
+        assert set(gym_tools) == {"shared_tool", "gym_tool"}
+        assert set(other_tools) == {"shared_tool"}
+
+        client = TestClient(_build_app(other))
+        assert client.post("/mcp", headers={"Authorization": "Bearer key-gym"}).status_code == 401
+        # Metrics cover the whole process: behind the key, and absent when hosted
+        assert client.get("/metrics").status_code == 401
+        assert client.get("/metrics", headers={"Authorization": "Bearer key-other"}).status_code == 200
+        hosted = TestClient(_build_app(other, metrics_route=False))
+        assert hosted.get("/metrics", headers={"Authorization": "Bearer key-other"}).status_code != 200
+        print("[PASS] Servers keep separate tools and auth")
+    except Exception as e:
+        print(f"[FAIL] Error testing hosted servers: {e}")
+        raise
+
+
+def test_busy_port_fails_only_its_server():
+    """A server that cannot bind fails alone; the others keep serving."""
+    try:
+        import socket
+        import asyncio
+        import urllib.request
+        import uvicorn
+        from core.utils.mcp_host import _HostedServer, _serve_all
+
+        async def app(scope, receive, send):
+            if scope["type"] != "http":
+                return
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"ok"})
+
+        with socket.socket() as busy, socket.socket() as probe:
+            busy.bind(("127.0.0.1", 0))
+            busy.listen(1)
+            probe.bind(("127.0.0.1", 0))
+            free_port = probe.getsockname()[1]
+            probe.close()
+            servers = [
+                _HostedServer(uvicorn.Config(app, host="127.0.0.1", port=busy.getsockname()[1], log_level="critical")),
+                _HostedServer(uvicorn.Config(app, host="127.0.0.1", port=free_port, log_level="critical")),
+            ]
+
+            async def scenario():
+                serving = asyncio.create_task(_serve_all(servers))
+                for _ in range(100):
+                    if servers[1].started:
+                        break
+                    await asyncio.sleep(0.05)
+                body = await asyncio.to_thread(lambda: urllib.request.urlopen(f"http://127.0.0.1:{free_port}/", timeout=2).read())
+                assert body == b"ok"
+                servers[1].should_exit = True
+                return await serving
+
+            assert asyncio.run(scenario()) == 1
+        print("[PASS] A busy port fails only its server")
+    except Exception as e:
+        print(f"[FAIL] Error testing busy port: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    print("Running MCP host tests...")
+    test_select_servers()
+    test_servers_keep_separate_tools_and_auth()
+    test_busy_port_fails_only_its_server()
+    print("\nAll tests passed!")
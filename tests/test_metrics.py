@@ -0,0 +1,100 @@
+"""Tests for Prometheus-style metrics."""
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from core.utils import metrics
+from core.utils import tracing
+
+
+def test_render_text_format():
+    """Counters, gauges and histograms render in the exposition format."""
+    try:
+        reg = metrics.Registry()
+        c = reg.counter("t_requests_total", "Requests", ("path",))
+        c.inc(path='/a "b"\n')
+        c.inc(2, path='/a "b"\n')
+        reg.gauge("t_active", "Active").set(3)
+        h = reg.histogram("t_latency_seconds", "Latency", buckets=(0.1, 1.0))
+        h.observe(0.05)
+        h.observe(0.5)
+        h.observe(5)
+        reg.register_collector(lambda: [("t_pool", "gauge", "Pool", [({"db": "main"}, 4)])])
+        text = reg.render()
+
+        assert '# TYPE t_requests_total counter' in text
+        assert 't_requests_total{path="/a \\"b\\"\\n"} 3' in text
+        assert 't_active 3' in text
+        assert 't_latency_seconds_bucket{le="0.1"} 1' in text
+        assert 't_latency_seconds_bucket{le="1"} 2' in text
+        assert 't_latency_seconds_bucket{le="+Inf"} 3' in text
+        assert 't_latency_seconds_sum 5.55' in text
+        assert 't_latency_seconds_count 3' in text
+        assert 't_pool{db="main"} 4' in text
+        assert reg.counter("t_requests_total", "Requests", ("path",)) is c
+        try:
+            reg.gauge("t_requests_total", "Requests", ("path",))
+            assert False, "expected ValueError"
+        except ValueError:
+            pass
+        print("[PASS] Registry renders Prometheus text")
+    except Exception as e:
+        print(f"[FAIL] Error testing render: {e}")
+        raise
+
+
+def test_middleware_and_shared_metrics():
+    """The middleware labels by route template and model; helpers feed shared series."""
+    try:
+        from fastapi import FastAPI, Request
+        from fastapi.testclient import TestClient
+
+        app = FastAPI()
+        app.add_middleware(metrics.MetricsMiddleware, service="test-metrics")
+
+        @app.get("/items/{item_id}")
+        async def item(item_id: int, request: Request):
+            request.state.luna_model = "test-model"
+            return {"id": item_id}
+
+        @app.get("/metrics")
+        async def get_metrics():
+            return metrics.metrics_response()
+
+        client = TestClient(app)
+        assert client.get("/items/1").status_code == 200
+        assert client.get("/items/2").status_code == 200
+        assert client.get("/missing").status_code == 404
+
+        labels = {"service": "test-metrics", "method": "GET"}
+        assert metrics.HTTP_REQUESTS.value(route="/items/{item_id}", status="200", **labels) == 2
+        assert metrics.HTTP_REQUESTS.value(route="unmatched", status="404", **labels) == 1
+        assert metrics.AGENT_REQUESTS.value(model="test-model", status="200") == 2
+
+        metrics.observe_tool("T_test_tool", 0.01, "timeout")
+        usage = tracing.llm_token_usage(SimpleNamespace(
+            llm_output={"token_usage": {"prompt_tokens": 7, "completion_tokens": 2}}
+        ))
+        metrics.record_llm_tokens("test-role", usage)
+        assert metrics.LLM_TOKENS.value(role="test-role", type="prompt") == 7
+
+        scrape = client.get("/metrics")
+        assert scrape.headers["content-type"].startswith("text/plain")
+        assert 'luna_tool_calls_total{tool="T_test_tool",status="timeout"} 1' in scrape.text
+        assert 'luna_llm_tokens_total{role="test-role",type="completion"} 2' in scrape.text
+        assert "luna_process_start_time_seconds" in scrape.text
+        print("[PASS] Middleware and shared metrics")
+    except Exception as e:
+        print(f"[FAIL] Error testing metrics middleware: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    print("Running metrics tests...")
+    test_render_text_format()
+    test_middleware_and_shared_metrics()
+    print("\nAll tests passed!")
@@ -0,0 +1,143 @@
+"""Tests for the pre-fork server."""
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import tempfile
+import multiprocessing
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from core.utils import prefork
+
+pytestmark = pytest.mark.skipif(not prefork.supported(), reason="fork not available")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _run_master(port: int, marker: str) -> None:
+    state = {"generation": 0, "refreshes": 0}
+
+    def refresh():
+        state["refreshes"] += 1
+
+    def preload():
+        state["generation"] += 1
+        with open(marker, "a") as f:
+            f.write(f"{state['generation']}\n")
+
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        body = json.dumps({"pid": os.getpid(), "generation": state["generation"], "refreshes": state["refreshes"]}).encode()
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": body})
+
+    prefork.PreforkServer(app, "127.0.0.1", port, workers=2, preload=preload, refresh=refresh, log_level="warning").serve()
+
+
+def _get(port: int) -> dict:
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=2) as resp:
+        return json.loads(resp.read())
+
+
+def _wait_for(predicate, timeout: float = 15.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        try:
+            value = predicate()
+            if value:
+                return value
+        except OSError:
+            pass
+        time.sleep(0.1)
+    raise AssertionError("condition not met in time")
+
+
+def test_workers_share_preload_and_reload_on_sighup():
+    """Workers inherit the master's preload; SIGHUP reloads once and replaces them."""
+    try:
+        port = _free_port()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            marker = str(Path(tmpdir) / "preloads")
+            master = multiprocessing.get_context("fork").Process(target=_run_master, args=(port, marker))
+            master.start()
+            try:
+                first = _wait_for(lambda: _get(port))
+                assert first["generation"] == 1
+                assert first["pid"] != master.pid
+
+                os.kill(master.pid, signal.SIGHUP)
+                reloaded = _wait_for(lambda: (lambda r: r if r["generation"] == 2 else None)(_get(port)))
+                assert reloaded["pid"] != first["pid"]
+                # Preload ran once per generation in the master, never in the workers
+                assert Path(marker).read_text().split() == ["1", "2"]
+            finally:
+                os.kill(master.pid, signal.SIGTERM)
+                master.join(20)
+            assert master.exitcode == 0
+        print("[PASS] Pre-fork workers share the preload and reload together")
+    except Exception as e:
+        print(f"[FAIL] Error testing pre-fork server: {e}")
+        raise
+
+
+def test_respawned_workers_fork_a_refreshed_runtime():
+    """A worker that dies is replaced from the master after the refresh hook ran."""
+    try:
+        port = _free_port()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            marker = str(Path(tmpdir) / "preloads")
+            master = multiprocessing.get_context("fork").Process(target=_run_master, args=(port, marker))
+            master.start()
+            try:
+                first = _wait_for(lambda: _get(port))
+                assert first["refreshes"] == 0
+                os.kill(first["pid"], signal.SIGKILL)
+                respawned = _wait_for(lambda: (lambda r: r if r["refreshes"] == 1 else None)(_get(port)))
+                assert respawned["pid"] != first["pid"]
+                assert Path(marker).read_text().split() == ["1"]  # no full preload
+            finally:
+                os.kill(master.pid, signal.SIGTERM)
+                master.join(20)
+            assert master.exitcode == 0
+        print("[PASS] Respawned workers fork a refreshed runtime")
+    except Exception as e:
+        print(f"[FAIL] Error testing respawn refresh: {e}")
+        raise
+
+
+def test_request_reload_outside_prefork():
+    """Reload requests are a no-op outside a pre-fork worker."""
+    try:
+        saved = os.environ.pop(prefork.MASTER_PID_ENV, None)
+        try:
+            assert prefork.master_pid() is None
+            assert prefork.request_reload() is False
+        finally:
+            if saved is not None:
+                os.environ[prefork.MASTER_PID_ENV] = saved
+        print("[PASS] Reload requests need a pre-fork master")
+    except Exception as e:
+        print(f"[FAIL] Error testing reload request: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    print("Running pre-fork server tests...")
+    test_workers_share_preload_and_reload_on_sighup()
+    test_respawned_workers_fork_a_refreshed_runtime()
+    test_request_reload_outside_prefork()
+    print("\nAll tests passed!")
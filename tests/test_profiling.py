@@ -0,0 +1,100 @@
+"""Tests for on-demand profiling hooks."""
+import sys
+import time
+import pstats
+import asyncio
+import tempfile
+import threading
+from pathlib import Path
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from core.utils import profiling
+
+
+def _busy_loop(seconds: float) -> int:
+    end = time.perf_counter() + seconds
+    n = 0
+    while time.perf_counter() < end:
+        n += 1
+    return n
+
+
+def test_sampler_collects_folded_stacks():
+    """The sampler sees worker threads and writes flamegraph-ready lines."""
+    try:
+        sampler = profiling.StackSampler(interval=0.002).start()
+        worker = threading.Thread(target=_busy_loop, args=(0.2,), name="busy-worker")
+        worker.start()
+        worker.join()
+        counts, samples = sampler.stop().drain()
+        assert samples > 0
+        busy = [s for s in counts if "_busy_loop (test_profiling.py" in s]
+        assert busy and all(s.startswith("busy-worker;") for s in busy)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = profiling.write_folded(counts, Path(tmpdir) / "out.folded")
+            for line in path.read_text().splitlines():
+                stack, n = line.rsplit(" ", 1)
+                assert stack and int(n) > 0
+        print("[PASS] Sampler collects folded stacks")
+    except Exception as e:
+        print(f"[FAIL] Error testing sampler: {e}")
+        raise
+
+
+def test_request_header_and_window_profiles():
+    """X-Luna-Profile profiles one request; profile_for writes pstats and is exclusive."""
+    try:
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+
+        app = FastAPI()
+        app.add_middleware(profiling.ProfilingMiddleware)
+
+        @app.get("/work")
+        def work():
+            return {"n": _busy_loop(0.05)}
+
+        saved = profiling.PROFILE_DIR
+        with tempfile.TemporaryDirectory() as tmpdir:
+            profiling.PROFILE_DIR = Path(tmpdir)
+            try:
+                client = TestClient(app)
+                plain = client.get("/work")
+                assert profiling.PROFILE_FILE_HEADER not in plain.headers
+                assert not list(Path(tmpdir).iterdir())
+
+                sampled = client.get("/work", headers={"X-Luna-Profile": "1"})
+                name = sampled.headers[profiling.PROFILE_FILE_HEADER]
+                assert name.endswith(".folded") and "GET_work" in name
+                assert "_busy_loop" in (Path(tmpdir) / name).read_text()
+
+                async def windows():
+                    first = asyncio.create_task(profiling.profile_for(0.2, "cprofile"))
+                    await asyncio.sleep(0.05)
+                    try:
+                        await profiling.profile_for(0.01)
+                        assert False, "expected RuntimeError"
+                    except RuntimeError:
+                        pass
+                    return await first
+
+                result = asyncio.run(windows())
+                assert result["file"].endswith(".prof")
+                pstats.Stats(result["file"])  # loadable
+            finally:
+                profiling.PROFILE_DIR = saved
+        print("[PASS] Request and window profiles")
+    except Exception as e:
+        print(f"[FAIL] Error testing profiles: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    print("Running profiling tests...")
+    test_sampler_collects_folded_stacks()
+    test_request_header_and_window_profiles()
+    print("\nAll tests passed!")
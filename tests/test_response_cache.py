@@ -0,0 +1,213 @@
+"""Tests for the chat completions response cache."""
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from core.utils.response_cache import ResponseCache, normalize_prompt, executed_tool_names
+
+
+def test_normalize_prompt():
+    """Near-exact repeats normalize to the same text."""
+    try:
+        assert normalize_prompt("  What's the   WEATHER? ") == "what's the weather"
+        assert normalize_prompt("what's the weather") == "what's the weather"
+        print("[PASS] Prompts normalize")
+    except Exception as e:
+        print(f"[FAIL] Error testing prompt normalization: {e}")
+        raise
+
+
+def test_cache_hit_and_key_parts():
+    """Keys depend on model, prompt, memory and history."""
+    try:
+        cache = ResponseCache(enabled=True, ttl_secs=60, domain_ttls={})
+        key = cache.make_key("passthrough_agent", "What's the weather?", memory="1. likes tea")
+        assert cache.store(key, "Sunny", ["WEATHER_GET_current"])
+
+        same = cache.make_key("passthrough_agent", "what's the weather", memory="1. likes tea")
+        assert cache.get(same).content == "Sunny"
+        assert cache.get(cache.make_key("simple_agent", "what's the weather", memory="1. likes tea")) is None
+        assert cache.get(cache.make_key("passthrough_agent", "what's the weather", memory="1. likes coffee")) is None
+        assert cache.get(cache.make_key("passthrough_agent", "what's the weather", memory="1. likes tea",
+                                        chat_history="user: hi")) is None
+        assert cache.stats()["hits"] == 1
+        print("[PASS] Cache hits only on matching keys")
+    except Exception as e:
+        print(f"[FAIL] Error testing cache keys: {e}")
+        raise
+
+
+def test_mutating_runs_bypass_and_invalidate():
+    """UPDATE/ACTION runs are not stored and drop answers from the same domain."""
+    try:
+        cache = ResponseCache(enabled=True, ttl_secs=60, domain_ttls={})
+        list_key = cache.make_key("a", "read my list")
+        other_key = cache.make_key("a", "weather")
+        assert cache.store(list_key, "milk, eggs", ["NOTES_GET_list"])
+        assert cache.store(other_key, "Sunny", ["WEATHER_GET_current"])
+
+        add_key = cache.make_key("a", "add bread")
+        assert not cache.store(add_key, "Added", ["NOTES_GET_list", "NOTES_UPDATE_add"])
+        assert cache.get(add_key) is None
+        assert cache.get(list_key) is None
+        assert cache.get(other_key).content == "Sunny"
+        print("[PASS] Mutating runs bypass the cache and invalidate their domain")
+    except Exception as e:
+        print(f"[FAIL] Error testing invalidation: {e}")
+        raise
+
+
+def test_ttls_and_disabled_cache():
+    """Entries expire, per-domain TTLs shorten them and a disabled cache stores nothing."""
+    try:
+        cache = ResponseCache(enabled=True, ttl_secs=60, domain_ttls={"CLOCK": 0.05})
+        key = cache.make_key("a", "what time is it")
+        assert cache.store(key, "noon", ["CLOCK_GET_now"])
+        time.sleep(0.1)
+        assert cache.get(key) is None
+
+        disabled = ResponseCache(enabled=False)
+        assert not disabled.store("k", "v", [])
+        assert disabled.get("k") is None
+        print("[PASS] TTLs and disabled cache behave")
+    except Exception as e:
+        print(f"[FAIL] Error testing TTLs: {e}")
+        raise
+
+
+def test_executed_tool_names():
+    """Tool names are read from agent result traces and results."""
+    try:
+        from core.agents.passthrough_agent.agent import AgentResult, ToolTrace, ToolResult
+        result = AgentResult(
+            final="ok", content="ok", response_time_secs=0.1,
+            traces=[ToolTrace(tool="NOTES_GET_list", output="x")],
+            results=[ToolResult(tool="NOTES_UPDATE_add", public_text="added")],
+        )
+        assert executed_tool_names(result) == ["NOTES_GET_list", "NOTES_UPDATE_add"]
+        print("[PASS] Executed tool names are extracted")
+    except Exception as e:
+        print(f"[FAIL] Error testing executed tool names: {e}")
+        raise
+
+
+def test_concurrent_runs_keep_their_own_traces():
+    """A run starting mid-way through another cannot clear the first run's traces."""
+    from core.agents.passthrough_agent import agent
+    from core.agents.passthrough_agent.agent import PlannedToolCall, PlannerStep, ToolCallOptions
+
+    def NOTES_UPDATE_add(text: str) -> str:
+        """Add a note."""
+        return f"added {text}"
+
+    def NOTES_GET_list() -> str:
+        """List notes."""
+        return "no notes"
+
+    class FakePlanner:
+        """Update run: call the tool, review it, then answer after a pause."""
+
+        def with_structured_output(self, *args, **kwargs):
+            return self
+
+        async def ainvoke(self, messages):
+            text = "\n".join(str(m.content) for m in messages)
+            if "add a note" in text:
+                if "Items requiring review" in text:
+                    await asyncio.sleep(0.2)  # the other run starts meanwhile
+                    return PlannerStep(final_text="Note added.")
+                return PlannerStep(calls=[PlannedToolCall(
+                    tool="NOTES_UPDATE_add", args={"text": "milk"}, options=ToolCallOptions(passthrough=False))])
+            return PlannerStep(calls=[PlannedToolCall(tool="NOTES_GET_list")])
+
+    saved = (dict(agent.TOOL_RUNNERS), agent.get_chat_model)
+    try:
+        agent.TOOL_RUNNERS.clear()
+        for fn in (NOTES_UPDATE_add, NOTES_GET_list):
+            agent.TOOL_RUNNERS[fn.__name__] = agent._wrap_callable_as_runner(fn, "notes")
+        agent.get_chat_model = lambda **kwargs: FakePlanner()
+
+        async def scenario():
+            update = asyncio.create_task(agent.run_agent("add a note: milk"))
+            await asyncio.sleep(0.1)
+            listing = asyncio.create_task(agent.run_agent("list my notes"))
+            return await update, await listing
+
+        update, listing = asyncio.run(scenario())
+        assert executed_tool_names(update) == ["NOTES_UPDATE_add"]
+        assert executed_tool_names(listing) == ["NOTES_GET_list"]
+
+        cache = ResponseCache(enabled=True)
+        key = cache.make_key("passthrough_agent", "add a note: milk", None, None)
+        assert cache.store(key, update.final, executed_tool_names(update)) is False
+        print("[PASS] Concurrent runs keep their own traces")
+    except Exception as e:
+        print(f"[FAIL] Error testing concurrent traces: {e}")
+        raise
+    finally:
+        agent.TOOL_RUNNERS.clear()
+        agent.TOOL_RUNNERS.update(saved[0])
+        agent.get_chat_model = saved[1]
+
+
+def test_streamed_runs_invalidate_what_they_mutate():
+    """Token-streamed runs are not stored, but their UPDATE tools still invalidate."""
+    from core.utils import agent_api, response_cache
+    from core.agents.passthrough_agent import agent
+    from core.agents.passthrough_agent.agent import PlannedToolCall, PlannerStep, ToolCallOptions
+
+    def NOTES_UPDATE_add(text: str) -> str:
+        """Add a note."""
+        return f"added {text}"
+
+    class FakePlanner:
+        def with_structured_output(self, *args, **kwargs):
+            return self
+
+        async def ainvoke(self, messages):
+            if "Items requiring review" in "\n".join(str(m.content) for m in messages):
+                return PlannerStep(final_text="Note added.")
+            return PlannerStep(calls=[PlannedToolCall(
+                tool="NOTES_UPDATE_add", args={"text": "milk"}, options=ToolCallOptions(passthrough=False))])
+
+    saved = (dict(agent.TOOL_RUNNERS), agent.get_chat_model, response_cache._CACHE)
+    try:
+        agent.TOOL_RUNNERS.clear()
+        agent.TOOL_RUNNERS["NOTES_UPDATE_add"] = agent._wrap_callable_as_runner(NOTES_UPDATE_add, "notes")
+        agent.get_chat_model = lambda **kwargs: FakePlanner()
+        cache = response_cache._CACHE = ResponseCache(enabled=True)
+        read_key = cache.make_key("passthrough_agent", "list my notes", None, None)
+        assert cache.store(read_key, "no notes", ["NOTES_GET_list"])
+
+        async def scenario():
+            return [chunk async for chunk in agent_api._sse_token_stream(agent, "add a note: milk", [], None, "passthrough_agent")]
+
+        chunks = asyncio.run(scenario())
+        assert any("Note added." in chunk for chunk in chunks)
+        assert cache.get(read_key) is None
+        print("[PASS] Streamed runs invalidate what they mutate")
+    except Exception as e:
+        print(f"[FAIL] Error testing streamed invalidation: {e}")
+        raise
+    finally:
+        agent.TOOL_RUNNERS.clear()
+        agent.TOOL_RUNNERS.update(saved[0])
+        agent.get_chat_model = saved[1]
+        response_cache._CACHE = saved[2]
+
+
+if __name__ == "__main__":
+    print("Running response cache tests...")
+    test_normalize_prompt()
+    test_cache_hit_and_key_parts()
+    test_mutating_runs_bypass_and_invalidate()
+    test_ttls_and_disabled_cache()
+    test_executed_tool_names()
+    test_concurrent_runs_keep_their_own_traces()
+    test_streamed_runs_invalidate_what_they_mutate()
+    print("\nAll tests passed!")
@@ -0,0 +1,86 @@
+"""Tests for SSE chunk encoding and delta coalescing."""
+import sys
+import json
+import asyncio
+from pathlib import Path
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from core.utils.sse import ChunkEncoder, coalesce
+
+
+def _chunk(delta, finish_reason=None):
+    return {
+        "id": "chatcmpl-abc",
+        "object": "chat.completion.chunk",
+        "created": 1700000000,
+        "model": "preset \"ü\"",
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+def _parse(event):
+    assert event.startswith("data: ") and event.endswith("\n\n")
+    return json.loads(event[len("data: "):])
+
+
+def test_encoder_matches_chunk_dicts():
+    """Template chunks decode to the same dicts a full json.dumps would encode."""
+    try:
+        enc = ChunkEncoder("chatcmpl-abc", 1700000000, "preset \"ü\"")
+        text = 'line "one"\n\ttab \\ ünïcode 🌙 </script> \ud800'
+        assert _parse(enc.role()) == _chunk({"role": "assistant"})
+        assert _parse(enc.role(text)) == _chunk({"role": "assistant", "content": text})
+        assert _parse(enc.content(text)) == _chunk({"content": text})
+        assert _parse(enc.content("")) == _chunk({"content": ""})
+        assert _parse(enc.stop()) == _chunk({}, "stop")
+        print("[PASS] Encoder output matches the chunk dicts")
+    except Exception as e:
+        print(f"[FAIL] Error testing chunk encoder: {e}")
+        raise
+
+
+async def _tokens(schedule):
+    for delay, token in schedule:
+        await asyncio.sleep(delay)
+        yield token
+
+
+async def _collect(agen):
+    return [item async for item in agen]
+
+
+def test_coalesce_merges_within_window():
+    """Tokens inside the flush window merge; a gap starts a new chunk."""
+    try:
+        schedule = [(0, "a"), (0, "b"), (0, "c"), (0.15, "d"), (0, "e")]
+        out = asyncio.run(_collect(coalesce(_tokens(schedule), window_ms=50)))
+        assert out == ["abc", "de"]
+
+        capped = asyncio.run(_collect(coalesce(_tokens([(0, "xx")] * 3), window_ms=1000, max_chars=4)))
+        assert capped == ["xxxx", "xx"]
+        print("[PASS] Coalescing merges tokens within the window")
+    except Exception as e:
+        print(f"[FAIL] Error testing coalescing: {e}")
+        raise
+
+
+def test_coalesce_disabled_passes_through():
+    """A zero window streams every token as it arrives."""
+    try:
+        out = asyncio.run(_collect(coalesce(_tokens([(0, "a"), (0, "b")]), window_ms=0)))
+        assert out == ["a", "b"]
+        print("[PASS] Disabled coalescing passes tokens through")
+    except Exception as e:
+        print(f"[FAIL] Error testing pass-through: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    print("Running SSE encoder tests...")
+    test_encoder_matches_chunk_dicts()
+    test_coalesce_merges_within_window()
+    test_coalesce_disabled_passes_through()
+    print("\nAll tests passed!")
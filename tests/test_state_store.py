@@ -0,0 +1,105 @@
+"""Tests for the write-behind state store."""
+import sys
+import json
+import time
+import sqlite3
+import tempfile
+import threading
+from pathlib import Path
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from core.utils.state_store import StateStore, WriteBehind
+
+
+def test_mutations_are_coalesced():
+    """Many marks within the debounce window become a single write."""
+    try:
+        writes = []
+        written = threading.Event()
+        writer = WriteBehind(lambda: (writes.append(1), written.set()), debounce=0.1, name="test")
+        try:
+            for _ in range(200):
+                writer.mark_dirty()
+            assert written.wait(2)
+            time.sleep(0.2)
+            assert writes == [1] and writer.flushes == 1 and not writer.dirty
+            assert writer.flush() is False  # nothing pending
+        finally:
+            writer.close()
+        print("[PASS] Mutations are coalesced")
+    except Exception as e:
+        print(f"[FAIL] Error testing coalescing: {e}")
+        raise
+
+
+def test_json_checkpoint_is_atomic():
+    """checkpoint() writes the current state at once via a rename."""
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "state.json"
+            store = StateStore(path, default={"services": {}}, backend="json", debounce=60)
+            try:
+                for i in range(50):
+                    with store.mutate() as data:
+                        data["services"][f"svc{i}"] = {"status": "running", "port": 5300 + i}
+                assert not path.exists()  # still behind
+                assert store.checkpoint() is True
+                assert json.loads(path.read_text())["services"]["svc49"]["port"] == 5349
+                assert store.flushes == 1
+                assert [p.name for p in Path(tmpdir).iterdir()] == ["state.json"]
+
+                reloaded = StateStore(path, backend="json", debounce=60)
+                assert len(reloaded.data["services"]) == 50
+                reloaded.close()
+            finally:
+                store.close()
+        print("[PASS] JSON checkpoint is atomic")
+    except Exception as e:
+        print(f"[FAIL] Error testing JSON checkpoint: {e}")
+        raise
+
+
+def test_sqlite_writes_changed_keys():
+    """The SQLite backend round-trips and only rewrites changed keys."""
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "state.json"
+            store = StateStore(path, default={"services": {}, "external_services": {}}, backend="sqlite", debounce=60)
+            try:
+                store.data["services"]["a"] = {"status": "running"}
+                store.mark_dirty()
+                store.checkpoint()
+
+                db = sqlite3.connect(str(path.with_suffix(".sqlite3")))
+                db.execute("UPDATE state SET value = '\"sentinel\"' WHERE key = 'external_services'")
+                db.commit()
+
+                store.data["services"]["a"]["status"] = "stopped"
+                store.mark_dirty()
+                store.checkpoint()
+                rows = dict(db.execute("SELECT key, value FROM state").fetchall())
+                db.close()
+                # external_services did not change, so its row was left alone
+                assert rows["external_services"] == '"sentinel"'
+                assert json.loads(rows["services"]) == {"a": {"status": "stopped"}}
+
+                reloaded = StateStore(path, backend="sqlite", debounce=60)
+                assert reloaded.data["services"]["a"]["status"] == "stopped"
+                reloaded.close()
+            finally:
+                store.close()
+        print("[PASS] SQLite writes changed keys")
+    except Exception as e:
+        print(f"[FAIL] Error testing SQLite backend: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    print("Running state store tests...")
+    test_mutations_are_coalesced()
+    test_json_checkpoint_is_atomic()
+    test_sqlite_writes_changed_keys()
+    print("\nAll tests passed!")
@@ -0,0 +1,123 @@
+"""Tests for queue-based structured logging."""
+import sys
+import json
+import tempfile
+import queue
+import logging
+from pathlib import Path
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from core.utils import structured_log
+
+
+def _save_state() -> dict:
+    return {"service": structured_log._STATE["service"], "options": structured_log._STATE["options"],
+            "files": dict(structured_log._FILES)}
+
+
+def _restore_state(saved: dict) -> None:
+    """Leave the module as the test found it, so later logging does not inherit test sinks."""
+    structured_log.shutdown()
+    structured_log._FILES.clear()
+    structured_log._FILES.update(saved["files"])
+    structured_log._STATE.update(service=saved["service"], options=saved["options"])
+
+
+def test_records_are_written_in_background():
+    """Records land in the JSONL file with fields; dedicated loggers use their own file."""
+    saved = _save_state()
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            structured_log.configure("unit", stdout=False, log_dir=tmpdir)
+            try:
+                log = structured_log.get_logger("unit.calls", label="UNIT")
+                remote = structured_log.get_logger("unit.remote", file=Path(tmpdir) / "remote.log")
+                log.info("tool call", tool="echo", duration_ms=1.5)
+                log.debug("hidden at INFO")
+                try:
+                    raise ValueError("boom")
+                except ValueError:
+                    log.exception("tool call failed", tool="echo")
+                remote.info("Connecting to server")
+                structured_log.flush()
+
+                records = [json.loads(line) for line in (Path(tmpdir) / "unit.jsonl").read_text().splitlines()]
+                assert [r["msg"] for r in records] == ["tool call", "tool call failed"]
+                assert records[0]["tool"] == "echo" and records[0]["duration_ms"] == 1.5
+                assert records[0]["service"] == "unit" and records[0]["level"] == "INFO"
+                assert records[1]["level"] == "ERROR" and "ValueError: boom" in records[1]["exc"]
+                remote_lines = (Path(tmpdir) / "remote.log").read_text().splitlines()
+                assert len(remote_lines) == 1 and remote_lines[0].endswith("] Connecting to server")
+            finally:
+                _restore_state(saved)
+        print("[PASS] Records are written in the background")
+    except Exception as e:
+        print(f"[FAIL] Error testing structured log: {e}")
+        raise
+
+
+def test_sampling_and_full_queue_never_block():
+    """Sampled records are thinned, warnings kept, and a full queue drops instead of blocking."""
+    saved = _save_state()
+    try:
+        saved_rate = structured_log.SAMPLE_RATE
+        with tempfile.TemporaryDirectory() as tmpdir:
+            structured_log.SAMPLE_RATE = 0.0
+            structured_log.configure("sampled", stdout=False, log_dir=tmpdir)
+            try:
+                log = structured_log.get_logger("unit.sampled")
+                for _ in range(100):
+                    log.info("sampled call", sample=True)
+                log.warning("slow call", sample=True)
+                structured_log.flush()
+                lines = (Path(tmpdir) / "sampled.jsonl").read_text().splitlines()
+                assert [json.loads(line)["msg"] for line in lines] == ["slow call"]
+
+                # Nobody drains this queue, so it fills up
+                handler = structured_log._QueueHandler(queue.Queue(5))
+                for i in range(20):
+                    handler.handle(logging.LogRecord("luna.burst", logging.INFO, __file__, 0, "burst %d", (i,), None))
+                assert handler.dropped == 15 and handler.queue.qsize() == 5
+                assert handler.queue.get_nowait().msg == "burst 0"
+            finally:
+                structured_log.SAMPLE_RATE = saved_rate
+                _restore_state(saved)
+        print("[PASS] Sampling and full queue never block")
+    except Exception as e:
+        print(f"[FAIL] Error testing sampling/backpressure: {e}")
+        raise
+
+
+def test_implicit_setup_writes_no_files():
+    """Logging without configure(), or after shutdown(), goes to stdout only."""
+    saved = _save_state()
+    saved_env = structured_log._LOG_DIR_ENV
+    try:
+        structured_log._LOG_DIR_ENV = None
+        with tempfile.TemporaryDirectory() as tmpdir:
+            structured_log.configure("unit", stdout=False, log_dir=tmpdir)
+            structured_log.shutdown()
+
+            structured_log.get_logger("unit.late").info("after shutdown")
+            structured_log.flush()
+            sinks = structured_log._STATE["fanout"].sinks
+            assert not any(isinstance(h, logging.FileHandler) for h in sinks)
+            assert list(Path(tmpdir).iterdir()) == []
+        print("[PASS] Implicit setup writes no files")
+    except Exception as e:
+        print(f"[FAIL] Error testing implicit setup: {e}")
+        raise
+    finally:
+        structured_log._LOG_DIR_ENV = saved_env
+        _restore_state(saved)
+
+
+if __name__ == "__main__":
+    print("Running structured log tests...")
+    test_records_are_written_in_background()
+    test_sampling_and_full_queue_never_block()
+    test_implicit_setup_writes_no_files()
+    print("\nAll tests passed!")
@@ -0,0 +1,124 @@
+"""Tests for token-budgeted context assembly."""
+import sys
+from pathlib import Path
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from core.utils.token_budget import ContextBudget, count_tokens, fit_tool_schema, trim_history, truncate_text
+
+
+def test_trim_history_drops_oldest_lines():
+    """History over budget keeps the most recent lines."""
+    try:
+        history = "\n".join(f"user: message number {i} about groceries" for i in range(200))
+        trimmed = trim_history(history, 100)
+
+        assert count_tokens(trimmed) <= 120
+        assert trimmed.startswith("[")
+        assert "earlier lines omitted" in trimmed
+        assert trimmed.endswith("message number 199 about groceries")
+        assert "message number 0 " not in trimmed
+        assert trim_history("user: hi", 100) == "user: hi"
+        print("[PASS] History is trimmed oldest-first")
+    except Exception as e:
+        print(f"[FAIL] Error testing history trimming: {e}")
+        raise
+
+
+def test_trim_history_keeps_tail_of_long_newest_line():
+    """A newest line that alone exceeds the budget keeps its end, not its start."""
+    try:
+        newest = "user: " + "start " * 2000 + "so what is the answer"
+        trimmed = trim_history("user: older\n" + newest, 50)
+
+        assert count_tokens(trimmed) <= 80
+        assert trimmed.startswith("[1 earlier lines omitted]\n[truncated ")
+        assert trimmed.endswith("so what is the answer")
+        print("[PASS] Long newest history line keeps its tail")
+    except Exception as e:
+        print(f"[FAIL] Error testing long newest history line: {e}")
+        raise
+
+
+def test_truncate_text_adds_pointer():
+    """Oversized text is cut and says where the rest lives."""
+    try:
+        text = "row " * 5000
+        cut = truncate_text(text, 50, pointer="full output is in the run trace")
+        assert count_tokens(cut) < 80
+        assert "truncated" in cut and "run trace" in cut
+        assert truncate_text("short", 50) == "short"
+        print("[PASS] Oversized text is truncated with a pointer")
+    except Exception as e:
+        print(f"[FAIL] Error testing truncation: {e}")
+        raise
+
+
+def test_budget_allocation_and_fit():
+    """Sections stay within the total and history gives way first."""
+    try:
+        budget = ContextBudget(total_tokens=1000, tool_output_tokens=100)
+        alloc = budget.allocate({"schema": 200, "review": 0, "memory": 50, "history": 5000})
+        assert alloc["schema"] == 200 and alloc["memory"] == 50
+        assert sum(alloc.values()) == 1000
+
+        history = "\n".join(f"assistant: reply {i} " + "x" * 40 for i in range(500))
+        fitted = budget.fit(
+            schema=["GET_weather(city: str)", "Domain prompt text"],
+            memory="likes tea",
+            history=history,
+            review_texts=["result " * 2000],
+        )
+        assert fitted["schema"] == ["GET_weather(city: str)", "Domain prompt text"]
+        assert fitted["memory"] == "likes tea"
+        assert "reply 499" in fitted["history"]
+        assert "reply 0 " not in fitted["history"]
+        assert "truncated" in fitted["review_texts"][0]
+        total = (count_tokens(fitted["history"]) + count_tokens(fitted["memory"])
+                 + sum(count_tokens(p) for p in fitted["schema"])
+                 + count_tokens(fitted["review_texts"][0]))
+        assert total <= 1100
+
+        assert "truncated" in budget.fit_tool_output("row " * 2000, "GET_rows")
+
+        disabled = ContextBudget(total_tokens=0)
+        assert disabled.fit(history=history)["history"] == history
+        print("[PASS] Context budget allocates and fits sections")
+    except Exception as e:
+        print(f"[FAIL] Error testing context budget: {e}")
+        raise
+
+
+def test_tool_list_is_never_cut():
+    """Over budget, tool descriptions are dropped but every tool stays listed."""
+    try:
+        schema = "\n".join(
+            f"- GET_tool_{i}(query: str) -> str\n  " + "Looks things up in a very thorough way. " * 10 + "\n"
+            for i in range(40)
+        )
+        fitted = fit_tool_schema(schema, 600)
+        assert all(f"- GET_tool_{i}(query: str)" in fitted for i in range(40))
+        assert "descriptions of" in fitted and "omitted" in fitted
+        assert fit_tool_schema("- GET_a()\n  Short.", 100) == "- GET_a()\n  Short."
+
+        budget = ContextBudget(total_tokens=300)
+        result = budget.fit(schema=[schema, "Domain prompt " * 50], history="user: hi\n" * 200)
+        tool_text, domain_text = result["schema"]
+        assert all(f"- GET_tool_{i}(query: str)" in tool_text for i in range(40))
+        assert result["allocation"]["history"] == 0 and domain_text == ""
+        print("[PASS] Tool list is never cut")
+    except Exception as e:
+        print(f"[FAIL] Error testing tool list budget: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    print("Running token budget tests...")
+    test_trim_history_drops_oldest_lines()
+    test_trim_history_keeps_tail_of_long_newest_line()
+    test_truncate_text_adds_pointer()
+    test_budget_allocation_and_fit()
+    test_tool_list_is_never_cut()
+    print("\nAll tests passed!")
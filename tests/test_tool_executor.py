@@ -0,0 +1,123 @@
+"""Tests for off-loop, concurrency-limited MCP tool execution."""
+import sys
+import time
+import asyncio
+import threading
+from pathlib import Path
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from core.utils import tool_executor
+from core.utils.tool_executor import ToolTimeout, offload, run_tool
+
+
+def _slow(seconds: float) -> str:
+    """Block like a slow sync tool."""
+    time.sleep(seconds)
+    return threading.current_thread().name
+
+
+def test_sync_tools_leave_the_loop_free():
+    """Sync tools run on the pool, in parallel up to their limit, and time out."""
+    try:
+        async def scenario():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            tick_task = asyncio.create_task(ticker())
+            t0 = time.perf_counter()
+            names = await asyncio.gather(*(run_tool(_slow, (0.2,), {}, "slow_a", timeout=5) for _ in range(4)))
+            parallel = time.perf_counter() - t0
+            tick_task.cancel()
+            assert all(name.startswith("mcp-tool") for name in names)
+            assert parallel < 0.6 and ticks >= 5  # the loop kept running meanwhile
+
+            tool_executor.TOOL_LIMITS["slow_b"] = 1
+            t0 = time.perf_counter()
+            await asyncio.gather(*(run_tool(_slow, (0.1,), {}, "slow_b", timeout=5) for _ in range(3)))
+            assert time.perf_counter() - t0 >= 0.3  # one at a time
+
+            try:
+                await run_tool(_slow, (0.5,), {}, "slow_b", timeout=0.1)
+                assert False, "expected a timeout"
+            except ToolTimeout:
+                pass
+            # The timed-out call still holds slow_b's only slot until its thread returns
+            try:
+                await run_tool(_slow, (0,), {}, "slow_b", timeout=0.1)
+                assert False, "expected to wait for a slot"
+            except ToolTimeout as exc:
+                assert "free slot" in str(exc)
+            await asyncio.sleep(0.5)
+            assert (await run_tool(_slow, (0,), {}, "slow_b", timeout=1)).startswith("mcp-tool")
+
+        try:
+            asyncio.run(scenario())
+        finally:
+            tool_executor.TOOL_LIMITS.pop("slow_b", None)
+        print("[PASS] Sync tools leave the loop free")
+    except Exception as e:
+        print(f"[FAIL] Error testing tool executor: {e}")
+        raise
+
+
+def test_registered_tools_keep_schema_and_remote_calls_are_awaited():
+    """Registered tools keep their schema; remote tools use the async call path."""
+    try:
+        from fastmcp import FastMCP, Client
+        from core.utils.mcp_server import _register_tools
+        from core.utils.tool_discovery import MCPRemoteTool
+
+        class AsyncOnlySessions:
+            """Session manager double exposing only the async call."""
+
+            def __init__(self):
+                self.calls = []
+
+            async def call_tool_async(self, server_id, tool_name, arguments):
+                self.calls.append((server_id, tool_name, arguments))
+                await asyncio.sleep(0)
+                return f"remote:{arguments.get('query')}"
+
+        def local_echo(text: str, times: int = 1) -> str:
+            """Echo text."""
+            return text * times
+
+        sessions = AsyncOnlySessions()
+        remote = MCPRemoteTool("srv", "remote_search", {
+            "docstring": "Search remotely.",
+            "input_schema": {"properties": {"query": {"type": "string"}}, "required": ["query"]},
+        }, sessions)
+
+        mcp = FastMCP("test")
+        assert _register_tools(mcp, [local_echo, remote]) == 2
+
+        async def scenario():
+            tools = await mcp.get_tools()
+            assert tools["local_echo"].parameters["required"] == ["text"]
+            assert set(tools["remote_search"].parameters["properties"]) == {"query"}
+            async with Client(mcp) as client:
+                assert (await client.call_tool("local_echo", {"text": "ab", "times": 2})).data == "abab"
+                assert (await client.call_tool("remote_search", {"query": "q"})).content[0].text == "remote:q"
+
+        asyncio.run(scenario())
+        assert sessions.calls == [("srv", "remote_search", {"query": "q"})]
+        assert offload(local_echo).__name__ == "local_echo"
+        print("[PASS] Registered tools keep schema; remote calls are awaited")
+    except Exception as e:
+        print(f"[FAIL] Error testing registered tools: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    print("Running tool executor tests...")
+    test_sync_tools_leave_the_loop_free()
+    test_registered_tools_keep_schema_and_remote_calls_are_awaited()
+    print("\nAll tests passed!")
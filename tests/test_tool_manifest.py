@@ -0,0 +1,218 @@
+"""Tests for the static tool manifest."""
+import os
+import sys
+import json
+import tempfile
+from pathlib import Path
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from core.utils import tool_manifest
+
+
+STATIC_TOOLS = '''
+import heavy_manifest_dep
+
+SYSTEM_PROMPT = ("Static prompt "
+                 "for tests.")
+
+def STATIC_GET_item(name: str, count: int = 3, *, flag: bool = False) -> str:
+    """Get an item.
+    Example Args: {"name": "x"}
+    """
+    return name
+
+def _helper():
+    return None
+
+TOOLS = [STATIC_GET_item]
+'''
+
+DYNAMIC_TOOLS = '''
+import heavy_manifest_dep
+
+def DYNAMIC_GET_one(x):
+    """Dynamic tool."""
+    return x
+
+TOOLS = [f for f in [DYNAMIC_GET_one]]
+'''
+
+GUARDED_TOOLS = '''
+import os
+
+def GUARDED_GET_one(x: str) -> str:
+    """Guarded tool."""
+    return x
+
+try:
+    TOOLS = [GUARDED_GET_one]
+except Exception:
+    TOOLS = []
+'''
+
+DECORATED_TOOLS = '''
+def logged(fn):
+    def wrapper(*args, **kwargs):
+        return "logged:" + fn(*args, **kwargs)
+    return wrapper
+
+@logged
+def DECO_GET_x(name: str) -> str:
+    """Decorated tool."""
+    return name
+
+TOOLS = [DECO_GET_x]
+'''
+
+
+def _make_tree(tmpdir: str) -> Path:
+    root = Path(tmpdir) / "extensions"
+    for ext, source in (("static_ext", STATIC_TOOLS), ("dynamic_ext", DYNAMIC_TOOLS)):
+        tools_dir = root / ext / "tools"
+        tools_dir.mkdir(parents=True)
+        (tools_dir / f"{ext}_tools.py").write_text(source)
+        # Importing it would register a marker module in this process
+        (tools_dir / "heavy_manifest_dep.py").write_text("import sys\nsys.modules['heavy_manifest_marker'] = sys\n")
+    (root / "static_ext" / "tools" / "tool_config.json").write_text('{"STATIC_GET_item": {"passthrough": true}}')
+    return root
+
+
+def test_manifest_reads_tools_without_importing():
+    """Literal modules are read with ast; dynamic ones are imported in a subprocess."""
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = _make_tree(tmpdir)
+            exts = {e["name"]: e for e in tool_manifest.list_extension_tools(str(root))}
+            assert "heavy_manifest_marker" not in sys.modules
+
+            static = exts["static_ext"]
+            assert static["system_prompt"] == "Static prompt for tests."
+            assert static["tool_configs"] == {"STATIC_GET_item": {"passthrough": True}}
+            (tool,) = static["tools"]
+            assert tool["summary"] == "Get an item."
+            assert tool_manifest.tool_signature(tool) == "STATIC_GET_item(name: str, count: int, flag: bool)"
+            params = {p["name"]: p for p in tool["params"]}
+            assert params["name"]["required"] and params["count"]["default"] == "3"
+            assert params["flag"]["kind"] == "KEYWORD_ONLY" and params["flag"]["default"] == "False"
+
+            (dyn,) = exts["dynamic_ext"]["tools"]
+            assert dyn["name"] == "DYNAMIC_GET_one" and dyn["summary"] == "Dynamic tool."
+
+            manifest = json.loads((Path(tmpdir) / ".luna" / "tool_manifest.json").read_text())
+            sources = {rel.split(os.sep)[0]: e["source"] for rel, e in manifest["files"].items()}
+            assert sources == {"static_ext": "ast", "dynamic_ext": "import"}
+        print("[PASS] Manifest reads tools without importing them")
+    except Exception as e:
+        print(f"[FAIL] Error testing manifest build: {e}")
+        raise
+
+
+def test_manifest_reuses_entries_by_hash():
+    """Unchanged files are not re-described; edited files are."""
+    try:
+        described = []
+        original = tool_manifest._describe_file
+
+        def counting(path, digest, st):
+            described.append(os.path.basename(path))
+            return original(path, digest, st)
+
+        tool_manifest._describe_file = counting
+        try:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                root = _make_tree(tmpdir)
+                tool_manifest.list_extension_tools(str(root))
+                assert len(described) == 2
+
+                # Fresh process state: entries come from the file on disk
+                tool_manifest._CACHE.clear()
+                tool_manifest.list_extension_tools(str(root))
+                assert len(described) == 2
+
+                # Touching without changing content re-hashes but does not re-describe
+                static_file = root / "static_ext" / "tools" / "static_ext_tools.py"
+                os.utime(static_file, ns=(0, 0))
+                tool_manifest.list_extension_tools(str(root))
+                assert len(described) == 2
+
+                static_file.write_text(STATIC_TOOLS.replace("Get an item.", "Get one item."))
+                exts = {e["name"]: e for e in tool_manifest.list_extension_tools(str(root))}
+                assert described[2:] == ["static_ext_tools.py"]
+                assert exts["static_ext"]["tools"][0]["summary"] == "Get one item."
+        finally:
+            tool_manifest._describe_file = original
+        print("[PASS] Manifest entries are reused by file hash")
+    except Exception as e:
+        print(f"[FAIL] Error testing manifest cache: {e}")
+        raise
+
+
+def test_conditional_tools_fall_back_to_import():
+    """TOOLS assigned under try/if or built elsewhere is imported, not read as empty."""
+    try:
+        for source in (
+            GUARDED_TOOLS,
+            "def A(): pass\nTOOLS = []\nif True:\n    TOOLS.append(A)\n",
+            "from other_tools import TOOLS\n",
+            "def A(): pass\nglobals()['TOOLS'] = [A]\n",
+        ):
+            with tempfile.NamedTemporaryFile("w", suffix="_tools.py", delete=False) as f:
+                f.write(source)
+            try:
+                tool_manifest._read_static(f.name)
+                assert False, f"expected an import fallback for {source!r}"
+            except tool_manifest._NotStatic:
+                pass
+            finally:
+                os.unlink(f.name)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tools_dir = Path(tmpdir) / "extensions" / "guarded_ext" / "tools"
+            tools_dir.mkdir(parents=True)
+            (tools_dir / "guarded_ext_tools.py").write_text(GUARDED_TOOLS)
+            (ext,) = tool_manifest.list_extension_tools(str(Path(tmpdir) / "extensions"))
+            assert [t["name"] for t in ext["tools"]] == ["GUARDED_GET_one"]
+            manifest = json.loads((Path(tmpdir) / ".luna" / "tool_manifest.json").read_text())
+            (entry,) = manifest["files"].values()
+            assert entry["source"] == "import" and "TOOLS" in entry["reason"]
+        print("[PASS] Conditional TOOLS fall back to import")
+    except Exception as e:
+        print(f"[FAIL] Error testing conditional TOOLS: {e}")
+        raise
+
+
+def test_decorated_tools_are_described_by_import():
+    """A decorator may rename or re-sign a tool, so its module is imported to describe it."""
+    try:
+        from core.utils.extension_discovery import discover_extensions
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tools_dir = Path(tmpdir) / "extensions" / "deco_ext" / "tools"
+            tools_dir.mkdir(parents=True)
+            path = tools_dir / "deco_tools.py"
+            path.write_text(DECORATED_TOOLS)
+            try:
+                tool_manifest._read_static(str(path))
+                assert False, "expected an import fallback"
+            except tool_manifest._NotStatic as exc:
+                assert "decorated" in str(exc)
+
+            (ext,) = discover_extensions(str(Path(tmpdir) / "extensions"))
+            (tool,) = ext["tools"]
+            assert tool("a") == "logged:a"
+        print("[PASS] Decorated tools are described by import")
+    except Exception as e:
+        print(f"[FAIL] Error testing decorated tools: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    print("Running tool manifest tests...")
+    test_manifest_reads_tools_without_importing()
+    test_manifest_reuses_entries_by_hash()
+    test_conditional_tools_fall_back_to_import()
+    test_decorated_tools_are_described_by_import()
+    print("\nAll tests passed!")
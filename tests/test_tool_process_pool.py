@@ -0,0 +1,196 @@
+"""Tests for out-of-process extension tools."""
+import os
+import sys
+import json
+import inspect
+import tempfile
+from pathlib import Path
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from core.utils.extension_discovery import discover_extensions
+from core.utils.tool_process_pool import shutdown_all_pools
+
+
+ISOLATED_TOOLS = '''
+import os
+from typing import Optional
+
+SYSTEM_PROMPT = "Isolated test prompt"
+
+def ISO_GET_pid(tag: str, count: int = 2, note: Optional[str] = None) -> tuple:
+    """Return the worker pid."""
+    return (True, f"{tag}:{count}:{os.getpid()}")
+
+def ISO_ACTION_crash() -> str:
+    """Kill the worker process."""
+    os._exit(3)
+
+def ISO_ACTION_fail() -> str:
+    """Raise an error."""
+    raise ValueError("boom")
+
+TOOLS = [ISO_GET_pid, ISO_ACTION_crash, ISO_ACTION_fail]
+'''
+
+STRICT_TOOLS = '''
+import time
+
+def ISO_GET_sleep(seconds: float) -> str:
+    """Sleep, then answer."""
+    time.sleep(seconds)
+    return "awake"
+
+def ISO_GET_sentinel(marker=object()) -> str:
+    """Has a default the parent cannot reproduce."""
+    return "ran"
+
+TOOLS = [ISO_GET_sleep, ISO_GET_sentinel]
+'''
+
+
+HELPER_TOOLS = '''
+import iso_helper
+
+def ISO_GET_value() -> str:
+    """Return the helper's value."""
+    return iso_helper.VALUE
+
+TOOLS = [ISO_GET_value]
+'''
+
+
+def _make_isolated_extension(root: str, source: str = ISOLATED_TOOLS, **config) -> None:
+    ext_dir = Path(root) / "iso_ext"
+    tools_dir = ext_dir / "tools"
+    tools_dir.mkdir(parents=True)
+    with open(ext_dir / "config.json", "w") as f:
+        json.dump({"name": "iso_ext", "tool_isolation": "process", "tool_workers": 1, **config}, f)
+    (tools_dir / "iso_tools.py").write_text(source)
+
+
+def test_isolated_extension_runs_out_of_process():
+    """Isolated tools keep their signature and run in a worker process."""
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            _make_isolated_extension(tmpdir)
+            extensions = discover_extensions(tmpdir)
+
+            assert len(extensions) == 1
+            assert extensions[0]['system_prompt'] == "Isolated test prompt"
+            tools = {t.__name__: t for t in extensions[0]['tools']}
+            assert set(tools) == {"ISO_GET_pid", "ISO_ACTION_crash", "ISO_ACTION_fail"}
+            assert "iso_tools" not in sys.modules
+
+            sig = inspect.signature(tools["ISO_GET_pid"])
+            assert list(sig.parameters) == ["tag", "count", "note"]
+            assert sig.parameters["count"].default == 2
+            assert tools["ISO_GET_pid"].__doc__ == "Return the worker pid."
+
+            ok, text = tools["ISO_GET_pid"]("a", count=5)
+            tag, count, pid = text.split(":")
+            assert ok is True and tag == "a" and count == "5"
+            assert int(pid) != os.getpid()
+        print("[PASS] Isolated tools run out of process")
+    except Exception as e:
+        print(f"[FAIL] Error testing isolated tools: {e}")
+        raise
+    finally:
+        shutdown_all_pools()
+
+
+def test_isolated_worker_crash_restarts_pool():
+    """A crashing tool fails its own call and the pool recovers."""
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            _make_isolated_extension(tmpdir)
+            tools = {t.__name__: t for t in discover_extensions(tmpdir)[0]['tools']}
+
+            try:
+                tools["ISO_ACTION_fail"]()
+                assert False, "expected RuntimeError"
+            except RuntimeError as exc:
+                assert "boom" in str(exc)
+
+            try:
+                tools["ISO_ACTION_crash"]()
+                assert False, "expected RuntimeError"
+            except RuntimeError as exc:
+                assert "crashed" in str(exc)
+
+            ok, _ = tools["ISO_GET_pid"]("after")
+            assert ok is True
+        print("[PASS] Worker crash restarts the pool")
+    except Exception as e:
+        print(f"[FAIL] Error testing worker crash: {e}")
+        raise
+    finally:
+        shutdown_all_pools()
+
+
+def test_isolated_calls_are_strict_and_time_out():
+    """Bad arguments raise, non-literal defaults are refused, and a hung call times out."""
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            _make_isolated_extension(tmpdir, STRICT_TOOLS, tool_timeout_s=1)
+            extensions = discover_extensions(tmpdir)
+            tools = {t.__name__: t for t in extensions[0]['tools']}
+
+            # Exposing the tool with a substitute default would change its behavior
+            assert set(tools) == {"ISO_GET_sleep"}
+            assert any("ISO_GET_sentinel" in err for err in extensions[0]['load_errors'])
+
+            assert tools["ISO_GET_sleep"](0) == "awake"
+            for args, kwargs in (((0, 1), {}), ((), {"seconds": 0, "extra": 1}), ((), {})):
+                try:
+                    tools["ISO_GET_sleep"](*args, **kwargs)
+                    assert False, "expected TypeError"
+                except TypeError:
+                    pass
+
+            try:
+                tools["ISO_GET_sleep"](30)
+                assert False, "expected a timeout"
+            except RuntimeError as exc:
+                assert "timed out" in str(exc)
+            assert tools["ISO_GET_sleep"](0) == "awake"
+        print("[PASS] Isolated calls are strict and time out")
+    except Exception as e:
+        print(f"[FAIL] Error testing strict isolated calls: {e}")
+        raise
+    finally:
+        shutdown_all_pools()
+
+
+def test_isolated_pool_restarts_when_a_helper_changes():
+    """Editing a helper module under tools/ gives the workers the new code."""
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            _make_isolated_extension(tmpdir, HELPER_TOOLS)
+            helper = Path(tmpdir) / "iso_ext" / "tools" / "iso_helper.py"
+            helper.write_text('VALUE = "old"\n')
+            tools = {t.__name__: t for t in discover_extensions(tmpdir)[0]['tools']}
+            assert tools["ISO_GET_value"]() == "old"
+
+            helper.write_text('VALUE = "new"\n')
+            mtime = helper.stat().st_mtime + 5
+            os.utime(helper, (mtime, mtime))
+            tools = {t.__name__: t for t in discover_extensions(tmpdir)[0]['tools']}
+            assert tools["ISO_GET_value"]() == "new"
+        print("[PASS] Isolated pool restarts when a helper changes")
+    except Exception as e:
+        print(f"[FAIL] Error testing helper changes: {e}")
+        raise
+    finally:
+        shutdown_all_pools()
+
+
+if __name__ == "__main__":
+    print("Running tool process pool tests...")
+    test_isolated_extension_runs_out_of_process()
+    test_isolated_worker_crash_restarts_pool()
+    test_isolated_calls_are_strict_and_time_out()
+    test_isolated_pool_restarts_when_a_helper_changes()
+    print("\nAll tests passed!")